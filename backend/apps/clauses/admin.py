@@ -4,7 +4,7 @@ from .models import ContractClause
 
 @admin.register(ContractClause)
 class ContractClauseAdmin(admin.ModelAdmin):
-    list_display = ['contract', 'clause_type', 'clause_title', 'is_confirmed', 'confidence', 'created_at']
+    list_display = ['contract', 'contract_version', 'clause_no', 'clause_type', 'clause_title', 'start_position', 'is_confirmed', 'confidence', 'created_at']
     list_filter = ['clause_type', 'is_confirmed', 'created_at']
     search_fields = ['contract__title', 'clause_content']
 
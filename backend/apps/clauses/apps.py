@@ -6,3 +6,5 @@ class ClausesConfig(AppConfig):
     name = 'apps.clauses'
     verbose_name = '条款识别'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,32 @@
+"""
+切分合同条款（合同文本保存时会自动切分，本命令用于历史合同批量切分）
+使用方法:
+    python manage.py build_contract_clauses            # 只切分尚未切分的合同
+    python manage.py build_contract_clauses --all      # 重新切分全部合同
+"""
+from django.core.management.base import BaseCommand
+from apps.clauses.services import ClauseService
+from apps.contracts.models import Contract, ContractText
+
+
+class Command(BaseCommand):
+    help = '切分合同当前版本的条款'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新切分全部合同')
+
+    def handle(self, *args, **options):
+        service = ClauseService()
+        contracts = Contract.objects.filter(is_deleted=False)
+        total = contracts.count()
+        for index, contract in enumerate(contracts.iterator(chunk_size=100), start=1):
+            contract_text = ContractText.objects.filter(
+                contract_id=contract.id, version=contract.current_version
+            ).first()
+            if options['all'] and contract_text is not None:
+                service.segment_contract_text(contract_text)
+            else:
+                service.get_clauses(contract)
+            if index % 100 == 0:
+                self.stdout.write(f'  已处理 {index}/{total} 份合同')
+        self.stdout.write(self.style.SUCCESS(f'✓ 完成，共 {total} 份合同'))
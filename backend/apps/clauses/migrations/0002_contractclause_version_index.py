@@ -0,0 +1,17 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clauses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contractclause',
+            index=models.Index(fields=['contract', 'contract_version', 'start_position'], name='clauses_contract_version_idx'),
+        ),
+    ]
@@ -35,6 +35,10 @@ class ContractClause(models.Model):
         verbose_name = '合同条款'
         verbose_name_plural = '合同条款'
         ordering = ['start_position']
+        indexes = [
+            # 按合同版本读取条款位置
+            models.Index(fields=['contract', 'contract_version', 'start_position'], name='clauses_contract_version_idx'),
+        ]
 
     def __str__(self):
         return f'{self.contract.title} - {self.get_clause_type_display()}'
@@ -0,0 +1,301 @@
+"""
+条款识别服务模块 - 按条款标题切分合同文本，按合同版本保存条款及其在全文中的位置
+
+切分规则：
+    第X条              条款（置信度最高）
+    一、 二、          合同中没有“第X条”时作为条款
+    1. 2、             合同中没有以上两种标题时作为条款
+    1.1 3.2.1          子条款，位置记录在所属条款的 extracted_data 中
+
+合同文本保存（每个合同版本的文本变化）时切分一次，规则匹配等直接读取保存的条款位置，不再重复切分。
+"""
+import difflib
+import logging
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+from django.db import transaction
+
+from apps.clauses.models import ContractClause
+from apps.contracts.models import Contract, ContractText
+from apps.contracts.services_text import ContractTextService
+
+logger = logging.getLogger(__name__)
+
+HEADING_PATTERN = re.compile(
+    r'^[ \t\u3000]*(?:'
+    r'(?P<article>第[一二三四五六七八九十百千零〇两\d]+条)'
+    r'|(?P<enum>[一二三四五六七八九十]+)、'
+    r'|(?P<sub>\d{1,3}(?:[.．]\d{1,3})+)(?![\d.．])'
+    r'|(?P<num>\d{1,3})(?:[.．](?!\d)|、)'
+    r')',
+    re.MULTILINE
+)
+TITLE_STRIP_CHARS = ' \t\u3000、.．:：'
+TITLE_END_PATTERN = re.compile(r'[。；;：:，,]')
+TITLE_MAX_LENGTH = 50
+
+# 标题不同的两个条款文本相似度不低于该值时视为同一条款被修改（否则为删除一条、新增一条）
+MODIFIED_MIN_RATIO = 0.6
+
+# 条款标题的优先级：存在“第X条”时其他编号都视为条款内部的列举
+TOP_LEVEL_KINDS = ('article', 'enum', 'num', 'sub')
+KIND_CONFIDENCE = {
+    'article': 0.95,
+    'enum': 0.85,
+    'num': 0.75,
+    'sub': 0.70,
+    'preamble': 0.50,
+}
+
+# 按条款标题（前言按内容）判断条款类型，按顺序取第一个命中的类型
+CLAUSE_TYPE_KEYWORDS = [
+    ('liability', ('违约', '赔偿', '罚则')),
+    ('payment', ('付款', '支付', '价款', '结算', '费用', '价格', '报酬')),
+    ('period', ('期限', '交付', '交货', '履行', '工期', '有效期')),
+    ('subject', ('标的', '产品', '货物', '服务内容', '工作内容', '数量', '质量', '规格')),
+    ('party', ('甲方', '乙方', '当事人', '主体', '双方')),
+]
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_clause_text(text: str) -> str:
+    """
+    规范化条款文本（用于判断不同合同中的条款是否相同）
+
+    全角半角统一、去掉开头的条款编号和所有空白，条款编号变化或排版不同不影响比较结果。
+    """
+    text = unicodedata.normalize('NFKC', text or '')
+    match = HEADING_PATTERN.match(text)
+    if match:
+        text = text[match.end():]
+    return WHITESPACE_PATTERN.sub('', text)
+
+
+class ClauseSegment:
+    """切分出的条款（只记录位置，条款文本按位置从全文中截取）"""
+
+    __slots__ = ('kind', 'clause_no', 'title', 'start', 'end', 'sub_clauses')
+
+    def __init__(self, kind: str, clause_no: str, title: str, start: int, end: int):
+        self.kind = kind
+        self.clause_no = clause_no
+        self.title = title
+        self.start = start
+        self.end = end
+        self.sub_clauses = []  # [(编号, 起始位置, 结束位置), ...]
+
+    @property
+    def confidence(self) -> float:
+        return KIND_CONFIDENCE[self.kind]
+
+    def clause_type(self, text: str) -> str:
+        """按标题判断条款类型（前言没有标题，按内容判断）"""
+        source = self.title if self.kind != 'preamble' else text[self.start:self.end]
+        for clause_type, keywords in CLAUSE_TYPE_KEYWORDS:
+            if any(keyword in source for keyword in keywords):
+                return clause_type
+        return 'other'
+
+
+class ClauseSegmenter:
+    """基于条款标题的合同切分器"""
+
+    def segment(self, text: str) -> List[ClauseSegment]:
+        """
+        切分合同文本
+
+        Returns:
+            按位置排序的条款列表，各条款首尾相接覆盖全文（第一个标题之前的内容为前言）
+        """
+        if not text:
+            return []
+
+        headings = {kind: [] for kind in TOP_LEVEL_KINDS}
+        for match in HEADING_PATTERN.finditer(text):
+            headings[match.lastgroup].append(match)
+        top_kind = next((kind for kind in TOP_LEVEL_KINDS if headings[kind]), None)
+        if top_kind is None:
+            return [ClauseSegment('preamble', '', '', 0, len(text))]
+
+        top_matches = headings[top_kind]
+        segments = []
+        if top_matches[0].start() > 0:
+            segments.append(ClauseSegment('preamble', '', '', 0, top_matches[0].start()))
+        for index, match in enumerate(top_matches):
+            end = top_matches[index + 1].start() if index + 1 < len(top_matches) else len(text)
+            segments.append(ClauseSegment(
+                top_kind, match.group(top_kind), self._title(text, match.end()), match.start(), end
+            ))
+
+        if top_kind != 'sub':
+            self._attach_sub_clauses(segments, headings['sub'])
+        return segments
+
+    def split(self, text: str) -> List[Tuple[int, str]]:
+        """切分合同文本，返回 [(条款起始位置, 条款文本), ...]，各条款文本按顺序拼接即为全文"""
+        return [(segment.start, text[segment.start:segment.end]) for segment in self.segment(text)]
+
+    def _title(self, text: str, heading_end: int) -> str:
+        """条款标题：标题编号之后到行尾（或第一个句读）的文字"""
+        line_end = text.find('\n', heading_end)
+        line = text[heading_end:line_end if line_end >= 0 else len(text)].strip(TITLE_STRIP_CHARS)
+        match = TITLE_END_PATTERN.search(line)
+        if match:
+            line = line[:match.start()]
+        return line[:TITLE_MAX_LENGTH].strip()
+
+    def _attach_sub_clauses(self, segments: List[ClauseSegment], sub_matches: List):
+        """子条款归入所在的条款，子条款到下一个子条款或所在条款结尾为止"""
+        segment_index = 0
+        for index, match in enumerate(sub_matches):
+            start = match.start()
+            while segments[segment_index].end <= start:
+                segment_index += 1
+            segment = segments[segment_index]
+            end = segment.end
+            if index + 1 < len(sub_matches):
+                end = min(end, sub_matches[index + 1].start())
+            segment.sub_clauses.append((match.group('sub'), start, end))
+
+
+class ClauseAligner:
+    """
+    按规范化文本对齐两组条款（如合同的两个版本、合同与模板）
+
+    先在条款序列上求最长公共子序列，文本相同的条款直接对齐；不同的区间内按标题相同
+    或文本相似度配对修改前后的条款，没有配对的为新增或删除的条款。
+    """
+
+    def align(
+        self,
+        source: List[Tuple[str, str]],
+        target: List[Tuple[str, str]]
+    ) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """
+        Args:
+            source: 源条款 [(条款标题, 规范化条款文本), ...]
+            target: 目标条款 [(条款标题, 规范化条款文本), ...]
+
+        Returns:
+            [(操作, 源条款序号, 目标条款序号), ...]，操作为 equal/modified/added/deleted，
+            按目标条款顺序排列，删除的条款排在原来的位置
+        """
+        matcher = difflib.SequenceMatcher(
+            None, [key for _, key in source], [key for _, key in target], autojunk=False
+        )
+        operations = []
+        for tag, s_start, s_end, t_start, t_end in matcher.get_opcodes():
+            if tag == 'equal':
+                operations.extend(
+                    ('equal', s_start + offset, t_start + offset) for offset in range(s_end - s_start)
+                )
+            else:
+                operations.extend(self._pair(source, target, range(s_start, s_end), range(t_start, t_end)))
+        return operations
+
+    def _pair(self, source, target, source_range, target_range) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """配对不同区间内修改前后的条款"""
+        remaining = list(source_range)
+        operations = []
+        for t_index in target_range:
+            title, key = target[t_index]
+            s_index = next((index for index in remaining if title and source[index][0] == title), None)
+            if s_index is None:
+                s_index = self._most_similar(key, source, remaining)
+            if s_index is None:
+                operations.append(('added', None, t_index))
+            else:
+                remaining.remove(s_index)
+                operations.append(('modified', s_index, t_index))
+        operations.extend(('deleted', s_index, None) for s_index in remaining)
+        return operations
+
+    def _most_similar(self, key: str, source, candidates: List[int]) -> Optional[int]:
+        best_ratio, best_index = 0.0, None
+        for index in candidates:
+            matcher = difflib.SequenceMatcher(None, key, source[index][1], autojunk=False)
+            # quick_ratio 是相似度的上界，先用它排除明显不同的条款
+            if matcher.quick_ratio() < max(MODIFIED_MIN_RATIO, best_ratio):
+                continue
+            ratio = matcher.ratio()
+            if ratio >= max(MODIFIED_MIN_RATIO, best_ratio):
+                best_ratio, best_index = ratio, index
+        return best_index
+
+
+class ClauseService:
+    """合同条款服务类"""
+
+    def __init__(self):
+        self.segmenter = ClauseSegmenter()
+
+    def segment_contract_text(self, contract_text: ContractText) -> List[ContractClause]:
+        """切分合同某个版本的文本并保存条款（替换该版本已有的条款）"""
+        text = contract_text.text
+        clauses = [
+            ContractClause(
+                contract_id=contract_text.contract_id,
+                contract_version=contract_text.version,
+                clause_no=segment.clause_no,
+                clause_type=segment.clause_type(text),
+                clause_title=segment.title,
+                clause_content=text[segment.start:segment.end],
+                start_position=segment.start,
+                end_position=segment.end,
+                extracted_data={
+                    'sub_clauses': [
+                        {'clause_no': clause_no, 'start_position': start, 'end_position': end}
+                        for clause_no, start, end in segment.sub_clauses
+                    ]
+                } if segment.sub_clauses else None,
+                confidence=segment.confidence,
+            )
+            for segment in self.segmenter.segment(text)
+        ]
+        with transaction.atomic():
+            ContractClause.objects.filter(
+                contract_id=contract_text.contract_id, contract_version=contract_text.version
+            ).delete()
+            ContractClause.objects.bulk_create(clauses, batch_size=500)
+        return clauses
+
+    def get_segments(self, contract: Contract, text: str, version: Optional[int] = None) -> List[Tuple[int, str]]:
+        """
+        获取合同指定版本（默认当前版本）的条款切分 [(条款起始位置, 条款文本), ...]
+
+        优先使用保存的条款位置；没有保存（历史合同）或与文本不一致（如条款被手工修改）时重新切分。
+        """
+        bounds = list(ContractClause.objects.filter(
+            contract_id=contract.id, contract_version=version or contract.current_version
+        ).order_by('start_position').values_list('start_position', 'end_position'))
+        if self._covers(bounds, len(text)):
+            return [(start, text[start:end]) for start, end in bounds]
+        return self.segmenter.split(text)
+
+    def get_clauses(self, contract: Contract) -> List[ContractClause]:
+        """获取合同当前版本的条款，尚未切分（历史合同）时切分并保存"""
+        clauses = list(ContractClause.objects.filter(
+            contract_id=contract.id, contract_version=contract.current_version
+        ).order_by('start_position'))
+        if clauses:
+            return clauses
+        contract_text = ContractText.objects.filter(
+            contract_id=contract.id, version=contract.current_version
+        ).first()
+        if contract_text is None:
+            # 保存提取文本时自动切分条款
+            ContractTextService().refresh(contract)
+            return list(ContractClause.objects.filter(
+                contract_id=contract.id, contract_version=contract.current_version
+            ).order_by('start_position'))
+        return self.segment_contract_text(contract_text)
+
+    def _covers(self, bounds: List[Tuple[Optional[int], Optional[int]]], text_length: int) -> bool:
+        """条款位置是否首尾相接覆盖全文"""
+        if not bounds or bounds[0][0] != 0 or bounds[-1][1] != text_length:
+            return False
+        return all(
+            previous[1] == current[0]
+            for previous, current in zip(bounds, bounds[1:])
+        )
@@ -0,0 +1,16 @@
+"""
+条款信号处理 - 合同版本的提取文本保存（文本变化）后切分条款
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.contracts.models import ContractText
+from .services import ClauseService
+
+
+@receiver(post_save, sender=ContractText)
+def segment_contract_clauses(sender, instance, raw=False, update_fields=None, **kwargs):
+    """提取文本变化时重新切分该版本的条款（只更新文件标记时跳过）"""
+    if raw or (update_fields is not None and 'text' not in update_fields):
+        return
+    ClauseService().segment_contract_text(instance)
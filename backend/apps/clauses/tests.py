@@ -0,0 +1,64 @@
+"""
+条款识别模块单元测试
+"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from apps.clauses.models import ContractClause
+from apps.clauses.services import ClauseSegmenter, ClauseService
+from apps.contracts.models import Contract
+
+User = get_user_model()
+
+
+class ClauseSegmentTest(TestCase):
+    """条款切分测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.text = (
+            '设备采购合同\n甲方：某公司\n'
+            '第一条 合同标的\n1.1 设备名称：数控机床\n1.2 数量：2台\n'
+            '第二条 付款方式：验收后付款。\n一、预付款\n'
+            '第三条 违约责任\n违约金为合同总额的百分之十。\n'
+        )
+    
+    def test_segment_positions_cover_text(self):
+        """条款首尾相接覆盖全文，条款内的列举和子条款不单独切分"""
+        segments = ClauseSegmenter().segment(self.text)
+        self.assertEqual([segment.clause_no for segment in segments], ['', '第一条', '第二条', '第三条'])
+        self.assertEqual([segment.title for segment in segments[1:]], ['合同标的', '付款方式', '违约责任'])
+        self.assertEqual(''.join(self.text[s.start:s.end] for s in segments), self.text)
+        self.assertEqual([no for no, _, _ in segments[1].sub_clauses], ['1.1', '1.2'])
+        self.assertEqual(
+            [segment.clause_type(self.text) for segment in segments],
+            ['party', 'subject', 'payment', 'liability']
+        )
+    
+    def test_numbered_headings_without_articles(self):
+        """没有“第X条”时按数字编号切分"""
+        segments = ClauseSegmenter().segment('1. 定义\n1.1 本合同\n2、付款\n')
+        self.assertEqual([(s.kind, s.clause_no, s.title) for s in segments], [('num', '1', '定义'), ('num', '2', '付款')])
+    
+    def test_clauses_saved_per_version(self):
+        """合同保存时按版本保存条款，规则匹配读取保存的条款位置"""
+        contract = Contract.objects.create(
+            title='设备采购合同', contract_type='procurement', content=self.text, drafter=self.user
+        )
+        clauses = list(ContractClause.objects.filter(contract=contract, contract_version=1))
+        self.assertEqual(len(clauses), 4)
+        self.assertEqual(clauses[3].clause_content, '第三条 违约责任\n违约金为合同总额的百分之十。\n')
+        self.assertEqual(
+            ClauseService().get_segments(contract, self.text),
+            ClauseSegmenter().split(self.text)
+        )
+        
+        contract.content = self.text + '第四条 争议解决\n提交仲裁。\n'
+        contract.current_version = 2
+        contract.save()
+        self.assertEqual(ContractClause.objects.filter(contract=contract, contract_version=1).count(), 4)
+        self.assertEqual(ContractClause.objects.filter(contract=contract, contract_version=2).count(), 5)
@@ -23,5 +23,21 @@ class ComparisonTaskSerializer(serializers.ModelSerializer):
                   'target_contract', 'target_contract_title', 'source_version',
                   'target_version', 'template', 'template_name', 'status', 'result_data',
                   'created_by', 'created_by_name', 'diffs', 'created_at', 'completed_at']
-        read_only_fields = ['created_at', 'completed_at']
+        read_only_fields = ['status', 'result_data', 'created_by', 'created_at', 'completed_at']
+
+    def validate(self, attrs):
+        task_type = attrs.get('task_type')
+        source_contract = attrs.get('source_contract')
+        target_contract = attrs.get('target_contract')
+        if task_type == 'version' and not (source_contract or target_contract):
+            raise serializers.ValidationError('版本对比需要指定合同')
+        if task_type == 'template' and not (source_contract or target_contract):
+            raise serializers.ValidationError('模板对比需要指定合同')
+        if task_type == 'template' and not attrs.get('template'):
+            contract = source_contract or target_contract
+            if not contract.template_id:
+                raise serializers.ValidationError('合同未使用模板，请指定对比的模板')
+        if task_type == 'cross_industry' and not (source_contract and target_contract):
+            raise serializers.ValidationError('合同对比需要指定源合同和目标合同')
+        return attrs
 
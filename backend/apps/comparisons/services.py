@@ -0,0 +1,294 @@
+"""
+合同对比服务模块 - 按条款对齐两份文本，计算修改条款内的词级差异
+
+对比流程：
+    1. 按条款标题切分两份文本，条款按规范化文本对齐（相同条款直接跳过，不做逐字比较）
+    2. 修改的条款先按句子比较，只对不同的句子按词比较（中文逐字，英文单词和数字整体），
+       百页以上的合同也只在少量不同的句子上做细粒度比较
+    3. 差异按条款批量写入 ComparisonDiff，词级差异和统计写入 result_data
+"""
+import difflib
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from django.db import transaction
+from django.utils import timezone
+
+from apps.clauses.services import ClauseAligner, ClauseSegment, ClauseSegmenter, normalize_clause_text
+from apps.comparisons.models import ComparisonDiff, ComparisonTask
+from apps.contracts.services_text import ContractTextService
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_PATTERN = re.compile(r'[^。；;！？!?\n]*(?:[。；;！？!?\n]|$)')
+TOKEN_PATTERN = re.compile(r'[A-Za-z]+|\d+(?:[.,]\d+)*|\s+|.', re.DOTALL)
+# 金额、比例、期限等数字（阿拉伯数字、大写数字、带单位的中文数字）
+NUMBER_PATTERN = re.compile(
+    r'\d|[壹贰叁肆伍陆柒捌玖拾佰仟]|[一二三四五六七八九十两百千万]+[日天个月年元%％]|[百千万]分之'
+)
+
+# 词级差异中未变化的文字只保留变化处前后的上下文
+CONTEXT_CHARS = 30
+BULK_BATCH_SIZE = 500
+
+# 付款、违约责任等条款的变化风险较高
+HIGH_RISK_CLAUSE_TYPES = ('payment', 'liability')
+MEDIUM_RISK_CLAUSE_TYPES = ('period', 'subject')
+
+
+def _merge_segments(segments: List[List[str]]) -> List[List[str]]:
+    """合并相邻的同类差异片段"""
+    merged = []
+    for operation, text in segments:
+        if not text:
+            continue
+        if merged and merged[-1][0] == operation:
+            merged[-1][1] += text
+        else:
+            merged.append([operation, text])
+    return merged
+
+
+def word_diff(source: str, target: str) -> List[List[str]]:
+    """
+    计算两段文本的词级差异
+
+    Returns:
+        [[操作, 文本], ...]，操作为 equal/delete/insert，按顺序拼接 equal+delete 为源文本、equal+insert 为目标文本
+    """
+    source_sentences = [s for s in SENTENCE_PATTERN.findall(source) if s]
+    target_sentences = [s for s in SENTENCE_PATTERN.findall(target) if s]
+    segments = []
+    matcher = difflib.SequenceMatcher(None, source_sentences, target_sentences, autojunk=False)
+    for tag, s_start, s_end, t_start, t_end in matcher.get_opcodes():
+        source_part = ''.join(source_sentences[s_start:s_end])
+        target_part = ''.join(target_sentences[t_start:t_end])
+        if tag == 'equal':
+            segments.append(['equal', source_part])
+        elif tag == 'delete':
+            segments.append(['delete', source_part])
+        elif tag == 'insert':
+            segments.append(['insert', target_part])
+        else:
+            source_tokens = TOKEN_PATTERN.findall(source_part)
+            target_tokens = TOKEN_PATTERN.findall(target_part)
+            token_matcher = difflib.SequenceMatcher(None, source_tokens, target_tokens, autojunk=False)
+            for token_tag, a_start, a_end, b_start, b_end in token_matcher.get_opcodes():
+                if token_tag == 'equal':
+                    segments.append(['equal', ''.join(source_tokens[a_start:a_end])])
+                    continue
+                segments.append(['delete', ''.join(source_tokens[a_start:a_end])])
+                segments.append(['insert', ''.join(target_tokens[b_start:b_end])])
+    return _merge_segments(segments)
+
+
+def trim_context(segments: List[List[str]], context: int = CONTEXT_CHARS) -> List[List[str]]:
+    """未变化的长文字只保留与变化处相邻的部分"""
+    trimmed = []
+    last = len(segments) - 1
+    for index, (operation, text) in enumerate(segments):
+        if operation == 'equal':
+            head = text[:context] if index > 0 else ''
+            tail = text[-context:] if index < last else ''
+            if len(text) > len(head) + len(tail) + 1:
+                text = f'{head}…{tail}'
+        trimmed.append([operation, text])
+    return trimmed
+
+
+class ComparisonService:
+    """合同对比服务类"""
+
+    def __init__(self):
+        self.text_service = ContractTextService()
+        self.segmenter = ClauseSegmenter()
+        self.aligner = ClauseAligner()
+
+    def run(self, task: ComparisonTask) -> Dict:
+        """
+        执行对比任务：计算差异，替换任务已有的差异记录，更新任务状态和结果
+
+        Returns:
+            Dict: 对比结果（同 result_data）
+        """
+        task.status = 'processing'
+        task.save(update_fields=['status'])
+        started = time.perf_counter()
+        try:
+            (source_label, source_text), (target_label, target_text) = self._load_texts(task)
+            differences = self.compare(source_text, target_text)
+
+            diffs = []
+            for difference in differences['differences']:
+                # 条款全文保存在差异记录中，result_data 只保留词级差异
+                diffs.append(ComparisonDiff(
+                    comparison_task=task,
+                    diff_type=difference['diff_type'],
+                    diff_level='clause',
+                    source_content=difference.pop('source_content'),
+                    target_content=difference.pop('target_content'),
+                    clause_id=difference['clause_id'][:100],
+                    risk_level=difference['risk_level'],
+                ))
+            with transaction.atomic():
+                ComparisonDiff.objects.filter(comparison_task=task).delete()
+                ComparisonDiff.objects.bulk_create(diffs, batch_size=BULK_BATCH_SIZE)
+
+            result = {
+                'source_label': source_label,
+                'target_label': target_label,
+                'summary': differences['summary'],
+                'differences': differences['differences'],
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            }
+            task.status = 'completed'
+            task.result_data = result
+            task.completed_at = timezone.now()
+            task.save(update_fields=['status', 'result_data', 'completed_at'])
+            logger.info(
+                f'合同对比完成 - 任务ID: {task.id}, 差异条款: {len(diffs)}, 耗时: {result["elapsed_ms"]}ms'
+            )
+            return result
+
+        except Exception as e:
+            logger.error(f'合同对比失败 - 任务ID: {task.id}, 错误: {str(e)}')
+            task.status = 'failed'
+            task.result_data = {'error': str(e)}
+            task.completed_at = timezone.now()
+            task.save(update_fields=['status', 'result_data', 'completed_at'])
+            raise
+
+    def compare(self, source_text: str, target_text: str) -> Dict:
+        """
+        按条款对比两份文本
+
+        Returns:
+            {'summary': 统计, 'differences': [差异条款, ...]}，差异条款按目标文本顺序排列
+        """
+        source_segments = self.segmenter.segment(source_text)
+        target_segments = self.segmenter.segment(target_text)
+        source_keys = [normalize_clause_text(source_text[s.start:s.end]) for s in source_segments]
+        target_keys = [normalize_clause_text(target_text[s.start:s.end]) for s in target_segments]
+        operations = self.aligner.align(
+            [(segment.title, key) for segment, key in zip(source_segments, source_keys)],
+            [(segment.title, key) for segment, key in zip(target_segments, target_keys)]
+        )
+
+        summary = {
+            'source_clause_count': len(source_segments),
+            'target_clause_count': len(target_segments),
+            'unchanged_count': 0,
+            'modified_count': 0,
+            'added_count': 0,
+            'deleted_count': 0,
+            'high_risk_count': 0,
+            'medium_risk_count': 0,
+            'low_risk_count': 0,
+        }
+        differences = []
+        for operation, s_index, t_index in operations:
+            if operation == 'equal':
+                summary['unchanged_count'] += 1
+                continue
+            source_segment = source_segments[s_index] if s_index is not None else None
+            target_segment = target_segments[t_index] if t_index is not None else None
+            # 只有编号或空白的条款不计为差异
+            if operation == 'added' and not target_keys[t_index]:
+                continue
+            if operation == 'deleted' and not source_keys[s_index]:
+                continue
+            difference = self._build_difference(
+                operation, source_segment, source_text, target_segment, target_text
+            )
+            summary[f'{operation}_count'] += 1
+            summary[f'{difference["risk_level"]}_risk_count'] += 1
+            differences.append(difference)
+        return {'summary': summary, 'differences': differences}
+
+    def _build_difference(
+        self,
+        operation: str,
+        source_segment: Optional[ClauseSegment],
+        source_text: str,
+        target_segment: Optional[ClauseSegment],
+        target_text: str
+    ) -> Dict:
+        source_content = source_text[source_segment.start:source_segment.end] if source_segment else ''
+        target_content = target_text[target_segment.start:target_segment.end] if target_segment else ''
+        segment, text = (target_segment, target_text) if target_segment else (source_segment, source_text)
+        clause_type = segment.clause_type(text)
+
+        if operation == 'modified':
+            segments = word_diff(source_content, target_content)
+        elif operation == 'added':
+            segments = [['insert', target_content]]
+        else:
+            segments = [['delete', source_content]]
+
+        return {
+            'clause_id': f'{segment.clause_no} {segment.title}'.strip() or '前言',
+            'clause_title': segment.title,
+            'clause_type': clause_type,
+            'diff_type': operation,
+            'risk_level': self._risk_level(operation, clause_type, segments),
+            'segments': trim_context(segments) if operation == 'modified' else segments,
+            'source_content': source_content,
+            'target_content': target_content,
+        }
+
+    def _risk_level(self, operation: str, clause_type: str, segments: List[List[str]]) -> str:
+        """
+        差异风险等级：删除付款、违约条款或修改其中的数字（金额、比例、期限）为高风险
+        """
+        numbers_changed = any(
+            segment_operation != 'equal' and NUMBER_PATTERN.search(text)
+            for segment_operation, text in segments
+        )
+        if operation == 'deleted':
+            return 'high' if clause_type in HIGH_RISK_CLAUSE_TYPES else 'medium'
+        if operation == 'added':
+            return 'medium' if clause_type in HIGH_RISK_CLAUSE_TYPES else 'low'
+        if clause_type in HIGH_RISK_CLAUSE_TYPES:
+            return 'high' if numbers_changed else 'medium'
+        if clause_type in MEDIUM_RISK_CLAUSE_TYPES or numbers_changed:
+            return 'medium'
+        return 'low'
+
+    def _load_texts(self, task: ComparisonTask) -> Tuple[Tuple[str, str], Tuple[str, str]]:
+        """
+        读取对比的两份文本
+
+        Returns:
+            ((源名称, 源文本), (目标名称, 目标文本))
+        """
+        if task.task_type == 'version':
+            source_contract = task.source_contract or task.target_contract
+            target_contract = task.target_contract or task.source_contract
+            if source_contract is None:
+                raise ValueError('版本对比需要指定合同')
+            source_version = task.source_version or 1
+            target_version = task.target_version or target_contract.current_version
+            return (
+                (f'{source_contract.title} v{source_version}',
+                 self.text_service.get_version_text(source_contract, source_version)),
+                (f'{target_contract.title} v{target_version}',
+                 self.text_service.get_version_text(target_contract, target_version)),
+            )
+
+        if task.task_type == 'template':
+            contract = task.source_contract or task.target_contract
+            template = task.template or (contract.template if contract else None)
+            if contract is None or template is None:
+                raise ValueError('模板对比需要指定合同和模板')
+            return (
+                (f'模板：{template.name}', template.content or ''),
+                (contract.title, self.text_service.get_text(contract)),
+            )
+
+        if task.source_contract is None or task.target_contract is None:
+            raise ValueError('合同对比需要指定源合同和目标合同')
+        return (
+            (task.source_contract.title, self.text_service.get_text(task.source_contract)),
+            (task.target_contract.title, self.text_service.get_text(task.target_contract)),
+        )
@@ -0,0 +1,23 @@
+from celery import shared_task
+import logging
+from .models import ComparisonTask
+from .services import ComparisonService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_comparison_task(task_id):
+    """执行合同对比任务"""
+    try:
+        task = ComparisonTask.objects.get(id=task_id)
+    except ComparisonTask.DoesNotExist:
+        logger.error(f'对比任务不存在 - 任务ID: {task_id}')
+        return {'success': False, 'error': '对比任务不存在'}
+    
+    logger.info(f'[开始] 合同对比 - 任务ID: {task_id}, 类型: {task.task_type}')
+    try:
+        result = ComparisonService().run(task)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+    return {'success': True, 'task_id': task_id, 'diff_count': len(result['differences'])}
@@ -0,0 +1,71 @@
+"""
+对比模块单元测试
+"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from apps.comparisons.models import ComparisonTask, ComparisonDiff
+from apps.comparisons.services import ComparisonService, word_diff
+from apps.contracts.models import Contract
+
+User = get_user_model()
+
+
+class ComparisonServiceTest(TestCase):
+    """合同对比测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.text = (
+            '设备采购合同\n'
+            '第一条 合同标的\n乙方向甲方提供数控机床2台。\n'
+            '第二条 付款方式\n甲方于验收后30日内支付全部价款。\n'
+            '第三条 违约责任\n违约金为合同总额的百分之十。\n'
+            '第四条 争议解决\n提交甲方所在地法院诉讼解决。\n'
+        )
+    
+    def test_word_diff_round_trip(self):
+        """词级差异按顺序拼接可还原两份文本"""
+        source = '甲方于验收后30日内支付全部价款。乙方开具发票。'
+        target = '甲方于验收后90日内支付全部价款。乙方开具发票。'
+        segments = word_diff(source, target)
+        self.assertEqual(segments[1:3], [['delete', '30'], ['insert', '90']])
+        self.assertEqual(''.join(text for op, text in segments if op != 'insert'), source)
+        self.assertEqual(''.join(text for op, text in segments if op != 'delete'), target)
+    
+    def test_version_comparison_writes_clause_diffs(self):
+        """版本对比按条款对齐，只记录修改、新增、删除的条款"""
+        contract = Contract.objects.create(
+            title='设备采购合同', contract_type='procurement', content=self.text, drafter=self.user
+        )
+        contract.content = (
+            self.text.replace('30日内', '90日内')
+            .replace('第四条 争议解决\n提交甲方所在地法院诉讼解决。\n', '')
+            + '第四条 保密\n双方对合同内容保密。\n'
+        )
+        contract.current_version = 2
+        contract.save()
+        
+        task = ComparisonTask.objects.create(
+            task_type='version', source_contract=contract, target_contract=contract,
+            source_version=1, target_version=2, created_by=self.user
+        )
+        result = ComparisonService().run(task)
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'completed')
+        self.assertIsNotNone(task.completed_at)
+        self.assertEqual(result['summary']['unchanged_count'], 3)
+        diffs = {diff.clause_id: diff for diff in ComparisonDiff.objects.filter(comparison_task=task)}
+        self.assertEqual(set(diffs), {'第二条 付款方式', '第四条 争议解决', '第四条 保密'})
+        self.assertEqual(diffs['第二条 付款方式'].diff_type, 'modified')
+        self.assertEqual(diffs['第二条 付款方式'].risk_level, 'high')
+        self.assertEqual(diffs['第四条 争议解决'].diff_type, 'deleted')
+        self.assertEqual(diffs['第四条 保密'].diff_type, 'added')
+        modified = next(d for d in task.result_data['differences'] if d['diff_type'] == 'modified')
+        self.assertIn(['delete', '30'], modified['segments'])
+        self.assertIn(['insert', '90'], modified['segments'])
@@ -1,10 +1,13 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 
 from .models import ComparisonTask, ComparisonDiff
 from .serializers import ComparisonTaskSerializer, ComparisonDiffSerializer
+from .tasks import run_comparison_task
 
 
 class ComparisonTaskViewSet(viewsets.ModelViewSet):
@@ -16,6 +19,33 @@ class ComparisonTaskViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at']
     ordering = ['-created_at']
 
+    def create(self, request, *args, **kwargs):
+        """创建对比任务并开始对比"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        task = serializer.save(created_by=request.user)
+        return self._dispatch(task)
+
+    @action(detail=True, methods=['post'])
+    def run(self, request, pk=None):
+        """重新执行对比（合同版本或模板变化后）"""
+        task = self.get_object()
+        if task.status == 'processing':
+            return Response({'error': '对比任务正在执行中'}, status=status.HTTP_400_BAD_REQUEST)
+        task.status = 'pending'
+        task.save(update_fields=['status'])
+        return self._dispatch(task)
+
+    def _dispatch(self, task):
+        # 尝试异步执行，如果 Celery 不可用则同步执行
+        try:
+            run_comparison_task.delay(task.id)
+            return Response(self.get_serializer(task).data, status=status.HTTP_202_ACCEPTED)
+        except Exception:
+            run_comparison_task(task.id)
+            task.refresh_from_db()
+            return Response(self.get_serializer(task).data, status=status.HTTP_201_CREATED)
+
 
 class ComparisonDiffViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = ComparisonDiff.objects.all()
@@ -25,4 +55,3 @@ class ComparisonDiffViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['comparison_task', 'diff_type', 'diff_level', 'risk_level']
     ordering_fields = ['risk_level', 'created_at']
     ordering = ['-risk_level']
-
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Contract, ContractVersion, Template, UserHabit
+from .models import (
+    Contract, ContractText, ContractVersion, FileBlob, FileParseCache, ParseJob, Template,
+    UploadSession, UserHabit
+)
 
 
 @admin.register(Contract)
@@ -8,13 +11,55 @@ class ContractAdmin(admin.ModelAdmin):
     list_filter = ['contract_type', 'status', 'created_at']
     search_fields = ['contract_no', 'title']
     date_hierarchy = 'created_at'
+    readonly_fields = ['content_hash']
 
 
 @admin.register(ContractVersion)
 class ContractVersionAdmin(admin.ModelAdmin):
-    list_display = ['contract', 'version', 'changed_by', 'created_at']
-    list_filter = ['created_at']
+    list_display = ['contract', 'version', 'storage_type', 'content_size', 'changed_by', 'created_at']
+    list_filter = ['storage_type', 'created_at']
     search_fields = ['contract__title']
+    exclude = ['content_data']
+    readonly_fields = ['content_hash']
+
+
+@admin.register(ContractText)
+class ContractTextAdmin(admin.ModelAdmin):
+    list_display = ['contract', 'version', 'source', 'char_count', 'updated_at']
+    list_filter = ['source']
+    search_fields = ['contract__title']
+    readonly_fields = ['content_hash']
+
+
+@admin.register(FileBlob)
+class FileBlobAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'file_format', 'file_size', 'ref_count', 'created_at']
+    list_filter = ['file_format']
+    search_fields = ['content_hash', 'file_path']
+    readonly_fields = ['content_hash', 'file_path']
+
+
+@admin.register(FileParseCache)
+class FileParseCacheAdmin(admin.ModelAdmin):
+    list_display = ['file_hash', 'file_format', 'file_size', 'parser_version', 'created_at']
+    list_filter = ['file_format', 'parser_version']
+    search_fields = ['file_hash']
+
+
+@admin.register(ParseJob)
+class ParseJobAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'file_format', 'file_size', 'status', 'created_by', 'created_at']
+    list_filter = ['status', 'file_format', 'created_at']
+    search_fields = ['file_name', 'file_path']
+    readonly_fields = ['result', 'progress']
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'file_size', 'received_bytes', 'status', 'created_by', 'updated_at']
+    list_filter = ['status', 'file_format']
+    search_fields = ['file_name', 'upload_id']
+    readonly_fields = ['upload_id', 'checksum']
 
 
 @admin.register(Template)
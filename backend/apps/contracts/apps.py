@@ -6,3 +6,5 @@ class ContractsConfig(AppConfig):
     name = 'apps.contracts'
     verbose_name = '合同管理'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,195 @@
+"""
+合同文件文本提取模块 - 逐页流式提取PDF文本，流式解析DOCX正文XML
+
+PDF：提取的文本和HTML逐页写入文件，不在内存中保留每页的中间结果；
+页数较多的PDF按页码区间在进程池中并行提取，再按顺序合并。
+
+DOCX：直接从压缩包中流式解析 word/document.xml，按文档顺序产出段落和表格单元格，
+不构建python-docx的完整对象模型，表格中的文本（付款计划、报价清单等）也会提取。
+
+本模块不依赖Django，进程池中的工作进程直接调用。
+"""
+import html
+import zipfile
+from typing import Callable, Iterator, Optional, Tuple
+from xml.etree import ElementTree
+
+try:
+    import fitz  # PyMuPDF
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+PAGE_SEPARATOR = '\n\n'
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY = f'{W_NS}body'
+W_P = f'{W_NS}p'
+W_T = f'{W_NS}t'
+W_TAB = f'{W_NS}tab'
+W_TABS = f'{W_NS}tabs'  # 段落属性中的制表位定义，其中的tab不是文本
+W_BR = f'{W_NS}br'
+W_CR = f'{W_NS}cr'
+W_TC = f'{W_NS}tc'
+W_TBL = f'{W_NS}tbl'
+DC_TITLE = '{http://purl.org/dc/elements/1.1/}title'
+DOCX_DOCUMENT = 'word/document.xml'
+DOCX_CORE = 'docProps/core.xml'
+PROGRESS_BLOCKS = 200  # 每解析多少个段落/单元格回调一次进度
+
+
+def page_html(page_num: int, text: str) -> str:
+    """单页的HTML片段"""
+    return f'<div class="page"><h3>第{page_num + 1}页</h3><p>{html.escape(text).replace(chr(10), "<br>")}</p></div>'
+
+
+def pdf_info(file_path: str) -> Tuple[int, dict]:
+    """
+    读取PDF页数和元数据
+
+    Returns:
+        (页数, 元数据字典)
+    """
+    doc = fitz.open(file_path)
+    try:
+        return len(doc), dict(doc.metadata or {})
+    finally:
+        doc.close()
+
+
+def iter_pdf_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """逐页产出 (页码, 文本)，每页只读取一次"""
+    doc = fitz.open(file_path)
+    try:
+        end = len(doc) if end is None else min(end, len(doc))
+        for page_num in range(start, end):
+            yield page_num, doc[page_num].get_text()
+    finally:
+        doc.close()
+
+
+def extract_pdf_range(
+    file_path: str,
+    start: int,
+    end: int,
+    text_path: str,
+    html_path: str,
+    progress_callback: Optional[Callable[[int], None]] = None
+) -> Tuple[int, Optional[str]]:
+    """
+    提取页码区间 [start, end) 的文本并写入文件（页之间的分隔符与整份文档一致）
+
+    Args:
+        progress_callback: 每页提取完成后的回调（可选），参数为区间内已提取的页数
+
+    Returns:
+        (提取的页数, 第一页文本（仅当区间包含第一页时）)
+    """
+    page_count = 0
+    first_page_text = None
+    with open(text_path, 'w', encoding='utf-8') as text_out, open(html_path, 'w', encoding='utf-8') as html_out:
+        for page_num, text in iter_pdf_pages(file_path, start, end):
+            if page_num == 0:
+                first_page_text = text
+            else:
+                text_out.write(PAGE_SEPARATOR)
+            text_out.write(text)
+            html_out.write(page_html(page_num, text))
+            page_count += 1
+            if progress_callback:
+                progress_callback(page_count)
+    return page_count, first_page_text
+
+
+class _CountingReader:
+    """记录已读取字节数的文件包装，用于报告DOCX解析进度"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def iter_docx_blocks(
+    file_path: str,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> Iterator[Tuple[str, str]]:
+    """
+    按文档顺序产出DOCX正文中的段落和表格单元格
+
+    Args:
+        progress_callback: 进度回调（可选），参数为 (已解析的XML字节数, XML总字节数)
+
+    Yields:
+        ('paragraph' | 'cell', 文本)；单元格内的多个段落以换行连接，嵌套表格的单元格先于外层单元格产出
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        total = archive.getinfo(DOCX_DOCUMENT).file_size
+        with archive.open(DOCX_DOCUMENT) as raw:
+            reader = _CountingReader(raw)
+            body = None
+            runs = []  # 当前段落（文本框中的段落嵌套在外层段落内时为栈）的文本片段
+            cells = []  # 当前所在单元格（嵌套表格时为栈）的段落列表
+            table_depth = 0
+            in_tab_stops = False
+            blocks = 0
+
+            for event, elem in ElementTree.iterparse(reader, events=('start', 'end')):
+                tag = elem.tag
+                if event == 'start':
+                    if tag == W_BODY:
+                        body = elem
+                    elif tag == W_TC:
+                        cells.append([])
+                    elif tag == W_TBL:
+                        table_depth += 1
+                    elif tag == W_P:
+                        runs.append([])
+                    elif tag == W_TABS:
+                        in_tab_stops = True
+                    continue
+
+                if tag == W_T and runs:
+                    runs[-1].append(elem.text or '')
+                elif tag == W_TABS:
+                    in_tab_stops = False
+                elif tag == W_TAB and runs and not in_tab_stops:
+                    runs[-1].append('\t')
+                elif tag in (W_BR, W_CR) and runs:
+                    runs[-1].append('\n')
+                elif tag == W_P:
+                    text = ''.join(runs.pop())
+                    if cells:
+                        cells[-1].append(text)
+                    else:
+                        yield 'paragraph', text
+                        blocks += 1
+                elif tag == W_TC:
+                    yield 'cell', '\n'.join(cells.pop())
+                    blocks += 1
+                elif tag == W_TBL:
+                    table_depth -= 1
+
+                # 正文顶层的段落或表格处理完后释放已解析的元素，内存占用与文档大小无关
+                if body is not None and tag in (W_P, W_TBL) and not cells and not runs and table_depth == 0:
+                    body.clear()
+                    if progress_callback and blocks >= PROGRESS_BLOCKS:
+                        blocks = 0
+                        progress_callback(reader.bytes_read, total)
+
+    if progress_callback:
+        progress_callback(total, total)
+
+
+def docx_title(file_path: str) -> str:
+    """读取DOCX文档属性中的标题"""
+    with zipfile.ZipFile(file_path) as archive:
+        if DOCX_CORE not in archive.namelist():
+            return ''
+        with archive.open(DOCX_CORE) as core:
+            title = ElementTree.parse(core).getroot().find(DC_TITLE)
+    return (title.text or '').strip() if title is not None else ''
@@ -0,0 +1,22 @@
+"""
+补全合同提取文本（历史合同首次读取时也会自动补全，本命令用于批量预先生成）
+使用方法:
+    python manage.py build_contract_texts
+"""
+from django.core.management.base import BaseCommand
+from apps.contracts.models import Contract
+from apps.contracts.services_text import ContractTextService
+
+
+class Command(BaseCommand):
+    help = '补全合同当前版本的提取文本'
+
+    def handle(self, *args, **options):
+        service = ContractTextService()
+        contracts = Contract.objects.filter(is_deleted=False)
+        total = contracts.count()
+        for index, contract in enumerate(contracts.iterator(chunk_size=100), start=1):
+            service.refresh(contract)
+            if index % 100 == 0:
+                self.stdout.write(f'  已处理 {index}/{total} 份合同')
+        self.stdout.write(self.style.SUCCESS(f'✓ 完成，共 {total} 份合同'))
@@ -0,0 +1,34 @@
+"""
+清理过期的文件解析任务，并释放上传文件的引用（没有合同引用的文件随之删除）；
+同时清理长时间未完成的分片上传
+使用方法:
+    python manage.py cleanup_parse_jobs              # 清理30天前的解析任务
+    python manage.py cleanup_parse_jobs --days 7
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.contracts.models import FileBlob, ParseJob
+from apps.contracts.services_storage import UploadSessionService
+
+
+class Command(BaseCommand):
+    help = '清理过期的文件解析任务并释放上传文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='清理多少天前的解析任务')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        jobs = ParseJob.objects.filter(created_at__lt=cutoff).exclude(status__in=['pending', 'running'])
+        blobs_before = FileBlob.objects.count()
+        deleted = 0
+        # 逐个删除以触发post_delete信号，释放文件引用
+        for job in jobs.select_related('blob').iterator(chunk_size=100):
+            job.delete()
+            deleted += 1
+        released = blobs_before - FileBlob.objects.count()
+        expired = UploadSessionService().cleanup_expired()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ 完成，删除 {deleted} 个解析任务，删除 {released} 个不再引用的文件，清理 {expired} 个未完成的分片上传'
+        ))
@@ -0,0 +1,31 @@
+"""
+将历史合同版本（完整内容）转换为快照加增量压缩保存
+使用方法:
+    python manage.py compact_contract_versions
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from apps.contracts.models import Contract, ContractVersion
+from apps.contracts.services_version import ContractVersionService
+
+
+class Command(BaseCommand):
+    help = '将历史合同版本转换为快照加增量压缩保存'
+
+    def handle(self, *args, **options):
+        service = ContractVersionService()
+        contract_ids = ContractVersion.objects.filter(
+            storage_type='full'
+        ).values_list('contract_id', flat=True).distinct()
+        contracts = Contract.objects.filter(id__in=list(contract_ids))
+        total = contracts.count()
+        converted = 0
+        for index, contract in enumerate(contracts.iterator(chunk_size=100), start=1):
+            converted += service.compact(contract)
+            if index % 100 == 0:
+                self.stdout.write(f'  已处理 {index}/{total} 份合同')
+        
+        stored = ContractVersion.objects.aggregate(size=Sum('content_size'))['size'] or 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ 完成，共 {total} 份合同、{converted} 个版本，版本内容原始大小 {stored // 1024}KB'
+        ))
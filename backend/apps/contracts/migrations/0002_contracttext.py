@@ -0,0 +1,34 @@
+# Generated manually
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField(verbose_name='版本号')),
+                ('text', models.TextField(blank=True, verbose_name='提取文本')),
+                ('content_hash', models.CharField(db_index=True, max_length=64, verbose_name='文本哈希')),
+                ('source', models.CharField(choices=[('content', '合同内容'), ('file', '合同文件'), ('title', '合同标题')], default='content', max_length=20, verbose_name='文本来源')),
+                ('char_count', models.IntegerField(default=0, verbose_name='字符数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('contract', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='texts', to='contracts.contract', verbose_name='合同')),
+            ],
+            options={
+                'verbose_name': '合同提取文本',
+                'verbose_name_plural': '合同提取文本',
+                'db_table': 'contracts_contract_text',
+                'unique_together': {('contract', 'version')},
+            },
+        ),
+    ]
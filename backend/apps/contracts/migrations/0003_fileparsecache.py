@@ -0,0 +1,36 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0002_contracttext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contracttext',
+            name='file_stamp',
+            field=models.CharField(blank=True, max_length=64, verbose_name='文件大小和修改时间'),
+        ),
+        migrations.CreateModel(
+            name='FileParseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_hash', models.CharField(max_length=64, verbose_name='文件哈希')),
+                ('parser_version', models.IntegerField(default=1, verbose_name='解析器版本')),
+                ('file_format', models.CharField(blank=True, max_length=20, verbose_name='文件格式')),
+                ('file_size', models.BigIntegerField(default=0, verbose_name='文件大小')),
+                ('result', models.JSONField(verbose_name='解析结果')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '文件解析缓存',
+                'verbose_name_plural': '文件解析缓存',
+                'db_table': 'contracts_file_parse_cache',
+                'unique_together': {('file_hash', 'parser_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated manually
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contracts', '0003_fileparsecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(max_length=500, verbose_name='文件路径')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='原始文件名')),
+                ('file_format', models.CharField(blank=True, max_length=20, verbose_name='文件格式')),
+                ('file_size', models.BigIntegerField(default=0, verbose_name='文件大小')),
+                ('status', models.CharField(choices=[('pending', '待解析'), ('running', '解析中'), ('completed', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='状态')),
+                ('progress', models.JSONField(blank=True, null=True, verbose_name='解析进度')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='解析结果')),
+                ('error_message', models.TextField(blank=True, verbose_name='错误信息')),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, verbose_name='Celery任务ID')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parse_jobs', to=settings.AUTH_USER_MODEL, verbose_name='上传人')),
+            ],
+            options={
+                'verbose_name': '文件解析任务',
+                'verbose_name_plural': '文件解析任务',
+                'db_table': 'contracts_parse_job',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated manually
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0004_parsejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='内容哈希')),
+                ('file_path', models.CharField(max_length=500, verbose_name='文件路径')),
+                ('file_format', models.CharField(blank=True, max_length=20, verbose_name='文件格式')),
+                ('file_size', models.BigIntegerField(default=0, verbose_name='文件大小')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='引用次数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '文件存储',
+                'verbose_name_plural': '文件存储',
+                'db_table': 'contracts_file_blob',
+            },
+        ),
+        migrations.AddField(
+            model_name='parsejob',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='parse_jobs', to='contracts.fileblob', verbose_name='存储文件'),
+        ),
+    ]
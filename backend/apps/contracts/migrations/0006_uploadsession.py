@@ -0,0 +1,41 @@
+# Generated manually
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contracts', '0005_fileblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='上传ID')),
+                ('file_name', models.CharField(max_length=255, verbose_name='原始文件名')),
+                ('file_format', models.CharField(max_length=20, verbose_name='文件格式')),
+                ('file_size', models.BigIntegerField(verbose_name='文件大小')),
+                ('checksum', models.CharField(blank=True, max_length=64, verbose_name='文件SHA-256')),
+                ('chunk_size', models.IntegerField(verbose_name='分片大小')),
+                ('received_bytes', models.BigIntegerField(default=0, verbose_name='已接收字节数')),
+                ('status', models.CharField(choices=[('uploading', '上传中'), ('completed', '已完成'), ('aborted', '已取消')], default='uploading', max_length=20, verbose_name='状态')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='上传人')),
+                ('parse_job', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='contracts.parsejob', verbose_name='解析任务')),
+            ],
+            options={
+                'verbose_name': '分片上传会话',
+                'verbose_name_plural': '分片上传会话',
+                'db_table': 'contracts_upload_session',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
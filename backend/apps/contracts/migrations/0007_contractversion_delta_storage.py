@@ -0,0 +1,43 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0006_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contractversion',
+            name='content',
+            field=models.JSONField(blank=True, help_text='仅历史数据（完整内容）使用', null=True, verbose_name='版本内容'),
+        ),
+        migrations.AddField(
+            model_name='contractversion',
+            name='storage_type',
+            field=models.CharField(choices=[('full', '完整内容'), ('snapshot', '压缩快照'), ('delta', '压缩增量')], default='full', max_length=20, verbose_name='存储方式'),
+        ),
+        migrations.AddField(
+            model_name='contractversion',
+            name='base_version',
+            field=models.IntegerField(blank=True, null=True, verbose_name='增量基准版本号'),
+        ),
+        migrations.AddField(
+            model_name='contractversion',
+            name='delta_depth',
+            field=models.IntegerField(default=0, verbose_name='距快照的增量层数'),
+        ),
+        migrations.AddField(
+            model_name='contractversion',
+            name='content_data',
+            field=models.BinaryField(blank=True, null=True, verbose_name='压缩内容'),
+        ),
+        migrations.AddField(
+            model_name='contractversion',
+            name='content_size',
+            field=models.IntegerField(default=0, verbose_name='内容大小（字节）'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated manually
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def _content_hash(content, file_path):
+    canonical = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f'{canonical}\n{file_path or ""}'.encode('utf-8')).hexdigest()
+
+
+def fill_content_hash(apps, schema_editor):
+    """补全已有合同和完整内容版本的内容哈希（压缩保存的版本不补全，哈希为空时视为内容未知）"""
+    Contract = apps.get_model('contracts', 'Contract')
+    ContractVersion = apps.get_model('contracts', 'ContractVersion')
+    for model in (Contract, ContractVersion):
+        queryset = model.objects.filter(content_hash='')
+        if model is ContractVersion:
+            queryset = queryset.filter(storage_type='full')
+        rows = []
+        for row in queryset.only('id', 'content', 'file_path').iterator(chunk_size=500):
+            row.content_hash = _content_hash(row.content, row.file_path)
+            rows.append(row)
+            if len(rows) >= 500:
+                model.objects.bulk_update(rows, ['content_hash'])
+                rows = []
+        if rows:
+            model.objects.bulk_update(rows, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0007_contractversion_delta_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='合同内容和文件路径的哈希，保存时更新', max_length=64, verbose_name='内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='contractversion',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='内容哈希'),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from apps.users.models import User
 
@@ -31,6 +33,7 @@ class Contract(models.Model):
     template = models.ForeignKey('Template', on_delete=models.SET_NULL, null=True, blank=True, verbose_name='使用的模板')
     drafter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='drafted_contracts', verbose_name='起草人')
     current_version = models.IntegerField(default=1, verbose_name='当前版本号')
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='内容哈希', help_text='合同内容和文件路径的哈希，保存时更新')
     is_deleted = models.BooleanField(default=False, verbose_name='是否删除')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
@@ -46,10 +49,22 @@ class Contract(models.Model):
 
 
 class ContractVersion(models.Model):
-    """合同版本表"""
+    """合同版本表 - 版本内容按周期性压缩快照加压缩增量保存，读取时通过 ContractVersionService 还原"""
+    STORAGE_TYPE_CHOICES = [
+        ('full', '完整内容'),  # 历史数据，内容保存在 content 中
+        ('snapshot', '压缩快照'),
+        ('delta', '压缩增量'),
+    ]
+
     contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='versions', verbose_name='合同')
     version = models.IntegerField(verbose_name='版本号')
-    content = models.JSONField(null=True, blank=True, verbose_name='版本内容')
+    content = models.JSONField(null=True, blank=True, verbose_name='版本内容', help_text='仅历史数据（完整内容）使用')
+    storage_type = models.CharField(max_length=20, choices=STORAGE_TYPE_CHOICES, default='full', verbose_name='存储方式')
+    base_version = models.IntegerField(null=True, blank=True, verbose_name='增量基准版本号')
+    delta_depth = models.IntegerField(default=0, verbose_name='距快照的增量层数')
+    content_data = models.BinaryField(null=True, blank=True, verbose_name='压缩内容')
+    content_size = models.IntegerField(default=0, verbose_name='内容大小（字节）')
+    content_hash = models.CharField(max_length=64, blank=True, verbose_name='内容哈希')
     file_path = models.CharField(max_length=500, blank=True, verbose_name='版本文件路径')
     change_summary = models.TextField(blank=True, verbose_name='变更摘要')
     changed_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='变更人')
@@ -67,6 +82,143 @@ class ContractVersion(models.Model):
         return f'{self.contract.title} - v{self.version}'
 
 
+class ContractText(models.Model):
+    """合同提取文本表 - 合同（及各版本）内容提取出的纯文本，保存时生成，审核、规则扫描等直接读取"""
+    SOURCE_CHOICES = [
+        ('content', '合同内容'),
+        ('file', '合同文件'),
+        ('title', '合同标题'),
+    ]
+
+    contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='texts', verbose_name='合同')
+    version = models.IntegerField(verbose_name='版本号')
+    text = models.TextField(blank=True, verbose_name='提取文本')
+    content_hash = models.CharField(max_length=64, db_index=True, verbose_name='文本哈希')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='content', verbose_name='文本来源')
+    char_count = models.IntegerField(default=0, verbose_name='字符数')
+    file_stamp = models.CharField(max_length=64, blank=True, verbose_name='文件大小和修改时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'contracts_contract_text'
+        verbose_name = '合同提取文本'
+        verbose_name_plural = '合同提取文本'
+        unique_together = [['contract', 'version']]
+
+    def __str__(self):
+        return f'{self.contract_id} - v{self.version}'
+
+
+class FileParseCache(models.Model):
+    """文件解析缓存表 - 按文件内容哈希缓存合同文件的解析结果"""
+    file_hash = models.CharField(max_length=64, verbose_name='文件哈希')
+    parser_version = models.IntegerField(default=1, verbose_name='解析器版本')
+    file_format = models.CharField(max_length=20, blank=True, verbose_name='文件格式')
+    file_size = models.BigIntegerField(default=0, verbose_name='文件大小')
+    result = models.JSONField(verbose_name='解析结果')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'contracts_file_parse_cache'
+        verbose_name = '文件解析缓存'
+        verbose_name_plural = '文件解析缓存'
+        unique_together = [['file_hash', 'parser_version']]
+
+    def __str__(self):
+        return f'{self.file_hash[:12]} ({self.file_format})'
+
+
+class FileBlob(models.Model):
+    """文件存储表 - 上传文件按内容哈希只保存一份，引用计数为零时删除"""
+    content_hash = models.CharField(max_length=64, unique=True, verbose_name='内容哈希')
+    file_path = models.CharField(max_length=500, verbose_name='文件路径')
+    file_format = models.CharField(max_length=20, blank=True, verbose_name='文件格式')
+    file_size = models.BigIntegerField(default=0, verbose_name='文件大小')
+    ref_count = models.PositiveIntegerField(default=0, verbose_name='引用次数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'contracts_file_blob'
+        verbose_name = '文件存储'
+        verbose_name_plural = '文件存储'
+
+    def __str__(self):
+        return f'{self.content_hash[:12]} ({self.file_format}, 引用{self.ref_count}次)'
+
+
+class ParseJob(models.Model):
+    """文件解析任务表 - 上传的合同文件在后台解析，客户端轮询解析进度和结果"""
+    STATUS_CHOICES = [
+        ('pending', '待解析'),
+        ('running', '解析中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    blob = models.ForeignKey(
+        FileBlob, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='parse_jobs', verbose_name='存储文件'
+    )
+    file_path = models.CharField(max_length=500, verbose_name='文件路径')
+    file_name = models.CharField(max_length=255, blank=True, verbose_name='原始文件名')
+    file_format = models.CharField(max_length=20, blank=True, verbose_name='文件格式')
+    file_size = models.BigIntegerField(default=0, verbose_name='文件大小')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    progress = models.JSONField(null=True, blank=True, verbose_name='解析进度')
+    result = models.JSONField(null=True, blank=True, verbose_name='解析结果')
+    error_message = models.TextField(blank=True, verbose_name='错误信息')
+    celery_task_id = models.CharField(max_length=255, blank=True, verbose_name='Celery任务ID')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='parse_jobs', verbose_name='上传人')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'contracts_parse_job'
+        verbose_name = '文件解析任务'
+        verbose_name_plural = '文件解析任务'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.file_name or self.file_path} - {self.get_status_display()}'
+
+
+class UploadSession(models.Model):
+    """分片上传会话表 - 大文件按分片顺序上传，中断后从已接收的位置继续"""
+    STATUS_CHOICES = [
+        ('uploading', '上传中'),
+        ('completed', '已完成'),
+        ('aborted', '已取消'),
+    ]
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, verbose_name='上传ID')
+    file_name = models.CharField(max_length=255, verbose_name='原始文件名')
+    file_format = models.CharField(max_length=20, verbose_name='文件格式')
+    file_size = models.BigIntegerField(verbose_name='文件大小')
+    checksum = models.CharField(max_length=64, blank=True, verbose_name='文件SHA-256')
+    chunk_size = models.IntegerField(verbose_name='分片大小')
+    received_bytes = models.BigIntegerField(default=0, verbose_name='已接收字节数')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading', verbose_name='状态')
+    parse_job = models.OneToOneField(
+        ParseJob, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='upload_session', verbose_name='解析任务'
+    )
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions', verbose_name='上传人')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'contracts_upload_session'
+        verbose_name = '分片上传会话'
+        verbose_name_plural = '分片上传会话'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.file_name} - {self.received_bytes}/{self.file_size}'
+
+
 class Template(models.Model):
     """合同模板表"""
     name = models.CharField(max_length=200, verbose_name='模板名称')
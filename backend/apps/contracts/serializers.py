@@ -1,22 +1,37 @@
 from rest_framework import serializers
 from apps.users.serializers import UserSerializer
-from .models import Contract, ContractVersion, Template, UserHabit
+from .models import Contract, ContractVersion, ParseJob, Template, UploadSession, UserHabit
+from .services_parser import FileParserService
+from .services_version import ContractVersionService
 
 
-class ContractVersionSerializer(serializers.ModelSerializer):
+class ContractVersionListSerializer(serializers.ModelSerializer):
+    """合同版本信息（不包含版本内容）"""
     changed_by_name = serializers.CharField(source='changed_by.username', read_only=True)
 
     class Meta:
         model = ContractVersion
-        fields = ['id', 'contract', 'version', 'content', 'file_path', 
-                  'change_summary', 'changed_by', 'changed_by_name', 'created_at']
-        read_only_fields = ['created_at']
+        fields = ['id', 'contract', 'version', 'file_path', 'change_summary',
+                  'changed_by', 'changed_by_name', 'storage_type', 'content_size', 'created_at']
+        read_only_fields = fields
+
+
+class ContractVersionSerializer(ContractVersionListSerializer):
+    """合同版本（包含还原后的版本内容）"""
+    content = serializers.SerializerMethodField()
+
+    class Meta(ContractVersionListSerializer.Meta):
+        fields = ContractVersionListSerializer.Meta.fields + ['content']
+        read_only_fields = fields
+
+    def get_content(self, obj):
+        return ContractVersionService().resolve_content(obj)
 
 
 class ContractSerializer(serializers.ModelSerializer):
     drafter_name = serializers.CharField(source='drafter.username', read_only=True)
     template_name = serializers.CharField(source='template.name', read_only=True)
-    versions = ContractVersionSerializer(many=True, read_only=True)
+    versions = ContractVersionListSerializer(many=True, read_only=True)
 
     class Meta:
         model = Contract
@@ -46,3 +61,31 @@ class UserHabitSerializer(serializers.ModelSerializer):
                   'frequency', 'last_used_at', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
+
+class ParseJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ParseJob
+        fields = ['id', 'file_path', 'file_name', 'file_format', 'file_size', 'status',
+                  'status_display', 'progress', 'result', 'error_message',
+                  'started_at', 'completed_at', 'created_at']
+        read_only_fields = fields
+
+    def get_result(self, obj):
+        """解析结果（PDF的提取文本从结果文件读回；列表中不读取文本）"""
+        view = self.context.get('view')
+        if getattr(view, 'action', None) == 'list':
+            return obj.result
+        return FileParserService().expand_result(obj.result)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['upload_id', 'file_name', 'file_format', 'file_size', 'checksum', 'chunk_size',
+                  'received_bytes', 'status', 'status_display', 'parse_job', 'created_at', 'updated_at']
+        read_only_fields = fields
@@ -0,0 +1,459 @@
+"""
+合同文件解析服务模块 - 解析上传的Word/PDF合同文件，解析结果按文件内容哈希缓存
+
+同一文件（内容相同）无论在上传、审核、重新扫描还是推荐中使用，都只解析一次；
+文件内容变化后哈希随之变化，自然不会命中旧的解析结果。
+PDF的提取结果直接写入 MEDIA_ROOT/contracts/parsed/ 下的文件，缓存的解析结果中只记录文件路径（text_path、html_path），
+使用时通过 read_text 读取；返回给客户端的解析结果由 expand_result 填回文本。
+"""
+import hashlib
+import html
+import io
+import logging
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+from apps.contracts.extractors import (
+    PDF_AVAILABLE, docx_title, extract_pdf_range, iter_docx_blocks, pdf_info
+)
+from apps.contracts.models import FileParseCache, ParseJob
+
+if not PDF_AVAILABLE:
+    logging.warning('pymupdf未安装，PDF合同文件解析功能将不可用')
+
+logger = logging.getLogger(__name__)
+
+PARSER_VERSION = 4  # 解析逻辑变化时递增，使旧的缓存结果失效
+HASH_CHUNK_SIZE = 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024  # 合并提取结果时每次读取的字符数
+PARSED_DIR = os.path.join('contracts', 'parsed')
+SUPPORTED_EXTENSIONS = ('.doc', '.docx', '.pdf')
+PROGRESS_INTERVAL = 1.0  # 解析进度写库的最小间隔（秒）
+
+DEFAULT_PARSING_SETTINGS = {
+    'MAX_WORKERS': None,  # 默认使用CPU核数
+    'PDF_PARALLEL_MIN_PAGES': 100,  # PDF页数达到该值时并行提取
+    'PDF_PAGES_PER_TASK': 25,  # 每个并行任务提取的页数
+}
+
+
+def get_parsing_settings() -> Dict:
+    """获取文件解析配置"""
+    config = dict(DEFAULT_PARSING_SETTINGS)
+    config.update(getattr(settings, 'CONTRACT_PARSING', {}))
+    if not config['MAX_WORKERS']:
+        config['MAX_WORKERS'] = os.cpu_count() or 1
+    return config
+
+
+class FileParserService:
+    """合同文件解析服务类"""
+
+    def resolve_path(self, file_path: str) -> Optional[str]:
+        """
+        将合同文件路径解析为MEDIA_ROOT下的绝对路径
+
+        Returns:
+            绝对路径；路径不在MEDIA_ROOT下或文件不存在时返回None
+        """
+        if not file_path:
+            return None
+        media_root = os.path.realpath(settings.MEDIA_ROOT)
+        absolute_path = os.path.realpath(os.path.join(media_root, file_path))
+        if os.path.commonpath([media_root, absolute_path]) != media_root:
+            logger.warning(f'合同文件路径不在媒体目录下，已忽略: {file_path}')
+            return None
+        if not os.path.isfile(absolute_path):
+            return None
+        return absolute_path
+
+    def file_stamp(self, absolute_path: Optional[str]) -> str:
+        """文件的大小和修改时间，用于低成本判断文件是否变化"""
+        if not absolute_path:
+            return ''
+        try:
+            stat = os.stat(absolute_path)
+        except OSError:
+            return ''
+        return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+    def file_hash(self, absolute_path: str) -> str:
+        """计算文件内容的SHA-256"""
+        digest = hashlib.sha256()
+        with open(absolute_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def parse_stored_file(self, file_path: str) -> Optional[Dict]:
+        """解析合同的存储文件（相对MEDIA_ROOT的路径），文件不存在时返回None"""
+        absolute_path = self.resolve_path(file_path)
+        if not absolute_path:
+            return None
+        return self.parse(absolute_path)
+
+    def cached_result(self, file_hash: str) -> Optional[Dict]:
+        """读取文件的缓存解析结果（提取结果文件已不存在时视为未缓存）"""
+        result = FileParseCache.objects.filter(
+            file_hash=file_hash, parser_version=PARSER_VERSION
+        ).values_list('result', flat=True).first()
+        if result and result.get('text_path') and not self._parsed_path(result['text_path']):
+            return None
+        return result
+
+    def read_text(self, content: Dict, field: str = 'text') -> str:
+        """
+        读取解析结果的文本（field 为 'text' 或 'html'）
+
+        结果中直接包含文本时返回该文本，否则读取 {field}_path 指向的提取结果文件。
+        """
+        if isinstance(content.get(field), str):
+            return content[field]
+        absolute_path = self._parsed_path(content.get(f'{field}_path') or '')
+        if not absolute_path:
+            return ''
+        with open(absolute_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def expand_result(self, content: Optional[Dict]) -> Optional[Dict]:
+        """返回给客户端的解析结果：提取结果文件读回 text/html 字段，不暴露内部文件路径"""
+        if not content or not (content.get('text_path') or content.get('html_path')):
+            return content
+        expanded = {key: value for key, value in content.items() if key not in ('text_path', 'html_path')}
+        expanded['text'] = self.read_text(content)
+        expanded['html'] = self.read_text(content, 'html')
+        return expanded
+
+    def _parsed_path(self, file_path: str) -> Optional[str]:
+        """提取结果文件的绝对路径（只允许 PARSED_DIR 下的文件）"""
+        absolute_path = self.resolve_path(file_path)
+        parsed_root = os.path.realpath(os.path.join(settings.MEDIA_ROOT, PARSED_DIR))
+        if not absolute_path or os.path.commonpath([parsed_root, absolute_path]) != parsed_root:
+            return None
+        return absolute_path
+
+    def parse(
+        self,
+        absolute_path: str,
+        file_ext: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        file_hash: Optional[str] = None
+    ) -> Dict:
+        """
+        解析文件内容（按文件内容哈希缓存）
+
+        Args:
+            absolute_path: 文件绝对路径
+            file_ext: 文件扩展名（可选，默认取路径扩展名）
+            progress_callback: 解析进度回调（可选），参数为 (已处理页数/段落数, 总数)
+            file_hash: 已计算的文件哈希（可选）
+
+        Returns:
+            {'text', 'html', 'title', 'metadata'}，解析失败时包含 'error'
+        """
+        file_ext = (file_ext or os.path.splitext(absolute_path)[1]).lower()
+        file_hash = file_hash or self.file_hash(absolute_path)
+
+        cached = self.cached_result(file_hash)
+        if cached is not None:
+            return cached
+
+        content = self._parse_file(absolute_path, file_ext, progress_callback, output_name=file_hash)
+        if 'error' not in content:
+            # 解析失败（如缺少依赖）不缓存，修复后可以重新解析
+            try:
+                FileParseCache.objects.create(
+                    file_hash=file_hash,
+                    parser_version=PARSER_VERSION,
+                    file_format=file_ext.lstrip('.'),
+                    file_size=os.path.getsize(absolute_path),
+                    result=content,
+                )
+            except IntegrityError:
+                pass  # 并发解析同一文件，已由其他进程写入
+        return content
+
+    def run_job(self, job: ParseJob) -> Dict:
+        """
+        执行文件解析任务，按页（段落）更新进度
+
+        Returns:
+            Dict: 解析结果
+        """
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.progress = {'progress': 0, 'message': '正在解析文件...'}
+        job.save(update_fields=['status', 'started_at', 'progress'])
+
+        last_reported = [0.0]
+
+        def on_progress(processed: int, total: int):
+            # 限制写库频率：每秒最多一次，以及最后一页
+            now = time.monotonic()
+            if processed < total and now - last_reported[0] < PROGRESS_INTERVAL:
+                return
+            last_reported[0] = now
+            ParseJob.objects.filter(id=job.id).update(progress={
+                'processed': processed,
+                'total': total,
+                'progress': int(processed * 100 / total) if total else 100,
+                'message': (
+                    f'已解析 {processed}/{total} 页' if job.file_format == 'pdf'
+                    else f'已解析 {int(processed * 100 / total) if total else 100}%'
+                ),
+            })
+
+        try:
+            absolute_path = self.resolve_path(job.file_path)
+            if not absolute_path:
+                raise FileNotFoundError('上传的文件不存在')
+            content = self.parse(
+                absolute_path, f'.{job.file_format}', on_progress,
+                file_hash=job.blob.content_hash if job.blob_id else None
+            )
+            if content.get('error'):
+                raise ValueError(content['error'])
+        except Exception as e:
+            logger.error(f'文件解析失败 - 任务ID: {job.id}, 错误: {str(e)}')
+            job.status = 'failed'
+            job.error_message = str(e)
+            job.completed_at = timezone.now()
+            job.progress = {'progress': 100, 'message': '文件解析失败'}
+            job.save()
+            raise
+
+        self.complete_job(job, content)
+        return content
+
+    def complete_job(self, job: ParseJob, content: Dict):
+        """记录解析结果"""
+        job.status = 'completed'
+        job.result = content
+        job.completed_at = timezone.now()
+        job.progress = {'progress': 100, 'message': '文件解析完成'}
+        job.save()
+
+    def _parse_file(
+        self,
+        file_path: str,
+        file_ext: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        output_name: Optional[str] = None
+    ) -> Dict:
+        """解析文件内容（output_name 为PDF提取结果文件名，默认使用文件哈希）"""
+        content = {
+            'text': '',
+            'html': '',
+            'title': '',  # 提取的标题
+            'metadata': {}
+        }
+
+        try:
+            if file_ext in ['.doc', '.docx']:
+                self._parse_docx(file_path, content, progress_callback)
+            elif file_ext == '.pdf':
+                if not PDF_AVAILABLE:
+                    raise RuntimeError('pymupdf未安装')
+                self._parse_pdf(file_path, content, progress_callback, output_name)
+            else:
+                raise ValueError(f'不支持的文件类型: {file_ext}')
+        except Exception as e:
+            content['error'] = f'解析文件时出错: {str(e)}'
+
+        return content
+
+    def _parse_docx(self, file_path: str, content: Dict, progress_callback=None):
+        """
+        解析Word文档（流式解析正文XML，包含表格单元格）
+
+        段落和单元格按文档顺序各占一行，metadata['blocks'] 记录各块的类型、在文本中的起始位置和长度。
+        """
+        if not zipfile.is_zipfile(file_path):
+            raise ValueError('不支持旧版Word(.doc)格式，请另存为.docx后上传')
+
+        text_out = io.StringIO()
+        html_out = io.StringIO()
+        blocks = []
+        paragraph_count = 0
+        title_candidate = ''
+        fallback_title = ''
+        offset = 0
+
+        for kind, text in iter_docx_blocks(file_path, progress_callback):
+            if blocks:
+                text_out.write('\n')
+                html_out.write('<br>')
+                offset += 1
+            text_out.write(text)
+            html_out.write(f'<p>{html.escape(text)}</p>')
+            blocks.append(['p' if kind == 'paragraph' else 'cell', offset, len(text)])
+            offset += len(text)
+
+            if kind != 'paragraph':
+                continue
+            paragraph_count += 1
+            # 标题候选：第一个非空、长度适中且不是纯数字的段落
+            para_text = text.strip()
+            if para_text and not fallback_title:
+                fallback_title = para_text[:100]
+            if not title_candidate and para_text and len(para_text) <= 200:
+                if not para_text.replace(' ', '').replace('：', '').replace(':', '').isdigit():
+                    title_candidate = para_text
+
+        content['text'] = text_out.getvalue()
+        content['html'] = html_out.getvalue()
+        # 提取标题：优先从文档属性，其次从第一个像标题的段落，最后使用第一个非空段落的前100个字符
+        content['title'] = docx_title(file_path) or title_candidate or fallback_title
+        content['metadata'] = {
+            'paragraph_count': paragraph_count,
+            'table_cell_count': len(blocks) - paragraph_count,
+            'word_count': len(content['text'].split()),
+            'blocks': blocks,
+        }
+
+    def _parse_pdf(self, file_path: str, content: Dict, progress_callback=None, output_name: Optional[str] = None):
+        """
+        解析PDF文档
+
+        逐页提取并写入临时文件，每页只读取一次；页数达到阈值时按页码区间并行提取。
+        各区间的提取结果按顺序分块写入 PARSED_DIR 下的结果文件，不在内存中合并整份文档。
+        """
+        for key in ('text', 'html'):
+            content.pop(key, None)
+        output_name = output_name or self.file_hash(file_path)
+        page_count, metadata = pdf_info(file_path)
+        config = get_parsing_settings()
+
+        with tempfile.TemporaryDirectory(prefix='contract_pdf_') as work_dir:
+            pages_per_task = max(1, config['PDF_PAGES_PER_TASK'])
+            if page_count >= config['PDF_PARALLEL_MIN_PAGES'] and config['MAX_WORKERS'] > 1:
+                ranges = [
+                    (start, min(page_count, start + pages_per_task))
+                    for start in range(0, page_count, pages_per_task)
+                ]
+            else:
+                ranges = [(0, page_count)]
+            parts = [
+                (start, end, os.path.join(work_dir, f'{index}.txt'), os.path.join(work_dir, f'{index}.html'))
+                for index, (start, end) in enumerate(ranges)
+            ]
+
+            first_page_text = None
+            extracted = False
+            if len(parts) > 1:
+                extracted, first_page_text = self._extract_pdf_parallel(
+                    file_path, parts, page_count, config['MAX_WORKERS'], progress_callback
+                )
+            if not extracted:
+                # 单进程逐页提取（也是进程池不可用时的回退）
+                parts = [(0, page_count, os.path.join(work_dir, 'all.txt'), os.path.join(work_dir, 'all.html'))]
+                _, first_page_text = extract_pdf_range(
+                    file_path, *parts[0],
+                    (lambda done: progress_callback(done, page_count)) if progress_callback else None
+                )
+
+            content['text_path'] = os.path.join(PARSED_DIR, f'{output_name}.txt')
+            content['html_path'] = os.path.join(PARSED_DIR, f'{output_name}.html')
+            text_length, word_count = self._write_parts([part[2] for part in parts], content['text_path'])
+            self._write_parts([part[3] for part in parts], content['html_path'])
+
+        content['title'] = self._pdf_title(metadata, first_page_text or '')
+        content['metadata'] = {
+            'page_count': page_count,
+            'word_count': word_count,
+            'text_length': text_length,
+        }
+
+    def _extract_pdf_parallel(
+        self,
+        file_path: str,
+        parts: List[Tuple],
+        page_count: int,
+        max_workers: int,
+        progress_callback=None
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        在进程池中按页码区间并行提取
+
+        Returns:
+            (是否成功, 第一页文本)
+        """
+        first_page_text = None
+        done_pages = 0
+        try:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(parts))) as executor:
+                futures = [executor.submit(extract_pdf_range, file_path, *part) for part in parts]
+                for future in as_completed(futures):
+                    pages, first_text = future.result()
+                    if first_text is not None:
+                        first_page_text = first_text
+                    done_pages += pages
+                    if progress_callback:
+                        progress_callback(done_pages, page_count)
+            return True, first_page_text
+        except Exception as e:
+            # 进程池不可用（如在Celery守护进程中无法创建子进程），回退到单进程提取
+            logger.warning(f'PDF并行提取失败，回退到单进程提取: {str(e)}')
+            return False, None
+
+    def _write_parts(self, part_paths: List[str], output_path: str) -> Tuple[int, int]:
+        """
+        按顺序将各区间的提取结果分块写入结果文件（先写临时文件再替换，读取方不会看到写了一半的文件）
+
+        Returns:
+            (字符数, 词数)
+        """
+        absolute_path = os.path.join(settings.MEDIA_ROOT, output_path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        length = words = 0
+        in_word = False
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(absolute_path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as out:
+                for part_path in part_paths:
+                    with open(part_path, 'r', encoding='utf-8') as f:
+                        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), ''):
+                            out.write(chunk)
+                            length += len(chunk)
+                            tokens = chunk.split()
+                            # 跨分块的词只计一次
+                            words += len(tokens) - (1 if tokens and in_word and not chunk[0].isspace() else 0)
+                            in_word = not chunk[-1].isspace()
+            os.replace(temp_path, absolute_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return length, words
+
+    def _pdf_title(self, metadata: Dict, first_page_text: str) -> str:
+        """从PDF元数据或第一页文本提取标题"""
+        title = ''
+        # 尝试从元数据获取标题
+        if metadata.get('title'):
+            title = metadata['title'].strip()
+
+        # 如果元数据中没有，从第一页文本提取
+        if not title and first_page_text:
+            # 获取第一页的前几行作为标题候选
+            lines = [line.strip() for line in first_page_text.split('\n') if line.strip()]
+            if lines:
+                # 查找第一个看起来像标题的行（长度适中，不包含太多标点）
+                for line in lines[:5]:  # 只检查前5行
+                    if 5 <= len(line) <= 200:
+                        # 排除明显不是标题的行（如页码、日期等）
+                        if not any(keyword in line for keyword in ['第', '页', '共', '日期', 'Date']):
+                            title = line
+                            break
+
+                # 如果还是没找到，使用第一行
+                if not title and lines[0]:
+                    title = lines[0][:100] if len(lines[0]) > 100 else lines[0]
+        return title
@@ -0,0 +1,318 @@
+"""
+合同文件存储服务模块 - 上传文件按内容哈希存储（内容寻址），相同文件只保存一份
+
+同一文件重复上传（重新上传的草稿、对方发回的同一份合同）时复用已有文件和它的解析缓存，
+只增加引用次数；引用次数降为零且没有合同引用该文件时删除文件。
+
+大文件（扫描版附件PDF等）通过分片上传会话上传：初始化、按偏移量顺序上传分片、完成。
+分片直接写入磁盘上的临时文件，中断后从已接收的位置继续上传。
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import timedelta
+from typing import Dict, Optional
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.contracts.models import Contract, ContractVersion, FileBlob, UploadSession
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = os.path.join('contracts', 'blobs')
+SESSION_DIR = os.path.join('contracts', 'upload_sessions')
+HASH_CHUNK_SIZE = 1024 * 1024
+STREAM_READ_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = ('.doc', '.docx', '.pdf')
+
+DEFAULT_UPLOAD_SETTINGS = {
+    'MAX_FILE_SIZE': 200 * 1024 * 1024,  # 分片上传的文件大小上限
+    'DIRECT_UPLOAD_MAX_SIZE': 10 * 1024 * 1024,  # 普通上传的文件大小上限（更大的文件使用分片上传）
+    'CHUNK_SIZE': 5 * 1024 * 1024,  # 单个分片的大小上限（不超过 DATA_UPLOAD_MAX_MEMORY_SIZE）
+    'SESSION_EXPIRE_HOURS': 24,  # 未完成的上传会话超过该时间未更新则清理
+}
+
+
+def get_upload_settings() -> Dict:
+    """获取文件上传配置"""
+    config = dict(DEFAULT_UPLOAD_SETTINGS)
+    config.update(getattr(settings, 'CONTRACT_UPLOAD', {}))
+    return config
+
+
+def file_sha256(file_path: str) -> str:
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ChunkOffsetError(ValueError):
+    """分片偏移量与已接收的字节数不一致（客户端应从已接收的位置继续上传）"""
+
+    def __init__(self, received_bytes: int):
+        super().__init__(f'分片偏移量不正确，已接收 {received_bytes} 字节')
+        self.received_bytes = received_bytes
+
+
+class FileStorageService:
+    """合同文件存储服务类"""
+
+    def blob_path(self, content_hash: str, file_ext: str) -> str:
+        """文件的存储路径（相对MEDIA_ROOT），按哈希前两级分目录避免单个目录文件过多"""
+        return os.path.join(BLOB_DIR, content_hash[:2], content_hash[2:4], f'{content_hash}{file_ext}')
+
+    def store_upload(self, uploaded_file, file_ext: str) -> FileBlob:
+        """
+        保存上传文件：写入临时文件时计算哈希，已存在相同内容的文件时丢弃临时文件并增加引用次数
+
+        Returns:
+            FileBlob: 文件存储记录（已计入本次引用）
+        """
+        blob_root = os.path.join(settings.MEDIA_ROOT, BLOB_DIR)
+        os.makedirs(blob_root, exist_ok=True)
+
+        # 临时文件与目标目录在同一文件系统，可以原子地移动到最终位置
+        digest = hashlib.sha256()
+        file_size = 0
+        fd, temp_path = tempfile.mkstemp(dir=blob_root, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as destination:
+                for chunk in uploaded_file.chunks():
+                    digest.update(chunk)
+                    destination.write(chunk)
+                    file_size += len(chunk)
+            return self._store(temp_path, digest.hexdigest(), file_ext, file_size)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def store_file(self, temp_path: str, file_ext: str) -> FileBlob:
+        """
+        保存已写入磁盘的文件（如分片上传合并后的文件），文件会被移动或删除
+
+        Returns:
+            FileBlob: 文件存储记录（已计入本次引用）
+        """
+        try:
+            return self._store(temp_path, file_sha256(temp_path), file_ext, os.path.getsize(temp_path))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def acquire(self, blob: FileBlob) -> FileBlob:
+        """增加文件的引用次数"""
+        FileBlob.objects.filter(id=blob.id).update(ref_count=F('ref_count') + 1)
+        blob.refresh_from_db(fields=['ref_count'])
+        return blob
+
+    def release(self, blob: FileBlob) -> bool:
+        """
+        减少文件的引用次数，降为零且没有合同（或合同版本）引用该文件时删除文件
+
+        Returns:
+            bool: 文件是否已删除
+        """
+        with transaction.atomic():
+            blob = FileBlob.objects.select_for_update().filter(id=blob.id).first()
+            if blob is None:
+                return False
+            if blob.ref_count > 0:
+                blob.ref_count -= 1
+                blob.save(update_fields=['ref_count', 'updated_at'])
+            if blob.ref_count > 0 or self._referenced_by_contracts(blob.file_path):
+                return False
+            blob.delete()
+
+        absolute_path = os.path.join(settings.MEDIA_ROOT, blob.file_path)
+        try:
+            os.remove(absolute_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f'删除存储文件失败 - 文件: {blob.file_path}, 错误: {str(e)}')
+        return True
+
+    def _store(self, temp_path: str, content_hash: str, file_ext: str, file_size: int) -> FileBlob:
+        existing = self._existing_blob(content_hash)
+        if existing is not None:
+            return self.acquire(existing)
+
+        relative_path = self.blob_path(content_hash, file_ext)
+        absolute_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        os.replace(temp_path, absolute_path)
+        try:
+            return FileBlob.objects.create(
+                content_hash=content_hash,
+                file_path=relative_path,
+                file_format=file_ext.lstrip('.'),
+                file_size=file_size,
+                ref_count=1,
+            )
+        except IntegrityError:
+            # 并发上传同一文件，记录已由其他请求创建（文件内容相同，覆盖无影响）
+            return self.acquire(FileBlob.objects.get(content_hash=content_hash))
+
+    def _existing_blob(self, content_hash: str) -> Optional[FileBlob]:
+        """已存在且文件仍在磁盘上的存储记录；文件丢失时删除记录，重新保存"""
+        blob = FileBlob.objects.filter(content_hash=content_hash).first()
+        if blob is None:
+            return None
+        if os.path.isfile(os.path.join(settings.MEDIA_ROOT, blob.file_path)):
+            return blob
+        logger.warning(f'存储文件丢失，重新保存 - 文件: {blob.file_path}')
+        blob.delete()
+        return None
+
+    def _referenced_by_contracts(self, file_path: str) -> bool:
+        return (
+            Contract.objects.filter(file_path=file_path).exists()
+            or ContractVersion.objects.filter(file_path=file_path).exists()
+        )
+
+
+class UploadSessionService:
+    """分片上传服务类"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or get_upload_settings()
+        self.storage = FileStorageService()
+
+    def part_path(self, session: UploadSession) -> str:
+        """上传中的临时文件（绝对路径）"""
+        return os.path.join(settings.MEDIA_ROOT, SESSION_DIR, f'{session.upload_id.hex}.part')
+
+    def create(self, user, file_name: str, file_size: int, checksum: str = '') -> UploadSession:
+        """初始化上传会话"""
+        file_ext = os.path.splitext(file_name or '')[1].lower()
+        if file_ext not in ALLOWED_EXTENSIONS:
+            raise ValueError('不支持的文件类型，仅支持 .doc, .docx, .pdf')
+        if file_size <= 0:
+            raise ValueError('文件大小不正确')
+        if file_size > self.config['MAX_FILE_SIZE']:
+            raise ValueError(f'文件大小不能超过{self.config["MAX_FILE_SIZE"] // (1024 * 1024)}MB')
+
+        session = UploadSession.objects.create(
+            file_name=file_name,
+            file_format=file_ext.lstrip('.'),
+            file_size=file_size,
+            checksum=(checksum or '').lower(),
+            chunk_size=self.config['CHUNK_SIZE'],
+            created_by=user
+        )
+        part_path = self.part_path(session)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        open(part_path, 'wb').close()
+        return session
+
+    def write_chunk(
+        self,
+        session: UploadSession,
+        stream,
+        offset: int,
+        length: int,
+        chunk_checksum: str = ''
+    ) -> UploadSession:
+        """
+        将分片从请求流直接写入临时文件（不在内存中缓存整个分片）
+
+        Args:
+            stream: 请求体数据流
+            offset: 分片在文件中的起始位置，必须等于已接收的字节数
+            length: 分片字节数
+            chunk_checksum: 分片的SHA-256（可选），不一致时丢弃该分片
+        """
+        with transaction.atomic():
+            # 锁定会话，同一会话的分片依次写入
+            session = UploadSession.objects.select_for_update().get(id=session.id)
+            if session.status != 'uploading':
+                raise ValueError(f'上传会话{session.get_status_display()}，不能继续上传')
+            if offset != session.received_bytes:
+                raise ChunkOffsetError(session.received_bytes)
+            if length <= 0 or length > session.chunk_size:
+                raise ValueError(f'分片大小必须在1到{session.chunk_size}字节之间')
+            if offset + length > session.file_size:
+                raise ValueError('分片超出文件大小')
+
+            digest = hashlib.sha256()
+            written = 0
+            with open(self.part_path(session), 'r+b') as part:
+                # 丢弃上次中断时写入的不完整数据
+                part.seek(offset)
+                part.truncate()
+                while written < length:
+                    data = stream.read(min(STREAM_READ_SIZE, length - written))
+                    if not data:
+                        break
+                    digest.update(data)
+                    part.write(data)
+                    written += len(data)
+
+                error = None
+                if written != length:
+                    error = '分片数据不完整'
+                elif chunk_checksum and digest.hexdigest() != chunk_checksum.lower():
+                    error = '分片校验失败'
+                if error:
+                    part.truncate(offset)
+                    raise ValueError(error)
+
+            session.received_bytes = offset + length
+            session.save(update_fields=['received_bytes', 'updated_at'])
+        return session
+
+    def complete(self, session: UploadSession) -> FileBlob:
+        """
+        完成上传：校验文件大小和SHA-256，按内容哈希保存文件
+
+        Returns:
+            FileBlob: 文件存储记录（已计入本次引用）
+        """
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(id=session.id)
+            if session.status != 'uploading':
+                raise ValueError(f'上传会话{session.get_status_display()}')
+            if session.received_bytes != session.file_size:
+                raise ChunkOffsetError(session.received_bytes)
+
+            part_path = self.part_path(session)
+            if session.checksum and file_sha256(part_path) != session.checksum:
+                # 整个文件需要重新上传（重置后在事务外报错，避免重置被回滚）
+                session.received_bytes = 0
+                session.save(update_fields=['received_bytes', 'updated_at'])
+                open(part_path, 'wb').close()
+                blob = None
+            else:
+                blob = self.storage.store_file(part_path, f'.{session.file_format}')
+                session.status = 'completed'
+                session.save(update_fields=['status', 'updated_at'])
+
+        if blob is None:
+            raise ValueError('文件校验失败，请重新上传')
+        return blob
+
+    def abort(self, session: UploadSession):
+        """取消上传并删除临时文件"""
+        if session.status == 'uploading':
+            session.status = 'aborted'
+            session.save(update_fields=['status', 'updated_at'])
+        try:
+            os.remove(self.part_path(session))
+        except FileNotFoundError:
+            pass
+
+    def cleanup_expired(self) -> int:
+        """清理长时间未更新的未完成上传会话"""
+        cutoff = timezone.now() - timedelta(hours=self.config['SESSION_EXPIRE_HOURS'])
+        sessions = UploadSession.objects.filter(status='uploading', updated_at__lt=cutoff)
+        count = 0
+        for session in sessions.iterator(chunk_size=100):
+            self.abort(session)
+            count += 1
+        return count
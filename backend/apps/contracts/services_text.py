@@ -0,0 +1,210 @@
+"""
+合同文本服务模块 - 合同（及各版本）内容的纯文本提取和持久化
+
+合同保存时提取一次纯文本并按 (合同, 当前版本号) 保存，审核、规则扫描、推荐等直接读取，
+不再在每次使用时重新序列化合同内容。版本号递增后旧版本的文本保留，作为该版本的文本记录。
+只有上传文件的合同从文件中提取文本，文件大小或修改时间变化时重新提取。
+"""
+import hashlib
+import json
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+from apps.contracts.models import Contract, ContractText, ContractVersion
+from apps.contracts.services_parser import FileParserService
+from apps.contracts.services_version import ContractVersionService
+
+logger = logging.getLogger(__name__)
+
+# 决定合同提取文本的字段
+TEXT_SOURCE_FIELDS = frozenset({'content', 'file_path', 'title', 'current_version'})
+
+
+def text_fields_updated(update_fields: Optional[Iterable[str]]) -> bool:
+    """保存合同时是否可能改变提取文本（update_fields 为 None 表示保存全部字段）"""
+    return update_fields is None or not TEXT_SOURCE_FIELDS.isdisjoint(update_fields)
+
+
+class ContractTextService:
+    """合同文本服务类"""
+
+    def __init__(self):
+        self.parser = FileParserService()
+
+    def extract_text(self, content, file_path: str = '', title: str = '') -> Tuple[str, str, str]:
+        """
+        从合同内容或合同文件中提取纯文本
+
+        Returns:
+            (文本, 文本来源, 文件标记)
+        """
+        if content:
+            if isinstance(content, dict):
+                # 上传解析和前端编辑的内容正文保存在text字段中（PDF解析结果为text_path指向的提取结果文件）
+                if isinstance(content.get('text'), str) and content['text'].strip():
+                    return content['text'], 'content', ''
+                if content.get('text_path'):
+                    text = self.parser.read_text(content)
+                    if text.strip():
+                        return text, 'content', ''
+                return json.dumps(content, ensure_ascii=False, indent=2), 'content', ''
+            elif isinstance(content, str):
+                return content, 'content', ''
+
+        absolute_path = self.parser.resolve_path(file_path)
+        if absolute_path:
+            try:
+                parsed = self.parser.parse(absolute_path)
+            except OSError as e:
+                logger.warning(f'读取合同文件失败 - 文件: {file_path}, 错误: {str(e)}')
+                parsed = {}
+            if parsed.get('error'):
+                logger.warning(f'合同文件解析失败 - 文件: {file_path}, {parsed["error"]}')
+            else:
+                text = self.parser.read_text(parsed)
+                if text.strip():
+                    return text, 'file', self.parser.file_stamp(absolute_path)
+
+        return title or '', 'title', ''
+
+    def refresh(self, contract: Contract) -> ContractText:
+        """根据合同当前内容更新当前版本的提取文本（文本未变化时不写库）"""
+        text, source, file_stamp = self.extract_text(contract.content, contract.file_path, contract.title)
+        contract_text = self._save(contract.id, contract.current_version, text, source, file_stamp)
+        contract._extracted_text = contract_text.text
+        return contract_text
+
+    def get_text(self, contract: Contract) -> str:
+        """
+        获取合同当前版本的纯文本
+
+        优先读取已保存的提取文本，不存在（如历史数据）或来源文件已变化时重新提取并保存；
+        结果缓存在合同对象上，同一次审核中多次读取只查询一次。
+        """
+        cached = getattr(contract, '_extracted_text', None)
+        if cached is not None:
+            return cached
+
+        row = ContractText.objects.filter(
+            contract_id=contract.id, version=contract.current_version
+        ).values_list('text', 'source', 'file_stamp').first()
+        if row is None or self._is_stale(contract, row[1], row[2]):
+            text = self.refresh(contract).text
+        else:
+            text = row[0]
+        contract._extracted_text = text
+        return text
+
+    def get_version_text(self, contract: Contract, version: int) -> str:
+        """
+        获取合同指定版本的纯文本
+
+        当前版本同 get_text；历史版本读取保存的版本文本，没有时（如历史数据）从版本记录中提取并保存。
+        """
+        if version == contract.current_version:
+            return self.get_text(contract)
+        text = ContractText.objects.filter(
+            contract_id=contract.id, version=version
+        ).values_list('text', flat=True).first()
+        if text is not None:
+            return text
+
+        contract_version = ContractVersion.objects.filter(contract_id=contract.id, version=version).first()
+        if contract_version is None:
+            raise ValueError(f'合同版本 v{version} 不存在')
+        text, source, file_stamp = self.extract_text(
+            ContractVersionService().resolve_content(contract_version), contract_version.file_path, contract.title
+        )
+        return self._save(contract.id, version, text, source, file_stamp).text
+
+    def get_texts(self, contracts: Iterable[Contract]) -> Dict[int, str]:
+        """批量获取合同当前版本的纯文本 {contract_id: text}"""
+        contracts = list(contracts)
+        stored = self.get_stored(contracts)
+        texts = {}
+        for contract in contracts:
+            row = stored.get(contract.id)
+            if row and not self._is_stale(contract, row[1], row[2]):
+                texts[contract.id] = row[0]
+            else:
+                texts[contract.id] = self.get_text(contract)
+        return texts
+
+    def get_stored_hashes(self, contracts: Iterable[Contract]) -> Dict[int, str]:
+        """
+        批量读取已保存的当前版本文本哈希 {contract_id: content_hash}
+
+        不重新提取文本：没有保存的文本或来源文件已变化的合同不在结果中。
+        """
+        contracts = {contract.id: contract for contract in contracts}
+        if not contracts:
+            return {}
+        rows = ContractText.objects.filter(
+            contract_id__in=list(contracts),
+            version__in={contract.current_version for contract in contracts.values()}
+        ).values_list('contract_id', 'version', 'content_hash', 'source', 'file_stamp')
+        hashes = {}
+        for contract_id, version, content_hash, source, file_stamp in rows:
+            contract = contracts[contract_id]
+            if contract.current_version == version and not self._is_stale(contract, source, file_stamp):
+                hashes[contract_id] = content_hash
+        return hashes
+
+    def get_stored(self, contracts: Iterable[Contract]) -> Dict[int, Tuple[str, str, str]]:
+        """批量读取已保存的当前版本文本 {contract_id: (text, source, file_stamp)}"""
+        versions = {contract.id: contract.current_version for contract in contracts}
+        if not versions:
+            return {}
+        rows = ContractText.objects.filter(
+            contract_id__in=list(versions), version__in=set(versions.values())
+        ).values_list('contract_id', 'version', 'text', 'source', 'file_stamp')
+        return {
+            contract_id: (text, source, file_stamp)
+            for contract_id, version, text, source, file_stamp in rows
+            if versions.get(contract_id) == version
+        }
+
+    def get_hash(self, contract: Contract) -> Optional[str]:
+        """获取合同当前版本文本的哈希"""
+        row = ContractText.objects.filter(
+            contract_id=contract.id, version=contract.current_version
+        ).values_list('content_hash', 'source', 'file_stamp').first()
+        if row is None or self._is_stale(contract, row[1], row[2]):
+            return self.refresh(contract).content_hash
+        return row[0]
+
+    def _is_stale(self, contract: Contract, source: str, file_stamp: str) -> bool:
+        """从文件提取的文本在文件变化后失效"""
+        if source != 'file':
+            return False
+        return self.parser.file_stamp(self.parser.resolve_path(contract.file_path)) != file_stamp
+
+    def _save(
+        self,
+        contract_id: int,
+        version: int,
+        text: str,
+        source: str,
+        file_stamp: str = ''
+    ) -> ContractText:
+        content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        contract_text = ContractText.objects.filter(contract_id=contract_id, version=version).first()
+        if contract_text and contract_text.content_hash == content_hash:
+            if contract_text.file_stamp != file_stamp:
+                # 文件被重新保存但内容未变，只更新文件标记
+                contract_text.file_stamp = file_stamp
+                contract_text.save(update_fields=['file_stamp', 'updated_at'])
+            return contract_text
+
+        contract_text, _ = ContractText.objects.update_or_create(
+            contract_id=contract_id,
+            version=version,
+            defaults={
+                'text': text,
+                'content_hash': content_hash,
+                'source': source,
+                'char_count': len(text),
+                'file_stamp': file_stamp,
+            }
+        )
+        return contract_text
@@ -0,0 +1,263 @@
+"""
+合同版本存储服务模块 - 版本内容按周期性快照加增量压缩保存
+
+谈判过程中同一合同会产生几十个内容几乎相同的版本，每个版本只保存与上一版本的差异：
+    快照    完整内容的JSON经zlib压缩（第一个版本、距上一个快照达到 SNAPSHOT_INTERVAL 层、或增量不比快照小很多时）
+    增量    相对基准版本的编辑操作（复制基准片段 / 插入新文字）经zlib压缩
+
+读取时从最近的快照开始依次应用增量还原内容；最近读取的版本内容缓存在进程内（版本创建后不会修改），
+连续读取相邻版本（版本列表、对比、回滚）时只需应用一层增量。
+"""
+import difflib
+import hashlib
+import json
+import logging
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.db import transaction
+
+from apps.contracts.models import Contract, ContractVersion
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERSION_STORAGE_SETTINGS = {
+    'SNAPSHOT_INTERVAL': 10,  # 连续增量达到该层数时保存快照，限制还原时需要应用的增量数
+    'SNAPSHOT_RATIO': 0.5,  # 增量超过快照大小的该比例时直接保存快照
+    'CACHE_SIZE': 64,  # 进程内缓存的版本内容数量
+}
+
+# 增量按片段计算：JSON中的换行（\n转义）、句号、字段分隔处切分，修改一句话只产生一个片段的差异
+PIECE_SPLIT_PATTERN = re.compile(r'(?<=\\n)|(?<=。)|(?<=",)')
+COMPRESS_LEVEL = 6
+
+
+def get_version_storage_settings() -> Dict:
+    """获取合同版本存储配置"""
+    config = dict(DEFAULT_VERSION_STORAGE_SETTINGS)
+    config.update(getattr(settings, 'CONTRACT_VERSION_STORAGE', {}))
+    return config
+
+
+def serialize_content(content) -> str:
+    return json.dumps(content, ensure_ascii=False)
+
+
+def content_hash(content, file_path: str = '') -> str:
+    """合同内容和文件路径的哈希（JSON键顺序不影响结果），用于判断内容是否变化"""
+    canonical = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f'{canonical}\n{file_path or ""}'.encode('utf-8')).hexdigest()
+
+
+def compute_delta(base: str, target: str) -> List:
+    """
+    计算从基准内容到目标内容的编辑操作
+
+    Returns:
+        [[起始片段, 结束片段], '插入的文字', ...]：列表项为基准片段区间时复制基准内容，为字符串时插入
+    """
+    base_pieces = PIECE_SPLIT_PATTERN.split(base)
+    target_pieces = PIECE_SPLIT_PATTERN.split(target)
+
+    # 相邻版本的修改通常集中在少数位置，先去掉相同的开头和结尾，只对中间部分做序列比较
+    prefix = 0
+    max_prefix = min(len(base_pieces), len(target_pieces))
+    while prefix < max_prefix and base_pieces[prefix] == target_pieces[prefix]:
+        prefix += 1
+    suffix = 0
+    max_suffix = max_prefix - prefix
+    while suffix < max_suffix and base_pieces[-1 - suffix] == target_pieces[-1 - suffix]:
+        suffix += 1
+
+    operations = [[0, prefix]] if prefix else []
+    matcher = difflib.SequenceMatcher(
+        None,
+        base_pieces[prefix:len(base_pieces) - suffix],
+        target_pieces[prefix:len(target_pieces) - suffix],
+        autojunk=False
+    )
+    for tag, b_start, b_end, t_start, t_end in matcher.get_opcodes():
+        if tag == 'equal':
+            operations.append([prefix + b_start, prefix + b_end])
+        elif tag in ('replace', 'insert'):
+            operations.append(''.join(target_pieces[prefix + t_start:prefix + t_end]))
+    if suffix:
+        operations.append([len(base_pieces) - suffix, len(base_pieces)])
+    return operations
+
+
+def apply_delta(base: str, operations: List) -> str:
+    """在基准内容上应用编辑操作"""
+    base_pieces = PIECE_SPLIT_PATTERN.split(base)
+    return ''.join(
+        operation if isinstance(operation, str) else ''.join(base_pieces[operation[0]:operation[1]])
+        for operation in operations
+    )
+
+
+class VersionContentCache:
+    """最近读取的版本内容（序列化后的JSON字符串，按版本记录ID缓存，LRU淘汰）"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version_id: int) -> Optional[str]:
+        with self._lock:
+            serialized = self._items.get(version_id)
+            if serialized is not None:
+                self._items.move_to_end(version_id)
+            return serialized
+
+    def set(self, version_id: int, serialized: str):
+        with self._lock:
+            self._items[version_id] = serialized
+            self._items.move_to_end(version_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_content_cache = VersionContentCache(get_version_storage_settings()['CACHE_SIZE'])
+
+
+class ContractVersionService:
+    """合同版本服务类"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or get_version_storage_settings()
+        self.cache = _content_cache
+
+    def create_version(
+        self,
+        contract: Contract,
+        content,
+        file_path: str,
+        change_summary: str,
+        changed_by,
+        version: Optional[int] = None
+    ) -> ContractVersion:
+        """
+        创建合同版本（内容保存为快照或相对上一版本的增量）
+
+        Args:
+            version: 版本号（默认为合同当前版本号+1）
+        """
+        serialized = serialize_content(content)
+        with transaction.atomic():
+            base = ContractVersion.objects.select_for_update().filter(
+                contract_id=contract.id
+            ).defer('content', 'content_data').order_by('-version').first()
+            version_obj = ContractVersion(
+                contract=contract,
+                version=version or contract.current_version + 1,
+                file_path=file_path or '',
+                change_summary=change_summary,
+                changed_by=changed_by,
+                content_hash=content_hash(content, file_path),
+                content_size=len(serialized.encode('utf-8')),
+            )
+            self._encode(version_obj, serialized, base)
+            version_obj.save()
+        self.cache.set(version_obj.id, serialized)
+        return version_obj
+
+    def is_current(self, contract: Contract, content, file_path: str) -> bool:
+        """内容和文件与合同当前内容相同（保存时不需要创建新版本）"""
+        return content_hash(content, file_path) == self.current_hash(contract)
+
+    def is_versioned(self, contract: Contract) -> bool:
+        """合同当前内容与最新的版本记录相同（当前内容已保存为版本）"""
+        latest_hash = ContractVersion.objects.filter(contract_id=contract.id).order_by(
+            '-version'
+        ).values_list('content_hash', flat=True).first()
+        return bool(latest_hash) and latest_hash == self.current_hash(contract)
+
+    def current_hash(self, contract: Contract) -> str:
+        """合同当前内容的哈希（历史数据没有保存哈希时现场计算）"""
+        return contract.content_hash or content_hash(contract.content, contract.file_path)
+
+    def resolve_content(self, version_obj: ContractVersion):
+        """还原版本内容"""
+        return json.loads(self._serialized(version_obj))
+
+    def get_content(self, contract: Contract, version: int):
+        """还原合同指定版本的内容"""
+        version_obj = ContractVersion.objects.get(contract_id=contract.id, version=version)
+        return self.resolve_content(version_obj)
+
+    def compact(self, contract: Contract) -> int:
+        """
+        将合同的历史完整内容版本改为快照加增量保存
+
+        Returns:
+            int: 转换的版本数
+        """
+        converted = 0
+        base = None
+        with transaction.atomic():
+            versions = ContractVersion.objects.select_for_update().filter(
+                contract_id=contract.id
+            ).order_by('version')
+            for version_obj in versions:
+                if version_obj.storage_type == 'full':
+                    serialized = serialize_content(version_obj.content)
+                    version_obj.content_size = len(serialized.encode('utf-8'))
+                    version_obj.content_hash = content_hash(version_obj.content, version_obj.file_path)
+                    self._encode(version_obj, serialized, base)
+                    version_obj.content = None
+                    version_obj.save(update_fields=[
+                        'content', 'storage_type', 'base_version', 'delta_depth', 'content_data',
+                        'content_size', 'content_hash'
+                    ])
+                    self.cache.set(version_obj.id, serialized)
+                    converted += 1
+                base = version_obj
+        return converted
+
+    def _encode(self, version_obj: ContractVersion, serialized: str, base: Optional[ContractVersion]):
+        """按快照或增量编码版本内容（写入 version_obj，不保存）"""
+        snapshot = zlib.compress(serialized.encode('utf-8'), COMPRESS_LEVEL)
+        if base is not None and base.delta_depth + 1 < self.config['SNAPSHOT_INTERVAL']:
+            operations = compute_delta(self._serialized(base), serialized)
+            delta = zlib.compress(
+                json.dumps(operations, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                COMPRESS_LEVEL
+            )
+            if len(delta) < len(snapshot) * self.config['SNAPSHOT_RATIO']:
+                version_obj.storage_type = 'delta'
+                version_obj.base_version = base.version
+                version_obj.delta_depth = base.delta_depth + 1
+                version_obj.content_data = delta
+                return
+        version_obj.storage_type = 'snapshot'
+        version_obj.base_version = None
+        version_obj.delta_depth = 0
+        version_obj.content_data = snapshot
+
+    def _serialized(self, version_obj: ContractVersion) -> str:
+        """版本内容的JSON字符串（增量版本递归还原基准版本）"""
+        serialized = self.cache.get(version_obj.id)
+        if serialized is not None:
+            return serialized
+
+        if version_obj.storage_type == 'full':
+            serialized = serialize_content(version_obj.content)
+        else:
+            data = zlib.decompress(bytes(version_obj.content_data)).decode('utf-8')
+            if version_obj.storage_type == 'snapshot':
+                serialized = data
+            else:
+                base = ContractVersion.objects.get(
+                    contract_id=version_obj.contract_id, version=version_obj.base_version
+                )
+                serialized = apply_delta(self._serialized(base), json.loads(data))
+        self.cache.set(version_obj.id, serialized)
+        return serialized
@@ -0,0 +1,35 @@
+"""
+合同信号处理 - 合同保存前更新内容哈希，保存后更新当前版本的提取文本；解析任务删除后释放上传文件的引用
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Contract, ParseJob
+from .services_storage import FileStorageService
+from .services_text import ContractTextService, text_fields_updated
+from .services_version import content_hash
+
+
+@receiver(pre_save, sender=Contract)
+def update_contract_content_hash(sender, instance, raw=False, **kwargs):
+    """合同保存前更新内容哈希"""
+    if raw:
+        return
+    instance.content_hash = content_hash(instance.content, instance.file_path)
+
+
+@receiver(post_save, sender=Contract)
+def update_contract_text(sender, instance, raw=False, update_fields=None, **kwargs):
+    """合同保存后更新当前版本的提取文本（文本未变化时不写库；历史版本的文本保持不变）"""
+    # 只更新状态等字段的保存不影响提取文本
+    if raw or not text_fields_updated(update_fields):
+        return
+    ContractTextService().refresh(instance)
+
+
+
+@receiver(post_delete, sender=ParseJob)
+def release_uploaded_file(sender, instance, **kwargs):
+    """每次上传对应一个解析任务，任务删除后上传文件的引用次数减一"""
+    if instance.blob_id:
+        FileStorageService().release(instance.blob)
@@ -0,0 +1,20 @@
+from celery import shared_task
+import logging
+from .models import ParseJob
+from .services_parser import FileParserService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def parse_uploaded_file(job_id):
+    """解析上传的合同文件"""
+    try:
+        job = ParseJob.objects.get(id=job_id)
+    except ParseJob.DoesNotExist:
+        return {'success': False, 'error': '解析任务不存在'}
+    try:
+        FileParserService().run_job(job)
+    except Exception as e:
+        return {'success': False, 'job_id': job_id, 'error': str(e)}
+    return {'success': True, 'job_id': job_id}
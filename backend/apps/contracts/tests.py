@@ -1,11 +1,18 @@
 """
 合同管理模块单元测试
 """
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
-from apps.contracts.models import Contract, Template
+from apps.contracts.models import Contract, ContractText, FileBlob, FileParseCache, ParseJob, Template
+from apps.contracts.services_parser import FileParserService
+from apps.contracts.services_text import ContractTextService
+from apps.contracts.services_version import ContractVersionService, _content_cache
 
 User = get_user_model()
 
@@ -48,6 +55,394 @@ class ContractModelTest(TestCase):
         self.assertIn(contract, Contract.objects.all())
 
 
+class ContractTextTest(TestCase):
+    """合同提取文本测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.service = ContractTextService()
+    
+    def test_text_saved_on_contract_save(self):
+        """合同保存时保存当前版本的提取文本"""
+        contract = Contract.objects.create(
+            title='测试合同',
+            contract_type='procurement',
+            content={'title': '测试合同', 'text': '第一条 违约责任'},
+            drafter=self.user
+        )
+        contract_text = ContractText.objects.get(contract=contract, version=1)
+        self.assertEqual(contract_text.text, '第一条 违约责任')
+        self.assertEqual(contract_text.source, 'content')
+        
+        fresh = Contract.objects.get(id=contract.id)
+        self.assertEqual(self.service.get_text(fresh), '第一条 违约责任')
+    
+    def test_old_version_text_kept(self):
+        """版本号递增后旧版本的文本保持不变"""
+        contract = Contract.objects.create(
+            title='测试合同', contract_type='procurement', content='旧内容', drafter=self.user
+        )
+        contract.content = '新内容'
+        contract.current_version = 2
+        contract.save()
+        
+        texts = dict(ContractText.objects.filter(contract=contract).values_list('version', 'text'))
+        self.assertEqual(texts, {1: '旧内容', 2: '新内容'})
+        self.assertEqual(self.service.get_texts([Contract.objects.get(id=contract.id)]), {contract.id: '新内容'})
+    
+    def test_missing_text_filled_lazily(self):
+        """历史合同首次读取时补全提取文本"""
+        contract = Contract.objects.create(
+            title='测试合同', contract_type='procurement', drafter=self.user
+        )
+        ContractText.objects.filter(contract=contract).delete()
+        fresh = Contract.objects.get(id=contract.id)
+        self.assertEqual(self.service.get_text(fresh), '测试合同')
+        self.assertTrue(ContractText.objects.filter(contract=contract, source='title').exists())
+    
+    def test_status_only_save_skips_text_refresh(self):
+        """只更新状态的保存不重新提取文本"""
+        contract = Contract.objects.create(
+            title='测试合同', contract_type='procurement', content='第一条 付款', drafter=self.user
+        )
+        contract.status = 'reviewing'
+        with mock.patch.object(ContractTextService, 'refresh') as refresh:
+            contract.save(update_fields=['status'])
+            refresh.assert_not_called()
+            contract.save(update_fields=['status', 'content'])
+            refresh.assert_called_once()
+
+
+class ContractVersionStorageTest(TestCase):
+    """合同版本快照加增量存储测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.contract = Contract.objects.create(
+            title='测试合同', contract_type='procurement', drafter=self.user
+        )
+        self.service = ContractVersionService(
+            {'SNAPSHOT_INTERVAL': 3, 'SNAPSHOT_RATIO': 0.5, 'CACHE_SIZE': 64}
+        )
+        self.clauses = [f'第{i}条 条款内容{i}。' + '双方应当按照约定履行义务。' * 20 for i in range(1, 21)]
+    
+    def _content(self, number):
+        clauses = list(self.clauses)
+        clauses[number % len(clauses)] += f'补充约定{number}。'
+        return {'title': '测试合同', 'text': '\n'.join(clauses)}
+    
+    def test_versions_stored_as_snapshot_and_deltas(self):
+        """第一个版本保存快照，之后保存增量，增量层数达到间隔时重新保存快照"""
+        for number in range(1, 6):
+            self.service.create_version(
+                self.contract, self._content(number), '', f'第{number}次修改', self.user, version=number
+            )
+        storage = list(self.contract.versions.order_by('version').values_list('version', 'storage_type', 'base_version'))
+        self.assertEqual(storage, [
+            (1, 'snapshot', None), (2, 'delta', 1), (3, 'delta', 2), (4, 'snapshot', None), (5, 'delta', 4),
+        ])
+        
+        _content_cache.clear()
+        for number in range(1, 6):
+            self.assertEqual(self.service.get_content(self.contract, number), self._content(number))
+    
+    def test_version_list_omits_content(self):
+        """版本列表只返回版本信息，版本内容按版本号单独获取"""
+        self.service.create_version(self.contract, self._content(1), '', '初始版本', self.user, version=1)
+        self.service.create_version(self.contract, self._content(2), '', '修改', self.user, version=2)
+        _content_cache.clear()
+        
+        response = self.client.get(f'/api/contracts/contracts/{self.contract.id}/versions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertNotIn('content', response.data[0])
+        
+        response = self.client.get(f'/api/contracts/contracts/{self.contract.id}/versions/2/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['content'], self._content(2))
+    
+    def test_unchanged_content_creates_no_version(self):
+        """提交的内容与当前内容相同时不创建新版本"""
+        self.contract.content = {'title': '测试合同', 'text': '第一条 标的'}
+        self.contract.save()
+        self.assertEqual(len(self.contract.content_hash), 64)
+        url = f'/api/contracts/contracts/{self.contract.id}/create_version/'
+        
+        response = self.client.post(url, {'content': {'text': '第一条 标的', 'title': '测试合同'}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['unchanged'])
+        self.assertFalse(self.contract.versions.exists())
+        
+        response = self.client.post(url, {'content': {'title': '测试合同', 'text': '第一条 货物'}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.current_version, 2)
+        self.assertEqual(self.contract.versions.get().content_hash, self.contract.content_hash)
+
+
+class ContractFileParseTest(TestCase):
+    """合同文件解析和解析缓存测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        os.makedirs(os.path.join(self.media_root, 'contracts', 'uploads'))
+        self.relative_path = os.path.join('contracts', 'uploads', 'contract.docx')
+        self._write_docx(['设备采购合同', '第一条 违约责任', '违约金为合同总额的百分之十。'])
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+    
+    def _write_docx(self, paragraphs):
+        import docx
+        document = docx.Document()
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+        document.save(os.path.join(self.media_root, self.relative_path))
+    
+    def test_same_file_parsed_once(self):
+        """同一文件只解析一次"""
+        service = FileParserService()
+        with mock.patch.object(FileParserService, '_parse_file', wraps=service._parse_file) as parse_file:
+            first = service.parse_stored_file(self.relative_path)
+            second = FileParserService().parse_stored_file(self.relative_path)
+        self.assertEqual(parse_file.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertIn('违约金', first['text'])
+        self.assertEqual(FileParseCache.objects.count(), 1)
+    
+    def test_identical_uploads_share_blob_and_parse(self):
+        """相同文件重复上传只保存一份、只解析一次，任务全部删除后文件随之删除"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from apps.contracts import views
+        with open(os.path.join(self.media_root, self.relative_path), 'rb') as f:
+            data = f.read()
+        
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with mock.patch.object(views.parse_uploaded_file, 'delay', side_effect=RuntimeError('broker unavailable')), \
+                mock.patch.object(FileParserService, '_parse_file', wraps=FileParserService()._parse_file) as parse_file:
+            responses = [
+                client.post('/api/contracts/upload/', {'file': SimpleUploadedFile(name, data)}, format='multipart')
+                for name in ('draft.docx', 'counterparty.docx')
+            ]
+        self.assertEqual([r.status_code for r in responses], [status.HTTP_200_OK, status.HTTP_200_OK])
+        self.assertEqual(parse_file.call_count, 1)
+        self.assertEqual(responses[0].data['content'], responses[1].data['content'])
+        
+        blob = FileBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual({job.file_path for job in ParseJob.objects.all()}, {blob.file_path})
+        absolute_path = os.path.join(self.media_root, blob.file_path)
+        self.assertTrue(os.path.isfile(absolute_path))
+        
+        ParseJob.objects.first().delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        ParseJob.objects.get().delete()
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertFalse(os.path.exists(absolute_path))
+    
+    def test_direct_upload_size_limit_from_settings(self):
+        """普通上传的大小上限读取 CONTRACT_UPLOAD 配置"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with override_settings(CONTRACT_UPLOAD={'DIRECT_UPLOAD_MAX_SIZE': 16}):
+            response = client.post(
+                '/api/contracts/upload/', {'file': SimpleUploadedFile('large.pdf', b'0' * 17)}, format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('分片上传', response.data['error'])
+        self.assertFalse(FileBlob.objects.exists())
+    
+    def test_chunked_upload_resumes_and_verifies(self):
+        """分片上传：偏移量不正确时返回已接收位置，校验失败的分片被丢弃，完成后开始解析"""
+        import hashlib
+        from apps.contracts import views
+        with open(os.path.join(self.media_root, self.relative_path), 'rb') as f:
+            data = f.read()
+        
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with override_settings(CONTRACT_UPLOAD={'CHUNK_SIZE': 1024}):
+            response = client.post('/api/contracts/upload-sessions/', {
+                'file_name': 'annex.docx', 'file_size': len(data),
+                'checksum': hashlib.sha256(data).hexdigest(),
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = f'/api/contracts/upload-sessions/{response.data["upload_id"]}/'
+        chunk_size = response.data['chunk_size']
+        
+        def put_chunk(offset, chunk, checksum=None):
+            return client.generic(
+                'PUT', f'{url}chunk/?offset={offset}', chunk,
+                content_type='application/octet-stream',
+                HTTP_X_CHUNK_CHECKSUM=checksum or hashlib.sha256(chunk).hexdigest()
+            )
+        
+        self.assertEqual(put_chunk(0, data[:chunk_size]).status_code, status.HTTP_200_OK)
+        # 重复发送已接收的分片：返回已接收的位置
+        conflict = put_chunk(0, data[:chunk_size])
+        self.assertEqual(conflict.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(conflict.data['received_bytes'], chunk_size)
+        # 分片损坏
+        corrupted = put_chunk(chunk_size, data[chunk_size:2 * chunk_size], checksum='0' * 64)
+        self.assertEqual(corrupted.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # 中断后查询进度并继续
+        offset = client.get(url).data['received_bytes']
+        self.assertEqual(offset, chunk_size)
+        while offset < len(data):
+            self.assertEqual(put_chunk(offset, data[offset:offset + chunk_size]).status_code, status.HTTP_200_OK)
+            offset += chunk_size
+        
+        with mock.patch.object(views.parse_uploaded_file, 'delay', side_effect=RuntimeError('broker unavailable')):
+            response = client.post(f'{url}complete/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('违约金', response.data['content']['text'])
+        blob = FileBlob.objects.get()
+        with open(os.path.join(self.media_root, blob.file_path), 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(client.get(url).data['status'], 'completed')
+    
+    def test_parse_job_reports_progress_and_result(self):
+        """解析任务完成后可查询解析结果"""
+        job = ParseJob.objects.create(
+            file_path=self.relative_path, file_name='contract.docx',
+            file_format='docx', created_by=self.user
+        )
+        FileParserService().run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.progress['progress'], 100)
+        
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(f'/api/contracts/parse-jobs/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('违约金', response.data['result']['text'])
+    
+    def test_docx_tables_extracted_in_document_order(self):
+        """DOCX表格单元格按文档顺序提取，并记录各块在文本中的位置"""
+        import docx
+        document = docx.Document()
+        document.add_paragraph('付款计划')
+        table = document.add_table(rows=2, cols=2)
+        table.cell(0, 0).text = '期次'
+        table.cell(0, 1).text = '金额'
+        table.cell(1, 0).text = '首付款'
+        table.cell(1, 1).text = '30%'
+        document.add_paragraph('第二条 交付')
+        document.save(os.path.join(self.media_root, self.relative_path))
+
+        result = FileParserService().parse_stored_file(self.relative_path)
+        self.assertEqual(result['text'], '付款计划\n期次\n金额\n首付款\n30%\n第二条 交付')
+        self.assertEqual(result['metadata']['paragraph_count'], 2)
+        self.assertEqual(result['metadata']['table_cell_count'], 4)
+        for kind, offset, length in result['metadata']['blocks']:
+            self.assertIn(kind, ('p', 'cell'))
+            self.assertEqual(len(result['text'][offset:offset + length]), length)
+        kind, offset, length = result['metadata']['blocks'][3]
+        self.assertEqual((kind, result['text'][offset:offset + length]), ('cell', '首付款'))
+
+    def test_parallel_pdf_extraction_matches_sequential(self):
+        """PDF按页码区间并行提取的结果与逐页顺序提取一致"""
+        import fitz
+        pdf_path = os.path.join(self.media_root, 'contracts', 'uploads', 'contract.pdf')
+        document = fitz.open()
+        for page_num in range(7):
+            page = document.new_page()
+            page.insert_text((72, 72), f'Page {page_num + 1} clause text')
+        document.save(pdf_path)
+        document.close()
+        
+        service = FileParserService()
+        with self.settings(CONTRACT_PARSING={'PDF_PARALLEL_MIN_PAGES': 1000}):
+            sequential = service._parse_file(pdf_path, '.pdf', output_name='sequential')
+        progress = []
+        with self.settings(CONTRACT_PARSING={'MAX_WORKERS': 2, 'PDF_PARALLEL_MIN_PAGES': 2, 'PDF_PAGES_PER_TASK': 2}):
+            parallel = service._parse_file(
+                pdf_path, '.pdf', lambda done, total: progress.append((done, total)), output_name='parallel'
+            )
+        
+        self.assertNotIn('error', parallel)
+        # 提取结果写入文件，解析结果中只记录路径
+        self.assertNotIn('text', parallel)
+        self.assertEqual(parallel['text_path'], os.path.join('contracts', 'parsed', 'parallel.txt'))
+        text = service.read_text(parallel)
+        self.assertEqual(text, service.read_text(sequential))
+        self.assertEqual(service.read_text(parallel, 'html'), service.read_text(sequential, 'html'))
+        self.assertEqual(parallel['metadata']['page_count'], 7)
+        self.assertEqual(parallel['metadata']['text_length'], len(text))
+        self.assertEqual(parallel['metadata']['word_count'], len(text.split()))
+        self.assertEqual(progress[-1], (7, 7))
+        self.assertLess(text.index('Page 2'), text.index('Page 7'))
+        
+        # 合同内容为PDF解析结果时，从提取结果文件读取文本
+        contract = Contract.objects.create(
+            title='PDF合同', contract_type='procurement', content=parallel, drafter=self.user
+        )
+        self.assertEqual(ContractTextService().get_text(Contract.objects.get(id=contract.id)), text)
+        self.assertEqual(service.read_text({'text_path': self.relative_path}), '')
+        
+        # 返回给客户端的解析结果包含提取文本，不包含内部文件路径
+        job = ParseJob.objects.create(
+            file_path='contracts/uploads/contract.pdf', file_name='contract.pdf', file_format='pdf',
+            status='completed', result=parallel, created_by=self.user
+        )
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(f'/api/contracts/parse-jobs/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['result']['text'], text)
+        self.assertIn('Page 7', response.data['result']['html'])
+        self.assertNotIn('text_path', response.data['result'])
+    
+    def test_path_outside_media_root_ignored(self):
+        """媒体目录之外的路径不读取"""
+        self.assertIsNone(FileParserService().resolve_path('../../etc/passwd'))
+    
+    def test_contract_text_from_file_refreshed_on_change(self):
+        """只有文件的合同从文件提取文本，文件变化后重新提取"""
+        contract = Contract.objects.create(
+            title='设备采购合同', contract_type='procurement',
+            file_path=self.relative_path, drafter=self.user
+        )
+        text_service = ContractTextService()
+        fresh = Contract.objects.get(id=contract.id)
+        self.assertIn('违约金', text_service.get_text(fresh))
+        self.assertEqual(ContractText.objects.get(contract=contract).source, 'file')
+        
+        self._write_docx(['设备采购合同', '第一条 保密义务', '双方应对商业秘密保密。'])
+        # 确保修改时间变化
+        stat = os.stat(os.path.join(self.media_root, self.relative_path))
+        os.utime(os.path.join(self.media_root, self.relative_path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        fresh = Contract.objects.get(id=contract.id)
+        self.assertIn('保密', text_service.get_text(fresh))
+        self.assertEqual(FileParseCache.objects.count(), 2)
+
+
 class ContractAPITest(TestCase):
     """合同API测试"""
     
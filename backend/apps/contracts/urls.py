@@ -1,11 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ContractViewSet, TemplateViewSet, UserHabitViewSet, FileUploadView
+from .views import (
+    ContractViewSet, TemplateViewSet, UserHabitViewSet, FileUploadView, ParseJobViewSet,
+    UploadSessionViewSet
+)
 
 router = DefaultRouter()
 router.register(r'contracts', ContractViewSet, basename='contract')
 router.register(r'templates', TemplateViewSet, basename='template')
 router.register(r'habits', UserHabitViewSet, basename='habit')
+router.register(r'parse-jobs', ParseJobViewSet, basename='parse-job')
+router.register(r'upload-sessions', UploadSessionViewSet, basename='upload-session')
 
 urlpatterns = [
     path('upload/', FileUploadView.as_view(), name='file-upload'),
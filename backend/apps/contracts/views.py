@@ -5,21 +5,23 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.db.models import Prefetch
 from django.utils import timezone
-from django.conf import settings
 from django.http import FileResponse, Http404
 import uuid
 import os
 from pathlib import Path
-import docx
-import fitz  # PyMuPDF
 
-from .models import Contract, ContractVersion, Template, UserHabit
+from .models import Contract, ContractVersion, ParseJob, Template, UploadSession, UserHabit
 from .serializers import (
-    ContractSerializer, ContractVersionSerializer,
-    TemplateSerializer, UserHabitSerializer
+    ContractSerializer, ContractVersionSerializer, ContractVersionListSerializer, ParseJobSerializer,
+    TemplateSerializer, UploadSessionSerializer, UserHabitSerializer
 )
 from .services import ContractService
+from .services_parser import FileParserService
+from .services_storage import ChunkOffsetError, FileStorageService, UploadSessionService, get_upload_settings
+from .services_version import ContractVersionService
+from .tasks import parse_uploaded_file
 
 
 class ContractViewSet(viewsets.ModelViewSet):
@@ -37,7 +39,9 @@ class ContractViewSet(viewsets.ModelViewSet):
         queryset = Contract.objects.filter(is_deleted=False).select_related(
             'drafter', 'template'
         ).prefetch_related(
-            'versions', 'review_tasks'
+            # 版本列表只需要元数据，不读取版本内容
+            Prefetch('versions', queryset=ContractVersion.objects.defer('content', 'content_data')),
+            'review_tasks'
         )
         return queryset
 
@@ -61,15 +65,28 @@ class ContractViewSet(viewsets.ModelViewSet):
             # 自动生成变更摘要
             change_summary = f'编辑合同内容 - {timezone.now().strftime("%Y-%m-%d %H:%M")}'
         
-        version = ContractVersion.objects.create(
+        content = request.data.get('content', contract.content)
+        file_path = request.data.get('file_path', contract.file_path)
+        version_service = ContractVersionService()
+        # 内容与当前内容相同（如自动保存）时不创建新版本
+        if version_service.is_current(contract, content, file_path):
+            return Response({
+                'message': '合同内容未变化，未创建新版本',
+                'unchanged': True,
+                'current_version': contract.current_version
+            })
+        version = version_service.create_version(
             contract=contract,
-            version=new_version,
-            content=request.data.get('content', contract.content),
-            file_path=request.data.get('file_path', contract.file_path),
+            content=content,
+            file_path=file_path,
             change_summary=change_summary,
-            changed_by=request.user
+            changed_by=request.user,
+            version=new_version
         )
         
+        # 新版本即为合同当前内容
+        contract.content = content
+        contract.file_path = version.file_path
         contract.current_version = new_version
         contract.save()
         
@@ -78,12 +95,24 @@ class ContractViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def versions(self, request, pk=None):
-        """获取合同所有版本"""
+        """获取合同所有版本（只返回版本信息，版本内容通过 version_content 获取）"""
         contract = self.get_object()
-        versions = contract.versions.filter(is_deleted=False)
-        serializer = ContractVersionSerializer(versions, many=True)
+        versions = ContractVersion.objects.filter(
+            contract_id=contract.id, is_deleted=False
+        ).defer('content', 'content_data').select_related('changed_by')
+        serializer = ContractVersionListSerializer(versions, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path=r'versions/(?P<version>\d+)')
+    def version_content(self, request, pk=None, version=None):
+        """获取合同指定版本（包含还原后的版本内容）"""
+        contract = self.get_object()
+        try:
+            version_obj = contract.versions.get(version=int(version), is_deleted=False)
+        except ContractVersion.DoesNotExist:
+            return Response({'error': f'版本 {version} 不存在'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ContractVersionSerializer(version_obj).data)
+
     @action(detail=True, methods=['post'])
     def rollback(self, request, pk=None):
         """回滚到指定版本"""
@@ -101,16 +130,15 @@ class ContractViewSet(viewsets.ModelViewSet):
             if contract.current_version == version_num:
                 return Response({'error': '该版本已经是当前版本，无需回滚'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # 保存当前内容（在回滚前）
-            old_content = contract.content
-            old_file_path = contract.file_path
-            
             # 恢复版本内容
-            contract.content = version.content
+            version_service = ContractVersionService()
+            content = version_service.resolve_content(version)
+            if version_service.is_current(contract, content, version.file_path):
+                return Response({'error': '该版本内容与当前内容相同，无需回滚'}, status=status.HTTP_400_BAD_REQUEST)
+            contract.content = content
             contract.file_path = version.file_path
-            contract.save()
             
-            # 创建回滚版本记录
+            # 创建回滚版本记录（合同在版本号更新后一次保存，避免旧版本的提取文本被覆盖）
             new_version = contract.current_version + 1
             change_summary = f'回滚到版本 {version_num}'
             if rollback_reason:
@@ -118,13 +146,13 @@ class ContractViewSet(viewsets.ModelViewSet):
             else:
                 change_summary += f'（由 {request.user.username} 于 {timezone.now().strftime("%Y-%m-%d %H:%M:%S")} 执行）'
             
-            ContractVersion.objects.create(
+            version_service.create_version(
                 contract=contract,
-                version=new_version,
-                content=version.content,
+                content=content,
                 file_path=version.file_path,
                 change_summary=change_summary,
-                changed_by=request.user
+                changed_by=request.user,
+                version=new_version
             )
             contract.current_version = new_version
             contract.save()
@@ -229,12 +257,61 @@ class UserHabitViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class FileUploadView(APIView):
-    """文件上传视图"""
+class ParseJobDispatchMixin:
+    """上传完成后创建解析任务并在后台解析"""
+
+    def _start_parse_job(self, blob, file_name, file_ext):
+        """
+        创建解析任务：同一文件已解析过时直接使用缓存的解析结果，否则在后台解析
+
+        Returns:
+            (解析任务, 是否已解析完成)
+        """
+        job = ParseJob.objects.create(
+            blob=blob,
+            file_path=blob.file_path,
+            file_name=file_name,
+            file_format=file_ext.lstrip('.'),
+            file_size=blob.file_size,
+            created_by=self.request.user
+        )
+        
+        # 同一文件已解析过时直接返回缓存的解析结果
+        parser = FileParserService()
+        cached = parser.cached_result(blob.content_hash)
+        if cached is not None:
+            parser.complete_job(job, cached)
+            return job, True
+        
+        # 在后台解析文件，Celery 不可用时同步解析
+        try:
+            celery_task = parse_uploaded_file.delay(job.id)
+            job.celery_task_id = celery_task.id
+            job.save(update_fields=['celery_task_id'])
+            return job, False
+        except Exception:
+            parse_uploaded_file(job.id)
+            job.refresh_from_db()
+            return job, True
+    
+    def _job_response(self, job):
+        """上传响应：解析完成时包含解析结果，否则客户端按job_id轮询解析进度"""
+        data = ParseJobSerializer(job).data
+        data.update({
+            'job_id': job.id,
+            'message': '文件上传成功' if job.status != 'failed' else f'文件解析失败: {job.error_message}',
+        })
+        if job.status == 'completed':
+            data['content'] = data['result']
+        return data
+
+
+class FileUploadView(ParseJobDispatchMixin, APIView):
+    """文件上传视图（CONTRACT_UPLOAD['DIRECT_UPLOAD_MAX_SIZE'] 以内的文件；更大的文件使用分片上传）"""
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        """上传文件并解析内容"""
+        """上传文件并在后台解析内容（返回解析任务，客户端轮询解析进度和结果）"""
         if 'file' not in request.FILES:
             return Response({'error': '未找到文件'}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -247,146 +324,123 @@ class FileUploadView(APIView):
             return Response({'error': '不支持的文件类型，仅支持 .doc, .docx, .pdf'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        # 验证文件大小（10MB）
-        if file.size > 10 * 1024 * 1024:
-            return Response({'error': '文件大小不能超过10MB'}, 
+        # 验证文件大小
+        max_size = get_upload_settings()['DIRECT_UPLOAD_MAX_SIZE']
+        if file.size > max_size:
+            return Response({'error': f'文件大小不能超过{max_size // (1024 * 1024)}MB，请使用分片上传'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # 保存文件
-            upload_dir = os.path.join(settings.MEDIA_ROOT, 'contracts', 'uploads')
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            file_name = f'{uuid.uuid4().hex}{file_ext}'
-            file_path = os.path.join(upload_dir, file_name)
-            
-            with open(file_path, 'wb+') as destination:
-                for chunk in file.chunks():
-                    destination.write(chunk)
-            
-            relative_path = os.path.join('contracts', 'uploads', file_name)
-            
-            # 解析文件内容
-            content = self._parse_file(file_path, file_ext)
-            
-            return Response({
-                'file_path': relative_path,
-                'content': content,
-                'message': '文件上传成功'
-            }, status=status.HTTP_200_OK)
-            
+            # 按内容哈希保存文件，相同文件只保存一份
+            blob = FileStorageService().store_upload(file, file_ext)
+            job, finished = self._start_parse_job(blob, file.name, file_ext)
+            return Response(
+                self._job_response(job),
+                status=status.HTTP_200_OK if finished else status.HTTP_202_ACCEPTED
+            )
         except Exception as e:
             return Response({'error': f'文件处理失败: {str(e)}'}, 
                           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class UploadSessionViewSet(ParseJobDispatchMixin, viewsets.GenericViewSet):
+    """
+    分片上传视图
     
-    def _parse_file(self, file_path, file_ext):
-        """解析文件内容"""
-        content = {
-            'text': '',
-            'html': '',
-            'title': '',  # 提取的标题
-            'metadata': {}
-        }
+    1. POST   upload-sessions/                    初始化（file_name, file_size, checksum 可选）
+    2. PUT    upload-sessions/{upload_id}/chunk/  上传分片，请求体为分片数据，
+              Content-Range: bytes {start}-{end}/{total}（或 ?offset=），X-Chunk-Checksum 可选
+    3. POST   upload-sessions/{upload_id}/complete/  完成上传并开始解析
+    中断后 GET upload-sessions/{upload_id}/ 获取已接收的字节数，从该位置继续上传。
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'upload_id'
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(created_by=self.request.user)
+
+    def create(self, request):
+        """初始化上传会话"""
+        try:
+            file_size = int(request.data.get('file_size') or 0)
+            session = UploadSessionService().create(
+                request.user,
+                request.data.get('file_name', ''),
+                file_size,
+                request.data.get('checksum', '')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, upload_id=None):
+        """查询上传进度（断点续传时从 received_bytes 继续）"""
+        return Response(self.get_serializer(self.get_object()).data)
+
+    def destroy(self, request, upload_id=None):
+        """取消上传"""
+        UploadSessionService().abort(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, upload_id=None):
+        """上传分片（请求体直接写入磁盘）"""
+        session = self.get_object()
+        try:
+            offset = self._chunk_offset(request)
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            session = UploadSessionService().write_chunk(
+                session, request.stream, offset, length,
+                request.META.get('HTTP_X_CHUNK_CHECKSUM', '')
+            )
+        except ChunkOffsetError as e:
+            return Response({'error': str(e), 'received_bytes': e.received_bytes},
+                          status=status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, upload_id=None):
+        """完成上传，校验文件后开始解析"""
+        session = self.get_object()
+        try:
+            blob = UploadSessionService().complete(session)
+        except ChunkOffsetError as e:
+            return Response({'error': '文件尚未上传完整', 'received_bytes': e.received_bytes},
+                          status=status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            if file_ext in ['.doc', '.docx']:
-                # 解析Word文档
-                doc = docx.Document(file_path)
-                paragraphs = [p.text for p in doc.paragraphs]
-                content['text'] = '\n'.join(paragraphs)
-                content['html'] = '<br>'.join([f'<p>{p}</p>' for p in paragraphs])
-                
-                # 提取标题：优先从文档属性，其次从第一个非空段落
-                title = ''
-                # 尝试从文档核心属性获取标题
-                try:
-                    if doc.core_properties.title:
-                        title = doc.core_properties.title.strip()
-                except:
-                    pass
-                
-                # 如果属性中没有标题，尝试从第一个段落提取
-                if not title and paragraphs:
-                    # 查找第一个非空段落作为标题候选
-                    for para in paragraphs:
-                        para_text = para.strip()
-                        if para_text and len(para_text) <= 200:  # 标题通常不会太长
-                            # 检查是否像标题（不包含太多标点，不是纯数字等）
-                            if not para_text.replace(' ', '').replace('：', '').replace(':', '').isdigit():
-                                title = para_text
-                                break
-                
-                # 如果还是没找到，使用第一个非空段落的前100个字符
-                if not title and paragraphs:
-                    for para in paragraphs:
-                        para_text = para.strip()
-                        if para_text:
-                            title = para_text[:100] if len(para_text) > 100 else para_text
-                            break
-                
-                content['title'] = title
-                content['metadata'] = {
-                    'paragraph_count': len(paragraphs),
-                    'word_count': len(content['text'].split())
-                }
-                
-            elif file_ext == '.pdf':
-                # 解析PDF文档
-                doc = fitz.open(file_path)
-                text_parts = []
-                html_parts = []
-                
-                # 提取第一页文本用于标题提取
-                first_page_text = ''
-                if len(doc) > 0:
-                    first_page = doc[0]
-                    first_page_text = first_page.get_text()
-                
-                for page_num in range(len(doc)):
-                    page = doc[page_num]
-                    text = page.get_text()
-                    text_parts.append(text)
-                    html_parts.append(f'<div class="page"><h3>第{page_num + 1}页</h3><p>{text.replace(chr(10), "<br>")}</p></div>')
-                
-                content['text'] = '\n\n'.join(text_parts)
-                content['html'] = ''.join(html_parts)
-                
-                # 从PDF提取标题
-                title = ''
-                # 尝试从元数据获取标题
-                try:
-                    metadata = doc.metadata
-                    if metadata and metadata.get('title'):
-                        title = metadata['title'].strip()
-                except:
-                    pass
-                
-                # 如果元数据中没有，从第一页文本提取
-                if not title and first_page_text:
-                    # 获取第一页的前几行作为标题候选
-                    lines = [line.strip() for line in first_page_text.split('\n') if line.strip()]
-                    if lines:
-                        # 查找第一个看起来像标题的行（长度适中，不包含太多标点）
-                        for line in lines[:5]:  # 只检查前5行
-                            if 5 <= len(line) <= 200:
-                                # 排除明显不是标题的行（如页码、日期等）
-                                if not any(keyword in line for keyword in ['第', '页', '共', '日期', 'Date']):
-                                    title = line
-                                    break
-                        
-                        # 如果还是没找到，使用第一行
-                        if not title and lines[0]:
-                            title = lines[0][:100] if len(lines[0]) > 100 else lines[0]
-                
-                content['title'] = title
-                content['metadata'] = {
-                    'page_count': len(doc),
-                    'word_count': len(content['text'].split())
-                }
-                doc.close()
-                
+            job, finished = self._start_parse_job(blob, session.file_name, f'.{session.file_format}')
         except Exception as e:
-            content['error'] = f'解析文件时出错: {str(e)}'
-        
-        return content
+            return Response({'error': f'文件处理失败: {str(e)}'},
+                          status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        UploadSession.objects.filter(id=session.id).update(parse_job=job)
+        data = self._job_response(job)
+        data['upload_id'] = str(session.upload_id)
+        return Response(data, status=status.HTTP_200_OK if finished else status.HTTP_202_ACCEPTED)
+
+    def _chunk_offset(self, request):
+        """从 Content-Range 头（bytes start-end/total）或 offset 参数读取分片偏移量"""
+        content_range = request.META.get('HTTP_CONTENT_RANGE', '')
+        if content_range:
+            try:
+                return int(content_range.split()[1].split('-')[0])
+            except (IndexError, ValueError):
+                raise ValueError('Content-Range格式不正确')
+        try:
+            return int(request.query_params.get('offset', ''))
+        except ValueError:
+            raise ValueError('缺少分片偏移量')
+
 
+class ParseJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """文件解析任务视图（查询解析进度和结果）"""
+    serializer_class = ParseJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ParseJob.objects.filter(created_by=self.request.user)
@@ -7,6 +7,7 @@ from typing import Dict, List, Optional
 from django.db.models import Q, Count, Avg
 from django.utils import timezone
 from apps.contracts.models import Contract, Template
+from apps.contracts.services_text import ContractTextService
 from apps.reviews.models import ReviewTask, ReviewResult, ReviewOpinion
 from apps.rules.models import ReviewRule
 from apps.recommendations.models import Recommendation
@@ -21,6 +22,7 @@ class RecommendationService:
     
     def __init__(self):
         self.ai_service = AIService()
+        self.text_service = ContractTextService()
     
     def recommend_clauses(
         self,
@@ -310,21 +312,15 @@ class RecommendationService:
             drafter=user,
             contract_type=contract_type,
             is_deleted=False
-        ).order_by('-created_at')[:5]
+        ).only('id', 'title', 'file_path', 'current_version').order_by('-created_at')[:5]
         
         clauses = []
-        for contract in contracts:
-            if contract.content:
-                # 从合同内容中提取常用条款（简化实现）
-                if isinstance(contract.content, dict):
-                    # 提取条款关键词
-                    pass
-                elif isinstance(contract.content, str):
-                    # 简单的文本分析
-                    if '违约责任' in contract.content:
-                        clauses.append('违约责任条款')
-                    if '付款方式' in contract.content:
-                        clauses.append('付款方式条款')
+        for text in self.text_service.get_texts(contracts).values():
+            # 从合同文本中提取常用条款（简单的文本分析）
+            if '违约责任' in text:
+                clauses.append('违约责任条款')
+            if '付款方式' in text:
+                clauses.append('付款方式条款')
         
         return list(set(clauses))  # 去重
     
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ReviewTask, ReviewResult, ReviewOpinion, ReviewCycle, ReviewFocusConfig, AIModelConfig
+from .models import ReviewTask, ReviewResult, ReviewOpinion, ReviewCycle, ReviewFocusConfig, AIModelConfig, ClauseReviewCache, ReviewerAssignment
 
 
 @admin.register(ReviewTask)
@@ -9,6 +9,14 @@ class ReviewTaskAdmin(admin.ModelAdmin):
     search_fields = ['contract__title']
 
 
+@admin.register(ReviewerAssignment)
+class ReviewerAssignmentAdmin(admin.ModelAdmin):
+    list_display = ['review_task', 'level', 'reviewer', 'created_at']
+    list_filter = ['level']
+    search_fields = ['review_task__contract__title', 'reviewer__username']
+    readonly_fields = ['review_task', 'level', 'reviewer', 'created_at']
+
+
 @admin.register(ReviewResult)
 class ReviewResultAdmin(admin.ModelAdmin):
     list_display = ['contract', 'overall_score', 'risk_level', 'risk_count', 'created_at']
@@ -63,3 +71,10 @@ class AIModelConfigAdmin(admin.ModelAdmin):
     )
     readonly_fields = ['created_at', 'updated_at']
 
+
+@admin.register(ClauseReviewCache)
+class ClauseReviewCacheAdmin(admin.ModelAdmin):
+    list_display = ['clause_title', 'clause_type', 'model_name', 'prompt_version', 'hit_count', 'last_used_at', 'created_at']
+    list_filter = ['model_name', 'prompt_version', 'clause_type']
+    search_fields = ['clause_hash', 'clause_title']
+    readonly_fields = ['clause_hash', 'created_at', 'last_used_at']
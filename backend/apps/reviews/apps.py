@@ -6,3 +6,5 @@ class ReviewsConfig(AppConfig):
     name = 'apps.reviews'
     verbose_name = '合同审核'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,39 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_add_progress_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewtask',
+            name='review_mode',
+            field=models.CharField(choices=[('full', '全文审核'), ('clause_cache', '条款级审核（复用条款审核结果）')], default='full', help_text='条款级审核只将没有缓存结果的条款发送给大模型', max_length=20, verbose_name='AI审核方式'),
+        ),
+        migrations.CreateModel(
+            name='ClauseReviewCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clause_hash', models.CharField(max_length=64, verbose_name='条款哈希')),
+                ('model_name', models.CharField(max_length=100, verbose_name='模型')),
+                ('prompt_version', models.IntegerField(default=1, verbose_name='提示词版本')),
+                ('clause_type', models.CharField(blank=True, max_length=50, verbose_name='条款类型')),
+                ('clause_title', models.CharField(blank=True, max_length=500, verbose_name='条款标题')),
+                ('result', models.JSONField(help_text='{"score": 0-100, "risks": [...], "suggestions": [...]}', verbose_name='审核结果')),
+                ('hit_count', models.IntegerField(default=0, verbose_name='命中次数')),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, verbose_name='最近使用时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '条款审核缓存',
+                'verbose_name_plural': '条款审核缓存',
+                'db_table': 'reviews_clause_review_cache',
+                'unique_together': {('clause_hash', 'model_name', 'prompt_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_alter_reviewtask_review_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reviewtask',
+            name='review_mode',
+            field=models.CharField(choices=[('full', '全文审核'), ('clause_cache', '条款级审核（复用条款审核结果）'), ('template_diff', '模板差异审核（只审核与模板不同的条款）'), ('incremental', '增量复审（只审核与上一轮审核版本不同的条款）')], default='full', help_text='条款级审核只将没有缓存结果的条款发送给大模型；模板差异审核只审核与所用模板不同的条款；增量复审沿用上一轮审核结果，只审核修改过的条款', max_length=20, verbose_name='AI审核方式'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_alter_reviewtask_review_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewresult',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='AI审核时合同内容的哈希，内容相同的审核请求直接复用该结果', max_length=64, verbose_name='审核内容哈希'),
+        ),
+    ]
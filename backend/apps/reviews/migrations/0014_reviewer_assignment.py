@@ -0,0 +1,62 @@
+# Generated manually
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+REVIEWER_LEVELS = ('level1', 'level2', 'level3')
+
+
+def fill_reviewer_assignments(apps, schema_editor):
+    """按已有审核任务的 reviewer_assignments 生成审核员分配记录"""
+    ReviewTask = apps.get_model('reviews', 'ReviewTask')
+    ReviewerAssignment = apps.get_model('reviews', 'ReviewerAssignment')
+    User = apps.get_model('users', 'User')
+    user_ids = set(User.objects.values_list('id', flat=True))
+
+    rows = []
+    tasks = ReviewTask.objects.filter(reviewer_assignments__isnull=False).only('id', 'reviewer_assignments')
+    for task in tasks.iterator(chunk_size=500):
+        if not isinstance(task.reviewer_assignments, dict):
+            continue
+        for level, reviewer_id in task.reviewer_assignments.items():
+            try:
+                reviewer_id = int(reviewer_id)
+            except (TypeError, ValueError):
+                continue
+            if level in REVIEWER_LEVELS and reviewer_id in user_ids:
+                rows.append(ReviewerAssignment(review_task_id=task.id, level=level, reviewer_id=reviewer_id))
+        if len(rows) >= 500:
+            ReviewerAssignment.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    if rows:
+        ReviewerAssignment.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reviews', '0013_reviewresult_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewerAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('level1', '一级审核员'), ('level2', '二级审核员'), ('level3', '三级审核员（高级）')], max_length=20, verbose_name='审核层级')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('review_task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='reviews.reviewtask', verbose_name='审核任务')),
+                ('reviewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_assignments', to=settings.AUTH_USER_MODEL, verbose_name='审核员')),
+            ],
+            options={
+                'verbose_name': '审核员分配',
+                'verbose_name_plural': '审核员分配',
+                'db_table': 'reviews_reviewer_assignment',
+                'unique_together': {('review_task', 'level')},
+                'indexes': [models.Index(fields=['reviewer', 'level', 'review_task'], name='reviews_assign_reviewer_idx')],
+            },
+        ),
+        migrations.RunPython(fill_reviewer_assignments, migrations.RunPython.noop),
+    ]
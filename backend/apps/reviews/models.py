@@ -15,6 +15,13 @@ class ReviewTask(models.Model):
         ('manual', '人工审核'),
     ]
     
+    REVIEW_MODE_CHOICES = [
+        ('full', '全文审核'),
+        ('clause_cache', '条款级审核（复用条款审核结果）'),
+        ('template_diff', '模板差异审核（只审核与模板不同的条款）'),
+        ('incremental', '增量复审（只审核与上一轮审核版本不同的条款）'),
+    ]
+    
     STATUS_CHOICES = [
         ('pending', '待处理'),
         ('ai_processing', 'AI审核中'),
@@ -27,6 +34,13 @@ class ReviewTask(models.Model):
     contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='review_tasks', verbose_name='合同')
     contract_version = models.IntegerField(null=True, blank=True, verbose_name='合同版本号')
     task_type = models.CharField(max_length=50, choices=TASK_TYPE_CHOICES, default='auto', verbose_name='任务类型')
+    review_mode = models.CharField(
+        max_length=20,
+        choices=REVIEW_MODE_CHOICES,
+        default='full',
+        verbose_name='AI审核方式',
+        help_text='条款级审核只将没有缓存结果的条款发送给大模型；模板差异审核只审核与所用模板不同的条款；增量复审沿用上一轮审核结果，只审核修改过的条款'
+    )
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
     priority = models.IntegerField(default=0, verbose_name='优先级')
     reviewer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='review_tasks', verbose_name='审核员')
@@ -78,6 +92,34 @@ class ReviewTask(models.Model):
         return f'{self.contract.title} - {self.get_status_display()}'
 
 
+class ReviewerAssignment(models.Model):
+    """审核员分配表 - 与审核任务的 reviewer_assignments 保持同步，按审核员查询分配的任务"""
+    review_task = models.ForeignKey(ReviewTask, on_delete=models.CASCADE, related_name='assignments', verbose_name='审核任务')
+    level = models.CharField(
+        max_length=20,
+        choices=[
+            ('level1', '一级审核员'),
+            ('level2', '二级审核员'),
+            ('level3', '三级审核员（高级）'),
+        ],
+        verbose_name='审核层级'
+    )
+    reviewer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='review_assignments', verbose_name='审核员')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'reviews_reviewer_assignment'
+        verbose_name = '审核员分配'
+        verbose_name_plural = '审核员分配'
+        unique_together = [['review_task', 'level']]
+        indexes = [
+            models.Index(fields=['reviewer', 'level', 'review_task'], name='reviews_assign_reviewer_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.review_task_id} - {self.get_level_display()} - {self.reviewer_id}'
+
+
 class ReviewResult(models.Model):
     """审核结果表"""
     RISK_LEVEL_CHOICES = [
@@ -95,6 +137,7 @@ class ReviewResult(models.Model):
     report_path = models.CharField(max_length=500, blank=True, verbose_name='报告文件路径')
     report_format = models.CharField(max_length=20, blank=True, verbose_name='报告格式')
     review_data = models.JSONField(null=True, blank=True, verbose_name='详细审核数据')
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='审核内容哈希', help_text='AI审核时合同内容的哈希，内容相同的审核请求直接复用该结果')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
 
     class Meta:
@@ -267,3 +310,25 @@ class AIModelConfig(models.Model):
         if self.is_default:
             AIModelConfig.objects.filter(is_default=True).exclude(pk=self.pk).update(is_default=False)
         super().save(*args, **kwargs)
+
+
+class ClauseReviewCache(models.Model):
+    """条款审核结果缓存表 - 按规范化条款文本的哈希缓存大模型对单个条款的审核结果"""
+    clause_hash = models.CharField(max_length=64, verbose_name='条款哈希')
+    model_name = models.CharField(max_length=100, verbose_name='模型')
+    prompt_version = models.IntegerField(default=1, verbose_name='提示词版本')
+    clause_type = models.CharField(max_length=50, blank=True, verbose_name='条款类型')
+    clause_title = models.CharField(max_length=500, blank=True, verbose_name='条款标题')
+    result = models.JSONField(verbose_name='审核结果', help_text='{"score": 0-100, "risks": [...], "suggestions": [...]}')
+    hit_count = models.IntegerField(default=0, verbose_name='命中次数')
+    last_used_at = models.DateTimeField(auto_now_add=True, verbose_name='最近使用时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'reviews_clause_review_cache'
+        verbose_name = '条款审核缓存'
+        verbose_name_plural = '条款审核缓存'
+        unique_together = [['clause_hash', 'model_name', 'prompt_version']]
+
+    def __str__(self):
+        return f'{self.clause_title or self.clause_hash[:12]} ({self.model_name})'
@@ -37,7 +37,7 @@ class ReviewTaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReviewTask
         fields = ['id', 'contract', 'contract_title', 'contract_version',
-                  'status', 'priority', 'reviewer', 'reviewer_name', 'reviewer_level',
+                  'status', 'priority', 'review_mode', 'reviewer', 'reviewer_name', 'reviewer_level',
                   'review_levels', 'reviewer_assignments', 'reviewer_assignments_detail', 'celery_task_id', 
                   'progress', 'started_at', 'completed_at',
                   'error_message', 'created_by', 'created_by_name', 'result',
@@ -8,6 +8,7 @@ from django.conf import settings
 from django.utils import timezone
 from apps.reviews.models import ReviewFocusConfig, ReviewTask, ReviewResult, ReviewOpinion
 from apps.contracts.models import Contract
+from apps.contracts.services_text import ContractTextService
 from apps.users.models import User
 
 try:
@@ -555,6 +556,7 @@ class ReviewService:
     
     def __init__(self):
         self.ai_service = AIService()
+        self.text_service = ContractTextService()
     
     def generate_ai_suggestions_for_reviewer(
         self,
@@ -593,7 +595,7 @@ class ReviewService:
             }
         
         # 获取合同内容
-        contract_content = self._extract_contract_content(contract)
+        contract_content = self.text_service.get_text(contract) or '合同内容'
         
         # 调用AI生成建议
         suggestions = self.ai_service.generate_review_suggestions(
@@ -618,22 +620,6 @@ class ReviewService:
             'suggestions': suggestions
         }
     
-    def _extract_contract_content(self, contract: Contract) -> str:
-        """提取合同内容为文本"""
-        if contract.content:
-            # 如果content是JSON，转换为文本
-            if isinstance(contract.content, dict):
-                return json.dumps(contract.content, ensure_ascii=False, indent=2)
-            elif isinstance(contract.content, str):
-                return contract.content
-        
-        # 如果有文件，可以读取文件内容
-        if contract.file_path:
-            # TODO: 实现文件内容读取
-            pass
-        
-        return contract.title or "合同内容"
-    
     def _save_ai_suggestions(
         self,
         review_task: ReviewTask,
@@ -0,0 +1,66 @@
+"""
+审核员分配服务模块 - 将审核任务的 reviewer_assignments（JSON）同步到审核员分配表
+
+reviewer_assignments 仍是分配的来源（创建、编辑任务时写入），分配表按 (审核员, 层级) 建索引，
+审核员查询分配给自己的任务时只需一次索引查询。
+"""
+import logging
+from typing import Dict
+
+from apps.reviews.models import ReviewTask, ReviewerAssignment
+from apps.users.models import User
+
+logger = logging.getLogger(__name__)
+
+REVIEWER_LEVELS = ('level1', 'level2', 'level3')
+
+
+class ReviewerAssignmentService:
+    """审核员分配服务类"""
+
+    def parse(self, assignments) -> Dict[str, int]:
+        """
+        解析 reviewer_assignments，忽略无效的层级和审核员
+
+        Returns:
+            {层级: 审核员id}
+        """
+        if not isinstance(assignments, dict):
+            return {}
+        parsed = {}
+        for level, reviewer_id in assignments.items():
+            try:
+                reviewer_id = int(reviewer_id)
+            except (TypeError, ValueError):
+                continue
+            if level in REVIEWER_LEVELS:
+                parsed[level] = reviewer_id
+        existing = set(User.objects.filter(id__in=set(parsed.values())).values_list('id', flat=True))
+        return {level: reviewer_id for level, reviewer_id in parsed.items() if reviewer_id in existing}
+
+    def sync(self, task: ReviewTask):
+        """按审核任务的 reviewer_assignments 更新分配记录（只写入有变化的层级）"""
+        desired = self.parse(task.reviewer_assignments)
+        current = {
+            assignment.level: assignment
+            for assignment in ReviewerAssignment.objects.filter(review_task_id=task.id)
+        }
+        stale = [
+            assignment.id for level, assignment in current.items()
+            if desired.get(level) != assignment.reviewer_id
+        ]
+        if stale:
+            ReviewerAssignment.objects.filter(id__in=stale).delete()
+        created = [
+            ReviewerAssignment(review_task_id=task.id, level=level, reviewer_id=reviewer_id)
+            for level, reviewer_id in desired.items()
+            if level not in current or current[level].reviewer_id != reviewer_id
+        ]
+        if created:
+            ReviewerAssignment.objects.bulk_create(created)
+        if stale or created:
+            logger.info(f'审核员分配已更新 - 任务ID: {task.id}, 分配: {desired}')
+
+    def assigned_task_ids(self, user: User, level: str):
+        """分配给审核员（在其层级上）的任务id子查询"""
+        return ReviewerAssignment.objects.filter(reviewer=user, level=level).values('review_task_id')
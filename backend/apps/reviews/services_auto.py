@@ -3,16 +3,30 @@
 """
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from typing import Dict, Optional, List
+from django.db import connection
 from django.utils import timezone
 from apps.contracts.models import Contract
+from apps.contracts.services_text import ContractTextService
+from apps.contracts.services_version import ContractVersionService
 from apps.reviews.models import ReviewTask, ReviewResult, ReviewOpinion
-from apps.rules.services import RuleEngineService
+from apps.rules.models import RuleMatch
+from apps.rules.services import RuleEngineService, get_ruleset_version
 from apps.reviews.services import AIService
+from apps.reviews.services_clause_cache import ClauseReviewService
+from apps.reviews.services_incremental import IncrementalReviewService
+from apps.reviews.services_template_diff import TemplateDiffReviewService
 from apps.reviews.services_report import ReportGeneratorService
 
 logger = logging.getLogger(__name__)
 
+# AI调用返回后等待规则引擎扫描完成的最长时间（秒）
+RULE_SCAN_WAIT_TIMEOUT = 60
+
+# 审核结果可以复用的审核任务状态（AI审核已完成）
+REUSABLE_TASK_STATUSES = ('ai_completed', 'manual_reviewing', 'completed')
+
 
 class AutoReviewService:
     """自动审核服务类 - 处理质检中心的自动审核流程"""
@@ -20,6 +34,7 @@ class AutoReviewService:
     def __init__(self):
         self.rule_engine = RuleEngineService()
         self.ai_service = AIService()
+        self.text_service = ContractTextService()
     
     def _update_progress(self, review_task: ReviewTask, step: str, progress: int, message: str = None):
         """更新审核进度"""
@@ -58,13 +73,22 @@ class AutoReviewService:
         Returns:
             Dict: 审核结果
         """
+        rule_scan_future = None
         try:
+            # 合同内容已审核过时直接复用已有的审核结果
+            content_hash = ContractVersionService().current_hash(contract)
+            reused = self._reuse_review_result(contract, review_task, content_hash)
+            if reused:
+                return reused
+            
             # 注意：状态更新由调用方（tasks.py）负责，这里不再重复更新
             logger.info(f'[步骤1/6] 开始快速AI审核 - 合同ID: {contract.id}, 任务ID: {review_task.id}')
             self._update_progress(review_task, '提取合同内容', 10, '正在提取合同内容...')
             
             # 快速审核：直接调用大模型一次性完成所有审核任务
-            contract_content = self._extract_contract_content(contract)
+            # 文本在主线程中提取（必要时保存提取结果），规则扫描线程直接使用
+            full_content = self.text_service.get_text(contract)
+            contract_content = full_content or '合同内容'
             
             # 限制合同内容长度，加快处理速度（最多8000字符）
             if len(contract_content) > 8000:
@@ -74,8 +98,14 @@ class AutoReviewService:
             logger.info(f'[步骤2/6] 构建审核提示词 - 合同ID: {contract.id}')
             self._update_progress(review_task, '构建审核提示词', 30, '正在构建AI审核提示词...')
             
-            # 构建简化的综合审核提示词（减少token数量）
-            prompt = self._build_comprehensive_review_prompt(contract, contract_content)
+            # 条款级审核按条款构建提示词，只发送没有缓存结果的条款；模板差异审核只发送与模板不同的条款；
+            # 增量复审只发送与上一轮审核版本不同的条款
+            review_mode = review_task.review_mode
+            if review_mode == 'template_diff' and not contract.template_id:
+                logger.info(f'[步骤2/6] 合同未使用模板，改为全文审核 - 合同ID: {contract.id}')
+                review_mode = 'full'
+            clause_mode = review_mode in ('clause_cache', 'template_diff', 'incremental')
+            prompt = None if clause_mode else self._build_comprehensive_review_prompt(contract, contract_content)
             
             # 调用AI接口进行一次性审核（设置更长的超时时间）
             if not self.ai_service.enabled or not self.ai_service.model:
@@ -86,11 +116,23 @@ class AutoReviewService:
             logger.info(f'[步骤3/6] 调用AI模型进行审核 - 合同ID: {contract.id}, 模型: {self.ai_service.model}')
             self._update_progress(review_task, '调用AI模型审核', 50, f'正在调用AI大模型({self.ai_service.model})进行审核，请稍候...')
             
+            # 规则引擎扫描与AI调用并行执行，不增加整体耗时
+            rule_scan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rule-scan')
+            rule_scan_future = rule_scan_executor.submit(self._run_rule_scan, contract, review_task, full_content)
+            rule_scan_executor.shutdown(wait=False)
+            
             # 临时增加超时时间到120秒
             original_timeout = self.ai_service.timeout
             self.ai_service.timeout = 120
             try:
-                ai_review_result = self.ai_service._call_ai_api(prompt)
+                if review_mode == 'template_diff':
+                    ai_review_result = TemplateDiffReviewService(self.ai_service).review(contract)
+                elif review_mode == 'incremental':
+                    ai_review_result = IncrementalReviewService(self.ai_service).review(contract, review_task)
+                elif clause_mode:
+                    ai_review_result = ClauseReviewService(self.ai_service).review(contract)
+                else:
+                    ai_review_result = self.ai_service._call_ai_api(prompt)
                 
                 # 检查返回结果是否包含错误信息
                 if isinstance(ai_review_result, dict) and ai_review_result.get('error'):
@@ -131,10 +173,8 @@ class AutoReviewService:
                         'summary': ai_review_result[:200]
                     }
             
-            # 跳过规则引擎扫描以加快速度（可选，如果规则引擎很快可以保留）
-            # 如果需要规则扫描，可以异步执行或使用快速模式
-            rule_scan_result = {'matches': [], 'overall_score': 85}
-            logger.info(f'[步骤5/6] 跳过规则引擎扫描以加快审核速度 - 合同ID: {contract.id}')
+            # 获取并行执行的规则引擎扫描结果
+            rule_scan_result = self._collect_rule_scan_result(rule_scan_future, contract, review_task)
             
             logger.info(f'[步骤5/6] 转换审核结果格式 - 合同ID: {contract.id}')
             self._update_progress(review_task, '转换审核结果格式', 90, '正在转换审核结果为标准格式...')
@@ -153,7 +193,8 @@ class AutoReviewService:
             review_result = self._save_review_result(
                 review_task=review_task,
                 contract=contract,
-                report_data=report_data
+                report_data=report_data,
+                content_hash=content_hash
             )
             
             # 保存审核意见
@@ -163,6 +204,11 @@ class AutoReviewService:
                 contract=contract,
                 suggestions=suggestions
             )
+            incremental_review = ai_review_result.get('incremental_review')
+            if incremental_review and incremental_review.get('carried_opinions'):
+                IncrementalReviewService(self.ai_service).carry_forward_opinions(
+                    review_result, incremental_review['carried_opinions']
+                )
             
             logger.info(f'[完成] 快速AI审核完成 - 合同ID: {contract.id}, 结果ID: {review_result.id}')
             self._update_progress(review_task, '审核完成', 100, 'AI审核已完成！')
@@ -178,6 +224,7 @@ class AutoReviewService:
             
         except Exception as e:
             logger.error(f'自动审核失败: {str(e)}')
+            self._discard_rule_scan(rule_scan_future)
             review_task.status = 'failed'
             review_task.error_message = str(e)
             review_task.completed_at = timezone.now()
@@ -188,11 +235,142 @@ class AutoReviewService:
                 'error': str(e)
             }
     
+    def _reuse_review_result(self, contract: Contract, review_task: ReviewTask, content_hash: str) -> Optional[Dict]:
+        """
+        复用合同相同内容已有的AI审核结果（审核数据、AI生成的审核意见和规则匹配记录）
+
+        只复用按当前规则集版本扫描的结果（规则变更后的重新扫描会同步更新已有结果的规则扫描版本），
+        规则集变化后重新审核。
+
+        Returns:
+            Dict: 与审核完成时相同格式的返回值；没有可复用的结果时返回 None
+        """
+        previous = ReviewResult.objects.filter(
+            contract_id=contract.id,
+            content_hash=content_hash,
+            review_task__status__in=REUSABLE_TASK_STATUSES,
+            review_data__detailed_data__rule_scan_result__ruleset_version=get_ruleset_version()
+        ).exclude(review_task_id=review_task.id).order_by('-created_at').first()
+        if previous is None:
+            return None
+        
+        review_data = dict(previous.review_data or {})
+        # 各层级的AI建议按本次任务的审核层级重新生成
+        review_data.pop('level_suggestions', None)
+        review_data['reused_from'] = {
+            'review_task_id': previous.review_task_id,
+            'review_result_id': previous.id,
+        }
+        review_result, _ = ReviewResult.objects.update_or_create(
+            review_task=review_task,
+            defaults={
+                'contract': contract,
+                'overall_score': previous.overall_score,
+                'risk_level': previous.risk_level,
+                'risk_count': previous.risk_count,
+                'summary': previous.summary,
+                'review_data': review_data,
+                'content_hash': content_hash,
+            }
+        )
+        # 只复制自动审核生成的意见（没有审核人），审核员的意见在本次人工审核中重新给出
+        opinions = [
+            ReviewOpinion(
+                review_result=review_result,
+                clause_id=opinion.clause_id,
+                clause_content=opinion.clause_content,
+                opinion_type=opinion.opinion_type,
+                risk_level=opinion.risk_level,
+                opinion_content=opinion.opinion_content,
+                legal_basis=opinion.legal_basis,
+                suggestion=opinion.suggestion,
+                status=opinion.status,
+            )
+            for opinion in previous.opinions.filter(reviewer__isnull=True, is_deleted=False)
+        ]
+        ReviewOpinion.objects.bulk_create(opinions, batch_size=200)
+        RuleMatch.objects.filter(review_task=review_task).delete()
+        RuleMatch.objects.bulk_create([
+            RuleMatch(
+                review_task=review_task,
+                rule_id=rule_match.rule_id,
+                contract_id=rule_match.contract_id,
+                matched_clause=rule_match.matched_clause,
+                match_score=rule_match.match_score,
+                match_result=rule_match.match_result,
+            )
+            for rule_match in RuleMatch.objects.filter(review_task_id=previous.review_task_id)
+        ], batch_size=200)
+        
+        logger.info(
+            f'[完成] 合同内容未变化，复用已有审核结果 - 合同ID: {contract.id}, '
+            f'任务ID: {review_task.id}, 复用任务ID: {previous.review_task_id}'
+        )
+        self._update_progress(review_task, '审核完成', 100, '合同内容已审核过，已复用已有的审核结果')
+        risk_overview = review_data.get('risk_overview', {})
+        return {
+            'success': True,
+            'review_result_id': review_result.id,
+            'overall_score': risk_overview.get('overall_score', previous.overall_score),
+            'risk_level': previous.risk_level,
+            'risk_count': previous.risk_count,
+            'suggestions_count': len(opinions),
+            'reused_from': previous.review_task_id
+        }
+    
+    def _run_rule_scan(self, contract: Contract, review_task: ReviewTask, contract_content: Optional[str] = None) -> Dict:
+        """
+        在工作线程中执行规则引擎扫描
+
+        合同文本由主线程提取后传入，线程内不创建合同文本和条款记录（条款位置只读取，缺失时在内存中切分）；
+        唯一的写入是规则统计的定期刷新，使用原子更新并对并发创建去重。
+        匹配记录由 _collect_rule_scan_result 在扫描按时完成后保存：
+        超时或AI审核失败时线程可能仍在运行，不能再为该任务写入匹配记录。
+        """
+        try:
+            return self.rule_engine.scan_contract(
+                contract, review_task, save_matches=False, contract_content=contract_content
+            )
+        finally:
+            # 线程内创建的数据库连接需要显式关闭
+            connection.close()
+    
+    def _collect_rule_scan_result(self, rule_scan_future, contract: Contract, review_task: ReviewTask) -> Dict:
+        """等待并获取规则引擎扫描结果并保存匹配记录，失败或超时时返回空结果"""
+        empty_result = {'success': False, 'matches': [], 'overall_score': 100, 'risk_level': 'low'}
+        try:
+            rule_scan_result = rule_scan_future.result(timeout=RULE_SCAN_WAIT_TIMEOUT)
+        except FutureTimeoutError:
+            logger.warning(f'[步骤5/6] 规则引擎扫描超时，本次审核不包含规则结果 - 合同ID: {contract.id}')
+            return empty_result
+        except Exception as e:
+            logger.error(f'[步骤5/6] 规则引擎扫描异常: {str(e)} - 合同ID: {contract.id}')
+            return empty_result
+        
+        if not rule_scan_result.get('success', False):
+            logger.warning(f'[步骤5/6] 规则引擎扫描失败: {rule_scan_result.get("error")} - 合同ID: {contract.id}')
+            return empty_result
+        
+        self.rule_engine.save_pending_matches(review_task, rule_scan_result)
+        logger.info(f'[步骤5/6] 规则引擎扫描完成，匹配{rule_scan_result.get("total_matches", 0)}条规则 - 合同ID: {contract.id}')
+        return rule_scan_result
+    
+    def _discard_rule_scan(self, rule_scan_future):
+        """审核失败时丢弃并行的规则引擎扫描：尚未开始则取消，已在运行则等待结束（结果不保存）"""
+        if rule_scan_future is None or rule_scan_future.cancel():
+            return
+        wait([rule_scan_future], timeout=RULE_SCAN_WAIT_TIMEOUT)
+    
+    def _max_risk_level(self, *levels: str) -> str:
+        """返回多个风险等级中最高的一个"""
+        order = {'low': 0, 'medium': 1, 'high': 2}
+        return max(levels, key=lambda level: order.get(level, 0))
+    
     def _ai_semantic_analysis(self, contract: Contract) -> Dict:
         """大模型语义理解"""
         try:
             # 提取合同内容
-            contract_content = self._extract_contract_content(contract)
+            contract_content = self.text_service.get_text(contract) or '合同内容'
             
             # 构建提示词
             prompt = f"""
@@ -241,7 +419,7 @@ class AutoReviewService:
     def _identify_clauses(self, contract: Contract, ai_analysis: Dict) -> Dict:
         """条款识别"""
         try:
-            contract_content = self._extract_contract_content(contract)
+            contract_content = self.text_service.get_text(contract) or '合同内容'
             
             # 使用AI识别关键条款
             prompt = f"""
@@ -318,7 +496,7 @@ class AutoReviewService:
         
         # 使用AI进行风险分析
         try:
-            contract_content = self._extract_contract_content(contract)
+            contract_content = self.text_service.get_text(contract) or '合同内容'
             prompt = f"""
 请对以下合同进行风险识别：
 
@@ -436,7 +614,7 @@ class AutoReviewService:
         for match in rule_scan_result.get('matches', []):
             suggestions.append({
                 'type': 'rule_suggestion',
-                'priority': 'high' if match.get('risk_level') == 'high' else 'medium',
+                'priority': 'high' if match.get('risk_level_code', match.get('risk_level')) == 'high' else 'medium',
                 'clause': match.get('matched_clause', ''),
                 'suggestion': match.get('suggestion', ''),
                 'legal_basis': match.get('legal_basis', '')
@@ -505,7 +683,8 @@ class AutoReviewService:
         self,
         review_task: ReviewTask,
         contract: Contract,
-        report_data: Dict
+        report_data: Dict,
+        content_hash: str = ''
     ) -> ReviewResult:
         """保存审核结果并自动生成报告"""
         risk_overview = report_data.get('risk_overview', {})
@@ -518,7 +697,8 @@ class AutoReviewService:
                 'risk_level': risk_overview.get('risk_level', 'low'),
                 'risk_count': risk_overview.get('risk_count', 0),
                 'summary': f"自动审核完成，发现{risk_overview.get('risk_count', 0)}个风险点",
-                'review_data': report_data
+                'review_data': report_data,
+                'content_hash': content_hash
             }
         )
         
@@ -528,6 +708,7 @@ class AutoReviewService:
             review_result.risk_count = risk_overview.get('risk_count', 0)
             review_result.summary = f"自动审核完成，发现{risk_overview.get('risk_count', 0)}个风险点"
             review_result.review_data = report_data
+            review_result.content_hash = content_hash
             review_result.save()
         
         # 跳过Word报告生成以加快速度（可以后续异步生成）
@@ -550,9 +731,11 @@ class AutoReviewService:
             return
         
         for suggestion in suggestions:
+            # 增量复审沿用的意见直接从上一轮复制（保留处理状态）
+            if suggestion.get('carried_forward'):
+                continue
             ReviewOpinion.objects.create(
                 review_result=review_result,
-                contract=contract,
                 opinion_type='suggestion',
                 risk_level=suggestion.get('priority', 'medium'),
                 opinion_content=suggestion.get('suggestion', ''),
@@ -707,6 +890,24 @@ class AutoReviewService:
         overall_score = ai_result.get('overall_score', clause_scoring.get('average_score', 85))
         risk_level = risk_quantification.get('overall_risk_level', 'low')
         risk_count = risk_identification.get('total_count', 0)
+        high_risk_count = risk_quantification.get('high_risk_count', 0)
+        medium_risk_count = risk_quantification.get('medium_risk_count', 0)
+        low_risk_count = risk_quantification.get('low_risk_count', 0)
+        
+        # 合并规则引擎的确定性结果：规则建议排在AI建议之前
+        rule_matches = rule_scan_result.get('matches', [])
+        rule_suggestions = self._generate_suggestions(rule_scan_result, {'risks': []}, {})
+        suggestions = rule_suggestions + list(suggestions)
+        for match in rule_matches:
+            match_level = match.get('risk_level_code') or 'low'
+            if match_level == 'high':
+                high_risk_count += 1
+            elif match_level == 'medium':
+                medium_risk_count += 1
+            else:
+                low_risk_count += 1
+        risk_count += len(rule_matches)
+        risk_level = self._max_risk_level(risk_level, rule_scan_result.get('risk_level', 'low'))
         
         # 构建报告数据
         report_data = {
@@ -720,12 +921,18 @@ class AutoReviewService:
                 'overall_score': overall_score,
                 'risk_level': risk_level,
                 'risk_count': risk_count,
-                'high_risk_count': risk_quantification.get('high_risk_count', 0),
-                'medium_risk_count': risk_quantification.get('medium_risk_count', 0),
-                'low_risk_count': risk_quantification.get('low_risk_count', 0)
+                'high_risk_count': high_risk_count,
+                'medium_risk_count': medium_risk_count,
+                'low_risk_count': low_risk_count,
+                'rule_score': rule_scan_result.get('overall_score', 100),
+                'rule_match_count': len(rule_matches)
             },
             'modification_suggestions': suggestions,
             'legal_basis': [
+                match.get('legal_basis', '')
+                for match in rule_matches
+                if match.get('legal_basis')
+            ] + [
                 risk.get('legal_basis', '')
                 for risk in risk_identification.get('risks', [])
                 if risk.get('legal_basis')
@@ -736,7 +943,10 @@ class AutoReviewService:
                 'clause_identification_result': clause_identification,
                 'risk_identification_result': risk_identification,
                 'risk_quantification_result': risk_quantification,
-                'scoring_result': clause_scoring
+                'scoring_result': clause_scoring,
+                'clause_cache': ai_result.get('clause_cache'),
+                'template_diff': ai_result.get('template_diff'),
+                'incremental_review': ai_result.get('incremental_review')
             }
         }
         
@@ -806,18 +1016,3 @@ class AutoReviewService:
             'overall_score': 85,
             'summary': f'{contract.title}合同审核完成，发现1个中等风险点，总体评分85分'
         }
-    
-    def _extract_contract_content(self, contract: Contract) -> str:
-        """提取合同内容为文本"""
-        if contract.content:
-            if isinstance(contract.content, dict):
-                return json.dumps(contract.content, ensure_ascii=False, indent=2)
-            elif isinstance(contract.content, str):
-                return contract.content
-        
-        if contract.file_path:
-            # TODO: 实现文件内容读取
-            pass
-        
-        return contract.title or "合同内容"
-
@@ -0,0 +1,381 @@
+"""
+条款级审核服务模块 - 按条款缓存大模型的审核结果，同一模板起草的合同只需审核有变化的条款
+
+条款文本规范化（去掉条款编号和空白、统一全角半角）后与合同类型一起计算哈希，
+审核结果按 (条款哈希, 模型, 提示词版本) 缓存。审核时只把没有缓存结果的条款分批发送给大模型，
+再将缓存结果与新结果合并为与全文审核相同格式的结果。
+
+条款级审核只能发现条款本身的问题，缺少条款等全文层面的问题由规则引擎负责。
+"""
+import hashlib
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from apps.clauses.models import ContractClause
+from apps.clauses.services import ClauseService, normalize_clause_text
+from apps.contracts.models import Contract
+from apps.reviews.models import ClauseReviewCache
+
+logger = logging.getLogger(__name__)
+
+# 修改条款审核提示词或结果格式时递增，旧版本的缓存结果不再使用
+PROMPT_VERSION = 1
+
+DEFAULT_CLAUSE_REVIEW_SETTINGS = {
+    'BATCH_CHARS': 6000,  # 每次调用大模型发送的条款文本总长度上限
+    'MAX_CLAUSE_CHARS': 3000,  # 单个条款发送给大模型的最大长度（超出部分截断）
+}
+
+RISK_LEVELS = ('high', 'medium', 'low')
+RISK_WEIGHTS = {'high': 10, 'medium': 5, 'low': 1}
+
+
+def get_clause_review_settings() -> Dict:
+    """获取条款级审核配置"""
+    config = dict(DEFAULT_CLAUSE_REVIEW_SETTINGS)
+    config.update(getattr(settings, 'REVIEW_CLAUSE_CACHE', {}))
+    return config
+
+
+class ClauseReviewService:
+    """条款级审核服务类"""
+
+    def __init__(self, ai_service, config: Optional[Dict] = None):
+        self.ai_service = ai_service
+        self.config = config or get_clause_review_settings()
+        self.clause_service = ClauseService()
+
+    def clause_hash(self, clause_text: str, contract_type: str = '', context: str = '') -> str:
+        """
+        条款哈希：合同类型相同、规范化后的条款文本相同的条款共享审核结果
+
+        附带参考信息审核的结果与参考信息相关（如上一轮的问题是否已解决），参考信息计入哈希，
+        不与普通的条款审核结果共享。
+        """
+        normalized = normalize_clause_text(clause_text)
+        raw = f'{contract_type}\n{normalized}'
+        if context:
+            raw += f'\n{context}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def review(self, contract: Contract) -> Dict:
+        """
+        按条款审核合同
+
+        Returns:
+            Dict: 与全文审核相同格式的审核结果，clause_cache 中记录缓存命中情况
+        """
+        results, stats = self.review_clauses(contract, self.clause_service.get_clauses(contract))
+        return self.assemble(results, stats)
+
+    def review_clauses(
+        self,
+        contract: Contract,
+        clauses: List[ContractClause],
+        context: Optional[Dict[int, str]] = None
+    ) -> Tuple[List[Tuple[ContractClause, Dict]], Dict]:
+        """
+        审核指定的条款（有缓存结果的条款不调用大模型）
+
+        Args:
+            context: 随条款发送给大模型的参考信息 {条款id: 文字}（如修改前的条款和上一轮审核意见）
+
+        Returns:
+            ([(条款, 审核结果), ...], 缓存命中统计)
+        """
+        context = context or {}
+        entries = []  # [(条款, 条款哈希), ...]
+        for clause in clauses:
+            if normalize_clause_text(clause.clause_content):
+                entries.append((clause, self.clause_hash(
+                    clause.clause_content, contract.contract_type, context.get(clause.id, '')
+                )))
+
+        hashes = {clause_hash for _, clause_hash in entries}
+        cached = {
+            row.clause_hash: row
+            for row in ClauseReviewCache.objects.filter(
+                clause_hash__in=hashes,
+                model_name=self.ai_service.model,
+                prompt_version=PROMPT_VERSION
+            )
+        }
+        if cached:
+            ClauseReviewCache.objects.filter(id__in=[row.id for row in cached.values()]).update(
+                hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+            )
+
+        # 同一合同中重复的条款只审核一次
+        pending = {}
+        for clause, clause_hash in entries:
+            if clause_hash not in cached and clause_hash not in pending:
+                pending[clause_hash] = clause
+        fresh = {}
+        batches = self._batches(list(pending.items()))
+        for batch in batches:
+            fresh.update(self._review_batch(contract, batch, context))
+        self._save_results(pending, fresh)
+
+        results = []
+        for clause, clause_hash in entries:
+            if clause_hash in cached:
+                results.append((clause, cached[clause_hash].result))
+            elif clause_hash in fresh:
+                results.append((clause, fresh[clause_hash]))
+
+        stats = {
+            'clause_count': len(entries),
+            'cached_count': sum(1 for _, clause_hash in entries if clause_hash in cached),
+            'reviewed_count': len(pending),
+            'ai_call_count': len(batches),
+            'prompt_version': PROMPT_VERSION,
+        }
+        logger.info(
+            f'条款级审核完成 - 合同ID: {contract.id}, 条款: {stats["clause_count"]}, '
+            f'复用缓存: {stats["cached_count"]}, 大模型审核: {stats["reviewed_count"]}, '
+            f'调用次数: {stats["ai_call_count"]}'
+        )
+        return results, stats
+
+    def _batches(self, pending: List[Tuple[str, ContractClause]]) -> List[List[Tuple[str, ContractClause]]]:
+        """按文本长度将待审核条款分批"""
+        batches = []
+        batch = []
+        batch_chars = 0
+        for clause_hash, clause in pending:
+            length = min(len(clause.clause_content), self.config['MAX_CLAUSE_CHARS'])
+            if batch and batch_chars + length > self.config['BATCH_CHARS']:
+                batches.append(batch)
+                batch = []
+                batch_chars = 0
+            batch.append((clause_hash, clause))
+            batch_chars += length
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _build_prompt(
+        self,
+        contract: Contract,
+        batch: List[Tuple[str, ContractClause]],
+        context: Optional[Dict[int, str]] = None
+    ) -> str:
+        """构建条款审核提示词，条款以 [C1]、[C2] 标记，参考信息附在条款之后"""
+        max_chars = self.config['MAX_CLAUSE_CHARS']
+        blocks = []
+        for index, (_, clause) in enumerate(batch, start=1):
+            block = f'[C{index}]\n{clause.clause_content.strip()[:max_chars]}'
+            if context and context.get(clause.id):
+                block += f'\n（参考，不需要审核）{context[clause.id][:max_chars]}'
+            blocks.append(block)
+        clause_blocks = '\n\n'.join(blocks)
+        return f"""你是一位资深的合同审核专家。以下是一份{contract.get_contract_type_display()}中的若干条款，请逐条独立审核每个条款本身的问题（不要评价合同是否缺少其他条款）。
+
+【条款】
+{clause_blocks}
+
+【审核要求】
+1. 风险：合法性、合规性、财务、履约等方面的风险，风险等级为 high/medium/low
+2. 评分：条款的完整性、明确性、公平性（0-100分）
+3. 建议：针对风险提供具体、可操作的修改建议和法律依据
+
+【输出格式要求】
+请严格按照以下JSON格式返回，每个条款一项（clause_index 为条款标记中的数字），只返回JSON，不要其他文字：
+
+{{
+    "clauses": [
+        {{
+            "clause_index": 1,
+            "score": 分数（0-100）,
+            "comments": "评分依据和评语",
+            "risks": [
+                {{
+                    "type": "legality/compliance/financial/performance/other",
+                    "level": "high/medium/low",
+                    "description": "风险描述",
+                    "legal_basis": "法律依据或标准依据"
+                }}
+            ],
+            "suggestions": [
+                {{
+                    "priority": "high/medium/low",
+                    "suggestion": "具体的修改建议",
+                    "legal_basis": "法律依据或标准依据"
+                }}
+            ]
+        }}
+    ]
+}}"""
+
+    def _review_batch(
+        self,
+        contract: Contract,
+        batch: List[Tuple[str, ContractClause]],
+        context: Optional[Dict[int, str]] = None
+    ) -> Dict[str, Dict]:
+        """调用大模型审核一批条款，返回 {条款哈希: 审核结果}"""
+        response = self.ai_service._call_ai_api(self._build_prompt(contract, batch, context))
+        if isinstance(response, str):
+            try:
+                response = json.loads(response)
+            except json.JSONDecodeError:
+                response = None
+        if isinstance(response, dict) and response.get('error'):
+            raise Exception(f"AI调用返回错误: {response.get('error')}")
+        if not isinstance(response, dict) or not isinstance(response.get('clauses'), list):
+            raise Exception('AI返回的条款审核结果格式不正确')
+
+        results = {}
+        for item in response['clauses']:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get('clause_index')) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < len(batch):
+                results[batch[index][0]] = self._normalize_result(item)
+        if len(results) < len(batch):
+            # 遗漏的条款不写入缓存，下次审核时重新发送
+            logger.warning(
+                f'AI未返回部分条款的审核结果 - 合同ID: {contract.id}, '
+                f'发送: {len(batch)}, 返回: {len(results)}'
+            )
+        return results
+
+    def _normalize_result(self, item: Dict) -> Dict:
+        """只保留需要缓存的字段，统一字段类型"""
+        try:
+            score = max(0, min(100, int(float(item.get('score', 100)))))
+        except (TypeError, ValueError):
+            score = 100
+        risks = []
+        for risk in item.get('risks') or []:
+            if isinstance(risk, dict) and risk.get('description'):
+                level = risk.get('level') if risk.get('level') in RISK_LEVELS else 'low'
+                risks.append({
+                    'type': risk.get('type') or 'other',
+                    'level': level,
+                    'description': str(risk['description']),
+                    'legal_basis': str(risk.get('legal_basis') or ''),
+                })
+        suggestions = []
+        for suggestion in item.get('suggestions') or []:
+            if isinstance(suggestion, dict) and suggestion.get('suggestion'):
+                priority = suggestion.get('priority') if suggestion.get('priority') in RISK_LEVELS else 'medium'
+                suggestions.append({
+                    'priority': priority,
+                    'suggestion': str(suggestion['suggestion']),
+                    'legal_basis': str(suggestion.get('legal_basis') or ''),
+                })
+        return {
+            'score': score,
+            'comments': str(item.get('comments') or ''),
+            'risks': risks,
+            'suggestions': suggestions,
+        }
+
+    def _save_results(self, pending: Dict[str, ContractClause], fresh: Dict[str, Dict]):
+        """保存新的条款审核结果（并发审核同一条款时保留先写入的结果）"""
+        rows = [
+            ClauseReviewCache(
+                clause_hash=clause_hash,
+                model_name=self.ai_service.model,
+                prompt_version=PROMPT_VERSION,
+                clause_type=pending[clause_hash].clause_type,
+                clause_title=pending[clause_hash].clause_title[:500],
+                result=result,
+            )
+            for clause_hash, result in fresh.items()
+        ]
+        if rows:
+            ClauseReviewCache.objects.bulk_create(rows, batch_size=200, ignore_conflicts=True)
+
+    def clause_label(self, clause: ContractClause) -> str:
+        label = f'{clause.clause_no} {clause.clause_title}'.strip()
+        return label or clause.clause_content.strip()[:30]
+
+    def assemble(
+        self,
+        results: List[Tuple[ContractClause, Dict]],
+        stats: Dict,
+        extra_risks: Optional[List[Dict]] = None,
+        summary: str = ''
+    ) -> Dict:
+        """
+        将各条款的审核结果合并为全文审核的结果格式
+
+        Args:
+            extra_risks: 不属于单个条款的风险（如删除了模板条款）
+            summary: 审核摘要（默认按缓存命中情况生成）
+        """
+        risks = list(extra_risks or [])
+        suggestions = []
+        clause_scores = []
+        for clause, result in results:
+            label = self.clause_label(clause)
+            for risk in result.get('risks', []):
+                risks.append(dict(risk, clause=label))
+            for suggestion in result.get('suggestions', []):
+                suggestions.append(dict(
+                    suggestion,
+                    type='risk_suggestion',
+                    clause=label,
+                ))
+            clause_scores.append({
+                'clause_type': clause.get_clause_type_display(),
+                'clause_content': label,
+                'score': result.get('score', 100),
+                'comments': result.get('comments', ''),
+                'pre_approved': result.get('pre_approved', False),
+            })
+
+        counts = {level: sum(1 for risk in risks if risk['level'] == level) for level in RISK_LEVELS}
+        if counts['high']:
+            overall_risk_level = 'high'
+        elif counts['medium']:
+            overall_risk_level = 'medium'
+        else:
+            overall_risk_level = 'low'
+        average_score = (
+            round(sum(item['score'] for item in clause_scores) / len(clause_scores))
+            if clause_scores else 100
+        )
+        summary = summary or (
+            f'条款级审核：共{stats["clause_count"]}个条款，{stats["cached_count"]}个复用已有审核结果，'
+            f'{stats["reviewed_count"]}个由大模型审核；发现{len(risks)}个风险点'
+            f'（高风险{counts["high"]}个，中风险{counts["medium"]}个，低风险{counts["low"]}个）。'
+        )
+
+        return {
+            'semantic_analysis': {'summary': summary},
+            'clause_identification': {
+                'clauses': [self.clause_label(clause) for clause, _ in results],
+            },
+            'risk_identification': {
+                'risks': risks,
+                'total_count': len(risks),
+                'high_count': counts['high'],
+                'medium_count': counts['medium'],
+                'low_count': counts['low'],
+            },
+            'risk_quantification': {
+                'risk_score': sum(RISK_WEIGHTS[risk['level']] for risk in risks),
+                'overall_risk_level': overall_risk_level,
+                'high_risk_count': counts['high'],
+                'medium_risk_count': counts['medium'],
+                'low_risk_count': counts['low'],
+            },
+            'clause_scoring': {
+                'clause_scores': clause_scores,
+                'average_score': average_score,
+            },
+            'suggestions': suggestions,
+            'overall_score': average_score,
+            'summary': summary,
+            'clause_cache': stats,
+        }
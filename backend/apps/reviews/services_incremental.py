@@ -0,0 +1,287 @@
+"""
+增量复审服务模块 - 起草人根据审核意见修改后重新提交时，只审核与上一轮审核版本不同的条款
+
+新版本条款与上一轮审核的版本按规范化文本对齐：
+    未变化的条款              沿用上一轮的风险、评分和审核意见（意见的处理状态一并保留）
+    修改或新增的条款          按条款级审核发送给大模型，修改的条款附带修改前的内容和上一轮的意见
+    删除的条款                上一轮针对该条款的风险和意见不再保留
+
+无法定位到条款的上一轮结论（如合同整体层面的问题）继续保留；规则引擎仍扫描全文。
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from apps.clauses.models import ContractClause
+from apps.clauses.services import ClauseAligner, ClauseSegment, ClauseSegmenter, normalize_clause_text
+from apps.contracts.models import Contract
+from apps.contracts.services_text import ContractTextService
+from apps.reviews.models import ReviewOpinion, ReviewResult, ReviewTask
+from apps.reviews.services_clause_cache import ClauseReviewService
+
+logger = logging.getLogger(__name__)
+
+# 可以作为复审基准的审核任务状态（AI审核已完成）
+BASE_TASK_STATUSES = ('ai_completed', 'manual_reviewing', 'completed')
+
+# 条款引用按文本包含关系定位时，引用文本的最短长度（过短的引用容易误匹配）
+MIN_REFERENCE_CHARS = 4
+
+CARRIED_COMMENTS = '与上一轮审核的版本相同，沿用上一轮审核结果'
+
+
+class IncrementalReviewService:
+    """增量复审服务类"""
+
+    def __init__(self, ai_service):
+        self.clause_review = ClauseReviewService(ai_service)
+        self.text_service = ContractTextService()
+        self.segmenter = ClauseSegmenter()
+        self.aligner = ClauseAligner()
+
+    def get_base_task(self, contract: Contract, review_task: ReviewTask) -> Optional[ReviewTask]:
+        """上一轮已完成AI审核的任务（按合同版本取最新的一轮）"""
+        return ReviewTask.objects.filter(
+            contract_id=contract.id,
+            status__in=BASE_TASK_STATUSES,
+            contract_version__isnull=False,
+            contract_version__lte=contract.current_version,
+            result__isnull=False,
+        ).exclude(id=review_task.id).select_related('result').order_by(
+            '-contract_version', '-created_at'
+        ).first()
+
+    def review(self, contract: Contract, review_task: ReviewTask) -> Dict:
+        """
+        对比上一轮审核的版本，只审核修改和新增的条款
+
+        Returns:
+            Dict: 与全文审核相同格式的审核结果，incremental_review 中记录对比情况和沿用的审核意见；
+                  没有上一轮审核结果时按条款级审核全部条款
+        """
+        base_task = self.get_base_task(contract, review_task)
+        if base_task is None:
+            logger.info(f'没有上一轮审核结果，改为条款级审核 - 合同ID: {contract.id}')
+            return self.clause_review.review(contract)
+
+        base_result = base_task.result
+        base_version = base_task.contract_version
+        try:
+            base_text = self.text_service.get_version_text(contract, base_version)
+        except ValueError as e:
+            logger.warning(f'上一轮审核的版本文本不可用，改为条款级审核 - 合同ID: {contract.id}, 错误: {str(e)}')
+            return self.clause_review.review(contract)
+        base_segments = self.segmenter.segment(base_text)
+        base_keys = [normalize_clause_text(base_text[s.start:s.end]) for s in base_segments]
+        clauses = self.clause_review.clause_service.get_clauses(contract)
+        operations = self.aligner.align(
+            [(segment.title, key) for segment, key in zip(base_segments, base_keys)],
+            [(clause.clause_title, normalize_clause_text(clause.clause_content)) for clause in clauses]
+        )
+
+        # 上一轮条款序号 -> (操作, 新版本条款)
+        base_mapping = {}
+        changed = []
+        modified_from = {}  # {修改的条款id: 上一轮条款序号}
+        for operation, b_index, c_index in operations:
+            clause = clauses[c_index] if c_index is not None else None
+            if b_index is not None:
+                base_mapping[b_index] = (operation, clause)
+            if operation in ('modified', 'added') and normalize_clause_text(clause.clause_content):
+                changed.append(clause)
+                if operation == 'modified':
+                    modified_from[clause.id] = b_index
+        deleted = [
+            base_segments[b_index] for b_index, (operation, _) in base_mapping.items()
+            if operation == 'deleted' and base_keys[b_index]
+        ]
+
+        review_data = base_result.review_data or {}
+        detailed_data = review_data.get('detailed_data') or {}
+        base_risks = (detailed_data.get('risk_identification_result') or {}).get('risks') or []
+        base_scores = (detailed_data.get('scoring_result') or {}).get('clause_scores') or []
+        opinions = list(ReviewOpinion.objects.filter(review_result=base_result, is_deleted=False))
+
+        locate = self._locator(base_text, base_segments)
+        carried_risks, stale_risks = self._partition(
+            base_risks, lambda risk: risk.get('clause', ''), locate, base_mapping
+        )
+        carried_opinions, stale_opinions = self._partition(
+            opinions, lambda opinion: opinion.clause_content, locate, base_mapping
+        )
+        located_scores, _ = self._partition(
+            base_scores, lambda item: item.get('clause_content', ''), locate, base_mapping
+        )
+
+        # 修改的条款附带修改前的内容和上一轮针对该条款的意见，便于判断问题是否已解决
+        context = {}
+        for clause_id, b_index in modified_from.items():
+            segment = base_segments[b_index]
+            issues = [risk.get('description', '') for risk in stale_risks.get(b_index, [])]
+            issues += [opinion.opinion_content for opinion in stale_opinions.get(b_index, [])]
+            lines = [f'修改前：{base_text[segment.start:segment.end].strip()}']
+            if issues:
+                lines.append('上一轮审核意见：' + '；'.join(issue for issue in issues if issue))
+            context[clause_id] = '\n'.join(lines)
+
+        reviewed, stats = self.clause_review.review_clauses(contract, changed, context=context)
+        reviewed_by_id = {clause.id: result for clause, result in reviewed}
+        base_score = self._score(base_result.overall_score, 100)
+
+        results = []
+        extra_risks = [dict(risk) for risk in carried_risks.get(None, [])]
+        for b_index, (operation, clause) in sorted(base_mapping.items()):
+            if operation != 'equal':
+                continue
+            scores = [self._score(item.get('score'), base_score) for item in located_scores.get(b_index, [])]
+            results.append((clause, {
+                'score': round(sum(scores) / len(scores)) if scores else base_score,
+                'comments': CARRIED_COMMENTS,
+                'risks': [
+                    {key: value for key, value in risk.items() if key != 'clause'}
+                    for risk in carried_risks.get(b_index, [])
+                ],
+                'suggestions': [],
+                'pre_approved': True,
+            }))
+        results.extend((clause, reviewed_by_id[clause.id]) for clause in changed if clause.id in reviewed_by_id)
+        order = {clause.id: index for index, clause in enumerate(clauses)}
+        results.sort(key=lambda item: order[item[0].id])
+
+        # 沿用的审核意见复制到本轮审核结果（保留处理状态），不再由建议重新生成
+        labels = self._labels(base_mapping)
+        carried = []
+        for b_index, items in carried_opinions.items():
+            for opinion in items:
+                carried.append({
+                    'opinion_id': opinion.id,
+                    'clause': labels.get(b_index, opinion.clause_content),
+                })
+
+        unchanged_count = sum(1 for operation, _ in base_mapping.values() if operation == 'equal')
+        dropped_count = (
+            sum(len(items) for key, items in stale_risks.items() if key is not None)
+            + sum(len(items) for key, items in stale_opinions.items() if key is not None)
+        )
+        stats.update({
+            'base_task_id': base_task.id,
+            'base_version': base_version,
+            'unchanged_count': unchanged_count,
+            'changed_count': len(changed),
+            'deleted_count': len(deleted),
+        })
+        summary = (
+            f'增量复审（对比第{base_version}版的审核结果）：共{len(clauses)}个条款，'
+            f'{unchanged_count}个未变化沿用上一轮结果，{len(changed)}个修改或新增的条款已重新审核'
+            f'（其中{stats["cached_count"]}个复用已有审核结果），删除条款{len(deleted)}个；'
+            f'沿用上一轮审核意见{len(carried)}条。'
+        )
+        logger.info(
+            f'增量复审 - 合同ID: {contract.id}, 基准版本: {base_version}, 未变化: {unchanged_count}, '
+            f'重新审核: {len(changed)}, 删除: {len(deleted)}, 沿用意见: {len(carried)}'
+        )
+
+        result = self.clause_review.assemble(results, stats, extra_risks=extra_risks, summary=summary)
+        result['suggestions'].extend(
+            {
+                'priority': opinion.risk_level or 'medium',
+                'type': 'risk_suggestion' if opinion.opinion_type == 'risk' else 'improvement_suggestion',
+                'clause': labels.get(b_index, opinion.clause_content),
+                'suggestion': opinion.suggestion or opinion.opinion_content,
+                'legal_basis': opinion.legal_basis,
+                'carried_forward': True,
+            }
+            for b_index, items in carried_opinions.items()
+            for opinion in items
+        )
+        result['incremental_review'] = {
+            'base_task_id': base_task.id,
+            'base_version': base_version,
+            'version': contract.current_version,
+            'changed_clauses': [self.clause_review.clause_label(clause) for clause in changed],
+            'deleted_clauses': [f'{segment.clause_no} {segment.title}'.strip() for segment in deleted],
+            'carried_risk_count': sum(len(items) for items in carried_risks.values()),
+            'carried_opinions': carried,
+            'dropped_finding_count': dropped_count,
+        }
+        return result
+
+    def carry_forward_opinions(self, review_result: ReviewResult, carried: List[Dict]) -> int:
+        """将沿用的上一轮审核意见复制到本轮审核结果"""
+        opinions = ReviewOpinion.objects.in_bulk([item['opinion_id'] for item in carried])
+        rows = []
+        for item in carried:
+            opinion = opinions.get(item['opinion_id'])
+            if opinion is None:
+                continue
+            rows.append(ReviewOpinion(
+                review_result=review_result,
+                reviewer_id=opinion.reviewer_id,
+                clause_id=opinion.clause_id,
+                clause_content=item['clause'],
+                opinion_type=opinion.opinion_type,
+                risk_level=opinion.risk_level,
+                opinion_content=opinion.opinion_content,
+                legal_basis=opinion.legal_basis,
+                suggestion=opinion.suggestion,
+                status=opinion.status,
+            ))
+        ReviewOpinion.objects.bulk_create(rows, batch_size=200)
+        return len(rows)
+
+    def _locator(self, base_text: str, base_segments: List[ClauseSegment]):
+        """按条款引用（条款编号标题或条款原文片段）定位上一轮版本中的条款，返回条款序号"""
+        labels = {}
+        for index, segment in enumerate(base_segments):
+            label = f'{segment.clause_no} {segment.title}'.strip()
+            if label:
+                labels.setdefault(label, index)
+        contents = [normalize_clause_text(base_text[s.start:s.end]) for s in base_segments]
+
+        def locate(reference: str) -> Optional[int]:
+            reference = (reference or '').strip()
+            if not reference:
+                return None
+            if reference in labels:
+                return labels[reference]
+            normalized = normalize_clause_text(reference)
+            if len(normalized) >= MIN_REFERENCE_CHARS:
+                for index, content in enumerate(contents):
+                    if normalized in content:
+                        return index
+            for index, segment in enumerate(base_segments):
+                if segment.title and segment.title in reference:
+                    return index
+            return None
+
+        return locate
+
+    def _partition(self, items, reference, locate, base_mapping) -> Tuple[Dict, Dict]:
+        """
+        按上一轮结论所在条款的变化情况分组
+
+        Returns:
+            (仍然有效的 {条款序号: [...]}, 条款已修改或删除的 {条款序号: [...]})，
+            无法定位条款的结论以 None 为键归入仍然有效的一组
+        """
+        valid, stale = {}, {}
+        for item in items:
+            b_index = locate(reference(item))
+            if b_index is None or base_mapping.get(b_index, ('deleted', None))[0] == 'equal':
+                valid.setdefault(b_index, []).append(item)
+            else:
+                stale.setdefault(b_index, []).append(item)
+        return valid, stale
+
+    def _labels(self, base_mapping: Dict[int, Tuple[str, Optional[ContractClause]]]) -> Dict[int, str]:
+        """未变化条款在新版本中的名称（条款编号可能变化）"""
+        return {
+            b_index: self.clause_review.clause_label(clause)
+            for b_index, (operation, clause) in base_mapping.items()
+            if operation == 'equal'
+        }
+
+    def _score(self, value, default: int) -> int:
+        try:
+            return max(0, min(100, int(float(value))))
+        except (TypeError, ValueError):
+            return default
@@ -6,8 +6,9 @@ import logging
 from typing import Dict, List, Optional
 from django.utils import timezone
 from django.db.models import Q
-from apps.contracts.models import Contract, ContractVersion
-from apps.reviews.models import ReviewTask, ReviewOpinion, ReviewResult
+from apps.contracts.models import Contract
+from apps.contracts.services_version import ContractVersionService
+from apps.reviews.models import ReviewTask, ReviewOpinion
 from apps.users.models import User
 
 logger = logging.getLogger(__name__)
@@ -47,25 +48,20 @@ class ReviewOpinionLoopService:
             }
             
             all_opinions = []
-            for task in review_tasks:
-                # 通过review_result获取opinions
-                try:
-                    review_result = task.result
-                    opinions = ReviewOpinion.objects.filter(
-                        review_result=review_result,
-                        contract=contract
-                    )
-                except ReviewResult.DoesNotExist:
-                    continue
-                
-                for opinion in opinions:
-                    level = task.reviewer_level or 'unknown'
-                    if level in opinions_by_level:
-                        opinions_by_level[level].append(opinion)
-                    all_opinions.append(opinion)
-                    # 设置opinion的review_task引用（用于后续查询）
-                    if not hasattr(opinion, '_review_task'):
-                        opinion._review_task = task
+            tasks_by_id = {task.id: task for task in review_tasks}
+            # 一次查询取出所有任务审核结果下的意见（ReviewOpinion 通过 review_result 关联合同）
+            opinions = ReviewOpinion.objects.filter(
+                review_result__review_task_id__in=list(tasks_by_id),
+                is_deleted=False
+            ).select_related('review_result').order_by('created_at')
+            for opinion in opinions:
+                task = tasks_by_id[opinion.review_result.review_task_id]
+                level = task.reviewer_level or 'unknown'
+                if level in opinions_by_level:
+                    opinions_by_level[level].append(opinion)
+                all_opinions.append(opinion)
+                # 设置opinion的review_task引用（用于后续查询）
+                opinion._review_task = task
             
             # 生成汇总表
             summary_table = self._generate_summary_table(
@@ -111,7 +107,7 @@ class ReviewOpinionLoopService:
                     'id': op.id,
                     'type': op.get_opinion_type_display(),
                     'risk_level': op.get_risk_level_display() if op.risk_level else '未设置',
-                    'content': op.content,
+                    'content': op.opinion_content,
                     'clause': op.clause_content,
                     'suggestion': op.suggestion,
                     'legal_basis': op.legal_basis,
@@ -124,7 +120,7 @@ class ReviewOpinionLoopService:
                     'id': op.id,
                     'type': op.get_opinion_type_display(),
                     'risk_level': op.get_risk_level_display() if op.risk_level else '未设置',
-                    'content': op.content,
+                    'content': op.opinion_content,
                     'clause': op.clause_content,
                     'suggestion': op.suggestion,
                     'legal_basis': op.legal_basis,
@@ -137,7 +133,7 @@ class ReviewOpinionLoopService:
                     'id': op.id,
                     'type': op.get_opinion_type_display(),
                     'risk_level': op.get_risk_level_display() if op.risk_level else '未设置',
-                    'content': op.content,
+                    'content': op.opinion_content,
                     'clause': op.clause_content,
                     'suggestion': op.suggestion,
                     'legal_basis': op.legal_basis,
@@ -166,7 +162,7 @@ class ReviewOpinionLoopService:
                 'medium_risk_count': sum(1 for op in all_opinions if op.risk_level == 'medium'),
                 'low_risk_count': sum(1 for op in all_opinions if op.risk_level == 'low'),
                 'pending_count': sum(1 for op in all_opinions if op.status == 'pending'),
-                'processed_count': sum(1 for op in all_opinions if op.status == 'processed')
+                'processed_count': sum(1 for op in all_opinions if op.status in ('accepted', 'rejected'))
             }
         }
         
@@ -230,27 +226,35 @@ class ReviewOpinionLoopService:
             Dict: 提交结果
         """
         try:
-            # 创建新版本
-            new_version = contract.current_version + 1
-            version = ContractVersion.objects.create(
-                contract=contract,
-                version=new_version,
-                content=contract.content,
-                file_path=contract.file_path,
-                change_summary=change_summary or '根据审核意见修改后重新提交',
-                changed_by=modified_by
-            )
-            
-            contract.current_version = new_version
+            # 创建新版本（合同内容与最新版本相同时不创建，审核时直接复用已有的审核结果）
+            version_service = ContractVersionService()
+            if version_service.is_versioned(contract):
+                new_version = contract.current_version
+            else:
+                new_version = contract.current_version + 1
+                version_service.create_version(
+                    contract=contract,
+                    content=contract.content,
+                    file_path=contract.file_path,
+                    change_summary=change_summary or '根据审核意见修改后重新提交',
+                    changed_by=modified_by,
+                    version=new_version
+                )
+                contract.current_version = new_version
             contract.status = 'reviewing'
             contract.save()
             
-            # 创建新的审核任务
+            # 创建新的审核任务：沿用上一轮的审核层级和审核员，AI审核只审核修改过的条款
+            previous_task = ReviewTask.objects.filter(contract=contract).order_by('-created_at').first()
             review_task = ReviewTask.objects.create(
                 contract=contract,
                 contract_version=new_version,
                 task_type='auto',  # 或根据配置决定
+                review_mode='incremental',
                 status='pending',
+                priority=previous_task.priority if previous_task else 0,
+                review_levels=previous_task.review_levels if previous_task else None,
+                reviewer_assignments=previous_task.reviewer_assignments if previous_task else None,
                 created_by=modified_by
             )
             
@@ -0,0 +1,146 @@
+"""
+模板差异审核服务模块 - 合同基于模板起草时，只审核与模板不同的条款
+
+合同条款与模板条款按规范化文本（去掉条款编号和空白、统一全角半角）对齐：
+    与模板条款相同            视为已审核（模板已审批），不发送给大模型
+    新增或修改的条款          按条款级审核发送给大模型（复用条款审核缓存）
+    删除的模板条款            直接作为风险点列出
+
+规则引擎仍扫描全文：未变化条款复用按条款缓存的匹配结果，缺少条款等规则需要全文判断。
+"""
+import logging
+from typing import Dict, List
+
+from apps.clauses.models import ContractClause
+from apps.clauses.services import ClauseAligner, ClauseSegmenter, normalize_clause_text
+from apps.contracts.models import Contract, Template
+from apps.reviews.services_clause_cache import ClauseReviewService
+
+logger = logging.getLogger(__name__)
+
+PRE_APPROVED_RESULT = {
+    'score': 100,
+    'comments': '与模板条款一致，视为已审核',
+    'risks': [],
+    'suggestions': [],
+    'pre_approved': True,
+}
+
+
+class TemplateAlignment:
+    """合同条款与模板条款的对齐结果"""
+
+    def __init__(self):
+        self.unchanged = []  # 与模板相同的合同条款
+        self.changed = []  # 新增或修改的合同条款
+        self.modified_from = {}  # {修改的合同条款id: 对应的模板条款文本}
+        self.removed = []  # 合同中删除的模板条款 [(编号, 标题), ...]
+
+
+class TemplateDiffService:
+    """合同与模板的条款对齐服务类"""
+
+    def __init__(self):
+        self.segmenter = ClauseSegmenter()
+        self.aligner = ClauseAligner()
+
+    def align(self, clauses: List[ContractClause], template: Template) -> TemplateAlignment:
+        """按条款对齐合同与模板（条款数量很少，对齐耗时可忽略）"""
+        template_text = template.content or ''
+        template_segments = self.segmenter.segment(template_text)
+        template_keys = [
+            normalize_clause_text(template_text[segment.start:segment.end]) for segment in template_segments
+        ]
+        operations = self.aligner.align(
+            [(segment.title, key) for segment, key in zip(template_segments, template_keys)],
+            [(clause.clause_title, normalize_clause_text(clause.clause_content)) for clause in clauses]
+        )
+
+        alignment = TemplateAlignment()
+        for operation, t_index, c_index in operations:
+            if operation == 'equal':
+                alignment.unchanged.append(clauses[c_index])
+            elif operation == 'deleted':
+                # 只有编号的空白条款删除时不提示
+                if template_keys[t_index]:
+                    segment = template_segments[t_index]
+                    alignment.removed.append((segment.clause_no, segment.title))
+            elif normalize_clause_text(clauses[c_index].clause_content):
+                alignment.changed.append(clauses[c_index])
+                if operation == 'modified':
+                    segment = template_segments[t_index]
+                    alignment.modified_from[clauses[c_index].id] = template_text[segment.start:segment.end]
+        return alignment
+
+
+class TemplateDiffReviewService:
+    """模板差异审核服务类"""
+
+    def __init__(self, ai_service):
+        self.clause_review = ClauseReviewService(ai_service)
+        self.diff_service = TemplateDiffService()
+
+    def review(self, contract: Contract) -> Dict:
+        """
+        只审核与模板不同的条款
+
+        Returns:
+            Dict: 与全文审核相同格式的审核结果，template_diff 中记录对齐情况，
+                  与模板一致的条款在 clause_scoring 中标记为 pre_approved
+        """
+        template = contract.template
+        clauses = self.clause_review.clause_service.get_clauses(contract)
+        alignment = self.diff_service.align(clauses, template)
+
+        reviewed, stats = self.clause_review.review_clauses(contract, alignment.changed)
+        reviewed_by_id = {clause.id: result for clause, result in reviewed}
+        unchanged_ids = {clause.id for clause in alignment.unchanged}
+        results = []
+        for clause in clauses:
+            if clause.id in reviewed_by_id:
+                results.append((clause, reviewed_by_id[clause.id]))
+            elif clause.id in unchanged_ids:
+                results.append((clause, PRE_APPROVED_RESULT))
+
+        removed_risks = [
+            {
+                'type': 'completeness',
+                'level': 'medium',
+                'description': f'删除了模板中的条款“{f"{clause_no} {title}".strip()}”，请确认删除原因',
+                'legal_basis': '',
+                'clause': f'{clause_no} {title}'.strip(),
+            }
+            for clause_no, title in alignment.removed
+        ]
+        stats.update({
+            'template_id': template.id,
+            'template_name': template.name,
+            'unchanged_count': len(alignment.unchanged),
+            'changed_count': len(alignment.changed),
+            'removed_count': len(alignment.removed),
+        })
+        summary = (
+            f'模板差异审核（模板：{template.name}）：共{len(clauses)}个条款，'
+            f'{len(alignment.unchanged)}个与模板一致视为已审核，{len(alignment.changed)}个新增或修改的条款已审核'
+            f'（其中{stats["cached_count"]}个复用已有审核结果），删除模板条款{len(alignment.removed)}个。'
+        )
+        logger.info(
+            f'模板差异审核 - 合同ID: {contract.id}, 模板ID: {template.id}, '
+            f'一致: {len(alignment.unchanged)}, 变化: {len(alignment.changed)}, 删除: {len(alignment.removed)}'
+        )
+
+        result = self.clause_review.assemble(results, stats, extra_risks=removed_risks, summary=summary)
+        result['template_diff'] = {
+            'template_id': template.id,
+            'template_name': template.name,
+            'pre_approved_clauses': [self.clause_review.clause_label(clause) for clause in alignment.unchanged],
+            'changed_clauses': [
+                {
+                    'clause': self.clause_review.clause_label(clause),
+                    'template_content': alignment.modified_from.get(clause.id, ''),
+                }
+                for clause in alignment.changed
+            ],
+            'removed_clauses': [f'{clause_no} {title}'.strip() for clause_no, title in alignment.removed],
+        }
+        return result
@@ -0,0 +1,20 @@
+"""
+审核信号处理 - 审核任务保存后同步审核员分配表
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import ReviewTask
+from .services_assignment import ReviewerAssignmentService
+
+
+@receiver(post_save, sender=ReviewTask)
+def sync_reviewer_assignments(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """审核任务保存后同步审核员分配（只更新进度、状态等其他字段时跳过）"""
+    if raw:
+        return
+    if update_fields is not None and 'reviewer_assignments' not in update_fields:
+        return
+    if created and not instance.reviewer_assignments:
+        return
+    ReviewerAssignmentService().sync(instance)
@@ -1,12 +1,24 @@
 """
 审核模块单元测试
 """
+import re
+import threading
+import time
+from concurrent.futures import Future
+from unittest import mock
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
-from apps.contracts.models import Contract
-from apps.reviews.models import ReviewTask, ReviewResult, ReviewOpinion
+from apps.contracts.models import Contract, Template
+from apps.reviews.models import ReviewTask, ReviewResult, ReviewOpinion, ReviewerAssignment, ClauseReviewCache
+from apps.reviews.services import AIService
+from apps.reviews.services_auto import AutoReviewService
+from apps.reviews.services_clause_cache import ClauseReviewService
+from apps.reviews.services_incremental import IncrementalReviewService
+from apps.reviews.services_template_diff import TemplateDiffReviewService
+from apps.rules.models import ReviewRule, RuleMatch
+from apps.rules.services import bump_ruleset_version, get_ruleset_version
 
 User = get_user_model()
 
@@ -112,4 +124,286 @@ class ReviewAPITest(TestCase):
         response = self.client.post(f'/api/reviews/tasks/{task.id}/start/')
         # 注意：实际启动可能需要Celery，这里只测试API调用
         self.assertIn(response.status_code, [status.HTTP_200_OK, status.HTTP_202_ACCEPTED])
+    
+    def test_reviewer_sees_only_assigned_tasks(self):
+        """审核员只看到在其层级上分配给自己的任务，修改分配后同步更新"""
+        reviewer = User.objects.create_user(
+            username='reviewer1', email='reviewer1@example.com', password='testpass123',
+            role='reviewer', reviewer_level='level1'
+        )
+        assigned = ReviewTask.objects.create(
+            contract=self.contract, created_by=self.user,
+            reviewer_assignments={'level1': reviewer.id, 'level2': self.user.id}
+        )
+        # 分配在其他层级上的任务不可见
+        ReviewTask.objects.create(
+            contract=self.contract, created_by=self.user, reviewer_assignments={'level2': reviewer.id}
+        )
+        ReviewTask.objects.create(contract=self.contract, created_by=self.user)
+        self.assertEqual(ReviewerAssignment.objects.filter(review_task=assigned).count(), 2)
+        
+        self.client.force_authenticate(user=reviewer)
+        response = self.client.get('/api/reviews/tasks/')
+        self.assertEqual([task['id'] for task in response.data['results']], [assigned.id])
+        
+        assigned.reviewer_assignments = {'level1': self.user.id}
+        assigned.save()
+        self.assertEqual(
+            list(ReviewerAssignment.objects.filter(review_task=assigned).values_list('level', 'reviewer_id')),
+            [('level1', self.user.id)]
+        )
+        response = self.client.get('/api/reviews/tasks/')
+        self.assertEqual(response.data['results'], [])
+
 
+class ClauseReviewCacheTest(TestCase):
+    """条款级审核缓存测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.text = (
+            '第一条 合同标的\n乙方向甲方提供数控机床2台。\n'
+            '第二条 付款方式\n甲方于验收后30日内付款。\n'
+            '第三条 违约责任\n违约金为合同总额的百分之十。\n'
+        )
+        self.ai_service = AIService()
+        self.ai_service.model = 'test-model'
+        self.prompts = []
+    
+    def _fake_ai(self, prompt):
+        self.prompts.append(prompt)
+        count = len(re.findall(r'^\[C\d+\]$', prompt, re.MULTILINE))
+        return {'clauses': [
+            {'clause_index': index, 'score': 80, 'risks': [
+                {'type': 'financial', 'level': 'medium', 'description': '约定不明确', 'legal_basis': '民法典第510条'}
+            ], 'suggestions': []}
+            for index in range(1, count + 1)
+        ]}
+    
+    def test_identical_clauses_reuse_cached_results(self):
+        """相同模板的第二份合同只把变化的条款发送给大模型"""
+        first = Contract.objects.create(
+            contract_no='CT-CC-001', title='采购合同A', contract_type='procurement', content=self.text, drafter=self.user
+        )
+        # 条款编号和空白不同、第三条内容不同
+        second_text = self.text.replace('第一条 合同标的\n', '第1条  合同标的\n').replace('百分之十', '百分之二十')
+        second = Contract.objects.create(
+            contract_no='CT-CC-002', title='采购合同B', contract_type='procurement', content=second_text, drafter=self.user
+        )
+        
+        with mock.patch.object(AIService, '_call_ai_api', autospec=True,
+                               side_effect=lambda service, prompt: self._fake_ai(prompt)):
+            first_result = ClauseReviewService(self.ai_service).review(first)
+            self.assertEqual(len(self.prompts), 1)
+            self.assertEqual(ClauseReviewCache.objects.count(), 3)
+            
+            second_result = ClauseReviewService(self.ai_service).review(second)
+        
+        self.assertEqual(len(self.prompts), 2)
+        self.assertIn('百分之二十', self.prompts[1])
+        self.assertNotIn('验收后30日内付款', self.prompts[1])
+        self.assertEqual(second_result['clause_cache']['cached_count'], 2)
+        self.assertEqual(second_result['clause_cache']['reviewed_count'], 1)
+        self.assertEqual(first_result['risk_identification']['total_count'], 3)
+        self.assertEqual(second_result['risk_identification']['total_count'], 3)
+        self.assertEqual(second_result['risk_quantification']['overall_risk_level'], 'medium')
+        self.assertEqual(ClauseReviewCache.objects.count(), 4)
+    
+    def test_template_diff_reviews_only_changed_clauses(self):
+        """模板差异审核只把新增或修改的条款发送给大模型，删除的模板条款列为风险"""
+        template = Template.objects.create(
+            name='采购合同模板', contract_type='procurement',
+            content=self.text + '第四条 争议解决\n提交甲方所在地法院诉讼解决。\n'
+        )
+        contract_text = (
+            self.text.replace('验收后30日内', '验收后90日内')
+            + '第四条 保密\n双方对合同内容保密。\n'
+        )
+        contract = Contract.objects.create(
+            title='采购合同', contract_type='procurement', content=contract_text,
+            template=template, drafter=self.user
+        )
+        
+        with mock.patch.object(AIService, '_call_ai_api', autospec=True,
+                               side_effect=lambda service, prompt: self._fake_ai(prompt)):
+            result = TemplateDiffReviewService(self.ai_service).review(contract)
+        
+        self.assertEqual(len(self.prompts), 1)
+        self.assertIn('验收后90日内', self.prompts[0])
+        self.assertIn('双方对合同内容保密', self.prompts[0])
+        self.assertNotIn('数控机床', self.prompts[0])
+        diff = result['template_diff']
+        self.assertEqual(diff['pre_approved_clauses'], ['第一条 合同标的', '第三条 违约责任'])
+        self.assertEqual(diff['changed_clauses'][0]['clause'], '第二条 付款方式')
+        self.assertIn('验收后30日内', diff['changed_clauses'][0]['template_content'])
+        self.assertEqual(diff['removed_clauses'], ['第四条 争议解决'])
+        scores = result['clause_scoring']['clause_scores']
+        self.assertEqual([score['pre_approved'] for score in scores], [True, False, True, False])
+        # 两个修改条款各一个风险，加上删除的模板条款
+        self.assertEqual(result['risk_identification']['total_count'], 3)
+    
+    def test_incremental_review_carries_forward_unchanged_findings(self):
+        """增量复审只审核修改的条款，未变化条款的风险和意见沿用上一轮"""
+        contract = Contract.objects.create(
+            title='采购合同', contract_type='procurement', content=self.text, drafter=self.user
+        )
+        base_task = ReviewTask.objects.create(
+            contract=contract, contract_version=1, status='completed', created_by=self.user
+        )
+        base_result = ReviewResult.objects.create(
+            review_task=base_task, contract=contract, overall_score=70,
+            review_data={'detailed_data': {'risk_identification_result': {'risks': [
+                {'type': 'financial', 'level': 'high', 'description': '付款期限过长', 'clause': '第二条 付款方式'},
+                {'type': 'other', 'level': 'low', 'description': '违约金偏高', 'clause': '违约金为合同总额的百分之十'},
+            ]}}}
+        )
+        ReviewOpinion.objects.create(
+            review_result=base_result, clause_content='第二条 付款方式',
+            opinion_content='建议缩短付款期限', status='accepted'
+        )
+        ReviewOpinion.objects.create(
+            review_result=base_result, clause_content='第三条 违约责任',
+            opinion_content='建议降低违约金比例', status='rejected'
+        )
+        contract.content = self.text.replace('验收后30日内', '验收后15日内')
+        contract.current_version = 2
+        contract.save()
+        task = ReviewTask.objects.create(
+            contract=contract, contract_version=2, review_mode='incremental', created_by=self.user
+        )
+        
+        service = IncrementalReviewService(self.ai_service)
+        with mock.patch.object(AIService, '_call_ai_api', autospec=True,
+                               side_effect=lambda service, prompt: self._fake_ai(prompt)):
+            result = service.review(Contract.objects.get(id=contract.id), task)
+        
+        self.assertEqual(len(self.prompts), 1)
+        # 附带修改前内容和上一轮意见审核的结果不作为普通条款审核结果缓存
+        clause_service = ClauseReviewService(self.ai_service)
+        plain_hashes = {
+            clause_service.clause_hash(clause.clause_content, contract.contract_type)
+            for clause in clause_service.clause_service.get_clauses(contract)
+        }
+        self.assertEqual(ClauseReviewCache.objects.count(), 1)
+        self.assertFalse(ClauseReviewCache.objects.filter(clause_hash__in=plain_hashes).exists())
+        self.assertIn('验收后15日内', self.prompts[0])
+        self.assertIn('修改前', self.prompts[0])
+        self.assertIn('付款期限过长', self.prompts[0])
+        self.assertNotIn('数控机床', self.prompts[0])
+        incremental = result['incremental_review']
+        self.assertEqual(incremental['base_version'], 1)
+        self.assertEqual(incremental['changed_clauses'], ['第二条 付款方式'])
+        self.assertEqual(incremental['carried_risk_count'], 1)
+        self.assertEqual(incremental['dropped_finding_count'], 2)
+        descriptions = [risk['description'] for risk in result['risk_identification']['risks']]
+        self.assertIn('违约金偏高', descriptions)
+        self.assertNotIn('付款期限过长', descriptions)
+        
+        new_result = ReviewResult.objects.create(review_task=task, contract=contract)
+        self.assertEqual(service.carry_forward_opinions(new_result, incremental['carried_opinions']), 1)
+        opinion = new_result.opinions.get()
+        self.assertEqual(opinion.opinion_content, '建议降低违约金比例')
+        self.assertEqual(opinion.status, 'rejected')
+    
+    def test_rule_matches_saved_only_after_scan_collected(self):
+        """并行的规则扫描线程不写库，扫描结果按时取回后才保存匹配记录"""
+        ReviewRule.objects.create(
+            rule_code='G001', rule_name='违约金规则', rule_type='general',
+            rule_content={'type': 'keyword', 'patterns': ['违约金']}
+        )
+        contract = Contract.objects.create(
+            title='采购合同', contract_type='procurement', content=self.text, drafter=self.user
+        )
+        task = ReviewTask.objects.create(contract=contract, created_by=self.user)
+        service = AutoReviewService()
+        
+        with mock.patch('apps.reviews.services_auto.connection'):
+            scan_result = service._run_rule_scan(contract, task)
+        self.assertEqual(scan_result['total_matches'], 1)
+        self.assertFalse(RuleMatch.objects.filter(review_task=task).exists())
+        
+        future = Future()
+        future.set_result(scan_result)
+        collected = service._collect_rule_scan_result(future, contract, task)
+        self.assertNotIn('pending_rule_matches', collected)
+        self.assertEqual(RuleMatch.objects.filter(review_task=task).count(), 1)
+    
+    def test_failed_ai_call_waits_for_rule_scan(self):
+        """AI调用失败时等待并丢弃并行的规则扫描，扫描线程使用主线程提取的文本"""
+        contract = Contract.objects.create(
+            title='采购合同', contract_type='procurement', content=self.text, drafter=self.user
+        )
+        task = ReviewTask.objects.create(contract=contract, created_by=self.user)
+        service = AutoReviewService()
+        service.ai_service.enabled = True
+        service.ai_service.model = 'test-model'
+        finished = threading.Event()
+        scanned_texts = []
+        
+        def slow_scan(contract, review_task, contract_content=None):
+            scanned_texts.append(contract_content)
+            time.sleep(0.2)
+            finished.set()
+            return {'success': True, 'matches': []}
+        
+        with mock.patch.object(service, '_run_rule_scan', side_effect=slow_scan), \
+                mock.patch.object(AIService, '_call_ai_api', side_effect=Exception('连接超时')):
+            result = service.process_auto_review(contract, task)
+        
+        self.assertFalse(result['success'])
+        self.assertTrue(finished.is_set())
+        self.assertEqual(scanned_texts, [service.text_service.get_text(contract)])
+        self.assertFalse(RuleMatch.objects.filter(review_task=task).exists())
+    
+    def test_unchanged_content_reuses_review_result(self):
+        """合同内容已审核过时直接复用审核结果，不调用大模型"""
+        contract = Contract.objects.create(
+            title='采购合同', contract_type='procurement', content=self.text, drafter=self.user
+        )
+        rule = ReviewRule.objects.create(
+            rule_code='G001', rule_name='违约金规则', rule_type='general',
+            rule_content={'type': 'keyword', 'patterns': ['违约金']}
+        )
+        base_task = ReviewTask.objects.create(contract=contract, status='completed', created_by=self.user)
+        base_result = ReviewResult.objects.create(
+            review_task=base_task, contract=contract, overall_score=82, risk_level='medium', risk_count=2,
+            content_hash=contract.content_hash, review_data={
+                'risk_overview': {'overall_score': 82},
+                'detailed_data': {'rule_scan_result': {'ruleset_version': get_ruleset_version()}},
+            }
+        )
+        RuleMatch.objects.create(
+            review_task=base_task, rule=rule, contract_id=contract.id,
+            matched_clause='违约金为合同总额的百分之十', match_score=0.8
+        )
+        ReviewOpinion.objects.create(review_result=base_result, opinion_content='建议明确验收标准')
+        ReviewOpinion.objects.create(
+            review_result=base_result, reviewer=self.user, opinion_content='审核员意见'
+        )
+        task = ReviewTask.objects.create(contract=contract, created_by=self.user)
+        
+        with mock.patch.object(AIService, '_call_ai_api', autospec=True) as call_ai_api:
+            result = AutoReviewService().process_auto_review(contract, task)
+        
+        call_ai_api.assert_not_called()
+        self.assertTrue(result['success'])
+        self.assertEqual(result['reused_from'], base_task.id)
+        review_result = ReviewResult.objects.get(review_task=task)
+        self.assertEqual(review_result.risk_level, 'medium')
+        self.assertEqual(review_result.review_data['reused_from']['review_task_id'], base_task.id)
+        self.assertEqual(
+            list(review_result.opinions.values_list('opinion_content', flat=True)), ['建议明确验收标准']
+        )
+        self.assertEqual(
+            list(RuleMatch.objects.filter(review_task=task).values_list('rule_id', flat=True)), [rule.id]
+        )
+        
+        # 规则集变化后不再复用
+        bump_ruleset_version()
+        other_task = ReviewTask.objects.create(contract=contract, created_by=self.user)
+        self.assertIsNone(AutoReviewService()._reuse_review_result(contract, other_task, contract.content_hash))
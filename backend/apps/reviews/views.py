@@ -21,6 +21,7 @@ from .serializers import (
 from .tasks import process_review_task
 from .services import ReviewService
 from .services_auto import AutoReviewService
+from .services_assignment import ReviewerAssignmentService
 from .services_loop import ReviewOpinionLoopService
 from apps.users.models import User
 
@@ -42,32 +43,14 @@ class ReviewTaskViewSet(viewsets.ModelViewSet):
             'contract__versions', 'contract__review_tasks'
         )
         
-        # 如果是审核员，只显示分配给自己的任务
+        # 如果是审核员，只显示分配给自己的任务（reviewer字段或在其层级上分配给自己的任务）
         user = self.request.user
         if user.is_authenticated and user.role == 'reviewer' and user.reviewer_level:
-            # 由于JSONField查询限制，我们需要在Python层面过滤
-            # 先获取所有可能相关的任务（reviewer字段或reviewer_assignments包含该层级的）
             from django.db.models import Q
-            potential_tasks = queryset.filter(
-                Q(reviewer=user) | 
-                Q(reviewer_assignments__isnull=False)
+            queryset = queryset.filter(
+                Q(reviewer=user) |
+                Q(id__in=ReviewerAssignmentService().assigned_task_ids(user, user.reviewer_level))
             )
-            
-            # 在Python层面过滤
-            filtered_task_ids = []
-            for task in potential_tasks:
-                # 检查是否分配给当前用户
-                if task.reviewer == user:
-                    filtered_task_ids.append(task.id)
-                elif task.reviewer_assignments and isinstance(task.reviewer_assignments, dict):
-                    assigned_user_id = task.reviewer_assignments.get(user.reviewer_level)
-                    if assigned_user_id and int(assigned_user_id) == user.id:
-                        filtered_task_ids.append(task.id)
-            
-            if filtered_task_ids:
-                queryset = queryset.filter(id__in=filtered_task_ids)
-            else:
-                queryset = queryset.none()
         
         return queryset
 
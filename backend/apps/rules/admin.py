@@ -1,11 +1,13 @@
 from django.contrib import admin
-from .models import ReviewRule, RuleMatch
+from .models import ReviewRule, RuleMatch, RuleBacktest, RuleStat, RuleRescanJob
 
 
 @admin.register(ReviewRule)
 class ReviewRuleAdmin(admin.ModelAdmin):
-    list_display = ['rule_code', 'rule_name', 'rule_type', 'industry', 'risk_level', 'is_active', 'created_at']
-    list_filter = ['rule_type', 'industry', 'risk_level', 'is_active', 'created_at']
+    list_display = ['rule_code', 'rule_name', 'rule_type', 'industry', 'risk_level', 'is_active',
+                    'benchmark_cost_ms', 'benchmark_flagged', 'created_at']
+    list_filter = ['rule_type', 'industry', 'risk_level', 'is_active', 'benchmark_flagged', 'created_at']
+    readonly_fields = ['benchmark_cost_ms', 'benchmark_peak_kb', 'benchmark_flagged', 'benchmarked_at']
     search_fields = ['rule_code', 'rule_name']
 
 
@@ -15,3 +17,21 @@ class RuleMatchAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['rule__rule_name']
 
+
+
+@admin.register(RuleStat)
+class RuleStatAdmin(admin.ModelAdmin):
+    list_display = ['rule', 'evaluations', 'hits', 'total_time_ms', 'max_time_ms', 'last_hit_at', 'updated_at']
+    search_fields = ['rule__rule_name', 'rule__rule_code']
+
+
+@admin.register(RuleBacktest)
+class RuleBacktestAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'ruleset_version', 'sample_size', 'created_by', 'created_at', 'completed_at']
+    list_filter = ['status', 'created_at']
+
+
+@admin.register(RuleRescanJob)
+class RuleRescanJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'processed_count', 'rescanned_count', 'total_count', 'created_by', 'created_at']
+    list_filter = ['status', 'created_at']
@@ -6,3 +6,5 @@ class RulesConfig(AppConfig):
     name = 'apps.rules'
     verbose_name = '规则引擎'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,182 @@
+"""
+规则基准测试模块 - 在固定的本地样本合同上测量规则的匹配耗时和内存占用
+
+样本合同由固定种子生成，保证同一规则在不同机器、不同时间的测量结果可比。
+为防止灾难性回溯的正则表达式阻塞请求，测量在新启动的Python子进程中执行（python -m apps.rules.benchmark），
+超时后强制终止子进程。
+
+本模块不依赖Django。
+"""
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from apps.rules.compiler import CompiledRule
+from apps.rules.dsl import RuleContext
+
+logger = logging.getLogger(__name__)
+
+# 子进程的工作目录（backend目录，保证 apps 包可导入）
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+
+CORPUS_SEED = 20240101
+CORPUS_SIZES = (2000, 5000, 10000, 20000, 50000, 100000)  # 样本合同长度（字符）
+
+CLAUSE_TITLES = [
+    '合同标的', '价款与支付', '交付与验收', '质量保证', '知识产权', '保密义务',
+    '违约责任', '不可抗力', '争议解决', '合同的变更与解除', '通知与送达', '其他约定',
+]
+
+CLAUSE_SENTENCES = [
+    '甲方应于本合同签订之日起{n}个工作日内向乙方支付合同总价款的百分之{p}。',
+    '乙方应按照甲方的要求，于{n}日内完成全部货物的交付，并提供相应的质量证明文件。',
+    '合同总价为人民币{a}元（大写：{c}），该价格已包含税费、运输费及安装调试费用。',
+    '任何一方违反本合同约定的，应向守约方支付合同总额百分之{p}的违约金。',
+    '双方对在履行本合同过程中知悉的对方商业秘密负有保密义务，保密期限为{n}年。',
+    '因不可抗力导致本合同不能履行的，受影响一方应在{n}日内书面通知对方。',
+    '本合同履行过程中发生的争议，双方应协商解决；协商不成的，提交甲方所在地人民法院诉讼解决。',
+    'The Supplier shall deliver the Goods within {n} days and bear all risks until acceptance.',
+    '验收不合格的，乙方应在{n}日内免费更换或维修，由此产生的费用由乙方承担。',
+    '未经对方书面同意，任何一方不得将本合同项下的权利义务转让给第三方。',
+]
+
+_corpus: Optional[List[str]] = None
+
+
+def get_sample_corpus() -> List[str]:
+    """生成固定的样本合同（进程内缓存）"""
+    global _corpus
+    if _corpus is None:
+        rng = random.Random(CORPUS_SEED)
+        corpus = []
+        for size in CORPUS_SIZES:
+            parts = []
+            length = 0
+            clause_no = 0
+            while length < size:
+                title = CLAUSE_TITLES[clause_no % len(CLAUSE_TITLES)]
+                clause_no += 1
+                lines = [f'第{clause_no}条 {title}']
+                for _ in range(rng.randint(2, 6)):
+                    lines.append(rng.choice(CLAUSE_SENTENCES).format(
+                        n=rng.randint(1, 90), p=rng.randint(1, 30),
+                        a=rng.randint(10000, 9999999), c='详见附件',
+                    ))
+                clause = '\n'.join(lines) + '\n'
+                parts.append(clause)
+                length += len(clause)
+            corpus.append(''.join(parts)[:size])
+        _corpus = corpus
+    return _corpus
+
+
+def _evaluate(compiled: CompiledRule, text: str, text_lower: str):
+    """在一份样本合同上执行规则（与规则引擎的匹配步骤一致）"""
+    if compiled.is_text_rule:
+        compiled.find(text, text_lower)
+    ctx = RuleContext(text)
+    if compiled.rule_type == 'pattern':
+        compiled.match_pattern(ctx)
+    compiled.check_conditions(ctx)
+
+
+def benchmark_rule(rule_content: Dict) -> Dict:
+    """
+    测量规则在样本合同上的开销
+
+    Returns:
+        {'compile_ms': 编译耗时, 'max_ms': 单份合同最大耗时, 'avg_ms': 单份合同平均耗时,
+         'peak_kb': 编译和匹配期间的内存峰值, 'timed_out': False}
+    """
+    corpus = get_sample_corpus()
+    lowered = [text.lower() for text in corpus]
+
+    started = time.perf_counter()
+    compiled = CompiledRule('benchmark', rule_content)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    # 计时（不开启内存跟踪，避免影响耗时）
+    times = []
+    for text, text_lower in zip(corpus, lowered):
+        started = time.perf_counter()
+        _evaluate(compiled, text, text_lower)
+        times.append((time.perf_counter() - started) * 1000)
+
+    # 内存峰值（包含编译）
+    tracemalloc.start()
+    try:
+        compiled = CompiledRule('benchmark', rule_content)
+        for text, text_lower in zip(corpus, lowered):
+            _evaluate(compiled, text, text_lower)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'compile_ms': round(compile_ms, 3),
+        'max_ms': round(max(times), 3),
+        'avg_ms': round(sum(times) / len(times), 3),
+        'peak_kb': round(peak / 1024, 1),
+        'timed_out': False,
+    }
+
+
+class IsolationUnavailableError(RuntimeError):
+    """无法启动隔离的子进程（不能在当前进程中测量，规则按未通过基准测试处理）"""
+
+
+def benchmark_rule_isolated(rule_content: Dict, timeout: float) -> Dict:
+    """
+    在独立的Python子进程中测量规则开销，超时则强制终止子进程
+
+    子进程是新启动的解释器（不使用fork），Windows和多线程的工作进程中同样可用；
+    无法启动子进程时抛出 IsolationUnavailableError，不回退到当前进程执行。
+    """
+    try:
+        completed = subprocess.run(
+            [sys.executable, '-m', 'apps.rules.benchmark'],
+            input=json.dumps(rule_content, ensure_ascii=False),
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            cwd=str(BACKEND_DIR),
+            env=dict(os.environ, PYTHONIOENCODING='utf-8'),
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        # subprocess.run 超时后已终止并回收子进程
+        return {'timed_out': True}
+    except OSError as e:
+        raise IsolationUnavailableError(f'规则基准测试无法创建子进程: {str(e)}') from e
+
+    try:
+        result = json.loads(completed.stdout)
+    except ValueError:
+        stderr = completed.stderr.strip().splitlines()
+        raise RuntimeError(
+            f'基准测试进程异常退出（退出码{completed.returncode}）: {stderr[-1] if stderr else ""}'
+        )
+
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+def _run_worker():
+    """子进程入口：从标准输入读取规则内容，测量结果以JSON写入标准输出"""
+    try:
+        result = benchmark_rule(json.load(sys.stdin))
+    except Exception as e:
+        result = {'error': str(e)}
+    json.dump(result, sys.stdout, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    _run_worker()
@@ -0,0 +1,342 @@
+"""
+规则编译模块 - 将规则内容编译为可复用的匹配器
+
+本模块不依赖Django，可在规则扫描的工作进程中直接导入使用。
+"""
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from apps.rules.dsl import DSLError, RuleContext, compile_conditions, compile_node
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+# 可直接在文本上匹配的规则类型（可分片并行执行）
+TEXT_RULE_TYPES = ('keyword', 'regex')
+
+# 依赖匹配位置前后文的正则操作：锚点（^、$、\A、\Z、\b、\B）和前后查找断言
+_CONTEXT_OPS = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT)
+_REPEAT_OPS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None))
+
+
+def _uses_context(items) -> bool:
+    """正则表达式片段是否包含依赖前后文的操作"""
+    for op, value in items:
+        if op in _CONTEXT_OPS:
+            return True
+        if op == sre_parse.SUBPATTERN:
+            children = [value[-1]]
+        elif op in _REPEAT_OPS:
+            children = [value[2]]
+        elif op == sre_parse.BRANCH:
+            children = value[1]
+        elif op == sre_parse.GROUPREF_EXISTS:
+            children = [value[1], value[2]]
+        elif op == getattr(sre_parse, 'ATOMIC_GROUP', None):
+            children = [value]
+        else:
+            continue
+        if any(child is not None and _uses_context(child) for child in children):
+            return True
+    return False
+
+# 编译结果缓存：{(rule_id, cache_token): CompiledRule}
+_compiled_cache: Dict[Tuple, 'CompiledRule'] = {}
+_COMPILED_CACHE_MAX_SIZE = 10000
+
+
+class CompiledRule:
+    """编译后的规则"""
+
+    __slots__ = (
+        'rule_id', 'rule_type', 'patterns', 'conditions', 'action', 'rule_content',
+        'context_free', 'max_match_length', '_matchers', '_pattern', '_condition'
+    )
+
+    def __init__(self, rule_id, rule_content: Dict):
+        self.rule_id = rule_id
+        self.rule_content = rule_content
+        self.rule_type = rule_content.get('type', 'keyword')
+        self.patterns = [str(pattern) for pattern in rule_content.get('patterns', []) or []]
+        self.conditions = rule_content.get('conditions', {}) or {}
+        self.action = rule_content.get('action', 'warning')
+        self._matchers = self._compile_matchers()
+        self.context_free, self.max_match_length = self._analyze_matchers()
+        self._pattern = None
+        self._condition = None
+
+        if self.rule_type == 'pattern':
+            try:
+                self._pattern = compile_node(rule_content.get('pattern'))
+            except DSLError as e:
+                # 无效的模式规则不匹配任何合同
+                logger.warning(f'规则{rule_id}的模式无效: {str(e)}')
+        try:
+            self._condition = compile_conditions(self.conditions)
+        except DSLError as e:
+            # 无效的条件不做过滤（与条件未实现前的行为一致）
+            logger.warning(f'规则{rule_id}的条件无效，已忽略: {str(e)}')
+
+    @property
+    def is_text_rule(self) -> bool:
+        """是否为可直接在文本上匹配的规则"""
+        return self.rule_type in TEXT_RULE_TYPES
+
+    def _compile_matchers(self) -> List:
+        """编译匹配器列表，与patterns一一对应（无效的正则为None）"""
+        matchers = []
+        if self.rule_type == 'keyword':
+            matchers = [pattern.lower() for pattern in self.patterns]
+        elif self.rule_type == 'regex':
+            for pattern in self.patterns:
+                try:
+                    matchers.append(re.compile(pattern, re.IGNORECASE))
+                except re.error:
+                    logger.warning(f'无效的正则表达式: {pattern}')
+                    matchers.append(None)
+        return matchers
+
+    def _analyze_matchers(self) -> Tuple[bool, int]:
+        """
+        分析文本规则的匹配范围
+
+        Returns:
+            (命中是否与前后文无关, 单次命中的最大长度)：两者都满足时，在一段文本中单独匹配的命中
+            与在包含该文本的全文中匹配一致（增量扫描可按条款缓存命中结果）
+        """
+        if self.rule_type == 'keyword':
+            return True, max((len(keyword) for keyword in self._matchers), default=0)
+        if self.rule_type != 'regex':
+            return False, 0
+        context_free, max_length = True, 0
+        for matcher in self._matchers:
+            if matcher is None:
+                continue
+            parsed = sre_parse.parse(matcher.pattern, matcher.flags)
+            if _uses_context(list(parsed)):
+                context_free = False
+            max_length = max(max_length, parsed.getwidth()[1])
+        return context_free, max_length
+
+    def find(
+        self,
+        text: str,
+        text_lower: Optional[str] = None,
+        start: int = 0,
+        end: Optional[int] = None
+    ) -> Optional[Tuple[int, int, int]]:
+        """
+        在文本中查找第一个命中的模式
+
+        按patterns顺序返回第一个命中的模式及其最左侧的匹配位置，
+        只统计起始位置在[start, end)范围内的匹配。
+
+        Args:
+            text: 合同文本
+            text_lower: 小写后的合同文本（关键词匹配使用，可选）
+            start: 匹配起始位置下限
+            end: 匹配起始位置上限（不含）
+
+        Returns:
+            (模式序号, 匹配起始位置, 匹配结束位置)，未命中时返回None
+        """
+        if end is None:
+            end = len(text)
+
+        if self.rule_type == 'keyword':
+            if text_lower is None:
+                text_lower = text.lower()
+            for index, keyword in enumerate(self._matchers):
+                if not keyword:
+                    continue
+                position = text_lower.find(keyword, start, end + len(keyword) - 1)
+                if position != -1:
+                    return index, position, position + len(keyword)
+
+        elif self.rule_type == 'regex':
+            for index, matcher in enumerate(self._matchers):
+                if matcher is None:
+                    continue
+                match = matcher.search(text, start)
+                if match and match.start() < end:
+                    return index, match.start(), match.end()
+
+        return None
+
+    def match_pattern(self, ctx: RuleContext) -> bool:
+        """判断模式规则是否命中（命中依据记录在ctx.evidence中）"""
+        if self._pattern is None:
+            return False
+        return self._pattern(ctx)
+
+    def find_pattern(self, ctx: RuleContext) -> Optional[Tuple[int, int, int]]:
+        """
+        判断模式规则是否命中
+
+        Returns:
+            (0, 命中依据起始位置, 命中依据结束位置)，没有命中依据时位置为0；未命中时返回None
+        """
+        mark = len(ctx.evidence)
+        matched = self.match_pattern(ctx)
+        evidence = ctx.evidence[mark:]
+        del ctx.evidence[mark:]
+        if not matched:
+            return None
+        match_start, match_end = evidence[0] if evidence else (0, 0)
+        return 0, match_start, match_end
+
+    def check_conditions(self, ctx: RuleContext) -> bool:
+        """判断规则条件是否满足（未设置条件时始终满足）"""
+        if self._condition is None:
+            return True
+        mark = len(ctx.evidence)
+        result = self._condition(ctx)
+        del ctx.evidence[mark:]
+        return result
+
+
+def validate_rule_content(rule_content: Dict):
+    """
+    校验规则内容
+
+    Raises:
+        DSLError: 规则内容格式错误
+    """
+    if not isinstance(rule_content, dict):
+        raise DSLError('规则内容必须是JSON对象')
+    rule_type = rule_content.get('type', 'keyword')
+    if rule_type in TEXT_RULE_TYPES:
+        patterns = rule_content.get('patterns', [])
+        if not isinstance(patterns, list):
+            raise DSLError('patterns 必须是列表')
+        if rule_type == 'regex':
+            for pattern in patterns:
+                try:
+                    re.compile(str(pattern))
+                except re.error as e:
+                    raise DSLError(f'无效的正则表达式 {pattern}: {str(e)}')
+    elif rule_type == 'pattern':
+        compile_node(rule_content.get('pattern'))
+    else:
+        raise DSLError(f'不支持的规则类型: {rule_type}')
+    compile_conditions(rule_content.get('conditions'))
+
+
+def compile_rule(rule_id, rule_content: Dict, cache_token=None) -> CompiledRule:
+    """
+    编译规则，相同 (rule_id, cache_token) 的规则只编译一次
+
+    Args:
+        rule_id: 规则ID
+        rule_content: 规则内容（字典）
+        cache_token: 缓存标识（规则内容变化时应随之变化，如更新时间）
+    """
+    if cache_token is None:
+        return CompiledRule(rule_id, rule_content)
+
+    key = (rule_id, cache_token)
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        if len(_compiled_cache) >= _COMPILED_CACHE_MAX_SIZE:
+            _compiled_cache.clear()
+        compiled = CompiledRule(rule_id, rule_content)
+        _compiled_cache[key] = compiled
+    return compiled
+
+
+def scan_shard(
+    rule_specs: Sequence[Tuple],
+    text: str,
+    text_offset: int,
+    start: int,
+    end: int
+) -> Tuple[List[Tuple[int, int, int, int]], Dict]:
+    """
+    扫描一个分片（工作进程入口）
+
+    Args:
+        rule_specs: 规则描述列表 [(rule_id, cache_token, rule_content), ...]
+        text: 分片文本（包含前后重叠区域）
+        text_offset: 分片文本在合同全文中的起始位置
+        start: 分片内有效匹配起始位置下限（相对分片文本）
+        end: 分片内有效匹配起始位置上限（相对分片文本，不含）
+
+    Returns:
+        (命中列表 [(rule_id, 模式序号, 全文起始位置, 全文结束位置), ...], {rule_id: 匹配耗时(ms)})
+    """
+    text_lower = text.lower()
+    hits = []
+    timings = {}
+    for rule_id, cache_token, rule_content in rule_specs:
+        compiled = compile_rule(rule_id, rule_content, cache_token)
+        started = time.perf_counter()
+        hit = compiled.find(text, text_lower, start, end)
+        timings[rule_id] = (time.perf_counter() - started) * 1000
+        if hit:
+            pattern_index, match_start, match_end = hit
+            hits.append((rule_id, pattern_index, match_start + text_offset, match_end + text_offset))
+    return hits, timings
+
+
+def backtest_documents(
+    rule_specs: Sequence[Tuple],
+    documents: Sequence[Tuple],
+    example_count: int = 5,
+    snippet_context: int = 40
+) -> Dict:
+    """
+    在一批合同上回测规则（工作进程入口）
+
+    关键词/正则规则直接在文本上匹配；模式规则和带条件的规则需要合同字段和条款切分结果，
+    由调用方随合同一并传入（工作进程中不访问数据库）。
+
+    Args:
+        rule_specs: 规则描述列表 [(rule_key, cache_token, rule_content), ...]
+        documents: 合同列表 [(contract_id, 合同文本), ...] 或
+                   [(contract_id, 合同文本, 合同字段, [(条款起始位置, 条款文本), ...]), ...]
+        example_count: 每条规则最多返回的命中示例数
+        snippet_context: 命中示例前后保留的字符数
+
+    Returns:
+        {rule_key: {'times': [每份合同的匹配耗时(ms)], 'hit_count': 命中合同数,
+                    'examples': [(contract_id, 模式序号, 起始位置, 片段), ...]}}
+    """
+    compiled_rules = [
+        compile_rule(rule_key, rule_content, cache_token)
+        for rule_key, cache_token, rule_content in rule_specs
+    ]
+    results = {
+        compiled.rule_id: {'times': [], 'hit_count': 0, 'examples': []}
+        for compiled in compiled_rules
+    }
+    for document in documents:
+        contract_id, text = document[0], document[1]
+        text_lower = text.lower()
+        ctx = None
+        if len(document) > 2:
+            ctx = RuleContext(text, fields=document[2], clauses=document[3])
+        for compiled in compiled_rules:
+            started = time.perf_counter()
+            if compiled.is_text_rule:
+                hit = compiled.find(text, text_lower)
+            else:
+                hit = compiled.find_pattern(ctx) if ctx is not None else None
+            if hit and ctx is not None and not compiled.check_conditions(ctx):
+                hit = None
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            result = results[compiled.rule_id]
+            result['times'].append(elapsed_ms)
+            if hit:
+                result['hit_count'] += 1
+                if len(result['examples']) < example_count:
+                    pattern_index, match_start, match_end = hit
+                    snippet = text[max(0, match_start - snippet_context):match_end + snippet_context]
+                    result['examples'].append((contract_id, pattern_index, match_start, snippet))
+    return results
@@ -0,0 +1,288 @@
+"""
+规则条件DSL模块 - 将规则内容中的 pattern / conditions 编译为可复用的判断函数
+
+DSL为JSON结构，每个节点是只含一个操作符的字典（field节点除外）：
+
+    {"all": [节点, ...]}                     全部满足
+    {"any": [节点, ...]}                     任一满足
+    {"not": 节点}                            取反
+    {"contains": "关键词" | ["关键词", ...]}   全文包含任一关键词（忽略大小写）
+    {"regex": "正则表达式"}                   全文匹配正则
+    {"clause_present": "违约责任" | [...]}    存在标题包含关键词的条款
+    {"clause_missing": "违约责任" | [...]}    不存在标题包含关键词的条款
+    {"amount": {"gte": 1000000}}             合同最大金额（元）满足比较条件（gt/gte/lt/lte/eq）
+    {"field": "contract_type", "eq": "procurement"}
+    {"field": "industry", "in": ["IT", "制造业"]}
+
+示例：金额超过100万且缺少违约责任条款
+
+    {"all": [{"amount": {"gt": 1000000}}, {"clause_missing": "违约责任"}]}
+
+本模块不依赖Django，可在规则扫描的工作进程中直接导入使用。
+"""
+import operator
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 可在 field 节点中使用的合同字段
+FIELD_NAMES = ('contract_type', 'industry', 'title', 'status', 'file_format')
+
+# 金额：数字 + 可选单位 + 元，如 "1,000,000元"、"50万元"、"1.2亿元"
+AMOUNT_PATTERN = re.compile(r'(\d[\d,，]*(?:\.\d+)?)\s*(亿|万)?\s*元')
+AMOUNT_UNITS = {'亿': 100000000, '万': 10000, None: 1}
+
+COMPARE_OPERATORS = {
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'eq': operator.eq,
+}
+
+
+class DSLError(ValueError):
+    """DSL格式错误"""
+
+
+class RuleContext:
+    """
+    规则判断上下文
+
+    同一次扫描中所有规则共享一个上下文，小写文本、条款标题和金额只在首次使用时计算。
+    """
+
+    def __init__(self, text: str, fields: Optional[Dict] = None, clauses: Optional[List[Tuple[int, str]]] = None):
+        self.text = text
+        self.fields = fields or {}
+        self.evidence: List[Tuple[int, int]] = []  # 命中依据的位置 [(起始位置, 结束位置), ...]
+        self._clauses = clauses
+        self._text_lower = None
+        self._clause_titles = None
+        self._amounts = None
+
+    @property
+    def text_lower(self) -> str:
+        if self._text_lower is None:
+            self._text_lower = self.text.lower()
+        return self._text_lower
+
+    @property
+    def clause_titles(self) -> List[Tuple[int, str]]:
+        """条款标题列表 [(标题在全文中的起始位置, 小写标题), ...]"""
+        if self._clause_titles is None:
+            clauses = self._clauses if self._clauses is not None else [(0, self.text)]
+            self._clause_titles = [
+                (offset, clause_text.split('\n', 1)[0].strip().lower())
+                for offset, clause_text in clauses
+            ]
+        return self._clause_titles
+
+    @property
+    def amounts(self) -> List[float]:
+        """合同中出现的金额（单位：元）"""
+        if self._amounts is None:
+            amounts = []
+            for match in AMOUNT_PATTERN.finditer(self.text):
+                try:
+                    value = float(match.group(1).replace(',', '').replace('，', ''))
+                except ValueError:
+                    continue
+                amounts.append(value * AMOUNT_UNITS[match.group(2)])
+            self._amounts = amounts
+        return self._amounts
+
+
+Predicate = Callable[[RuleContext], bool]
+
+
+def _as_keywords(value, name: str) -> List[str]:
+    """关键词参数可以是字符串或字符串列表"""
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not value or not all(isinstance(item, str) and item for item in value):
+        raise DSLError(f'{name} 需要非空字符串或字符串列表')
+    return [item.lower() for item in value]
+
+
+def _compile_contains(value) -> Predicate:
+    keywords = _as_keywords(value, 'contains')
+
+    def predicate(ctx: RuleContext) -> bool:
+        for keyword in keywords:
+            position = ctx.text_lower.find(keyword)
+            if position != -1:
+                ctx.evidence.append((position, position + len(keyword)))
+                return True
+        return False
+    return predicate
+
+
+def _compile_regex(value) -> Predicate:
+    if not isinstance(value, str) or not value:
+        raise DSLError('regex 需要非空字符串')
+    try:
+        pattern = re.compile(value, re.IGNORECASE)
+    except re.error as e:
+        raise DSLError(f'无效的正则表达式 {value}: {str(e)}')
+
+    def predicate(ctx: RuleContext) -> bool:
+        match = pattern.search(ctx.text)
+        if match:
+            ctx.evidence.append((match.start(), match.end()))
+            return True
+        return False
+    return predicate
+
+
+def _find_clause(ctx: RuleContext, keywords: List[str]) -> Optional[Tuple[int, int]]:
+    """查找标题包含关键词的条款，返回标题位置"""
+    for offset, title in ctx.clause_titles:
+        for keyword in keywords:
+            if keyword in title:
+                return offset, offset + len(title)
+    return None
+
+
+def _compile_clause_present(value) -> Predicate:
+    keywords = _as_keywords(value, 'clause_present')
+
+    def predicate(ctx: RuleContext) -> bool:
+        span = _find_clause(ctx, keywords)
+        if span:
+            ctx.evidence.append(span)
+            return True
+        return False
+    return predicate
+
+
+def _compile_clause_missing(value) -> Predicate:
+    keywords = _as_keywords(value, 'clause_missing')
+
+    def predicate(ctx: RuleContext) -> bool:
+        return _find_clause(ctx, keywords) is None
+    return predicate
+
+
+def _compile_amount(value) -> Predicate:
+    if not isinstance(value, dict) or not value:
+        raise DSLError('amount 需要比较条件，如 {"gte": 1000000}')
+    comparisons = []
+    for name, threshold in value.items():
+        if name not in COMPARE_OPERATORS:
+            raise DSLError(f'amount 不支持的比较操作: {name}')
+        if not isinstance(threshold, (int, float)) or isinstance(threshold, bool):
+            raise DSLError(f'amount 比较值必须是数字: {threshold}')
+        comparisons.append((COMPARE_OPERATORS[name], threshold))
+
+    def predicate(ctx: RuleContext) -> bool:
+        if not ctx.amounts:
+            return False
+        max_amount = max(ctx.amounts)
+        return all(compare(max_amount, threshold) for compare, threshold in comparisons)
+    return predicate
+
+
+def _compile_field(node: Dict) -> Predicate:
+    field = node.get('field')
+    if field not in FIELD_NAMES:
+        raise DSLError(f'field 不支持的字段: {field}，可用字段: {", ".join(FIELD_NAMES)}')
+    if 'eq' in node:
+        expected = node['eq']
+        return lambda ctx: ctx.fields.get(field) == expected
+    if 'in' in node:
+        expected = node['in']
+        if not isinstance(expected, list):
+            raise DSLError('field 的 in 需要列表')
+        expected = set(expected)
+        return lambda ctx: ctx.fields.get(field) in expected
+    if 'contains' in node:
+        expected = str(node['contains']).lower()
+        return lambda ctx: expected in str(ctx.fields.get(field) or '').lower()
+    raise DSLError('field 需要 eq / in / contains 条件之一')
+
+
+def _compile_children(value, name: str) -> List[Predicate]:
+    if not isinstance(value, list) or not value:
+        raise DSLError(f'{name} 需要非空的条件列表')
+    return [compile_node(child) for child in value]
+
+
+def _compile_all(value) -> Predicate:
+    children = _compile_children(value, 'all')
+
+    def predicate(ctx: RuleContext) -> bool:
+        mark = len(ctx.evidence)
+        for child in children:
+            if not child(ctx):
+                del ctx.evidence[mark:]
+                return False
+        return True
+    return predicate
+
+
+def _compile_any(value) -> Predicate:
+    children = _compile_children(value, 'any')
+
+    def predicate(ctx: RuleContext) -> bool:
+        return any(child(ctx) for child in children)
+    return predicate
+
+
+def _compile_not(value) -> Predicate:
+    child = compile_node(value)
+
+    def predicate(ctx: RuleContext) -> bool:
+        # 子条件的命中依据对取反结果没有意义，不保留
+        mark = len(ctx.evidence)
+        result = child(ctx)
+        del ctx.evidence[mark:]
+        return not result
+    return predicate
+
+
+OPERATORS = {
+    'all': _compile_all,
+    'any': _compile_any,
+    'not': _compile_not,
+    'contains': _compile_contains,
+    'regex': _compile_regex,
+    'clause_present': _compile_clause_present,
+    'clause_missing': _compile_clause_missing,
+    'amount': _compile_amount,
+}
+
+
+def compile_node(node) -> Predicate:
+    """
+    编译DSL节点
+
+    Raises:
+        DSLError: DSL格式错误
+    """
+    if not isinstance(node, dict) or not node:
+        raise DSLError(f'条件节点必须是非空字典: {node!r}')
+    if 'field' in node:
+        return _compile_field(node)
+    if len(node) != 1:
+        raise DSLError(f'条件节点只能包含一个操作符: {", ".join(node)}')
+    name, value = next(iter(node.items()))
+    if name not in OPERATORS:
+        raise DSLError(f'不支持的操作符: {name}')
+    return OPERATORS[name](value)
+
+
+def compile_conditions(conditions: Dict) -> Optional[Predicate]:
+    """
+    编译规则条件（conditions）
+
+    条件字典可以是单个DSL节点，也可以是多个节点的简写（各节点同时满足），如
+    {"field": "contract_type", "eq": "sales"} 或 {"amount": {"gte": 100000}, "clause_missing": "违约责任"}。
+    未设置条件时返回None。
+    """
+    if not conditions:
+        return None
+    if not isinstance(conditions, dict):
+        raise DSLError('conditions 必须是字典')
+    if 'field' in conditions or len(conditions) == 1:
+        return compile_node(conditions)
+    return _compile_all([{name: value} for name, value in conditions.items()])
@@ -0,0 +1,77 @@
+"""
+在历史合同上回测规则
+使用方法:
+    python manage.py backtest_rules                          # 回测当前整个规则集
+    python manage.py backtest_rules --rule-code R001 R002    # 回测指定规则
+    python manage.py backtest_rules --draft draft_rule.json  # 回测草稿规则（JSON文件）
+    python manage.py backtest_rules --sample 500             # 抽样500份合同
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from apps.rules.models import ReviewRule, RuleBacktest
+from apps.rules.services_backtest import RuleBacktestService
+
+
+class Command(BaseCommand):
+    help = '在历史合同上回测规则，统计命中数、示例和匹配耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rule-code', nargs='+', default=[], help='要回测的规则编码')
+        parser.add_argument('--draft', help='草稿规则JSON文件路径')
+        parser.add_argument('--sample', type=int, help='抽样合同数（默认全部合同）')
+        parser.add_argument('--workers', type=int, help='工作进程数（默认CPU核数）')
+
+    def handle(self, *args, **options):
+        rule_ids = []
+        if options['rule_code']:
+            rules = dict(
+                ReviewRule.objects.filter(rule_code__in=options['rule_code'], is_deleted=False)
+                .values_list('rule_code', 'id')
+            )
+            missing = set(options['rule_code']) - set(rules)
+            if missing:
+                raise CommandError(f'规则不存在: {", ".join(sorted(missing))}')
+            rule_ids = list(rules.values())
+
+        draft_rule = None
+        if options['draft']:
+            try:
+                with open(options['draft'], 'r', encoding='utf-8') as f:
+                    draft_rule = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                raise CommandError(f'读取草稿规则失败: {str(e)}')
+
+        backtest = RuleBacktest.objects.create(
+            rule_ids=rule_ids,
+            draft_rule=draft_rule,
+            sample_size=options['sample'],
+        )
+
+        service = RuleBacktestService()
+        if options['workers']:
+            service.config['MAX_WORKERS'] = options['workers']
+
+        self.stdout.write(f'开始规则回测（回测ID: {backtest.id}）...')
+        try:
+            result = service.run(
+                backtest,
+                progress_callback=lambda progress: self.stdout.write(f'  {progress["message"]}')
+            )
+        except Exception as e:
+            raise CommandError(f'规则回测失败: {str(e)}')
+
+        self.stdout.write(
+            f'\n合同数: {result["contract_count"]}，规则数: {result["rule_count"]}，'
+            f'慢规则: {result["slow_rule_count"]}，过宽规则: {result["broad_rule_count"]}\n'
+        )
+        self.stdout.write(f'{"规则编码":<16}{"命中数":>8}{"命中率":>10}{"p50(ms)":>10}{"p99(ms)":>10}  标记')
+        for rule in result['rules']:
+            line = (
+                f'{rule["rule_code"] or "(草稿)":<16}{rule["hit_count"]:>8}{rule["hit_rate"]:>10.2%}'
+                f'{rule["p50_ms"]:>10.3f}{rule["p99_ms"]:>10.3f}  {",".join(rule["warnings"])}'
+            )
+            if rule['warnings']:
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ 回测完成，详细结果见回测记录 #{backtest.id}'))
@@ -0,0 +1,40 @@
+"""
+在固定样本合同上重新测量规则开销（补全已有规则的基准测试结果，供并行扫描均衡分片）
+使用方法:
+    python manage.py benchmark_rules              # 只测量尚未测量的规则
+    python manage.py benchmark_rules --all        # 重新测量全部规则
+    python manage.py benchmark_rules --rule-ids 1 2 3
+"""
+from django.core.management.base import BaseCommand
+from apps.rules.models import ReviewRule
+from apps.rules.services_benchmark import RuleBenchmarkService
+
+
+class Command(BaseCommand):
+    help = '在固定样本合同上重新测量规则开销'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新测量全部规则')
+        parser.add_argument('--rule-ids', nargs='+', type=int, help='指定规则ID')
+
+    def handle(self, *args, **options):
+        service = RuleBenchmarkService()
+        rules = ReviewRule.objects.filter(is_deleted=False)
+        if options['rule_ids']:
+            rules = rules.filter(id__in=options['rule_ids'])
+        elif not options['all']:
+            rules = rules.filter(benchmarked_at__isnull=True)
+
+        flagged = 0
+        for rule in rules.order_by('id'):
+            evaluation = service.benchmark_rule(rule)
+            if evaluation['flagged']:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(
+                    f'  [{rule.rule_code}] {rule.rule_name}: {"；".join(evaluation["reasons"])}'
+                ))
+            else:
+                self.stdout.write(
+                    f'  [{rule.rule_code}] {rule.rule_name}: {evaluation["cost_ms"]}ms, {evaluation["peak_kb"]}KB'
+                )
+        self.stdout.write(self.style.SUCCESS(f'✓ 测量完成，共 {rules.count()} 条规则，超出预算 {flagged} 条'))
@@ -0,0 +1,28 @@
+"""
+建立或补全合同三元组索引（用于规则回测和重新扫描的候选合同预筛选）
+使用方法:
+    python manage.py build_trigram_index            # 只索引未建立索引或文本已变化的合同
+    python manage.py build_trigram_index --force    # 全部重建
+"""
+from django.core.management.base import BaseCommand
+from apps.contracts.models import Contract
+from apps.rules.services_trigram import TrigramIndexService
+
+
+class Command(BaseCommand):
+    help = '建立或补全合同三元组索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='忽略文本哈希，全部重建')
+
+    def handle(self, *args, **options):
+        service = TrigramIndexService()
+        contracts = Contract.objects.filter(is_deleted=False).only('id', 'title', 'file_path', 'current_version')
+        total = contracts.count()
+        rebuilt = 0
+        for index, contract in enumerate(contracts.iterator(chunk_size=100), start=1):
+            if service.index_contract(contract, force=options['force']):
+                rebuilt += 1
+            if index % 100 == 0:
+                self.stdout.write(f'  已处理 {index}/{total} 份合同')
+        self.stdout.write(self.style.SUCCESS(f'✓ 索引完成，共 {total} 份合同，重建 {rebuilt} 份'))
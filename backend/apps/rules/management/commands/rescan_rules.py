@@ -0,0 +1,50 @@
+"""
+规则变更后重新扫描历史审核结果（只刷新规则匹配，不调用AI）
+使用方法:
+    python manage.py rescan_rules                        # 扫描上次重新扫描之后变更的规则
+    python manage.py rescan_rules --rule-id 12 15        # 指定变更的规则
+    python manage.py rescan_rules --resume 3             # 从检查点恢复任务#3
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.rules.models import RuleRescanJob
+from apps.rules.services_rescan import RuleRescanService
+
+
+class Command(BaseCommand):
+    help = '规则变更后按批重新扫描受影响的历史审核结果'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rule-id', type=int, nargs='+', default=[], help='变更的规则ID')
+        parser.add_argument('--resume', type=int, help='恢复指定的重新扫描任务')
+        parser.add_argument('--chunk-size', type=int, help='每批审核结果数')
+        parser.add_argument('--interval', type=float, help='批次间隔（秒）')
+
+    def handle(self, *args, **options):
+        service = RuleRescanService()
+
+        if options['resume']:
+            try:
+                job = RuleRescanJob.objects.get(id=options['resume'])
+            except RuleRescanJob.DoesNotExist:
+                raise CommandError(f'重新扫描任务不存在: {options["resume"]}')
+            if job.status in ('completed', 'cancelled'):
+                raise CommandError('任务已结束，无法恢复')
+            job.status = 'running'
+            job.error_message = ''
+            job.save(update_fields=['status', 'error_message', 'updated_at'])
+            self.stdout.write(f'从审核结果ID {job.cursor} 之后恢复任务 #{job.id}...')
+        else:
+            job = service.create_job(
+                rule_ids=options['rule_id'],
+                chunk_size=options['chunk_size'],
+                chunk_interval=options['interval'],
+            )
+            self.stdout.write(f'创建重新扫描任务 #{job.id}，变更规则 {len(job.rule_ids)} 条...')
+
+        service.run_job(job, progress_callback=lambda progress: self.stdout.write(f'  {progress["message"]}'))
+
+        job.refresh_from_db()
+        if job.status == 'completed':
+            self.stdout.write(self.style.SUCCESS(f'✓ {job.progress.get("message", "重新扫描完成")}'))
+        else:
+            raise CommandError(f'任务 #{job.id} 状态: {job.get_status_display()} {job.error_message}')
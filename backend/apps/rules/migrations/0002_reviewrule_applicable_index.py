@@ -0,0 +1,20 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reviewrule',
+            index=models.Index(
+                fields=['is_active', 'is_deleted', 'rule_type', 'industry', '-priority'],
+                name='rules_applicable_idx'
+            ),
+        ),
+    ]
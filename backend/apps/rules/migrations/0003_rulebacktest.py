@@ -0,0 +1,41 @@
+# Generated manually
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rules', '0002_reviewrule_applicable_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RuleBacktest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule_ids', models.JSONField(blank=True, default=list, verbose_name='回测规则ID列表')),
+                ('draft_rule', models.JSONField(blank=True, null=True, verbose_name='草稿规则')),
+                ('ruleset_version', models.IntegerField(blank=True, null=True, verbose_name='规则集版本')),
+                ('sample_size', models.IntegerField(blank=True, null=True, verbose_name='抽样合同数')),
+                ('status', models.CharField(choices=[('pending', '待执行'), ('running', '执行中'), ('completed', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='状态')),
+                ('progress', models.JSONField(blank=True, default=dict, verbose_name='进度信息')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='回测结果')),
+                ('error_message', models.TextField(blank=True, verbose_name='错误信息')),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, verbose_name='Celery任务ID')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='创建人')),
+            ],
+            options={
+                'verbose_name': '规则回测',
+                'verbose_name_plural': '规则回测',
+                'db_table': 'rules_rule_backtest',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated manually
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0003_rulebacktest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RuleStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evaluations', models.BigIntegerField(default=0, verbose_name='匹配次数')),
+                ('hits', models.BigIntegerField(default=0, verbose_name='命中次数')),
+                ('total_time_ms', models.FloatField(default=0, verbose_name='累计匹配耗时(毫秒)')),
+                ('max_time_ms', models.FloatField(default=0, verbose_name='最大匹配耗时(毫秒)')),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True, verbose_name='最近命中时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('rule', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stat', to='rules.reviewrule', verbose_name='规则')),
+            ],
+            options={
+                'verbose_name': '规则统计',
+                'verbose_name_plural': '规则统计',
+                'db_table': 'rules_rule_stat',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated manually
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rules', '0004_rulestat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RuleRescanJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule_ids', models.JSONField(blank=True, default=list, verbose_name='变更规则ID列表')),
+                ('since', models.DateTimeField(blank=True, null=True, verbose_name='规则变更起始时间')),
+                ('ruleset_version', models.IntegerField(blank=True, null=True, verbose_name='规则集版本')),
+                ('status', models.CharField(choices=[('pending', '待执行'), ('running', '执行中'), ('paused', '已暂停'), ('completed', '已完成'), ('failed', '失败'), ('cancelled', '已取消')], default='pending', max_length=20, verbose_name='状态')),
+                ('chunk_size', models.IntegerField(default=100, verbose_name='每批审核结果数')),
+                ('chunk_interval', models.FloatField(default=1.0, verbose_name='批次间隔(秒)')),
+                ('cursor', models.BigIntegerField(default=0, verbose_name='已处理到的审核结果ID')),
+                ('total_count', models.IntegerField(default=0, verbose_name='审核结果总数')),
+                ('processed_count', models.IntegerField(default=0, verbose_name='已处理数')),
+                ('rescanned_count', models.IntegerField(default=0, verbose_name='重新扫描数')),
+                ('progress', models.JSONField(blank=True, default=dict, verbose_name='进度信息')),
+                ('error_message', models.TextField(blank=True, verbose_name='错误信息')),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, verbose_name='Celery任务ID')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='创建人')),
+            ],
+            options={
+                'verbose_name': '规则重新扫描任务',
+                'verbose_name_plural': '规则重新扫描任务',
+                'db_table': 'rules_rule_rescan_job',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
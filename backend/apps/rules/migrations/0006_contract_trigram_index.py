@@ -0,0 +1,44 @@
+# Generated manually
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0001_initial'),
+        ('rules', '0005_rulerescanjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractTrigramIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_hash', models.CharField(max_length=64, verbose_name='文本哈希')),
+                ('trigram_count', models.IntegerField(default=0, verbose_name='三元组数量')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('contract', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trigram_index', to='contracts.contract', verbose_name='合同')),
+            ],
+            options={
+                'verbose_name': '合同三元组索引',
+                'verbose_name_plural': '合同三元组索引',
+                'db_table': 'rules_contract_trigram_index',
+            },
+        ),
+        migrations.CreateModel(
+            name='ContractTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3, verbose_name='三元组')),
+                ('contract', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='contracts.contract', verbose_name='合同')),
+            ],
+            options={
+                'verbose_name': '合同三元组',
+                'verbose_name_plural': '合同三元组',
+                'db_table': 'rules_contract_trigram',
+                'unique_together': {('trigram', 'contract')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0006_contract_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewrule',
+            name='benchmark_cost_ms',
+            field=models.FloatField(blank=True, null=True, verbose_name='基准测试单份合同最大耗时(毫秒)'),
+        ),
+        migrations.AddField(
+            model_name='reviewrule',
+            name='benchmark_peak_kb',
+            field=models.FloatField(blank=True, null=True, verbose_name='基准测试内存峰值(KB)'),
+        ),
+        migrations.AddField(
+            model_name='reviewrule',
+            name='benchmark_flagged',
+            field=models.BooleanField(default=False, verbose_name='超出开销预算'),
+        ),
+        migrations.AddField(
+            model_name='reviewrule',
+            name='benchmarked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='基准测试时间'),
+        ),
+    ]
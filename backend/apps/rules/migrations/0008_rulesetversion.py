@@ -0,0 +1,26 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0007_reviewrule_benchmark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RulesetVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=1, verbose_name='版本号')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '规则集版本',
+                'verbose_name_plural': '规则集版本',
+                'db_table': 'rules_ruleset_version',
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from apps.users.models import User
+from apps.contracts.models import Contract
 from apps.reviews.models import ReviewTask
 
 
@@ -29,6 +30,10 @@ class ReviewRule(models.Model):
     description = models.TextField(blank=True, verbose_name='规则描述')
     is_active = models.BooleanField(default=True, verbose_name='是否启用')
     version = models.IntegerField(default=1, verbose_name='规则版本')
+    benchmark_cost_ms = models.FloatField(null=True, blank=True, verbose_name='基准测试单份合同最大耗时(毫秒)')
+    benchmark_peak_kb = models.FloatField(null=True, blank=True, verbose_name='基准测试内存峰值(KB)')
+    benchmark_flagged = models.BooleanField(default=False, verbose_name='超出开销预算')
+    benchmarked_at = models.DateTimeField(null=True, blank=True, verbose_name='基准测试时间')
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='创建人')
     is_deleted = models.BooleanField(default=False, verbose_name='是否删除')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
@@ -39,6 +44,13 @@ class ReviewRule(models.Model):
         verbose_name = '审核规则'
         verbose_name_plural = '审核规则'
         ordering = ['-priority', '-created_at']
+        indexes = [
+            # 规则引擎按启用状态、类型、行业筛选并按优先级排序
+            models.Index(
+                fields=['is_active', 'is_deleted', 'rule_type', 'industry', '-priority'],
+                name='rules_applicable_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.rule_name
@@ -63,3 +75,140 @@ class RuleMatch(models.Model):
     def __str__(self):
         return f'{self.rule.rule_name} - 匹配记录'
 
+
+
+class RuleStat(models.Model):
+    """规则命中统计表（由规则引擎定期从内存计数器刷新）"""
+    rule = models.OneToOneField(ReviewRule, on_delete=models.CASCADE, related_name='stat', verbose_name='规则')
+    evaluations = models.BigIntegerField(default=0, verbose_name='匹配次数')
+    hits = models.BigIntegerField(default=0, verbose_name='命中次数')
+    total_time_ms = models.FloatField(default=0, verbose_name='累计匹配耗时(毫秒)')
+    max_time_ms = models.FloatField(default=0, verbose_name='最大匹配耗时(毫秒)')
+    last_hit_at = models.DateTimeField(null=True, blank=True, verbose_name='最近命中时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'rules_rule_stat'
+        verbose_name = '规则统计'
+        verbose_name_plural = '规则统计'
+
+    def __str__(self):
+        return f'{self.rule.rule_name} - 命中{self.hits}/{self.evaluations}'
+
+
+class RulesetVersion(models.Model):
+    """规则集版本号表（单行计数器，规则任何变更都会递增；缓存只保存其副本）"""
+    version = models.BigIntegerField(default=1, verbose_name='版本号')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'rules_ruleset_version'
+        verbose_name = '规则集版本'
+        verbose_name_plural = '规则集版本'
+
+    def __str__(self):
+        return f'规则集版本 v{self.version}'
+
+
+class RuleBacktest(models.Model):
+    """规则回测任务表"""
+    STATUS_CHOICES = [
+        ('pending', '待执行'),
+        ('running', '执行中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+    
+    rule_ids = models.JSONField(default=list, blank=True, verbose_name='回测规则ID列表')
+    draft_rule = models.JSONField(null=True, blank=True, verbose_name='草稿规则')
+    ruleset_version = models.IntegerField(null=True, blank=True, verbose_name='规则集版本')
+    sample_size = models.IntegerField(null=True, blank=True, verbose_name='抽样合同数')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    progress = models.JSONField(default=dict, blank=True, verbose_name='进度信息')
+    result = models.JSONField(null=True, blank=True, verbose_name='回测结果')
+    error_message = models.TextField(blank=True, verbose_name='错误信息')
+    celery_task_id = models.CharField(max_length=255, blank=True, verbose_name='Celery任务ID')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='创建人')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'rules_rule_backtest'
+        verbose_name = '规则回测'
+        verbose_name_plural = '规则回测'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'规则回测 #{self.id} - {self.get_status_display()}'
+
+
+class RuleRescanJob(models.Model):
+    """规则变更后的历史审核结果重新扫描任务（可暂停、可恢复）"""
+    STATUS_CHOICES = [
+        ('pending', '待执行'),
+        ('running', '执行中'),
+        ('paused', '已暂停'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+        ('cancelled', '已取消'),
+    ]
+    
+    rule_ids = models.JSONField(default=list, blank=True, verbose_name='变更规则ID列表')
+    since = models.DateTimeField(null=True, blank=True, verbose_name='规则变更起始时间')
+    ruleset_version = models.IntegerField(null=True, blank=True, verbose_name='规则集版本')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    chunk_size = models.IntegerField(default=100, verbose_name='每批审核结果数')
+    chunk_interval = models.FloatField(default=1.0, verbose_name='批次间隔(秒)')
+    cursor = models.BigIntegerField(default=0, verbose_name='已处理到的审核结果ID')
+    total_count = models.IntegerField(default=0, verbose_name='审核结果总数')
+    processed_count = models.IntegerField(default=0, verbose_name='已处理数')
+    rescanned_count = models.IntegerField(default=0, verbose_name='重新扫描数')
+    progress = models.JSONField(default=dict, blank=True, verbose_name='进度信息')
+    error_message = models.TextField(blank=True, verbose_name='错误信息')
+    celery_task_id = models.CharField(max_length=255, blank=True, verbose_name='Celery任务ID')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='创建人')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'rules_rule_rescan_job'
+        verbose_name = '规则重新扫描任务'
+        verbose_name_plural = '规则重新扫描任务'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'规则重新扫描 #{self.id} - {self.get_status_display()}'
+
+
+class ContractTrigramIndex(models.Model):
+    """合同三元组索引状态表（记录已索引文本的哈希，文本未变化时跳过重建）"""
+    contract = models.OneToOneField(Contract, on_delete=models.CASCADE, related_name='trigram_index', verbose_name='合同')
+    text_hash = models.CharField(max_length=64, verbose_name='文本哈希')
+    trigram_count = models.IntegerField(default=0, verbose_name='三元组数量')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'rules_contract_trigram_index'
+        verbose_name = '合同三元组索引'
+        verbose_name_plural = '合同三元组索引'
+
+    def __str__(self):
+        return f'合同{self.contract_id} - {self.trigram_count}个三元组'
+
+
+class ContractTrigram(models.Model):
+    """合同文本三元组倒排索引表"""
+    trigram = models.CharField(max_length=3, verbose_name='三元组')
+    contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='trigrams', verbose_name='合同')
+
+    class Meta:
+        db_table = 'rules_contract_trigram'
+        verbose_name = '合同三元组'
+        verbose_name_plural = '合同三元组'
+        unique_together = [['trigram', 'contract']]
+
+    def __str__(self):
+        return f'{self.trigram} - 合同{self.contract_id}'
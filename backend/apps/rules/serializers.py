@@ -1,5 +1,11 @@
+import logging
 from rest_framework import serializers
-from .models import ReviewRule, RuleMatch
+from .compiler import validate_rule_content
+from .dsl import DSLError
+from .models import ReviewRule, RuleMatch, RuleBacktest, RuleStat, RuleRescanJob
+from .services_benchmark import RuleBenchmarkService
+
+logger = logging.getLogger(__name__)
 
 
 class ReviewRuleSerializer(serializers.ModelSerializer):
@@ -9,9 +15,38 @@ class ReviewRuleSerializer(serializers.ModelSerializer):
         model = ReviewRule
         fields = ['id', 'rule_code', 'rule_name', 'rule_type', 'industry', 'category',
                   'priority', 'rule_content', 'risk_level', 'legal_basis', 'description',
-                  'is_active', 'version', 'created_by', 'created_by_name',
+                  'is_active', 'version', 'benchmark_cost_ms', 'benchmark_peak_kb',
+                  'benchmark_flagged', 'benchmarked_at', 'created_by', 'created_by_name',
                   'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['benchmark_cost_ms', 'benchmark_peak_kb', 'benchmark_flagged',
+                            'benchmarked_at', 'created_at', 'updated_at']
+
+    def validate_rule_content(self, value):
+        """校验规则内容（模式和条件DSL需能编译）"""
+        try:
+            validate_rule_content(value)
+        except DSLError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+    def validate(self, attrs):
+        """新建规则或规则内容变化时做基准测试：超出硬限制拒绝保存，超出预算标记"""
+        rule_content = attrs.get('rule_content')
+        if rule_content is None or (self.instance and self.instance.rule_content == rule_content):
+            return attrs
+
+        service = RuleBenchmarkService()
+        try:
+            evaluation = service.evaluate(rule_content)
+        except Exception as e:
+            # 子进程被终止（如内存不足）、输出异常或规则执行出错时同样拒绝，不能跳过开销检查
+            logger.warning(f'规则基准测试失败，拒绝保存: {str(e)}')
+            raise serializers.ValidationError({'rule_content': [f'规则基准测试失败：{str(e)}']})
+
+        if evaluation['rejected']:
+            raise serializers.ValidationError({'rule_content': evaluation['reasons']})
+        attrs.update(service.benchmark_fields(evaluation))
+        return attrs
 
 
 class RuleMatchSerializer(serializers.ModelSerializer):
@@ -23,3 +58,80 @@ class RuleMatchSerializer(serializers.ModelSerializer):
                   'matched_clause', 'match_score', 'match_result', 'created_at']
         read_only_fields = ['created_at']
 
+
+
+class RuleStatSerializer(serializers.ModelSerializer):
+    rule_code = serializers.CharField(source='rule.rule_code', read_only=True)
+    rule_name = serializers.CharField(source='rule.rule_name', read_only=True)
+    is_active = serializers.BooleanField(source='rule.is_active', read_only=True)
+    hit_rate = serializers.SerializerMethodField()
+    avg_time_ms = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RuleStat
+        fields = ['rule', 'rule_code', 'rule_name', 'is_active', 'evaluations', 'hits', 'hit_rate',
+                  'total_time_ms', 'avg_time_ms', 'max_time_ms', 'last_hit_at', 'updated_at']
+
+    def get_hit_rate(self, obj):
+        return round(obj.hits / obj.evaluations, 4) if obj.evaluations else 0.0
+
+    def get_avg_time_ms(self, obj):
+        return round(obj.total_time_ms / obj.evaluations, 3) if obj.evaluations else 0.0
+
+
+class RuleBacktestSerializer(serializers.ModelSerializer):
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = RuleBacktest
+        fields = ['id', 'rule_ids', 'draft_rule', 'ruleset_version', 'sample_size',
+                  'status', 'status_display', 'progress', 'result', 'error_message',
+                  'created_by', 'created_by_name', 'started_at', 'completed_at', 'created_at']
+        read_only_fields = ['ruleset_version', 'status', 'progress', 'result', 'error_message',
+                            'created_by', 'started_at', 'completed_at', 'created_at']
+
+    def validate_draft_rule(self, value):
+        """草稿规则需包含有效的规则内容（关键词、正则或模式规则）"""
+        if value is None:
+            return value
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('草稿规则格式错误')
+        rule_content = value.get('rule_content', value)
+        try:
+            validate_rule_content(rule_content)
+        except DSLError as e:
+            raise serializers.ValidationError(f'草稿规则内容无效：{str(e)}')
+        if rule_content.get('type', 'keyword') in ('keyword', 'regex') and not rule_content.get('patterns'):
+            raise serializers.ValidationError('草稿规则缺少匹配模式(patterns)')
+        return value
+
+    def validate_sample_size(self, value):
+        if value is not None and value <= 0:
+            raise serializers.ValidationError('抽样合同数必须大于0')
+        return value
+
+
+class RuleRescanJobSerializer(serializers.ModelSerializer):
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = RuleRescanJob
+        fields = ['id', 'rule_ids', 'since', 'ruleset_version', 'status', 'status_display',
+                  'chunk_size', 'chunk_interval', 'cursor', 'total_count', 'processed_count',
+                  'rescanned_count', 'progress', 'error_message', 'created_by', 'created_by_name',
+                  'started_at', 'completed_at', 'created_at', 'updated_at']
+        read_only_fields = ['ruleset_version', 'status', 'cursor', 'total_count', 'processed_count',
+                            'rescanned_count', 'progress', 'error_message', 'created_by',
+                            'started_at', 'completed_at', 'created_at', 'updated_at']
+
+    def validate_chunk_size(self, value):
+        if value <= 0 or value > 1000:
+            raise serializers.ValidationError('每批审核结果数需在1到1000之间')
+        return value
+
+    def validate_chunk_interval(self, value):
+        if value < 0:
+            raise serializers.ValidationError('批次间隔不能小于0')
+        return value
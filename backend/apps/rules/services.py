@@ -1,27 +1,94 @@
 """
 规则引擎服务模块 - 处理规则匹配和扫描
 """
+import hashlib
 import json
-import re
+import time
 import logging
-from typing import Dict, List, Optional
-from django.db.models import Q
-from apps.rules.models import ReviewRule, RuleMatch
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from apps.clauses.services import ClauseSegmenter, ClauseService
+from apps.rules.compiler import CompiledRule, compile_rule
+from apps.rules.dsl import FIELD_NAMES, RuleContext
+from apps.rules.models import ReviewRule, RuleMatch, RulesetVersion
+from apps.rules.services_parallel import ParallelRuleScanner
+from apps.rules.stats import rule_stats
 from apps.contracts.models import Contract
+from apps.contracts.services_text import ContractTextService
 from apps.reviews.models import ReviewTask
 
 logger = logging.getLogger(__name__)
 
+RULESET_VERSION_KEY = 'rules:ruleset_version'
+RULESET_VERSION_ROW_ID = 1
+RULE_INDEX_KEY_PREFIX = 'rules:applicable'
+CLAUSE_HITS_KEY_PREFIX = 'rules:clause_hits'
+
+
+def get_ruleset_version() -> int:
+    """
+    获取当前规则集版本号（规则任何变更都会使版本号递增）
+
+    版本号保存在数据库中，缓存只作为读取副本（缓存被清空后从数据库恢复，不会回退到旧版本号）。
+    事务内读取的版本号可能尚未提交，不写入缓存。
+    """
+    version = cache.get(RULESET_VERSION_KEY)
+    if version is None:
+        version = RulesetVersion.objects.filter(id=RULESET_VERSION_ROW_ID).values_list(
+            'version', flat=True
+        ).first() or 1
+        if not transaction.get_connection().in_atomic_block:
+            cache.add(RULESET_VERSION_KEY, version, None)
+    return version
+
+
+def bump_ruleset_version() -> int:
+    """递增规则集版本号，使所有基于旧版本的规则缓存失效"""
+    with transaction.atomic():
+        RulesetVersion.objects.get_or_create(id=RULESET_VERSION_ROW_ID)
+        RulesetVersion.objects.filter(id=RULESET_VERSION_ROW_ID).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+        version = RulesetVersion.objects.filter(id=RULESET_VERSION_ROW_ID).values_list(
+            'version', flat=True
+        ).get()
+    # 立即清除缓存副本，事务提交后再清除一次（提交前其他连接可能已把旧版本号写回缓存）
+    cache.delete(RULESET_VERSION_KEY)
+    transaction.on_commit(lambda: cache.delete(RULESET_VERSION_KEY))
+    return version
+
+
+def split_clauses(text: str) -> List[Tuple[int, str]]:
+    """
+    按条款标题切分合同文本
+    
+    Returns:
+        [(条款在全文中的起始位置, 条款文本), ...]，各条款文本按顺序拼接即为全文
+    """
+    return ClauseSegmenter().split(text)
+
 
 class RuleEngineService:
     """规则引擎服务类 - 处理规则匹配和扫描"""
     
+    def __init__(self):
+        self.text_service = ContractTextService()
+        self.clause_service = ClauseService()
+    
     def scan_contract(
         self,
         contract: Contract,
         review_task: Optional[ReviewTask] = None,
         rule_types: Optional[List[str]] = None,
-        industry: Optional[str] = None
+        industry: Optional[str] = None,
+        parallel: Optional[bool] = None,
+        incremental: bool = True,
+        save_matches: bool = True,
+        contract_content: Optional[str] = None
     ) -> Dict:
         """
         扫描合同并匹配规则
@@ -31,13 +98,19 @@ class RuleEngineService:
             review_task: 审核任务对象（可选）
             rule_types: 规则类型列表（可选，如['general', 'industry']）
             industry: 行业（可选，用于筛选行业规则）
+            parallel: 是否分片并行扫描（可选，默认根据合同长度和规则数自动选择）
+            incremental: 是否按条款增量扫描（未变化条款复用缓存的匹配结果）
+            save_matches: 是否立即保存审核任务的匹配记录；为False时匹配记录放在结果的
+                pending_rule_matches 中，由调用方确认后通过 save_pending_matches 保存
+            contract_content: 已提取的合同文本（可选，未提供时读取合同当前版本的文本）
             
         Returns:
             Dict: 包含匹配结果的字典
         """
         try:
             # 提取合同内容
-            contract_content = self._extract_contract_content(contract)
+            if contract_content is None:
+                contract_content = self.text_service.get_text(contract)
             
             # 获取适用的规则
             rules = self._get_applicable_rules(
@@ -47,50 +120,19 @@ class RuleEngineService:
             )
             
             # 匹配规则
-            matches = []
-            for rule in rules:
-                match_result = self._match_rule(rule, contract_content, contract)
-                if match_result['matched']:
-                    matches.append({
-                        'rule': rule,
-                        'match_result': match_result
-                    })
-                    
-                    # 保存匹配记录
-                    if review_task:
-                        RuleMatch.objects.create(
-                            review_task=review_task,
-                            rule=rule,
-                            contract_id=contract.id,
-                            matched_clause=match_result.get('matched_clause', ''),
-                            match_score=match_result.get('score', 0),
-                            match_result=match_result
-                        )
+            matches, scan_stats = self._match_rules(
+                rules, contract_content, contract, parallel, incremental
+            )
             
-            # 计算总体评分和风险等级
-            overall_score, risk_level, risk_count = self._calculate_overall_metrics(matches)
+            scan_result = self._build_scan_result(rules, matches, scan_stats)
             
-            return {
-                'success': True,
-                'total_rules_scanned': len(rules),
-                'total_matches': len(matches),
-                'overall_score': overall_score,
-                'risk_level': risk_level,
-                'risk_count': risk_count,
-                'matches': [
-                    {
-                        'rule_code': match['rule'].rule_code,
-                        'rule_name': match['rule'].rule_name,
-                        'rule_type': match['rule'].get_rule_type_display(),
-                        'risk_level': match['rule'].get_risk_level_display() if match['rule'].risk_level else '未设置',
-                        'matched_clause': match['match_result'].get('matched_clause', ''),
-                        'match_score': match['match_result'].get('score', 0),
-                        'suggestion': match['match_result'].get('suggestion', ''),
-                        'legal_basis': match['rule'].legal_basis
-                    }
-                    for match in matches
-                ]
-            }
+            # 保存匹配记录（重新扫描同一任务时先清除旧记录）
+            if review_task and save_matches:
+                self._save_rule_matches(review_task, contract, matches)
+            elif review_task:
+                scan_result['pending_rule_matches'] = self._build_rule_match_objects(review_task, contract, matches)
+            
+            return scan_result
             
         except Exception as e:
             logger.error(f'规则引擎扫描失败: {str(e)}')
@@ -100,55 +142,391 @@ class RuleEngineService:
                 'matches': []
             }
     
+    def rescan_review_tasks(self, review_tasks: List[ReviewTask]) -> Dict[int, Dict]:
+        """
+        批量重新扫描审核任务的规则匹配（不调用AI）
+        
+        按审核任务审核的合同版本重新扫描（未记录版本的任务使用当前版本），
+        规则匹配记录按批次统一删除和创建。
+        
+        Returns:
+            {review_task_id: 扫描结果}
+        """
+        results = {}
+        rule_matches = []
+        for review_task in review_tasks:
+            contract = review_task.contract
+            version = review_task.contract_version or contract.current_version
+            contract_content = self.text_service.get_version_text(contract, version)
+            rules = self._get_applicable_rules(
+                industry=contract.industry,
+                contract_type=contract.contract_type
+            )
+            matches, scan_stats = self._match_rules(rules, contract_content, contract, version=version)
+            rule_matches.extend(self._build_rule_match_objects(review_task, contract, matches))
+            results[review_task.id] = self._build_scan_result(rules, matches, scan_stats)
+        
+        RuleMatch.objects.filter(review_task__in=review_tasks).delete()
+        RuleMatch.objects.bulk_create(rule_matches)
+        return results
+    
+    def _build_scan_result(self, rules: List[ReviewRule], matches: List[Dict], scan_stats: Dict) -> Dict:
+        """构建扫描结果"""
+        # 计算总体评分和风险等级
+        overall_score, risk_level, risk_count = self._calculate_overall_metrics(matches)
+        
+        return {
+            'success': True,
+            'total_rules_scanned': len(rules),
+            'total_matches': len(matches),
+            'overall_score': overall_score,
+            'risk_level': risk_level,
+            'risk_count': risk_count,
+            'ruleset_version': get_ruleset_version(),
+            'scan_stats': scan_stats,
+            'matches': [
+                {
+                    'rule_id': match['rule'].id,
+                    'rule_code': match['rule'].rule_code,
+                    'rule_name': match['rule'].rule_name,
+                    'rule_type': match['rule'].get_rule_type_display(),
+                    'risk_level': match['rule'].get_risk_level_display() if match['rule'].risk_level else '未设置',
+                    'risk_level_code': match['rule'].risk_level or '',
+                    'matched_clause': match['match_result'].get('matched_clause', ''),
+                    'match_score': match['match_result'].get('score', 0),
+                    'suggestion': match['match_result'].get('suggestion', ''),
+                    'legal_basis': match['rule'].legal_basis
+                }
+                for match in matches
+            ]
+        }
+    
+    def save_pending_matches(self, review_task: ReviewTask, scan_result: Dict) -> int:
+        """保存 scan_contract(save_matches=False) 返回的匹配记录（从结果中移除），返回保存的条数"""
+        rule_matches = scan_result.pop('pending_rule_matches', [])
+        RuleMatch.objects.filter(review_task=review_task).delete()
+        RuleMatch.objects.bulk_create(rule_matches)
+        return len(rule_matches)
+    
+    def _save_rule_matches(self, review_task: ReviewTask, contract: Contract, matches: List[Dict]):
+        """批量保存规则匹配记录"""
+        RuleMatch.objects.filter(review_task=review_task).delete()
+        RuleMatch.objects.bulk_create(self._build_rule_match_objects(review_task, contract, matches))
+    
+    def _build_rule_match_objects(
+        self,
+        review_task: ReviewTask,
+        contract: Contract,
+        matches: List[Dict]
+    ) -> List[RuleMatch]:
+        """构建规则匹配记录"""
+        return [
+            RuleMatch(
+                review_task=review_task,
+                rule=match['rule'],
+                contract_id=contract.id,
+                matched_clause=match['match_result'].get('matched_clause', ''),
+                match_score=match['match_result'].get('score', 0),
+                match_result=match['match_result']
+            )
+            for match in matches
+        ]
+    
     def _get_applicable_rules(
         self,
         rule_types: Optional[List[str]] = None,
         industry: Optional[str] = None,
         contract_type: Optional[str] = None
     ) -> List[ReviewRule]:
-        """获取适用的规则"""
+        """获取适用的规则（按优先级排序）"""
+        rule_ids = self._get_applicable_rule_ids(
+            rule_types=rule_types,
+            industry=industry,
+            contract_type=contract_type
+        )
+        if not rule_ids:
+            return []
+        
+        rules_by_id = ReviewRule.objects.in_bulk(rule_ids)
+        return [rules_by_id[rule_id] for rule_id in rule_ids if rule_id in rules_by_id]
+    
+    def _get_applicable_rule_ids(
+        self,
+        rule_types: Optional[List[str]] = None,
+        industry: Optional[str] = None,
+        contract_type: Optional[str] = None
+    ) -> List[int]:
+        """
+        获取适用规则的ID列表
+        
+        筛选在数据库中完成（命中rules_applicable_idx索引），结果按
+        (行业, 合同类型, 规则类型) 缓存，规则变更时通过规则集版本号失效。
+        """
+        cache_key = self._build_rule_index_key(rule_types, industry, contract_type)
+        rule_ids = cache.get(cache_key)
+        if rule_ids is not None:
+            return rule_ids
+        
         query = Q(is_active=True, is_deleted=False)
         
         # 规则类型过滤
         if rule_types:
             query &= Q(rule_type__in=rule_types)
         
-        # 获取所有规则
-        rules = ReviewRule.objects.filter(query).order_by('-priority')
-        
-        # 过滤行业规则
-        applicable_rules = []
-        for rule in rules:
-            if rule.rule_type == 'general':
-                # 通用规则适用于所有合同
-                applicable_rules.append(rule)
-            elif rule.rule_type == 'industry':
-                # 行业规则需要匹配行业
-                if industry and (not rule.industry or rule.industry == industry):
-                    applicable_rules.append(rule)
-            elif rule.rule_type == 'enterprise':
-                # 企业规则需要匹配企业（这里简化处理，实际可能需要企业ID）
-                applicable_rules.append(rule)
-        
-        return applicable_rules
+        # 通用规则适用于所有合同；企业规则暂不区分企业（实际可能需要企业ID）
+        scope = Q(rule_type__in=['general', 'enterprise'])
+        # 行业规则需要匹配行业（未设置行业的行业规则适用于所有行业）
+        if industry:
+            scope |= Q(rule_type='industry') & (Q(industry='') | Q(industry=industry))
+        query &= scope
+        
+        rule_ids = list(
+            ReviewRule.objects.filter(query)
+            .order_by('-priority', '-created_at', 'id')
+            .values_list('id', flat=True)
+        )
+        cache.set(cache_key, rule_ids, settings.CACHE_TTL.get('rule_index', 3600))
+        return rule_ids
     
-    def _extract_contract_content(self, contract: Contract) -> str:
-        """提取合同内容为文本"""
-        if contract.content:
-            if isinstance(contract.content, dict):
-                # 如果是字典，转换为文本
-                return json.dumps(contract.content, ensure_ascii=False, indent=2)
-            elif isinstance(contract.content, str):
-                return contract.content
-        
-        # 如果有文件路径，可以读取文件（这里简化处理）
-        if contract.file_path:
-            # TODO: 实现文件内容读取
-            pass
-        
-        return contract.title or ""
+    def _build_rule_index_key(
+        self,
+        rule_types: Optional[List[str]],
+        industry: Optional[str],
+        contract_type: Optional[str]
+    ) -> str:
+        """构建规则索引缓存键"""
+        types_part = ','.join(sorted(rule_types)) if rule_types else '*'
+        raw_key = f'{industry or "-"}:{contract_type or "-"}:{types_part}'
+        digest = hashlib.md5(raw_key.encode('utf-8')).hexdigest()
+        return f'{RULE_INDEX_KEY_PREFIX}:v{get_ruleset_version()}:{digest}'
     
-    def _match_rule(self, rule: ReviewRule, contract_content: str, contract: Contract) -> Dict:
+    def _match_rules(
+        self,
+        rules: List[ReviewRule],
+        contract_content: str,
+        contract: Contract,
+        parallel: Optional[bool] = None,
+        incremental: bool = True,
+        version: Optional[int] = None
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        匹配所有规则（version 为合同文本对应的版本号，默认当前版本）
+        
+        Returns:
+            (按规则优先级排序的命中列表, 扫描统计)
+        """
+        compiled_rules = [self._compile_rule(rule) for rule in rules]
+        text_rules = [compiled for compiled in compiled_rules if compiled.is_text_rule]
+        rule_specs = [
+            (compiled.rule_id, self._rule_cache_token(rule), compiled.rule_content)
+            for rule, compiled in zip(rules, compiled_rules)
+            if compiled.is_text_rule
+        ]
+        
+        # 使用合同版本保存的条款位置，不再重复切分
+        clauses = self.clause_service.get_segments(contract, contract_content, version)
+        timings = {}
+        rule_costs = {rule.id: rule.benchmark_cost_ms for rule in rules}
+        hits, scan_stats = self._find_text_hits(
+            text_rules, rule_specs, contract_content, parallel, incremental, clauses, timings,
+            rule_costs
+        )
+        
+        # 模式规则和规则条件在同一个上下文中判断（金额、条款标题等只提取一次）
+        ctx = self._build_rule_context(contract, contract_content, clauses)
+        matches = []
+        stat_records = []
+        for rule, compiled in zip(rules, compiled_rules):
+            started = time.perf_counter()
+            if compiled.is_text_rule:
+                match_result = self._build_match_result(
+                    rule, compiled, hits.get(rule.id), contract_content, ctx
+                )
+            else:
+                match_result = self._match_rule(rule, contract_content, contract, ctx)
+            elapsed_ms = timings.get(rule.id, 0.0) + (time.perf_counter() - started) * 1000
+            stat_records.append((rule.id, elapsed_ms, match_result['matched']))
+            if match_result['matched']:
+                matches.append({
+                    'rule': rule,
+                    'match_result': match_result
+                })
+        
+        rule_stats.record_many(stat_records)
+        return matches, scan_stats
+    
+    def _find_text_hits(
+        self,
+        text_rules: List[CompiledRule],
+        rule_specs: List[Tuple],
+        contract_content: str,
+        parallel: Optional[bool] = None,
+        incremental: bool = True,
+        clauses: Optional[List[Tuple[int, str]]] = None,
+        timings: Optional[Dict] = None,
+        rule_costs: Optional[Dict] = None
+    ) -> Tuple[Dict[int, Tuple[int, int, int]], Dict]:
+        """
+        查找关键词/正则规则的命中位置
+        
+        增量模式下合同按条款切分，每个条款的命中结果按 (规则集版本, 规则集摘要, 条款内容哈希)
+        缓存，只有新增或修改过的条款需要重新匹配。跨条款的命中由条款边界前后 CLAUSE_OVERLAP
+        长度的窗口补充匹配（窗口同样按内容缓存）。需要重新匹配的文本足够大时改为全文分片并行扫描。
+        只有命中与前后文无关且长度不超过 CLAUSE_OVERLAP 的规则按条款匹配；含锚点、前后查找断言
+        或命中长度不受限的正则在条款中单独匹配的结果可能与全文不同，始终在全文上匹配。
+        各规则实际匹配耗时累加到timings中（复用缓存的条款不计耗时）。
+        """
+        scanner = ParallelRuleScanner()
+        overlap = scanner.config['CLAUSE_OVERLAP']
+        clause_rules = [
+            compiled for compiled in text_rules
+            if compiled.context_free and compiled.max_match_length <= overlap
+        ]
+        if not (incremental and clause_rules):
+            clauses = []
+        elif clauses is None:
+            clauses = split_clauses(contract_content)
+        scan_stats = {
+            'mode': 'full',
+            'clauses_total': len(clauses),
+            'clauses_rescanned': len(clauses),
+        }
+        if not text_rules:
+            return {}, scan_stats
+        
+        clause_keys, clause_hits, missed = [], {}, []
+        boundaries, boundary_keys, missed_boundaries = [], [], []
+        full_text_rules = text_rules
+        if len(clauses) > 1:
+            clause_rule_ids = {compiled.rule_id for compiled in clause_rules}
+            full_text_rules = [compiled for compiled in text_rules if compiled.rule_id not in clause_rule_ids]
+            key_prefix = self._build_clause_hits_prefix(
+                [spec for spec in rule_specs if spec[0] in clause_rule_ids]
+            )
+            clause_keys = [
+                self._build_clause_hits_key(key_prefix, clause_text)
+                for _, clause_text in clauses
+            ]
+            # 条款边界窗口：(窗口在全文中的起始位置, 边界在窗口中的位置, 窗口文本)
+            for offset, _ in clauses[1:]:
+                window_start = max(0, offset - overlap)
+                boundaries.append(
+                    (window_start, offset - window_start, contract_content[window_start:offset + overlap])
+                )
+            boundary_keys = [
+                self._build_clause_hits_key(key_prefix, f'boundary:{split}:{window}')
+                for _, split, window in boundaries
+            ]
+            clause_hits = cache.get_many(clause_keys + boundary_keys)
+            missed = [index for index, key in enumerate(clause_keys) if key not in clause_hits]
+            missed_boundaries = [index for index, key in enumerate(boundary_keys) if key not in clause_hits]
+            scan_text_length = sum(len(clauses[index][1]) for index in missed)
+            if full_text_rules:
+                scan_text_length = len(contract_content)
+        else:
+            scan_text_length = len(contract_content)
+        
+        if parallel is None:
+            parallel = scanner.should_parallelize(scan_text_length, len(text_rules))
+        
+        if parallel:
+            return scanner.find_hits(
+                text_rules, rule_specs, contract_content, timings, rule_costs
+            ), scan_stats
+        if not clause_keys:
+            return scanner.find_hits_in_process(text_rules, contract_content, timings), scan_stats
+        
+        # 只重新匹配缓存未命中的条款（条款内位置为相对位置）
+        new_clause_hits = {
+            clause_keys[index]: scanner.find_hits_in_process(clause_rules, clauses[index][1], timings)
+            for index in missed
+        }
+        # 边界窗口只匹配起始位置在边界之前的命中（起始位置在边界之后的由后一条款覆盖）
+        new_clause_hits.update({
+            boundary_keys[index]: scanner.find_hits_in_process(
+                clause_rules, boundaries[index][2], timings, end=boundaries[index][1]
+            )
+            for index in missed_boundaries
+        })
+        if new_clause_hits:
+            cache.set_many(new_clause_hits, settings.CACHE_TTL.get('rule_clause_hits', 86400))
+            clause_hits.update(new_clause_hits)
+        
+        # 按条款顺序合并，每条规则取 (模式序号, 全文位置) 最小的命中，与全文扫描一致；
+        # 起始位置相同时取边界窗口的命中（窗口包含后一条款，匹配范围与全文扫描一致）
+        hits = {}
+        for key, (offset, _) in zip(clause_keys, clauses):
+            for rule_id, (pattern_index, match_start, match_end) in clause_hits[key].items():
+                current = hits.get(rule_id)
+                if current is None or (pattern_index, match_start + offset) < current[:2]:
+                    hits[rule_id] = (pattern_index, match_start + offset, match_end + offset)
+        for key, (offset, _, _) in zip(boundary_keys, boundaries):
+            for rule_id, (pattern_index, match_start, match_end) in clause_hits[key].items():
+                current = hits.get(rule_id)
+                if current is None or (pattern_index, match_start + offset) <= current[:2]:
+                    hits[rule_id] = (pattern_index, match_start + offset, match_end + offset)
+        hits.update(scanner.find_hits_in_process(full_text_rules, contract_content, timings))
+        
+        scan_stats.update({
+            'mode': 'incremental',
+            'clauses_rescanned': len(missed),
+            'boundaries_rescanned': len(missed_boundaries),
+            'full_text_rules': len(full_text_rules),
+        })
+        logger.info(
+            f'规则增量扫描：条款{len(clauses)}个，重新匹配{len(missed)}个，'
+            f'复用缓存{len(clauses) - len(missed)}个，重新匹配条款边界{len(missed_boundaries)}个，'
+            f'全文匹配规则{len(full_text_rules)}条'
+        )
+        return hits, scan_stats
+    
+    def _build_clause_hits_prefix(self, rule_specs: List[Tuple]) -> str:
+        """构建条款匹配结果缓存键前缀（规则集版本 + 参与匹配的规则及其版本摘要）"""
+        raw = ','.join(f'{rule_id}:{cache_token}' for rule_id, cache_token, _ in rule_specs)
+        rules_digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+        return f'{CLAUSE_HITS_KEY_PREFIX}:v{get_ruleset_version()}:{rules_digest}'
+    
+    def _build_clause_hits_key(self, key_prefix: str, clause_text: str) -> str:
+        """构建条款匹配结果缓存键"""
+        clause_hash = hashlib.sha1(clause_text.encode('utf-8')).hexdigest()
+        return f'{key_prefix}:{clause_hash}'
+    
+    def _rule_cache_token(self, rule: ReviewRule) -> str:
+        """规则编译缓存标识（规则更新后自动失效）"""
+        return f'{rule.version}:{rule.updated_at.isoformat() if rule.updated_at else ""}'
+    
+    def _compile_rule(self, rule: ReviewRule) -> CompiledRule:
+        """编译规则（同一规则版本只编译一次）"""
+        rule_content = rule.rule_content
+        if isinstance(rule_content, str):
+            try:
+                rule_content = json.loads(rule_content)
+            except json.JSONDecodeError:
+                logger.warning(f'规则内容不是有效的JSON: {rule.rule_code}')
+                rule_content = {}
+        if not isinstance(rule_content, dict):
+            rule_content = {}
+        return compile_rule(rule.id, rule_content, self._rule_cache_token(rule))
+    
+    def _build_rule_context(
+        self,
+        contract: Contract,
+        contract_content: str,
+        clauses: Optional[List[Tuple[int, str]]] = None
+    ) -> RuleContext:
+        """构建规则判断上下文"""
+        fields = {name: getattr(contract, name, None) for name in FIELD_NAMES}
+        if clauses is None:
+            clauses = split_clauses(contract_content)
+        return RuleContext(contract_content, fields=fields, clauses=clauses)
+    
+    def _match_rule(
+        self,
+        rule: ReviewRule,
+        contract_content: str,
+        contract: Contract,
+        ctx: Optional[RuleContext] = None
+    ) -> Dict:
         """
         匹配单个规则
         
@@ -156,77 +534,49 @@ class RuleEngineService:
             rule: 规则对象
             contract_content: 合同内容文本
             contract: 合同对象
+            ctx: 规则判断上下文（可选，批量匹配时共享）
             
         Returns:
             Dict: 匹配结果
         """
+        # 规则内容结构示例：
+        # {
+        #   "type": "keyword",  # keyword/regex/pattern
+        #   "patterns": ["关键词1", "关键词2"],        # keyword/regex规则
+        #   "pattern": {"clause_missing": "违约责任"},  # pattern规则（DSL，见apps.rules.dsl）
+        #   "conditions": {...},                      # 条件（DSL）
+        #   "action": "warning"  # warning/error/suggestion
+        # }
         try:
-            rule_content = rule.rule_content
-            if isinstance(rule_content, str):
-                rule_content = json.loads(rule_content)
-            
-            # 规则内容结构示例：
-            # {
-            #   "type": "keyword",  # keyword/regex/pattern
-            #   "patterns": ["关键词1", "关键词2"],
-            #   "conditions": {...},
-            #   "action": "warning"  # warning/error/suggestion
-            # }
+            compiled = self._compile_rule(rule)
+            if ctx is None:
+                ctx = self._build_rule_context(contract, contract_content)
             
-            rule_type = rule_content.get('type', 'keyword')
-            patterns = rule_content.get('patterns', [])
-            conditions = rule_content.get('conditions', {})
-            action = rule_content.get('action', 'warning')
+            if compiled.is_text_rule:
+                hit = compiled.find(contract_content)
+                return self._build_match_result(rule, compiled, hit, contract_content, ctx)
             
             matched = False
             matched_clause = ""
             score = 0.0
             suggestion = ""
             
-            if rule_type == 'keyword':
-                # 关键词匹配
-                for pattern in patterns:
-                    if pattern.lower() in contract_content.lower():
-                        matched = True
-                        # 查找匹配的条款
-                        matched_clause = self._find_matched_clause(pattern, contract_content)
-                        score = 0.8  # 关键词匹配默认分数
-                        suggestion = rule.description or f"发现关键词：{pattern}"
-                        break
-            
-            elif rule_type == 'regex':
-                # 正则表达式匹配
-                for pattern in patterns:
-                    try:
-                        matches = re.finditer(pattern, contract_content, re.IGNORECASE)
-                        if matches:
-                            matched = True
-                            matched_clause = self._find_matched_clause(pattern, contract_content)
-                            score = 0.9  # 正则匹配分数更高
-                            suggestion = rule.description or f"匹配到模式：{pattern}"
-                            break
-                    except re.error:
-                        logger.warning(f'无效的正则表达式: {pattern}')
-                        continue
-            
-            elif rule_type == 'pattern':
+            if compiled.rule_type == 'pattern':
                 # 模式匹配（更复杂的匹配逻辑）
-                matched, matched_clause, score = self._pattern_match(
-                    rule_content, contract_content
-                )
+                matched, matched_clause, score = self._pattern_match(compiled, ctx)
                 if matched:
                     suggestion = rule.description or "发现匹配模式"
             
             # 应用条件过滤
-            if matched and conditions:
-                matched = self._check_conditions(conditions, contract, contract_content)
+            if matched:
+                matched = self._check_conditions(compiled, ctx)
             
             return {
                 'matched': matched,
                 'matched_clause': matched_clause,
                 'score': score,
                 'suggestion': suggestion,
-                'action': action
+                'action': compiled.action
             }
             
         except Exception as e:
@@ -239,28 +589,90 @@ class RuleEngineService:
                 'action': 'warning'
             }
     
-    def _find_matched_clause(self, pattern: str, content: str, context_lines: int = 3) -> str:
-        """查找匹配的条款上下文"""
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            if pattern.lower() in line.lower():
-                # 返回匹配行及其上下文
-                start = max(0, i - context_lines)
-                end = min(len(lines), i + context_lines + 1)
-                return '\n'.join(lines[start:end])
-        return ""
+    def _build_match_result(
+        self,
+        rule: ReviewRule,
+        compiled: CompiledRule,
+        hit: Optional[tuple],
+        contract_content: str,
+        ctx: RuleContext
+    ) -> Dict:
+        """根据关键词/正则命中位置构建匹配结果"""
+        if not hit:
+            return {
+                'matched': False,
+                'matched_clause': '',
+                'score': 0.0,
+                'suggestion': '',
+                'action': compiled.action
+            }
+        
+        pattern_index, match_start, match_end = hit
+        pattern = compiled.patterns[pattern_index]
+        if compiled.rule_type == 'keyword':
+            score = 0.8  # 关键词匹配默认分数
+            suggestion = rule.description or f"发现关键词：{pattern}"
+        else:
+            score = 0.9  # 正则匹配分数更高
+            suggestion = rule.description or f"匹配到模式：{pattern}"
+        
+        # 应用条件过滤
+        matched = self._check_conditions(compiled, ctx)
+        
+        return {
+            'matched': matched,
+            'matched_clause': self._extract_match_context(contract_content, match_start, match_end),
+            'score': score,
+            'suggestion': suggestion,
+            'action': compiled.action,
+            'pattern': pattern,
+            'position': [match_start, match_end]
+        }
+    
+    def _extract_match_context(self, content: str, start: int, end: int, context_lines: int = 3) -> str:
+        """提取匹配位置前后若干行作为匹配的条款上下文"""
+        context_start = start
+        for _ in range(context_lines + 1):
+            newline = content.rfind('\n', 0, context_start)
+            if newline == -1:
+                context_start = 0
+                break
+            context_start = newline
+        else:
+            context_start += 1
+        if context_start > 0 and content[context_start] == '\n':
+            context_start += 1
+        
+        context_end = end
+        for _ in range(context_lines + 1):
+            newline = content.find('\n', context_end)
+            if newline == -1:
+                context_end = len(content)
+                break
+            context_end = newline + 1
+        
+        return content[context_start:context_end].rstrip('\n')
     
-    def _pattern_match(self, rule_content: Dict, contract_content: str) -> tuple:
-        """模式匹配（更复杂的匹配逻辑）"""
-        # 这里可以实现更复杂的模式匹配逻辑
-        # 例如：检查合同结构、条款完整性等
-        return False, "", 0.0
+    def _pattern_match(self, compiled: CompiledRule, ctx: RuleContext) -> tuple:
+        """
+        模式匹配（检查合同结构、条款完整性、金额等）
+        
+        Returns:
+            (是否匹配, 匹配的条款上下文, 匹配分数)
+        """
+        hit = compiled.find_pattern(ctx)
+        if hit is None:
+            return False, "", 0.0
+        
+        matched_clause = ""
+        _, match_start, match_end = hit
+        if match_end:
+            matched_clause = self._extract_match_context(ctx.text, match_start, match_end)
+        return True, matched_clause, 0.85
     
-    def _check_conditions(self, conditions: Dict, contract: Contract, content: str) -> bool:
-        """检查条件是否满足"""
-        # 这里可以实现条件检查逻辑
-        # 例如：检查合同类型、金额范围等
-        return True
+    def _check_conditions(self, compiled: CompiledRule, ctx: RuleContext) -> bool:
+        """检查条件是否满足（合同类型、金额范围、条款是否存在等）"""
+        return compiled.check_conditions(ctx)
     
     def _calculate_overall_metrics(self, matches: List[Dict]) -> tuple:
         """计算总体评分和风险等级"""
@@ -0,0 +1,337 @@
+"""
+规则回测服务模块 - 在历史合同上回测规则的命中情况和耗时
+"""
+import logging
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.utils import timezone
+
+from apps.contracts.models import Contract
+from apps.rules.compiler import backtest_documents, compile_rule
+from apps.rules.dsl import FIELD_NAMES
+from apps.rules.models import ReviewRule, RuleBacktest
+from apps.rules.services import RuleEngineService, get_ruleset_version, split_clauses
+from apps.rules.services_parallel import can_start_workers, get_mp_context
+from apps.rules.services_trigram import TrigramIndexService
+
+logger = logging.getLogger(__name__)
+
+DRAFT_RULE_KEY = 'draft'
+
+DEFAULT_BACKTEST_SETTINGS = {
+    'MAX_WORKERS': None,  # 默认使用CPU核数
+    'BATCH_SIZE': 50,  # 每个工作任务处理的合同数
+    'EXAMPLE_COUNT': 5,  # 每条规则保留的命中示例数
+    'SLOW_P99_MS': 20.0,  # 单份合同匹配耗时p99超过该值视为慢规则
+    'BROAD_HIT_RATE': 0.5,  # 命中合同比例超过该值视为过宽规则
+}
+
+
+def get_backtest_settings() -> Dict:
+    """获取规则回测配置"""
+    config = dict(DEFAULT_BACKTEST_SETTINGS)
+    config.update(getattr(settings, 'RULE_BACKTEST', {}))
+    if not config['MAX_WORKERS']:
+        config['MAX_WORKERS'] = os.cpu_count() or 1
+    return config
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """计算百分位数（最近秩法，输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RuleBacktestService:
+    """规则回测服务类"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or get_backtest_settings()
+        self.rule_engine = RuleEngineService()
+
+    def run(
+        self,
+        backtest: RuleBacktest,
+        progress_callback: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        执行回测任务
+
+        Args:
+            backtest: 回测任务对象
+            progress_callback: 进度回调（可选，如管理命令输出进度）
+
+        Returns:
+            Dict: 回测结果
+        """
+        backtest.status = 'running'
+        backtest.started_at = timezone.now()
+        backtest.ruleset_version = get_ruleset_version()
+        backtest.save(update_fields=['status', 'started_at', 'ruleset_version'])
+
+        try:
+            rule_specs, rule_info = self._build_rule_specs(backtest)
+            if not rule_specs:
+                raise ValueError('没有可回测的规则')
+
+            contract_ids = self._select_contract_ids(backtest.sample_size)
+            # 用三元组索引排除不可能命中的合同，只读取候选合同的全文
+            scan_ids = self._prefilter_contract_ids(rule_specs, contract_ids, backtest.sample_size)
+
+            def on_progress(processed: int):
+                progress = {
+                    'processed': processed,
+                    'total': len(scan_ids),
+                    'progress': int(processed * 100 / len(scan_ids)) if scan_ids else 100,
+                    'message': f'已回测 {processed}/{len(scan_ids)} 份候选合同（共 {len(contract_ids)} 份）',
+                }
+                RuleBacktest.objects.filter(id=backtest.id).update(progress=progress)
+                if progress_callback:
+                    progress_callback(progress)
+
+            batch_results = self._run_batches(
+                rule_specs, scan_ids, on_progress, self._needs_context(rule_specs)
+            )
+            result = self._build_report(rule_info, batch_results, len(contract_ids))
+            result['scanned_count'] = len(scan_ids)
+
+            backtest.status = 'completed'
+            backtest.result = result
+            backtest.progress = {
+                'processed': len(scan_ids),
+                'total': len(scan_ids),
+                'progress': 100,
+                'message': '回测完成',
+            }
+            backtest.completed_at = timezone.now()
+            backtest.save()
+            return result
+
+        except Exception as e:
+            logger.error(f'规则回测失败 - 回测ID: {backtest.id}, 错误: {str(e)}')
+            backtest.status = 'failed'
+            backtest.error_message = str(e)
+            backtest.completed_at = timezone.now()
+            backtest.save()
+            raise
+
+    def _build_rule_specs(self, backtest: RuleBacktest) -> Tuple[List[Tuple], Dict]:
+        """
+        构建回测规则列表
+
+        Returns:
+            ([(rule_key, cache_token, rule_content), ...], {rule_key: 规则信息})
+        """
+        rule_specs = []
+        rule_info = {}
+
+        if backtest.rule_ids:
+            rules = ReviewRule.objects.filter(id__in=backtest.rule_ids, is_deleted=False)
+        elif not backtest.draft_rule:
+            # 未指定规则时回测当前整个规则集
+            rules = ReviewRule.objects.filter(is_active=True, is_deleted=False)
+        else:
+            rules = ReviewRule.objects.none()
+
+        for rule in rules.order_by('-priority', '-created_at', 'id'):
+            compiled = self.rule_engine._compile_rule(rule)
+            rule_specs.append((rule.id, self.rule_engine._rule_cache_token(rule), compiled.rule_content))
+            rule_info[rule.id] = {
+                'rule_id': rule.id,
+                'rule_code': rule.rule_code,
+                'rule_name': rule.rule_name,
+            }
+
+        if backtest.draft_rule:
+            draft = backtest.draft_rule
+            rule_content = draft.get('rule_content', draft)
+            rule_specs.append((DRAFT_RULE_KEY, None, rule_content))
+            rule_info[DRAFT_RULE_KEY] = {
+                'rule_id': None,
+                'rule_code': draft.get('rule_code', ''),
+                'rule_name': draft.get('rule_name', '草稿规则'),
+            }
+
+        return rule_specs, rule_info
+
+    def _select_contract_ids(self, sample_size: Optional[int]) -> List[int]:
+        """选择回测合同（抽样使用固定种子，便于对比同一规则修改前后的结果）"""
+        contract_ids = list(
+            Contract.objects.filter(is_deleted=False).order_by('id').values_list('id', flat=True)
+        )
+        if sample_size and sample_size < len(contract_ids):
+            contract_ids = sorted(random.Random(sample_size).sample(contract_ids, sample_size))
+        return contract_ids
+
+    def _prefilter_contract_ids(
+        self,
+        rule_specs: List[Tuple],
+        contract_ids: List[int],
+        sample_size: Optional[int]
+    ) -> List[int]:
+        """按规则必需字面量预筛选候选合同（匹配耗时只统计候选合同）"""
+        candidates = TrigramIndexService().candidate_contract_ids(
+            [rule_content for _, _, rule_content in rule_specs],
+            contract_ids if sample_size else None
+        )
+        if candidates is None:
+            return contract_ids
+        return [contract_id for contract_id in contract_ids if contract_id in candidates]
+
+    def _needs_context(self, rule_specs: List[Tuple]) -> bool:
+        """是否有规则需要合同字段和条款（模式规则、带条件的规则）"""
+        for rule_key, cache_token, rule_content in rule_specs:
+            compiled = compile_rule(rule_key, rule_content, cache_token)
+            if not compiled.is_text_rule or compiled.conditions:
+                return True
+        return False
+
+    def _iter_document_batches(self, contract_ids: List[int], with_context: bool = False):
+        """按批加载合同文本（with_context时同时准备合同字段和条款切分结果）"""
+        batch_size = self.config['BATCH_SIZE']
+        for index in range(0, len(contract_ids), batch_size):
+            batch_ids = contract_ids[index:index + batch_size]
+            contracts = list(Contract.objects.filter(id__in=batch_ids).only(
+                'id', 'file_path', 'current_version', *FIELD_NAMES
+            ))
+            texts = self.rule_engine.text_service.get_texts(contracts)
+            if not with_context:
+                yield list(texts.items())
+                continue
+            yield [
+                (
+                    contract.id,
+                    texts[contract.id],
+                    {name: getattr(contract, name, None) for name in FIELD_NAMES},
+                    split_clauses(texts[contract.id]),
+                )
+                for contract in contracts
+            ]
+
+    def _run_batches(
+        self,
+        rule_specs: List[Tuple],
+        contract_ids: List[int],
+        on_progress: Callable[[int], None],
+        with_context: bool = False
+    ) -> List[Dict]:
+        """在进程池中按批回测，进程池不可用时（如在Celery守护进程中）回退到进程内执行"""
+        example_count = self.config['EXAMPLE_COUNT']
+        if can_start_workers():
+            batch_results = self._run_batches_in_pool(rule_specs, contract_ids, on_progress, with_context)
+            if batch_results is not None:
+                return batch_results
+
+        # 回退时从头执行，保证结果完整
+        batch_results = []
+        processed = 0
+        for documents in self._iter_document_batches(contract_ids, with_context):
+            batch_results.append(backtest_documents(rule_specs, documents, example_count))
+            processed += len(documents)
+            on_progress(processed)
+        return batch_results
+
+    def _run_batches_in_pool(
+        self,
+        rule_specs: List[Tuple],
+        contract_ids: List[int],
+        on_progress: Callable[[int], None],
+        with_context: bool
+    ) -> Optional[List[Dict]]:
+        """在进程池中按批回测，进程池不可用时返回None"""
+        example_count = self.config['EXAMPLE_COUNT']
+        batch_results = []
+        processed = 0
+
+        batches = self._iter_document_batches(contract_ids, with_context)
+        try:
+            with ProcessPoolExecutor(max_workers=self.config['MAX_WORKERS'], mp_context=get_mp_context()) as executor:
+                # 控制在途批次数，避免一次性加载全部合同文本
+                pending = []
+                for documents in batches:
+                    pending.append((len(documents), executor.submit(
+                        backtest_documents, rule_specs, documents, example_count
+                    )))
+                    if len(pending) >= self.config['MAX_WORKERS'] * 2:
+                        count, future = pending.pop(0)
+                        batch_results.append(future.result())
+                        processed += count
+                        on_progress(processed)
+                for count, future in pending:
+                    batch_results.append(future.result())
+                    processed += count
+                    on_progress(processed)
+            return batch_results
+        except Exception as e:
+            logger.warning(f'规则回测进程池不可用，回退到进程内执行: {str(e)}')
+            return None
+
+    def _build_report(self, rule_info: Dict, batch_results: List[Dict], contract_count: int) -> Dict:
+        """汇总各批次结果，生成回测报告"""
+        example_count = self.config['EXAMPLE_COUNT']
+        titles = {}
+        rules = []
+
+        for rule_key, info in rule_info.items():
+            times = []
+            hit_count = 0
+            examples = []
+            for batch in batch_results:
+                rule_result = batch.get(rule_key)
+                if not rule_result:
+                    continue
+                times.extend(rule_result['times'])
+                hit_count += rule_result['hit_count']
+                examples.extend(rule_result['examples'][:example_count - len(examples)])
+
+            times.sort()
+            hit_rate = hit_count / contract_count if contract_count else 0.0
+            p99_ms = percentile(times, 99)
+            warnings = []
+            if p99_ms > self.config['SLOW_P99_MS']:
+                warnings.append('slow')
+            if hit_rate > self.config['BROAD_HIT_RATE']:
+                warnings.append('broad')
+
+            titles.update({contract_id: None for contract_id, _, _, _ in examples})
+            rules.append({
+                **info,
+                'hit_count': hit_count,
+                'hit_rate': round(hit_rate, 4),
+                'p50_ms': round(percentile(times, 50), 3),
+                'p99_ms': round(p99_ms, 3),
+                'max_ms': round(times[-1], 3) if times else 0.0,
+                'total_ms': round(sum(times), 3),
+                'warnings': warnings,
+                'examples': [
+                    {
+                        'contract_id': contract_id,
+                        'pattern_index': pattern_index,
+                        'position': match_start,
+                        'snippet': snippet,
+                    }
+                    for contract_id, pattern_index, match_start, snippet in examples
+                ],
+            })
+
+        # 补充示例合同标题
+        titles = dict(Contract.objects.filter(id__in=list(titles)).values_list('id', 'title'))
+        for rule in rules:
+            for example in rule['examples']:
+                example['contract_title'] = titles.get(example['contract_id'], '')
+
+        # 慢规则排在前面，便于定位
+        rules.sort(key=lambda rule: rule['p99_ms'], reverse=True)
+        return {
+            'contract_count': contract_count,
+            'rule_count': len(rules),
+            'slow_rule_count': sum(1 for rule in rules if 'slow' in rule['warnings']),
+            'broad_rule_count': sum(1 for rule in rules if 'broad' in rule['warnings']),
+            'rules': rules,
+        }
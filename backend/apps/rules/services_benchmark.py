@@ -0,0 +1,107 @@
+"""
+规则基准测试服务模块 - 规则创建/修改时测量开销，超出预算的规则被拒绝或标记
+"""
+import logging
+from typing import Dict, Optional
+from django.conf import settings
+from django.utils import timezone
+
+from apps.rules.benchmark import IsolationUnavailableError, benchmark_rule_isolated
+from apps.rules.models import ReviewRule
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_SETTINGS = {
+    'SOFT_TIME_MS': 20.0,  # 单份合同耗时超过该值标记规则
+    'HARD_TIME_MS': 200.0,  # 单份合同耗时超过该值拒绝保存
+    'SOFT_MEMORY_KB': 2048.0,
+    'HARD_MEMORY_KB': 32768.0,
+    'TIMEOUT_SECONDS': 5.0,  # 基准测试超时视为超出硬限制（如灾难性回溯的正则）
+}
+
+
+def get_budget_settings() -> Dict:
+    """获取规则开销预算配置"""
+    config = dict(DEFAULT_BUDGET_SETTINGS)
+    config.update(getattr(settings, 'RULE_AUTHORING_BUDGET', {}))
+    return config
+
+
+class RuleBenchmarkService:
+    """规则基准测试服务类"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or get_budget_settings()
+
+    def evaluate(self, rule_content: Dict) -> Dict:
+        """
+        测量规则开销并与预算比较
+
+        Returns:
+            {'cost_ms', 'peak_kb', 'compile_ms', 'rejected', 'flagged', 'reasons': [说明, ...]}
+        """
+        try:
+            result = benchmark_rule_isolated(rule_content, self.config['TIMEOUT_SECONDS'])
+        except IsolationUnavailableError as e:
+            logger.error(str(e))
+            return {
+                'cost_ms': None,
+                'peak_kb': None,
+                'compile_ms': None,
+                'rejected': True,
+                'flagged': True,
+                'reasons': ['无法在隔离的子进程中完成基准测试，暂不能保存规则内容，请稍后重试'],
+            }
+        if result.get('timed_out'):
+            return {
+                'cost_ms': None,
+                'peak_kb': None,
+                'compile_ms': None,
+                'rejected': True,
+                'flagged': True,
+                'reasons': [f'基准测试超过{self.config["TIMEOUT_SECONDS"]}秒未完成，规则可能存在灾难性回溯'],
+            }
+
+        cost_ms, peak_kb = result['max_ms'], result['peak_kb']
+        reasons = []
+        rejected = False
+        if cost_ms > self.config['HARD_TIME_MS']:
+            rejected = True
+            reasons.append(f'单份合同匹配耗时{cost_ms}ms，超过上限{self.config["HARD_TIME_MS"]}ms')
+        elif cost_ms > self.config['SOFT_TIME_MS']:
+            reasons.append(f'单份合同匹配耗时{cost_ms}ms，超过预算{self.config["SOFT_TIME_MS"]}ms')
+        if peak_kb > self.config['HARD_MEMORY_KB']:
+            rejected = True
+            reasons.append(f'内存峰值{peak_kb}KB，超过上限{self.config["HARD_MEMORY_KB"]}KB')
+        elif peak_kb > self.config['SOFT_MEMORY_KB']:
+            reasons.append(f'内存峰值{peak_kb}KB，超过预算{self.config["SOFT_MEMORY_KB"]}KB')
+
+        return {
+            'cost_ms': cost_ms,
+            'peak_kb': peak_kb,
+            'compile_ms': result['compile_ms'],
+            'rejected': rejected,
+            'flagged': bool(reasons),
+            'reasons': reasons,
+        }
+
+    def benchmark_fields(self, evaluation: Dict) -> Dict:
+        """转换为规则模型上的基准测试字段"""
+        return {
+            'benchmark_cost_ms': evaluation['cost_ms'],
+            'benchmark_peak_kb': evaluation['peak_kb'],
+            'benchmark_flagged': evaluation['flagged'],
+            'benchmarked_at': timezone.now(),
+        }
+
+    def benchmark_rule(self, rule: ReviewRule) -> Dict:
+        """重新测量已有规则并保存结果（超出硬限制的规则只标记，不自动停用）"""
+        evaluation = self.evaluate(rule.rule_content)
+        fields = self.benchmark_fields(evaluation)
+        # 只写基准测试字段：不修改updated_at，避免被当作规则变更而触发重新扫描
+        ReviewRule.objects.filter(id=rule.id).update(**fields)
+        for name, value in fields.items():
+            setattr(rule, name, value)
+        if evaluation['reasons']:
+            logger.warning(f'规则超出开销预算 - 规则ID: {rule.id}, {"；".join(evaluation["reasons"])}')
+        return evaluation
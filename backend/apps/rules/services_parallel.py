@@ -0,0 +1,238 @@
+"""
+规则并行扫描服务模块 - 大合同、大规则集的分片并行扫描
+"""
+import heapq
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+
+from apps.rules.compiler import CompiledRule, scan_shard
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARALLEL_SETTINGS = {
+    'ENABLED': True,
+    'MAX_WORKERS': None,  # 默认使用CPU核数
+    'MIN_TEXT_LENGTH': 200000,  # 合同文本达到该长度（字符）时考虑并行
+    'MIN_RULE_COUNT': 500,  # 规则数达到该数量时考虑并行
+    'SHARD_TEXT_LENGTH': 100000,  # 每个文本分片的长度
+    'SHARD_RULE_COUNT': 250,  # 每个规则分片的规则数
+    'SHARD_OVERLAP': 2000,  # 文本分片边界的重叠长度
+    'CLAUSE_OVERLAP': 200,  # 增量扫描时条款边界前后重新匹配的长度（跨条款命中的长度上限）
+    # 工作进程启动方式：扫描可能在审核线程中发起，fork会把其他线程持有的锁复制到子进程导致死锁
+    'START_METHOD': 'forkserver',
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_parallel_settings() -> Dict:
+    """获取并行扫描配置"""
+    config = dict(DEFAULT_PARALLEL_SETTINGS)
+    config.update(getattr(settings, 'RULE_ENGINE_PARALLEL', {}))
+    if not config['MAX_WORKERS']:
+        config['MAX_WORKERS'] = os.cpu_count() or 1
+    return config
+
+
+def get_mp_context(start_method: Optional[str] = None):
+    """获取进程池的多进程上下文（平台不支持配置的启动方式时使用spawn）"""
+    start_method = start_method or get_parallel_settings()['START_METHOD']
+    if start_method not in multiprocessing.get_all_start_methods():
+        start_method = 'spawn'
+    return multiprocessing.get_context(start_method)
+
+
+def can_start_workers() -> bool:
+    """
+    当前进程能否创建工作进程
+
+    Celery prefork 工作进程是守护进程，不允许创建子进程，此时规则扫描和回测直接在进程内执行
+    （多个任务由Celery的多个工作进程并发处理）。
+    """
+    return not multiprocessing.current_process().daemon
+
+
+def _get_executor(max_workers: int, start_method: Optional[str] = None) -> ProcessPoolExecutor:
+    """获取进程池（进程内复用）"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=get_mp_context(start_method))
+    return _executor
+
+
+def _reset_executor():
+    """进程池异常后重建"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+class ParallelRuleScanner:
+    """规则并行扫描器 - 将规则和合同文本分片后在进程池中扫描"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or get_parallel_settings()
+
+    def should_parallelize(self, text_length: int, rule_count: int) -> bool:
+        """判断是否需要并行扫描（小输入直接在进程内扫描更快）"""
+        if not self.config['ENABLED'] or self.config['MAX_WORKERS'] <= 1 or rule_count == 0:
+            return False
+        if not can_start_workers():
+            return False
+        return (
+            text_length >= self.config['MIN_TEXT_LENGTH']
+            or rule_count >= self.config['MIN_RULE_COUNT']
+        )
+
+    def plan_shards(self, text_length: int, rule_count: int) -> Tuple[int, int]:
+        """
+        根据合同长度和规则数量计算分片数
+
+        Returns:
+            (文本分片数, 规则分片数)
+        """
+        max_workers = self.config['MAX_WORKERS']
+        text_shards = max(1, math.ceil(text_length / self.config['SHARD_TEXT_LENGTH']))
+        rule_shards = max(1, math.ceil(rule_count / self.config['SHARD_RULE_COUNT']))
+
+        # 总任务数控制在工作进程数的2倍以内，优先保留文本分片
+        max_jobs = max_workers * 2
+        text_shards = min(text_shards, max_jobs)
+        rule_shards = min(rule_shards, max(1, max_jobs // text_shards))
+        return text_shards, rule_shards
+
+    def find_hits(
+        self,
+        compiled_rules: List[CompiledRule],
+        rule_specs: List[Tuple],
+        text: str,
+        timings: Optional[Dict] = None,
+        rule_costs: Optional[Dict] = None
+    ) -> Dict[int, Tuple[int, int, int]]:
+        """
+        并行查找规则命中
+
+        Args:
+            compiled_rules: 编译后的文本规则列表
+            rule_specs: 与compiled_rules对应的规则描述 [(rule_id, cache_token, rule_content), ...]
+            text: 合同全文
+            timings: 各规则匹配耗时累加字典（可选，{rule_id: ms}）
+            rule_costs: 各规则的基准测试耗时（可选，{rule_id: ms}），用于均衡各规则分片的开销
+
+        Returns:
+            {rule_id: (模式序号, 起始位置, 结束位置)}
+        """
+        text_shards, rule_shards = self.plan_shards(len(text), len(rule_specs))
+        overlap = self.config['SHARD_OVERLAP']
+        shard_length = math.ceil(len(text) / text_shards) if text else 0
+        rule_groups = self.group_rules(rule_specs, rule_shards, rule_costs)
+
+        jobs = []
+        for text_index in range(text_shards):
+            start = text_index * shard_length
+            end = min(len(text), start + shard_length)
+            if start >= end and text:
+                continue
+            # 分片前后各保留重叠区域，保证跨边界的匹配和前后文断言正确
+            slice_start = max(0, start - overlap)
+            slice_end = min(len(text), end + overlap)
+            shard_text = text[slice_start:slice_end]
+            for group in rule_groups:
+                if group:
+                    jobs.append((group, shard_text, slice_start, start - slice_start, end - slice_start))
+
+        logger.info(
+            f'规则并行扫描：文本长度{len(text)}，规则数{len(rule_specs)}，'
+            f'文本分片{text_shards}，规则分片{rule_shards}，任务数{len(jobs)}'
+        )
+
+        try:
+            executor = _get_executor(self.config['MAX_WORKERS'], self.config.get('START_METHOD'))
+            futures = [executor.submit(scan_shard, *job) for job in jobs]
+            shard_results = [future.result() for future in futures]
+        except Exception as e:
+            # 进程池不可用（如系统限制无法创建子进程、工作进程异常退出），回退到进程内扫描
+            logger.warning(f'规则并行扫描失败，回退到进程内扫描: {str(e)}')
+            _reset_executor()
+            return self.find_hits_in_process(compiled_rules, text, timings)
+
+        if timings is not None:
+            for _, shard_timings in shard_results:
+                for rule_id, elapsed_ms in shard_timings.items():
+                    timings[rule_id] = timings.get(rule_id, 0.0) + elapsed_ms
+        return self._merge_hits([shard_hits for shard_hits, _ in shard_results])
+
+    def group_rules(
+        self,
+        rule_specs: List[Tuple],
+        rule_shards: int,
+        rule_costs: Optional[Dict] = None
+    ) -> List[List[Tuple]]:
+        """
+        将规则分成若干组
+
+        有基准测试耗时时按耗时从高到低依次放入当前总耗时最小的组（未测量的规则取已测量规则的中位数），
+        避免昂贵规则集中在同一分片；否则按轮转方式分组。
+        """
+        rule_costs = rule_costs or {}
+        known_costs = sorted(
+            rule_costs[rule_id] for rule_id, _, _ in rule_specs
+            if rule_costs.get(rule_id) is not None
+        )
+        if rule_shards <= 1 or not known_costs:
+            return [rule_specs[index::rule_shards] for index in range(rule_shards)]
+
+        default_cost = known_costs[len(known_costs) // 2]
+
+        def cost_of(spec):
+            cost = rule_costs.get(spec[0])
+            return default_cost if cost is None else cost
+
+        groups = [[] for _ in range(rule_shards)]
+        heap = [(0.0, index) for index in range(rule_shards)]
+        for spec in sorted(rule_specs, key=cost_of, reverse=True):
+            total, index = heapq.heappop(heap)
+            groups[index].append(spec)
+            heapq.heappush(heap, (total + cost_of(spec), index))
+        return groups
+
+    def find_hits_in_process(
+        self,
+        compiled_rules: List[CompiledRule],
+        text: str,
+        timings: Optional[Dict] = None,
+        end: Optional[int] = None
+    ) -> Dict[int, Tuple[int, int, int]]:
+        """在当前进程中查找规则命中（可选累加各规则匹配耗时；end 限定匹配起始位置上限）"""
+        text_lower = text.lower()
+        hits = {}
+        for compiled in compiled_rules:
+            started = time.perf_counter()
+            hit = compiled.find(text, text_lower, 0, end)
+            if timings is not None:
+                timings[compiled.rule_id] = timings.get(compiled.rule_id, 0.0) + (time.perf_counter() - started) * 1000
+            if hit:
+                hits[compiled.rule_id] = hit
+        return hits
+
+    def _merge_hits(self, shard_results: List[List[Tuple]]) -> Dict[int, Tuple[int, int, int]]:
+        """
+        合并各分片结果
+
+        每条规则取 (模式序号, 起始位置) 最小的命中，与顺序扫描结果一致，
+        且与分片完成顺序无关。
+        """
+        hits = {}
+        for shard_hits in shard_results:
+            for rule_id, pattern_index, match_start, match_end in shard_hits:
+                current = hits.get(rule_id)
+                if current is None or (pattern_index, match_start) < current[:2]:
+                    hits[rule_id] = (pattern_index, match_start, match_end)
+        return hits
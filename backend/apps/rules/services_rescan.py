@@ -0,0 +1,315 @@
+"""
+规则重新扫描服务模块 - 规则变更后按批刷新历史审核结果中的规则匹配（不调用AI）
+"""
+import logging
+import time
+from typing import Dict, List, Optional
+from django.db import transaction
+from django.utils import timezone
+
+from apps.contracts.models import Contract
+from apps.reviews.models import ReviewOpinion, ReviewResult
+from apps.rules.models import ReviewRule, RuleMatch, RuleRescanJob
+from apps.rules.services import RuleEngineService, get_ruleset_version
+from apps.rules.services_trigram import TrigramIndexService
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVEL_ORDER = {'low': 0, 'medium': 1, 'high': 2}
+
+
+class RuleRescanService:
+    """规则重新扫描服务类"""
+
+    def __init__(self):
+        self.rule_engine = RuleEngineService()
+        self._delta_rules = {}
+
+    def create_job(
+        self,
+        rule_ids: Optional[List[int]] = None,
+        since=None,
+        chunk_size: Optional[int] = None,
+        chunk_interval: Optional[float] = None,
+        created_by=None
+    ) -> RuleRescanJob:
+        """
+        创建重新扫描任务
+
+        未指定变更规则时，取上次完成的重新扫描任务之后（或since之后）修改过的规则，
+        包括已停用和已删除的规则（它们的旧匹配记录需要清除）。
+        """
+        if not rule_ids:
+            if since is None:
+                last_job = RuleRescanJob.objects.filter(status='completed').order_by('-created_at').first()
+                since = last_job.created_at if last_job else None
+            rules = ReviewRule.objects.all()
+            if since is not None:
+                rules = rules.filter(updated_at__gt=since)
+            rule_ids = list(rules.values_list('id', flat=True))
+
+        job = RuleRescanJob(
+            rule_ids=rule_ids,
+            since=since,
+            ruleset_version=get_ruleset_version(),
+            total_count=ReviewResult.objects.count() if rule_ids else 0,
+            created_by=created_by,
+        )
+        if chunk_size:
+            job.chunk_size = chunk_size
+        if chunk_interval is not None:
+            job.chunk_interval = chunk_interval
+        job.save()
+        return job
+
+    def process_chunk(self, job: RuleRescanJob) -> bool:
+        """
+        处理一批审核结果并记录检查点
+
+        Returns:
+            bool: 是否还有待处理的审核结果
+        """
+        job.refresh_from_db()
+        if job.status not in ('pending', 'running'):
+            return False
+
+        if job.status == 'pending':
+            job.status = 'running'
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at', 'updated_at'])
+
+        if not job.rule_ids:
+            self._complete(job)
+            return False
+
+        try:
+            with transaction.atomic():
+                results = list(
+                    ReviewResult.objects.filter(id__gt=job.cursor)
+                    .select_related('review_task__contract')
+                    .order_by('id')[:job.chunk_size]
+                )
+                if not results:
+                    self._complete(job)
+                    return False
+
+                affected = self._find_affected_results(job, results)
+                if affected:
+                    scan_results = self.rule_engine.rescan_review_tasks(
+                        [review_result.review_task for review_result in affected]
+                    )
+                    for review_result in affected:
+                        self._apply_scan_result(review_result, scan_results[review_result.review_task_id])
+                    ReviewResult.objects.bulk_update(
+                        affected, ['review_data', 'risk_level', 'risk_count']
+                    )
+
+                # 检查点：任务中断后从下一条审核结果继续
+                job.cursor = results[-1].id
+                job.processed_count += len(results)
+                job.rescanned_count += len(affected)
+                job.progress = {
+                    'progress': min(99, int(job.processed_count * 100 / job.total_count)) if job.total_count else 99,
+                    'message': f'已处理 {job.processed_count}/{job.total_count} 条审核结果，'
+                               f'重新扫描 {job.rescanned_count} 条',
+                }
+                job.save(update_fields=[
+                    'cursor', 'processed_count', 'rescanned_count', 'progress', 'updated_at'
+                ])
+            return True
+
+        except Exception as e:
+            logger.error(f'规则重新扫描失败 - 任务ID: {job.id}, 错误: {str(e)}')
+            job.status = 'failed'
+            job.error_message = str(e)
+            job.completed_at = timezone.now()
+            job.save()
+            return False
+
+    def run_job(self, job: RuleRescanJob, progress_callback=None):
+        """在当前进程中执行任务（按批次间隔限速）"""
+        while self.process_chunk(job):
+            if progress_callback:
+                progress_callback(job.progress)
+            if job.chunk_interval:
+                time.sleep(job.chunk_interval)
+
+    def _complete(self, job: RuleRescanJob):
+        job.status = 'completed'
+        job.completed_at = timezone.now()
+        job.progress = {
+            'progress': 100,
+            'message': f'重新扫描完成，共处理 {job.processed_count} 条审核结果，'
+                       f'重新扫描 {job.rescanned_count} 条',
+        }
+        job.save()
+
+    def _get_delta_rules(self, job: RuleRescanJob) -> List[ReviewRule]:
+        """获取仍然生效的变更规则"""
+        if job.id not in self._delta_rules:
+            self._delta_rules[job.id] = list(
+                ReviewRule.objects.filter(id__in=job.rule_ids, is_active=True, is_deleted=False)
+                .order_by('-priority', '-created_at', 'id')
+            )
+        return self._delta_rules[job.id]
+
+    def _find_affected_results(self, job: RuleRescanJob, results: List[ReviewResult]) -> List[ReviewResult]:
+        """
+        找出受规则变更影响的审核结果
+
+        旧结果中命中过变更规则（规则被修改、停用或删除），或变更规则现在能命中合同的，需要重新扫描。
+        """
+        affected_task_ids = set(
+            RuleMatch.objects.filter(
+                review_task_id__in=[review_result.review_task_id for review_result in results],
+                rule_id__in=job.rule_ids
+            ).values_list('review_task_id', flat=True)
+        )
+
+        delta_rules = self._get_delta_rules(job)
+        # 用三元组索引排除变更规则不可能命中的合同，避免读取全文
+        candidates = None
+        if delta_rules:
+            candidates = TrigramIndexService().candidate_contract_ids(
+                [self.rule_engine._compile_rule(rule).rule_content for rule in delta_rules],
+                [review_result.review_task.contract_id for review_result in results]
+            )
+        
+        affected = []
+        for review_result in results:
+            if review_result.review_task_id in affected_task_ids:
+                affected.append(review_result)
+                continue
+            contract = review_result.review_task.contract
+            if candidates is not None and contract.id not in candidates:
+                continue
+            rules = [rule for rule in delta_rules if self._is_applicable(rule, contract)]
+            if not rules:
+                continue
+            # 按审核时的合同版本判断（合同之后可能已修改）
+            version = review_result.review_task.contract_version or contract.current_version
+            contract_content = self.rule_engine.text_service.get_version_text(contract, version)
+            matches, _ = self.rule_engine._match_rules(
+                rules, contract_content, contract, parallel=False, incremental=False, version=version
+            )
+            if matches:
+                affected.append(review_result)
+        return affected
+
+    def _is_applicable(self, rule: ReviewRule, contract: Contract) -> bool:
+        """规则是否适用于合同（与规则引擎的适用规则筛选一致）"""
+        if rule.rule_type != 'industry':
+            return True
+        return bool(contract.industry) and rule.industry in ('', contract.industry)
+
+    def _apply_scan_result(self, review_result: ReviewResult, scan_result: Dict):
+        """用新的规则扫描结果替换审核结果中规则相关的部分（AI结果保持不变）"""
+        review_data = review_result.review_data if isinstance(review_result.review_data, dict) else {}
+        detailed_data = review_data.setdefault('detailed_data', {})
+        risk_overview = review_data.setdefault('risk_overview', {})
+
+        old_matches = (detailed_data.get('rule_scan_result') or {}).get('matches', [])
+        new_matches = scan_result.get('matches', [])
+
+        # 风险数量：减去旧规则匹配的贡献，加上新规则匹配的贡献
+        for level in ('high', 'medium', 'low'):
+            key = f'{level}_risk_count'
+            old_count = sum(1 for match in old_matches if (match.get('risk_level_code') or 'low') == level)
+            new_count = sum(1 for match in new_matches if (match.get('risk_level_code') or 'low') == level)
+            risk_overview[key] = max(0, risk_overview.get(key, 0) - old_count + new_count)
+        risk_count = max(0, (review_result.risk_count or 0) - len(old_matches) + len(new_matches))
+
+        ai_risk_level = (detailed_data.get('risk_quantification_result') or {}).get('overall_risk_level', 'low')
+        risk_level = max(
+            [ai_risk_level, scan_result.get('risk_level', 'low')],
+            key=lambda level: RISK_LEVEL_ORDER.get(level, 0)
+        )
+
+        risk_overview.update({
+            'risk_count': risk_count,
+            'risk_level': risk_level,
+            'rule_score': scan_result.get('overall_score', 100),
+            'rule_match_count': len(new_matches),
+        })
+        detailed_data['rule_scan_result'] = scan_result
+
+        # 规则建议和法律依据排在AI结果之前
+        rule_suggestions = [
+            {
+                'type': 'rule_suggestion',
+                'priority': 'high' if match.get('risk_level_code') == 'high' else 'medium',
+                'clause': match.get('matched_clause', ''),
+                'suggestion': match.get('suggestion', ''),
+                'legal_basis': match.get('legal_basis', '')
+            }
+            for match in new_matches
+        ]
+        old_suggestions = review_data.get('modification_suggestions', [])
+        self._sync_rule_opinions(
+            review_result,
+            [suggestion for suggestion in old_suggestions if suggestion.get('type') == 'rule_suggestion'],
+            rule_suggestions
+        )
+        review_data['modification_suggestions'] = rule_suggestions + [
+            suggestion for suggestion in old_suggestions
+            if suggestion.get('type') != 'rule_suggestion'
+        ]
+        review_data['legal_basis'] = [
+            match.get('legal_basis', '') for match in new_matches if match.get('legal_basis')
+        ] + [
+            risk.get('legal_basis', '')
+            for risk in (detailed_data.get('risk_identification_result') or {}).get('risks', [])
+            if risk.get('legal_basis')
+        ]
+
+        review_result.review_data = review_data
+        review_result.risk_level = risk_level
+        review_result.risk_count = risk_count
+
+    def _sync_rule_opinions(self, review_result: ReviewResult, old_suggestions: List[Dict], new_suggestions: List[Dict]):
+        """
+        同步规则建议生成的审核意见
+
+        规则建议按 (条款, 建议) 对应审核意见：不再命中的规则建议，其待处理的意见标记为删除
+        （已接受/已拒绝的意见保留处理记录）；新命中的规则建议生成待处理的意见。
+        """
+        def key_of(suggestion):
+            return suggestion.get('clause', ''), suggestion.get('suggestion', '')
+
+        old_keys = {key_of(suggestion) for suggestion in old_suggestions}
+        new_keys = {key_of(suggestion) for suggestion in new_suggestions}
+
+        # 系统生成的意见（reviewer为空）中与旧规则建议对应的部分
+        opinions = ReviewOpinion.objects.filter(
+            review_result=review_result, reviewer__isnull=True, opinion_type='suggestion', is_deleted=False
+        )
+        existing_keys = set()
+        stale_ids = []
+        for opinion in opinions:
+            key = (opinion.clause_content, opinion.suggestion)
+            if key not in old_keys:
+                continue
+            if key in new_keys:
+                existing_keys.add(key)
+            elif opinion.status == 'pending':
+                stale_ids.append(opinion.id)
+        if stale_ids:
+            ReviewOpinion.objects.filter(id__in=stale_ids).update(is_deleted=True, updated_at=timezone.now())
+
+        created_keys = set()
+        new_opinions = []
+        for suggestion in new_suggestions:
+            key = key_of(suggestion)
+            if key in existing_keys or key in created_keys:
+                continue
+            created_keys.add(key)
+            new_opinions.append(ReviewOpinion(
+                review_result=review_result,
+                opinion_type='suggestion',
+                risk_level=suggestion.get('priority', 'medium'),
+                opinion_content=suggestion.get('suggestion', ''),
+                clause_content=suggestion.get('clause', ''),
+                suggestion=suggestion.get('suggestion', ''),
+                status='pending'
+            ))
+        ReviewOpinion.objects.bulk_create(new_opinions)
@@ -0,0 +1,126 @@
+"""
+合同三元组索引服务模块 - 维护合同文本的三元组倒排索引，按规则必需字面量预筛选候选合同
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+from django.db import transaction
+from django.db.models import Count
+
+from apps.contracts.models import Contract
+from apps.contracts.services_text import ContractTextService
+from apps.rules.models import ContractTrigram, ContractTrigramIndex
+from apps.rules.trigrams import extract_trigrams, required_literals
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 2000
+
+
+class TrigramIndexService:
+    """合同三元组索引服务类"""
+
+    def __init__(self):
+        self.text_service = ContractTextService()
+
+    def index_contract(self, contract: Contract, force: bool = False) -> bool:
+        """
+        更新单个合同的三元组索引（文本未变化时跳过）
+
+        Returns:
+            bool: 是否重建了索引
+        """
+        text_hash = self.text_service.get_hash(contract)
+
+        index = ContractTrigramIndex.objects.filter(contract=contract).first()
+        if index and index.text_hash == text_hash and not force:
+            return False
+
+        trigrams = extract_trigrams(self.text_service.get_text(contract))
+        with transaction.atomic():
+            ContractTrigram.objects.filter(contract=contract).delete()
+            # 数据库排序规则可能把不同字符视为相同，忽略唯一约束冲突
+            ContractTrigram.objects.bulk_create(
+                [ContractTrigram(trigram=trigram, contract=contract) for trigram in trigrams],
+                batch_size=INSERT_BATCH_SIZE,
+                ignore_conflicts=True
+            )
+            ContractTrigramIndex.objects.update_or_create(
+                contract=contract,
+                defaults={'text_hash': text_hash, 'trigram_count': len(trigrams)}
+            )
+        return True
+
+    def candidate_contract_ids(
+        self,
+        rule_contents: Iterable[Dict],
+        contract_ids: Optional[Iterable[int]] = None
+    ) -> Optional[Set[int]]:
+        """
+        计算可能命中任一规则的候选合同
+
+        Args:
+            rule_contents: 规则内容列表
+            contract_ids: 限定的合同范围（可选）
+
+        Returns:
+            候选合同ID集合；None表示无法预筛选（需要扫描全部合同）
+        """
+        alternatives = []
+        for rule_content in rule_contents:
+            rule_alternatives = required_literals(rule_content)
+            if rule_alternatives is None:
+                return None
+            alternatives.extend(rule_alternatives)
+
+        scope = set(contract_ids) if contract_ids is not None else None
+        candidates = set()
+        for literals in alternatives:
+            trigrams = set()
+            for literal in literals:
+                trigrams |= extract_trigrams(literal)
+            candidates |= self._contracts_with_trigrams(trigrams, scope)
+
+        # 未建立索引或索引已过期（文本已变化、索引任务尚未完成）的合同无法排除，始终作为候选
+        candidates |= self._unindexed_contract_ids(scope)
+        candidates |= self._stale_contract_ids(scope)
+        return candidates
+
+    def _contracts_with_trigrams(self, trigrams: Set[str], scope: Optional[Set[int]]) -> Set[int]:
+        """包含全部三元组的合同"""
+        queryset = ContractTrigram.objects.filter(trigram__in=trigrams)
+        if scope is not None:
+            queryset = queryset.filter(contract_id__in=scope)
+        return set(
+            queryset.values('contract_id')
+            .annotate(matched=Count('trigram', distinct=True))
+            .filter(matched__gte=len(trigrams))
+            .values_list('contract_id', flat=True)
+        )
+
+    def _unindexed_contract_ids(self, scope: Optional[Set[int]]) -> Set[int]:
+        queryset = Contract.objects.filter(is_deleted=False, trigram_index__isnull=True)
+        if scope is not None:
+            queryset = queryset.filter(id__in=scope)
+        return set(queryset.values_list('id', flat=True))
+
+    def _stale_contract_ids(self, scope: Optional[Set[int]]) -> Set[int]:
+        """索引的文本哈希与合同当前文本哈希不一致的合同"""
+        queryset = ContractTrigramIndex.objects.filter(contract__is_deleted=False)
+        if scope is not None:
+            queryset = queryset.filter(contract_id__in=scope)
+        indexed = dict(queryset.values_list('contract_id', 'text_hash'))
+        if not indexed:
+            return set()
+        contracts = Contract.objects.filter(id__in=list(indexed)).only('id', 'current_version', 'file_path')
+        current = self.text_service.get_stored_hashes(contracts)
+        return {
+            contract_id for contract_id, text_hash in indexed.items()
+            if current.get(contract_id) != text_hash
+        }
+
+    def filter_contract_ids(self, rule_contents: List[Dict], contract_ids: List[int]) -> List[int]:
+        """按规则预筛选合同ID列表（保持原顺序）"""
+        candidates = self.candidate_contract_ids(rule_contents, contract_ids)
+        if candidates is None:
+            return contract_ids
+        return [contract_id for contract_id in contract_ids if contract_id in candidates]
@@ -0,0 +1,53 @@
+"""
+规则变更信号处理 - 规则保存或删除后使规则索引缓存失效；合同保存后更新三元组索引
+"""
+import logging
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.contracts.models import Contract, ContractVersion
+from apps.contracts.services_text import text_fields_updated
+from .models import ReviewRule
+from .services import bump_ruleset_version
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=ReviewRule)
+@receiver(post_delete, sender=ReviewRule)
+def invalidate_rule_index(sender, **kwargs):
+    """规则变更后递增规则集版本号"""
+    bump_ruleset_version()
+
+
+def _schedule_trigram_index(contract_id):
+    """事务提交后异步更新合同三元组索引，Celery 不可用时同步更新"""
+    from .tasks import index_contract_trigrams
+
+    def enqueue():
+        try:
+            index_contract_trigrams.delay(contract_id)
+        except Exception:
+            try:
+                index_contract_trigrams(contract_id)
+            except Exception as e:
+                # 索引更新失败不影响合同保存（未索引的合同在预筛选时始终作为候选）
+                logger.warning(f'合同三元组索引更新失败 - 合同ID: {contract_id}, 错误: {str(e)}')
+
+    transaction.on_commit(enqueue)
+
+
+@receiver(post_save, sender=Contract)
+def update_contract_trigram_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """合同保存后更新三元组索引（文本未变化时任务会直接跳过；只更新状态等字段的保存不调度任务）"""
+    if raw or not text_fields_updated(update_fields):
+        return
+    _schedule_trigram_index(instance.id)
+
+
+@receiver(post_save, sender=ContractVersion)
+def update_version_trigram_index(sender, instance, created, **kwargs):
+    """创建合同版本后更新三元组索引"""
+    if created:
+        _schedule_trigram_index(instance.contract_id)
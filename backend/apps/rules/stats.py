@@ -0,0 +1,96 @@
+"""
+规则统计模块 - 记录每条规则的匹配次数、命中次数和匹配耗时
+
+扫描过程中只累加进程内计数器，按固定间隔批量刷新到数据库（RuleStat），
+避免每次扫描都写数据库。
+"""
+import atexit
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 60  # 秒
+
+
+class RuleStatsCollector:
+    """规则统计计数器（线程安全）"""
+
+    def __init__(self, flush_interval: int = None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(
+            settings, 'RULE_STATS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL
+        )
+        self._lock = threading.Lock()
+        self._counters: Dict[int, list] = {}
+        self._last_flush = time.monotonic()
+
+    def record_many(self, records: Iterable[Tuple[int, float, bool]]):
+        """
+        记录一批规则匹配
+
+        Args:
+            records: [(rule_id, 匹配耗时(ms), 是否命中), ...]
+        """
+        with self._lock:
+            for rule_id, elapsed_ms, hit in records:
+                counter = self._counters.get(rule_id)
+                if counter is None:
+                    # [匹配次数, 命中次数, 累计耗时, 最大耗时]
+                    counter = self._counters[rule_id] = [0, 0, 0.0, 0.0]
+                counter[0] += 1
+                if hit:
+                    counter[1] += 1
+                counter[2] += elapsed_ms
+                if elapsed_ms > counter[3]:
+                    counter[3] = elapsed_ms
+            should_flush = time.monotonic() - self._last_flush >= self.flush_interval
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """将计数器刷新到数据库"""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            self._last_flush = time.monotonic()
+        if not counters:
+            return
+
+        from apps.rules.models import ReviewRule, RuleStat
+
+        try:
+            # 首次统计的规则先创建记录（并发时由唯一约束去重）
+            existing = set(RuleStat.objects.filter(rule_id__in=counters).values_list('rule_id', flat=True))
+            missing = [rule_id for rule_id in counters if rule_id not in existing]
+            if missing:
+                valid = ReviewRule.objects.filter(id__in=missing).values_list('id', flat=True)
+                RuleStat.objects.bulk_create(
+                    [RuleStat(rule_id=rule_id) for rule_id in valid],
+                    ignore_conflicts=True
+                )
+
+            now = timezone.now()
+            for rule_id, (evaluations, hits, total_time_ms, max_time_ms) in counters.items():
+                updates = {
+                    'evaluations': F('evaluations') + evaluations,
+                    'hits': F('hits') + hits,
+                    'total_time_ms': F('total_time_ms') + total_time_ms,
+                    'max_time_ms': Greatest(F('max_time_ms'), max_time_ms),
+                    'updated_at': now,
+                }
+                if hits:
+                    updates['last_hit_at'] = now
+                RuleStat.objects.filter(rule_id=rule_id).update(**updates)
+        except Exception as e:
+            # 统计失败不影响规则扫描
+            logger.warning(f'规则统计刷新失败: {str(e)}')
+
+
+rule_stats = RuleStatsCollector()
+atexit.register(rule_stats.flush)
@@ -0,0 +1,57 @@
+from celery import shared_task
+import logging
+from apps.contracts.models import Contract
+from .models import RuleBacktest, RuleRescanJob
+from .services_backtest import RuleBacktestService
+from .services_rescan import RuleRescanService
+from .services_trigram import TrigramIndexService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_rule_backtest(backtest_id):
+    """执行规则回测任务"""
+    try:
+        backtest = RuleBacktest.objects.get(id=backtest_id)
+    except RuleBacktest.DoesNotExist:
+        logger.error(f'规则回测任务不存在 - 回测ID: {backtest_id}')
+        return {'success': False, 'error': '回测任务不存在'}
+    
+    logger.info(f'[开始] 规则回测 - 回测ID: {backtest_id}')
+    try:
+        result = RuleBacktestService().run(backtest)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+    logger.info(
+        f'[完成] 规则回测 - 回测ID: {backtest_id}, '
+        f'合同数: {result["contract_count"]}, 规则数: {result["rule_count"]}'
+    )
+    return {'success': True, 'backtest_id': backtest_id}
+
+
+@shared_task
+def process_rule_rescan_job(job_id):
+    """处理一批规则重新扫描，还有剩余时按批次间隔重新入队（限速，且便于暂停和恢复）"""
+    try:
+        job = RuleRescanJob.objects.get(id=job_id)
+    except RuleRescanJob.DoesNotExist:
+        logger.error(f'规则重新扫描任务不存在 - 任务ID: {job_id}')
+        return {'success': False, 'error': '重新扫描任务不存在'}
+    
+    has_more = RuleRescanService().process_chunk(job)
+    if has_more:
+        next_task = process_rule_rescan_job.apply_async((job_id,), countdown=job.chunk_interval)
+        RuleRescanJob.objects.filter(id=job_id).update(celery_task_id=next_task.id)
+    return {'success': True, 'job_id': job_id, 'has_more': has_more}
+
+
+@shared_task
+def index_contract_trigrams(contract_id):
+    """更新合同的三元组索引"""
+    try:
+        contract = Contract.objects.get(id=contract_id)
+    except Contract.DoesNotExist:
+        return {'success': False, 'error': '合同不存在'}
+    rebuilt = TrigramIndexService().index_contract(contract)
+    return {'success': True, 'contract_id': contract_id, 'rebuilt': rebuilt}
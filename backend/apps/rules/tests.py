@@ -0,0 +1,709 @@
+"""
+规则引擎模块单元测试
+"""
+from unittest import mock
+from django.test import TestCase
+from django.core.cache import cache
+from apps.contracts.models import Contract
+from apps.reviews.models import ReviewOpinion, ReviewResult, ReviewTask
+from apps.rules.models import ReviewRule, RuleBacktest, RuleMatch, RuleRescanJob, RuleStat
+from apps.rules.serializers import ReviewRuleSerializer, RuleBacktestSerializer
+from apps.rules.benchmark import benchmark_rule, get_sample_corpus
+from apps.rules.compiler import compile_rule, scan_shard
+from apps.rules.services import RuleEngineService, bump_ruleset_version, get_ruleset_version
+from apps.rules.services_backtest import RuleBacktestService, percentile
+from apps.rules.services_benchmark import RuleBenchmarkService
+from apps.rules.services_parallel import ParallelRuleScanner, get_mp_context
+from apps.rules.services_rescan import RuleRescanService
+from apps.rules.services_trigram import TrigramIndexService
+from apps.rules.stats import RuleStatsCollector
+from apps.rules.trigrams import required_literals
+from apps.users.models import User
+
+
+class ApplicableRulesTest(TestCase):
+    """适用规则筛选测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        cache.clear()
+        self.service = RuleEngineService()
+        self.general = ReviewRule.objects.create(
+            rule_code='G001', rule_name='通用规则', rule_type='general',
+            priority=1, rule_content={'type': 'keyword', 'patterns': ['违约']}
+        )
+        self.industry_it = ReviewRule.objects.create(
+            rule_code='I001', rule_name='IT行业规则', rule_type='industry', industry='IT',
+            priority=5, rule_content={'type': 'keyword', 'patterns': ['源代码']}
+        )
+        self.industry_any = ReviewRule.objects.create(
+            rule_code='I002', rule_name='不限行业规则', rule_type='industry',
+            priority=3, rule_content={'type': 'keyword', 'patterns': ['保密']}
+        )
+        ReviewRule.objects.create(
+            rule_code='D001', rule_name='已停用规则', rule_type='general', is_active=False,
+            priority=9, rule_content={'type': 'keyword', 'patterns': ['停用']}
+        )
+    
+    def test_filter_by_industry(self):
+        """测试按行业筛选规则并按优先级排序"""
+        rules = self.service._get_applicable_rules(industry='IT')
+        self.assertEqual(
+            [rule.rule_code for rule in rules],
+            ['I001', 'I002', 'G001']
+        )
+        
+        # 未指定行业时不加载行业规则
+        rules = self.service._get_applicable_rules(industry=None)
+        self.assertEqual([rule.rule_code for rule in rules], ['G001'])
+        
+        # 其他行业只加载不限行业的行业规则
+        rules = self.service._get_applicable_rules(industry='制造业')
+        self.assertEqual([rule.rule_code for rule in rules], ['I002', 'G001'])
+    
+    def test_rule_index_invalidated_on_change(self):
+        """测试规则变更后规则索引缓存失效"""
+        rules = self.service._get_applicable_rules(rule_types=['general'])
+        self.assertEqual([rule.rule_code for rule in rules], ['G001'])
+        
+        self.general.is_active = False
+        self.general.save()
+        
+        rules = self.service._get_applicable_rules(rule_types=['general'])
+        self.assertEqual(rules, [])
+
+
+class ParallelRuleScanTest(TestCase):
+    """规则分片并行扫描测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.text = ('第一条 合同标的\n' + '甲方应按期付款。\n' * 50 + '违约金为合同总额的百分之三十。\n') * 20
+        self.rules = [
+            compile_rule(1, {'type': 'keyword', 'patterns': ['不存在的词', '违约金']}),
+            compile_rule(2, {'type': 'regex', 'patterns': [r'百分之[一二三四五六七八九十]+']}),
+            compile_rule(3, {'type': 'regex', 'patterns': [r'赔偿上限']}),
+        ]
+        self.specs = [(rule.rule_id, None, rule.rule_content) for rule in self.rules]
+    
+    def test_sharded_hits_match_sequential_scan(self):
+        """分片扫描结果与顺序扫描一致"""
+        scanner = ParallelRuleScanner({
+            'ENABLED': True, 'MAX_WORKERS': 4, 'MIN_TEXT_LENGTH': 0, 'MIN_RULE_COUNT': 0,
+            'SHARD_TEXT_LENGTH': 500, 'SHARD_RULE_COUNT': 1, 'SHARD_OVERLAP': 20,
+        })
+        expected = scanner.find_hits_in_process(self.rules, self.text)
+        
+        shard_results = []
+        text_shards, _ = scanner.plan_shards(len(self.text), len(self.specs))
+        shard_length = -(-len(self.text) // text_shards)
+        for index in range(text_shards):
+            start = index * shard_length
+            end = min(len(self.text), start + shard_length)
+            slice_start = max(0, start - 20)
+            shard_text = self.text[slice_start:end + 20]
+            shard_hits, _ = scan_shard(self.specs, shard_text, slice_start, start - slice_start, end - slice_start)
+            shard_results.append(shard_hits)
+        
+        self.assertEqual(scanner._merge_hits(reversed(shard_results)), expected)
+        self.assertEqual(expected[1][0], 1)
+        self.assertNotIn(3, expected)
+    
+    def test_process_pool_start_method(self):
+        """进程池不使用fork启动，守护进程（Celery prefork工作进程）中不并行"""
+        self.assertIn(get_mp_context().get_start_method(), ('forkserver', 'spawn'))
+        scanner = ParallelRuleScanner({'ENABLED': True, 'MAX_WORKERS': 4, 'MIN_TEXT_LENGTH': 0, 'MIN_RULE_COUNT': 0})
+        self.assertTrue(scanner.should_parallelize(len(self.text), len(self.rules)))
+        with mock.patch('apps.rules.services_parallel.multiprocessing.current_process') as current_process:
+            current_process.return_value.daemon = True
+            self.assertFalse(scanner.should_parallelize(len(self.text), len(self.rules)))
+    
+    def test_invalid_regex_does_not_match(self):
+        """无效的正则表达式不产生命中"""
+        rule = compile_rule(4, {'type': 'regex', 'patterns': ['(未闭合']})
+        self.assertIsNone(rule.find(self.text))
+
+
+class IncrementalRuleScanTest(TestCase):
+    """规则增量扫描测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        cache.clear()
+        self.service = RuleEngineService()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        ReviewRule.objects.create(
+            rule_code='G001', rule_name='违约金规则', rule_type='general',
+            priority=5, rule_content={'type': 'keyword', 'patterns': ['违约金']}
+        )
+        ReviewRule.objects.create(
+            rule_code='G002', rule_name='保密规则', rule_type='general',
+            priority=3, rule_content={'type': 'regex', 'patterns': [r'保密期[限间]']}
+        )
+        self.clauses = [
+            '第一条 合同标的\n甲方向乙方采购设备。\n',
+            '第二条 付款方式\n甲方应于验收后付款。\n',
+            '第三条 违约责任\n违约金为合同总额的百分之十。\n',
+        ]
+        self.contract = Contract.objects.create(
+            title='测试合同',
+            contract_type='procurement',
+            content=''.join(self.clauses),
+            drafter=self.user
+        )
+    
+    def test_only_changed_clauses_rescanned(self):
+        """测试修改条款后只重新匹配变化的条款"""
+        first = self.service.scan_contract(self.contract, parallel=False)
+        self.assertEqual(first['scan_stats']['clauses_rescanned'], 3)
+        self.assertEqual([match['rule_code'] for match in first['matches']], ['G001'])
+        
+        self.clauses[1] = '第二条 付款方式\n甲方应于验收后付款，保密期限为三年。\n'
+        self.contract.content = ''.join(self.clauses)
+        self.contract.save()
+        
+        second = self.service.scan_contract(self.contract, parallel=False)
+        self.assertEqual(second['scan_stats']['mode'], 'incremental')
+        self.assertEqual(second['scan_stats']['clauses_rescanned'], 1)
+        
+        full = self.service.scan_contract(self.contract, parallel=False, incremental=False)
+        self.assertEqual(second['matches'], full['matches'])
+        self.assertEqual([match['rule_code'] for match in second['matches']], ['G001', 'G002'])
+    
+    def test_match_across_clause_boundary(self):
+        """测试跨越条款边界的命中与全文扫描一致"""
+        ReviewRule.objects.create(
+            rule_code='G003', rule_name='跨条款规则', rule_type='general',
+            priority=1, rule_content={'type': 'regex', 'patterns': [r'采购设备。\s*第二条']}
+        )
+        ReviewRule.objects.create(
+            rule_code='G004', rule_name='跨条款关键词', rule_type='general',
+            priority=1, rule_content={'type': 'keyword', 'patterns': ['后付款。\n第三条']}
+        )
+        incremental = self.service.scan_contract(self.contract, parallel=False)
+        self.assertEqual(incremental['scan_stats']['mode'], 'incremental')
+        self.assertEqual(incremental['scan_stats']['boundaries_rescanned'], 2)
+        
+        full = self.service.scan_contract(self.contract, parallel=False, incremental=False)
+        self.assertEqual(incremental['matches'], full['matches'])
+        self.assertEqual(
+            sorted(match['rule_code'] for match in incremental['matches']), ['G001', 'G003', 'G004']
+        )
+        
+        cached = self.service.scan_contract(self.contract, parallel=False)
+        self.assertEqual(cached['scan_stats']['boundaries_rescanned'], 0)
+        self.assertEqual(cached['matches'], full['matches'])
+    
+    def test_ruleset_version_survives_cache_flush(self):
+        """测试规则集版本号保存在数据库中，缓存清空后不回退"""
+        version = get_ruleset_version()
+        ReviewRule.objects.create(
+            rule_code='G005', rule_name='新增规则', rule_type='general',
+            rule_content={'type': 'keyword', 'patterns': ['验收']}
+        )
+        self.assertEqual(get_ruleset_version(), version + 1)
+        self.assertEqual(bump_ruleset_version(), version + 2)
+        
+        cache.clear()
+        self.assertEqual(get_ruleset_version(), version + 2)
+    
+    def test_context_dependent_regex_matches_full_text(self):
+        """测试锚点和前后查找断言的正则与全文扫描一致（不按条款单独匹配）"""
+        patterns = [r'^第二条', r'设备。$', r'(?<!采购设备。\n)第二条', r'(?<=验收后)付款']
+        for index, pattern in enumerate(patterns):
+            ReviewRule.objects.create(
+                rule_code=f'C{index:03d}', rule_name=f'前后文规则{index}', rule_type='general',
+                priority=1, rule_content={'type': 'regex', 'patterns': [pattern]}
+            )
+        incremental = self.service.scan_contract(self.contract, parallel=False)
+        self.assertEqual(incremental['scan_stats']['mode'], 'incremental')
+        self.assertEqual(incremental['scan_stats']['full_text_rules'], 4)
+        
+        full = self.service.scan_contract(self.contract, parallel=False, incremental=False)
+        self.assertEqual(incremental['matches'], full['matches'])
+        self.assertEqual(sorted(match['rule_code'] for match in full['matches']), ['C003', 'G001'])
+
+
+class RuleBacktestTest(TestCase):
+    """规则回测测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        for index in range(4):
+            Contract.objects.create(
+                contract_no=f'CT-BT-{index:03d}',
+                title=f'合同{index}',
+                contract_type='procurement',
+                content='第一条 违约责任\n违约金为合同总额的百分之十。\n' if index % 2 else '第一条 付款\n按月付款。\n',
+                drafter=self.user
+            )
+        self.rule = ReviewRule.objects.create(
+            rule_code='G001', rule_name='违约金规则', rule_type='general',
+            rule_content={'type': 'keyword', 'patterns': ['违约金']}
+        )
+    
+    def test_backtest_rule_and_draft(self):
+        """测试回测已有规则和草稿规则"""
+        backtest = RuleBacktest.objects.create(
+            rule_ids=[self.rule.id],
+            draft_rule={'rule_name': '付款规则', 'rule_content': {'type': 'regex', 'patterns': ['按[月年]付款']}},
+        )
+        result = RuleBacktestService({
+            'MAX_WORKERS': 2, 'BATCH_SIZE': 1, 'EXAMPLE_COUNT': 1,
+            'SLOW_P99_MS': 1000.0, 'BROAD_HIT_RATE': 0.9,
+        }).run(backtest)
+        
+        backtest.refresh_from_db()
+        self.assertEqual(backtest.status, 'completed')
+        self.assertEqual(backtest.progress['progress'], 100)
+        self.assertEqual(result['contract_count'], 4)
+        
+        rules = {rule['rule_name']: rule for rule in result['rules']}
+        self.assertEqual(rules['违约金规则']['hit_count'], 2)
+        self.assertEqual(rules['付款规则']['hit_count'], 2)
+        self.assertEqual(len(rules['违约金规则']['examples']), 1)
+        self.assertIn('违约金', rules['违约金规则']['examples'][0]['snippet'])
+    
+    def test_backtest_pattern_rule(self):
+        """测试回测模式规则（含条件）及草稿规则校验"""
+        pattern_rule = ReviewRule.objects.create(
+            rule_code='P001', rule_name='缺少违约责任', rule_type='general',
+            rule_content={
+                'type': 'pattern', 'pattern': {'clause_missing': '违约责任'},
+                'conditions': {'field': 'contract_type', 'eq': 'procurement'},
+            }
+        )
+        backtest = RuleBacktest.objects.create(
+            rule_ids=[pattern_rule.id],
+            draft_rule={'rule_name': '付款条款', 'rule_content': {'type': 'pattern', 'pattern': {'clause_present': '付款'}}},
+        )
+        result = RuleBacktestService({
+            'MAX_WORKERS': 1, 'BATCH_SIZE': 2, 'EXAMPLE_COUNT': 1,
+            'SLOW_P99_MS': 1000.0, 'BROAD_HIT_RATE': 0.9,
+        }).run(backtest)
+        
+        rules = {rule['rule_name']: rule for rule in result['rules']}
+        self.assertEqual(rules['缺少违约责任']['hit_count'], 2)
+        self.assertEqual(rules['付款条款']['hit_count'], 2)
+        
+        serializer = RuleBacktestSerializer(data={'draft_rule': {'type': 'pattern', 'pattern': {'unknown': 1}}})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('draft_rule', serializer.errors)
+    
+    def test_percentile(self):
+        """测试百分位数计算"""
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([], 99), 0.0)
+
+
+class RuleDSLTest(TestCase):
+    """规则条件DSL测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        cache.clear()
+        self.service = RuleEngineService()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.contract = Contract.objects.create(
+            title='设备采购合同',
+            contract_type='procurement',
+            content='第一条 合同标的\n合同总价为人民币150万元。\n第二条 付款方式\n验收后一次性付款。\n',
+            drafter=self.user
+        )
+    
+    def test_pattern_rule_missing_clause_and_amount(self):
+        """测试模式规则：金额超过100万且缺少违约责任条款"""
+        ReviewRule.objects.create(
+            rule_code='P001', rule_name='大额合同缺少违约责任', rule_type='general', priority=5,
+            rule_content={
+                'type': 'pattern',
+                'pattern': {'all': [{'amount': {'gt': 1000000}}, {'clause_missing': '违约责任'}]},
+            }
+        )
+        ReviewRule.objects.create(
+            rule_code='P002', rule_name='缺少付款条款', rule_type='general', priority=4,
+            rule_content={'type': 'pattern', 'pattern': {'clause_missing': ['付款', '支付']}}
+        )
+        result = self.service.scan_contract(self.contract, parallel=False)
+        self.assertEqual([match['rule_code'] for match in result['matches']], ['P001'])
+    
+    def test_conditions_filter_by_contract_field(self):
+        """测试条件：按合同类型和条款过滤关键词规则"""
+        ReviewRule.objects.create(
+            rule_code='K001', rule_name='采购合同验收', rule_type='general', priority=5,
+            rule_content={
+                'type': 'keyword', 'patterns': ['验收'],
+                'conditions': {'field': 'contract_type', 'eq': 'procurement'},
+            }
+        )
+        ReviewRule.objects.create(
+            rule_code='K002', rule_name='销售合同验收', rule_type='general', priority=4,
+            rule_content={
+                'type': 'keyword', 'patterns': ['验收'],
+                'conditions': {'field': 'contract_type', 'in': ['sales', 'service']},
+            }
+        )
+        ReviewRule.objects.create(
+            rule_code='K003', rule_name='有付款条款时检查一次性付款', rule_type='general', priority=3,
+            rule_content={
+                'type': 'regex', 'patterns': ['一次性(付款|支付)'],
+                'conditions': {'clause_present': '付款', 'not': {'contains': '分期'}},
+            }
+        )
+        result = self.service.scan_contract(self.contract, parallel=False)
+        self.assertEqual([match['rule_code'] for match in result['matches']], ['K001', 'K003'])
+    
+    def test_invalid_rule_content_rejected(self):
+        """测试无效的DSL在保存前被拒绝"""
+        serializer = ReviewRuleSerializer(data={
+            'rule_code': 'X001', 'rule_name': '无效规则', 'rule_type': 'general',
+            'rule_content': {'type': 'pattern', 'pattern': {'unknown': '违约'}},
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('rule_content', serializer.errors)
+
+
+class RuleStatsTest(TestCase):
+    """规则命中统计测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.contract = Contract.objects.create(
+            title='测试合同',
+            contract_type='procurement',
+            content='第一条 违约责任\n违约金为合同总额的百分之十。\n',
+            drafter=self.user
+        )
+        self.hit_rule = ReviewRule.objects.create(
+            rule_code='G001', rule_name='违约金规则', rule_type='general',
+            rule_content={'type': 'keyword', 'patterns': ['违约金']}
+        )
+        self.dead_rule = ReviewRule.objects.create(
+            rule_code='G002', rule_name='不会命中的规则', rule_type='general',
+            rule_content={'type': 'keyword', 'patterns': ['不存在的词']}
+        )
+        # 使用独立的计数器，避免其他测试遗留的未刷新计数影响结果
+        self.collector = RuleStatsCollector(flush_interval=3600)
+        patcher = mock.patch('apps.rules.services.rule_stats', self.collector)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_scan_records_rule_stats(self):
+        """测试扫描后统计匹配次数和命中次数"""
+        service = RuleEngineService()
+        service.scan_contract(self.contract, parallel=False)
+        service.scan_contract(self.contract, parallel=False)
+        self.collector.flush()
+        
+        hit_stat = RuleStat.objects.get(rule=self.hit_rule)
+        self.assertEqual((hit_stat.evaluations, hit_stat.hits), (2, 2))
+        self.assertIsNotNone(hit_stat.last_hit_at)
+        self.assertGreaterEqual(hit_stat.max_time_ms, 0)
+        
+        dead_stat = RuleStat.objects.get(rule=self.dead_rule)
+        self.assertEqual((dead_stat.evaluations, dead_stat.hits), (2, 0))
+        self.assertIsNone(dead_stat.last_hit_at)
+
+
+class RuleRescanJobTest(TestCase):
+    """规则重新扫描任务测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.rule = ReviewRule.objects.create(
+            rule_code='G001', rule_name='违约金规则', rule_type='general', risk_level='high',
+            rule_content={'type': 'keyword', 'patterns': ['违约金']}
+        )
+        self.results = []
+        for index, content in enumerate(['第一条 违约责任\n违约金为百分之十。\n', '第一条 付款\n按月付款。\n']):
+            contract = Contract.objects.create(
+                contract_no=f'CT-RS-{index:03d}', title=f'合同{index}', contract_type='procurement',
+                content=content, drafter=self.user
+            )
+            task = ReviewTask.objects.create(contract=contract, task_type='auto', status='completed')
+            scan_result = RuleEngineService().scan_contract(contract, task, parallel=False)
+            self.results.append(ReviewResult.objects.create(
+                review_task=task, contract=contract, risk_level='high',
+                risk_count=scan_result['total_matches'],
+                review_data={
+                    'risk_overview': {'risk_count': scan_result['total_matches']},
+                    'detailed_data': {'rule_scan_result': scan_result},
+                }
+            ))
+    
+    def test_rescan_updates_affected_results(self):
+        """测试规则停用后只刷新受影响的审核结果"""
+        self.rule.is_active = False
+        self.rule.save()
+        
+        service = RuleRescanService()
+        job = service.create_job(rule_ids=[self.rule.id], chunk_size=1, chunk_interval=0)
+        service.run_job(job)
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.processed_count, job.rescanned_count), (2, 1))
+        self.assertEqual(job.cursor, self.results[-1].id)
+        self.assertFalse(RuleMatch.objects.filter(rule=self.rule).exists())
+        
+        result = ReviewResult.objects.get(id=self.results[0].id)
+        self.assertEqual(result.risk_count, 0)
+        self.assertEqual(result.risk_level, 'low')
+        self.assertEqual(result.review_data['risk_overview']['rule_match_count'], 0)
+    
+    def test_rescan_uses_reviewed_version_and_refreshes_opinions(self):
+        """测试重新扫描按审核时的合同版本匹配，并同步规则建议生成的审核意见"""
+        review_result = self.results[0]
+        task = review_result.review_task
+        task.contract_version = 1
+        task.save()
+        old_match = review_result.review_data['detailed_data']['rule_scan_result']['matches'][0]
+        review_result.review_data['modification_suggestions'] = [{
+            'type': 'rule_suggestion', 'priority': 'high',
+            'clause': old_match['matched_clause'], 'suggestion': old_match['suggestion'],
+        }]
+        review_result.save()
+        ReviewOpinion.objects.create(
+            review_result=review_result, opinion_type='suggestion', risk_level='high',
+            opinion_content=old_match['suggestion'], clause_content=old_match['matched_clause'],
+            suggestion=old_match['suggestion']
+        )
+        # 审核之后合同修改为不含违约金的新版本
+        contract = task.contract
+        contract.content = '第一条 违约责任\n按实际损失赔偿。\n'
+        contract.current_version = 2
+        contract.save()
+        
+        self.rule.description = '请核实违约金比例'
+        self.rule.save()
+        service = RuleRescanService()
+        service.run_job(service.create_job(rule_ids=[self.rule.id], chunk_size=10, chunk_interval=0))
+        
+        review_result.refresh_from_db()
+        self.assertEqual(review_result.review_data['risk_overview']['rule_match_count'], 1)
+        self.assertTrue(RuleMatch.objects.filter(review_task=task, rule=self.rule).exists())
+        opinions = ReviewOpinion.objects.filter(review_result=review_result)
+        self.assertEqual(
+            list(opinions.filter(is_deleted=False).values_list('suggestion', flat=True)), ['请核实违约金比例']
+        )
+        self.assertTrue(opinions.get(suggestion=old_match['suggestion']).is_deleted)
+    
+    def test_paused_job_stops_at_checkpoint(self):
+        """测试暂停后不再处理后续批次"""
+        service = RuleRescanService()
+        job = service.create_job(rule_ids=[self.rule.id], chunk_size=1, chunk_interval=0)
+        self.assertTrue(service.process_chunk(job))
+        
+        RuleRescanJob.objects.filter(id=job.id).update(status='paused')
+        self.assertFalse(service.process_chunk(job))
+        self.assertEqual(job.cursor, self.results[0].id)
+
+
+class TrigramPrefilterTest(TestCase):
+    """三元组预筛选测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.service = TrigramIndexService()
+        self.penalty = Contract.objects.create(
+            contract_no='CT-TG-001', title='合同1', contract_type='procurement', drafter=self.user,
+            content='第一条 违约责任\n违约金为合同总额的百分之十。\n'
+        )
+        self.secret = Contract.objects.create(
+            contract_no='CT-TG-002', title='合同2', contract_type='procurement', drafter=self.user,
+            content='第一条 保密\n保密期限为三年。\n'
+        )
+        self.unindexed = Contract.objects.create(
+            contract_no='CT-TG-003', title='合同3', contract_type='procurement', drafter=self.user, content='未建立索引'
+        )
+        self.service.index_contract(self.penalty)
+        self.service.index_contract(self.secret)
+    
+    def test_required_literals(self):
+        """测试规则必需字面量提取"""
+        self.assertEqual(
+            required_literals({'type': 'regex', 'patterns': ['违约金(为|是)合同总额']}),
+            [{'违约金', '合同总额'}]
+        )
+        self.assertIsNone(required_literals({'type': 'regex', 'patterns': [r'\d+元']}))
+        self.assertIsNone(required_literals({'type': 'keyword', 'patterns': ['违约']}))
+        self.assertIsNone(required_literals({'type': 'pattern', 'pattern': {'contains': '违约'}}))
+    
+    def test_candidates_narrowed_by_index(self):
+        """测试按规则字面量预筛选候选合同（未索引的合同始终作为候选）"""
+        candidates = self.service.candidate_contract_ids([
+            {'type': 'regex', 'patterns': ['保密期[限间]']},
+        ])
+        self.assertEqual(candidates, {self.secret.id, self.unindexed.id})
+        
+        candidates = self.service.candidate_contract_ids(
+            [{'type': 'keyword', 'patterns': ['违约金', '不存在的词语']}],
+            [self.penalty.id, self.secret.id]
+        )
+        self.assertEqual(candidates, {self.penalty.id})
+        
+        self.assertIsNone(self.service.candidate_contract_ids([{'type': 'regex', 'patterns': ['.*']}]))
+    
+    def test_stale_index_kept_as_candidate(self):
+        """测试文本变化但索引尚未重建的合同仍作为候选"""
+        rule_contents = [{'type': 'regex', 'patterns': ['保密期[限间]']}]
+        self.penalty.content = '第一条 保密\n保密期间为五年。\n'
+        self.penalty.save()
+        
+        candidates = self.service.candidate_contract_ids(rule_contents, [self.penalty.id, self.secret.id])
+        self.assertEqual(candidates, {self.penalty.id, self.secret.id})
+        
+        self.service.index_contract(self.penalty)
+        candidates = self.service.candidate_contract_ids(rule_contents, [self.penalty.id, self.secret.id])
+        self.assertEqual(candidates, {self.penalty.id, self.secret.id})
+        
+        self.secret.content = '第一条 付款\n按月付款。\n'
+        self.secret.save()
+        self.service.index_contract(self.secret)
+        candidates = self.service.candidate_contract_ids(rule_contents, [self.penalty.id, self.secret.id])
+        self.assertEqual(candidates, {self.penalty.id})
+    
+    def test_status_only_save_not_indexed(self):
+        """只更新状态的保存不调度索引任务"""
+        self.penalty.status = 'reviewing'
+        with mock.patch('apps.rules.signals._schedule_trigram_index') as schedule:
+            self.penalty.save(update_fields=['status'])
+            schedule.assert_not_called()
+            self.penalty.save()
+            schedule.assert_called_once_with(self.penalty.id)
+    
+    def test_index_skipped_when_text_unchanged(self):
+        """测试文本未变化时跳过重建"""
+        self.assertFalse(self.service.index_contract(self.penalty))
+        self.penalty.content = '第一条 违约责任\n违约金为百分之二十。\n'
+        self.penalty.save()
+        self.assertTrue(self.service.index_contract(self.penalty))
+
+
+class RuleBenchmarkTest(TestCase):
+    """规则开销基准测试测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.data = {
+            'rule_code': 'B001', 'rule_name': '违约金检查', 'rule_type': 'general',
+            'rule_content': {'type': 'keyword', 'patterns': ['违约金']},
+            'risk_level': 'medium', 'created_by': self.user.id,
+        }
+    
+    def test_sample_corpus_is_deterministic(self):
+        """样本合同固定不变，测量结果可比"""
+        corpus = get_sample_corpus()
+        self.assertEqual(len(corpus), 6)
+        self.assertEqual(len(corpus[-1]), 100000)
+        result = benchmark_rule({'type': 'keyword', 'patterns': ['违约金']})
+        self.assertFalse(result['timed_out'])
+        self.assertGreater(result['max_ms'], 0)
+        self.assertGreaterEqual(result['max_ms'], result['avg_ms'])
+    
+    def test_serializer_stores_benchmark_cost(self):
+        """保存规则时记录基准测试结果"""
+        serializer = ReviewRuleSerializer(data=self.data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        rule = serializer.save()
+        self.assertIsNotNone(rule.benchmark_cost_ms)
+        self.assertIsNotNone(rule.benchmarked_at)
+        self.assertFalse(rule.benchmark_flagged)
+    
+    def test_over_budget_rule_is_flagged_or_rejected(self):
+        """超出预算的规则被标记，超出硬限制的规则被拒绝"""
+        service = RuleBenchmarkService({
+            'SOFT_TIME_MS': 0.0, 'HARD_TIME_MS': 10000.0,
+            'SOFT_MEMORY_KB': 10000.0, 'HARD_MEMORY_KB': 100000.0, 'TIMEOUT_SECONDS': 30,
+        })
+        evaluation = service.evaluate({'type': 'regex', 'patterns': [r'百分之\d+']})
+        self.assertTrue(evaluation['flagged'])
+        self.assertFalse(evaluation['rejected'])
+        
+        service.config['HARD_TIME_MS'] = 0.0
+        evaluation = service.evaluate({'type': 'regex', 'patterns': [r'百分之\d+']})
+        self.assertTrue(evaluation['rejected'])
+        
+        with self.settings(RULE_AUTHORING_BUDGET={'HARD_TIME_MS': 0.0}):
+            serializer = ReviewRuleSerializer(data=self.data)
+            self.assertFalse(serializer.is_valid())
+            self.assertIn('rule_content', serializer.errors)
+    
+    def test_catastrophic_regex_times_out(self):
+        """灾难性回溯的正则在超时后被拒绝"""
+        service = RuleBenchmarkService({
+            'SOFT_TIME_MS': 20.0, 'HARD_TIME_MS': 200.0,
+            'SOFT_MEMORY_KB': 2048.0, 'HARD_MEMORY_KB': 32768.0, 'TIMEOUT_SECONDS': 0.5,
+        })
+        evaluation = service.evaluate({'type': 'regex', 'patterns': [r'(.*.*)*违约金不存在$']})
+        self.assertTrue(evaluation['rejected'])
+    
+    def test_rule_rejected_when_benchmark_process_crashes(self):
+        """基准测试子进程异常退出（如被系统终止）时规则被拒绝"""
+        import subprocess
+        crashed = subprocess.CompletedProcess(args=[], returncode=-9, stdout='', stderr='Killed')
+        with mock.patch('apps.rules.benchmark.subprocess.run', return_value=crashed):
+            serializer = ReviewRuleSerializer(data=self.data)
+            self.assertFalse(serializer.is_valid())
+        self.assertIn('基准测试', str(serializer.errors['rule_content']))
+        self.assertFalse(ReviewRule.objects.filter(rule_code='B001').exists())
+    
+    def test_rule_rejected_when_isolation_unavailable(self):
+        """无法创建子进程时不在当前进程中测量，规则被拒绝"""
+        with mock.patch('apps.rules.benchmark.subprocess.run', side_effect=OSError('fork failed')):
+            evaluation = RuleBenchmarkService().evaluate({'type': 'keyword', 'patterns': ['违约金']})
+            serializer = ReviewRuleSerializer(data=self.data)
+            self.assertFalse(serializer.is_valid())
+        self.assertTrue(evaluation['rejected'])
+        self.assertIsNone(evaluation['cost_ms'])
+        self.assertIn('rule_content', serializer.errors)
+    
+    def test_rule_groups_balanced_by_cost(self):
+        """并行扫描按基准测试耗时均衡规则分组"""
+        specs = [(rule_id, None, {}) for rule_id in range(1, 7)]
+        costs = {1: 100.0, 2: 90.0, 3: 1.0, 4: 1.0, 5: 1.0, 6: None}
+        groups = ParallelRuleScanner().group_rules(specs, 2, costs)
+        group_ids = [{spec[0] for spec in group} for group in groups]
+        self.assertTrue(any(1 in ids and 2 not in ids for ids in group_ids))
+        self.assertEqual(sorted(spec[0] for group in groups for spec in group), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(
+            ParallelRuleScanner().group_rules(specs, 2),
+            [specs[0::2], specs[1::2]]
+        )
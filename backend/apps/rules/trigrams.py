@@ -0,0 +1,109 @@
+"""
+三元组（trigram）模块 - 提取文本三元组和规则的必需字面量
+
+规则能命中合同的必要条件是合同包含规则的必需字面量，而包含某个字面量的必要条件是
+合同包含该字面量的全部三元组。据此可以用三元组倒排索引，在读取合同全文之前排除不可能命中的合同。
+
+本模块不依赖Django。
+"""
+import re
+from typing import Dict, List, Optional, Set
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+TRIGRAM_LENGTH = 3
+MAX_ALTERNATIVES = 16  # 分支组合数超过该值时放弃该部分的字面量约束（结果仍然正确，只是过滤变弱）
+
+
+def extract_trigrams(text: str) -> Set[str]:
+    """提取文本（小写）的全部三元组"""
+    text = text.lower()
+    return {text[index:index + TRIGRAM_LENGTH] for index in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+def _and_merge(left: List[Set[str]], right: List[Set[str]]) -> List[Set[str]]:
+    """合并两个必须同时满足的条件（各自为"或"关系的字面量集合列表）"""
+    if len(left) * len(right) > MAX_ALTERNATIVES:
+        # 组合过多时只保留左侧约束，候选集变大但不会漏掉合同
+        return left
+    return [a | b for a in left for b in right]
+
+
+def _regex_alternatives(items) -> List[Set[str]]:
+    """
+    计算正则表达式片段的必需字面量
+
+    Returns:
+        [{字面量, ...}, ...]：匹配时至少满足其中一组，每组内的字面量都必须出现
+    """
+    alternatives = [set()]
+    run = []
+
+    def flush():
+        if len(run) >= TRIGRAM_LENGTH:
+            literal = ''.join(run).lower()
+            for alternative in alternatives:
+                alternative.add(literal)
+        run.clear()
+
+    for op, value in items:
+        if op == sre_parse.LITERAL:
+            run.append(chr(value))
+            continue
+
+        flush()
+        if op == sre_parse.SUBPATTERN:
+            alternatives = _and_merge(alternatives, _regex_alternatives(value[-1]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)):
+            min_count, _, body = value
+            if min_count >= 1:
+                alternatives = _and_merge(alternatives, _regex_alternatives(body))
+        elif op == sre_parse.BRANCH:
+            branch_alternatives = []
+            for branch in value[1]:
+                branch_alternatives.extend(_regex_alternatives(branch))
+            alternatives = _and_merge(alternatives, branch_alternatives)
+        # 其他操作（字符集、任意字符、断言、反向引用等）不提供必需字面量
+
+    flush()
+    return alternatives
+
+
+def required_literals(rule_content: Dict) -> Optional[List[Set[str]]]:
+    """
+    计算规则命中所需的字面量
+
+    Returns:
+        [{字面量, ...}, ...]：合同至少满足其中一组（组内字面量全部出现）才可能命中规则；
+        空列表表示规则不可能命中任何合同；None表示无法据此过滤（如模式规则、过短的关键词）
+    """
+    rule_type = rule_content.get('type', 'keyword')
+    patterns = [str(pattern) for pattern in rule_content.get('patterns', []) or []]
+
+    alternatives = []
+    if rule_type == 'keyword':
+        for keyword in patterns:
+            if not keyword:
+                continue
+            if len(keyword) < TRIGRAM_LENGTH:
+                return None
+            alternatives.append({keyword.lower()})
+    elif rule_type == 'regex':
+        for pattern in patterns:
+            try:
+                parsed = sre_parse.parse(pattern, re.IGNORECASE)
+            except re.error:
+                continue  # 无效的正则不会命中
+            pattern_alternatives = _regex_alternatives(list(parsed))
+            if any(not alternative for alternative in pattern_alternatives):
+                return None
+            alternatives.extend(pattern_alternatives)
+    else:
+        return None
+
+    # 去重
+    unique = {frozenset(alternative) for alternative in alternatives}
+    return [set(alternative) for alternative in unique]
@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ReviewRuleViewSet, RuleMatchViewSet
+from .views import ReviewRuleViewSet, RuleMatchViewSet, RuleBacktestViewSet, RuleRescanJobViewSet
 
 router = DefaultRouter()
 router.register(r'rules', ReviewRuleViewSet, basename='review-rule')
 router.register(r'matches', RuleMatchViewSet, basename='rule-match')
+router.register(r'backtests', RuleBacktestViewSet, basename='rule-backtest')
+router.register(r'rescans', RuleRescanJobViewSet, basename='rule-rescan')
 
 urlpatterns = [
     path('', include(router.urls)),
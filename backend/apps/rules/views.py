@@ -1,10 +1,20 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.utils import timezone
 
-from .models import ReviewRule, RuleMatch
-from .serializers import ReviewRuleSerializer, RuleMatchSerializer
+from apps.users.permissions import IsAdminRole
+from .models import ReviewRule, RuleMatch, RuleBacktest, RuleStat, RuleRescanJob
+from .serializers import (
+    ReviewRuleSerializer, RuleMatchSerializer, RuleBacktestSerializer, RuleStatSerializer,
+    RuleRescanJobSerializer
+)
+from .services_rescan import RuleRescanService
+from .stats import rule_stats
+from .tasks import run_rule_backtest, process_rule_rescan_job
 
 
 class ReviewRuleViewSet(viewsets.ModelViewSet):
@@ -17,6 +27,53 @@ class ReviewRuleViewSet(viewsets.ModelViewSet):
     ordering_fields = ['priority', 'created_at']
     ordering = ['-priority', '-created_at']
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminRole])
+    def backtest(self, request):
+        """
+        回测规则（草稿规则、指定规则或整个规则集）
+        
+        请求参数：rule_ids（可选）、draft_rule（可选）、sample_size（可选，默认全部合同）；
+        rule_ids和draft_rule都未提供时回测当前整个规则集。
+        """
+        serializer = RuleBacktestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        backtest = serializer.save(created_by=request.user)
+        
+        # 尝试异步执行，如果 Celery 不可用则同步执行
+        try:
+            celery_task = run_rule_backtest.delay(backtest.id)
+            backtest.celery_task_id = celery_task.id
+            backtest.save(update_fields=['celery_task_id'])
+            return Response(RuleBacktestSerializer(backtest).data, status=status.HTTP_202_ACCEPTED)
+        except Exception:
+            run_rule_backtest(backtest.id)
+            backtest.refresh_from_db()
+            return Response(RuleBacktestSerializer(backtest).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdminRole])
+    def stats(self, request):
+        """
+        规则命中率和耗时统计
+        
+        查询参数：
+            ordering: 排序字段（evaluations/hits/hit_rate/avg_time_ms/max_time_ms/total_time_ms，前缀-表示降序，默认-avg_time_ms）
+            unused: 为true时只返回从未命中的规则
+        """
+        # 先刷新当前进程的计数器，保证看到最新数据
+        rule_stats.flush()
+        
+        queryset = RuleStat.objects.select_related('rule').filter(rule__is_deleted=False)
+        if request.query_params.get('unused') == 'true':
+            queryset = queryset.filter(hits=0)
+        data = RuleStatSerializer(queryset, many=True).data
+        
+        ordering = request.query_params.get('ordering', '-avg_time_ms')
+        field = ordering.lstrip('-')
+        if field not in ('evaluations', 'hits', 'hit_rate', 'avg_time_ms', 'max_time_ms', 'total_time_ms'):
+            return Response({'error': f'不支持的排序字段: {field}'}, status=status.HTTP_400_BAD_REQUEST)
+        data = sorted(data, key=lambda item: item[field], reverse=ordering.startswith('-'))
+        return Response(data)
+
 
 class RuleMatchViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = RuleMatch.objects.all()
@@ -27,3 +84,92 @@ class RuleMatchViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['match_score', 'created_at']
     ordering = ['-match_score']
 
+
+
+class RuleBacktestViewSet(viewsets.ReadOnlyModelViewSet):
+    """规则回测任务（查询回测进度和结果）"""
+    queryset = RuleBacktest.objects.select_related('created_by')
+    serializer_class = RuleBacktestSerializer
+    permission_classes = [IsAuthenticated, IsAdminRole]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['status']
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
+
+
+class RuleRescanJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    规则重新扫描任务
+    
+    规则变更后按批重新扫描受影响的历史审核结果，只刷新规则匹配和规则评分，不调用AI。
+    """
+    queryset = RuleRescanJob.objects.select_related('created_by')
+    serializer_class = RuleRescanJobSerializer
+    permission_classes = [IsAuthenticated, IsAdminRole]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['status']
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
+
+    def create(self, request, *args, **kwargs):
+        """
+        创建并启动重新扫描任务
+        
+        请求参数：rule_ids（可选，变更的规则ID）、since（可选，取该时间之后修改的规则）、
+        chunk_size（可选）、chunk_interval（可选，批次间隔秒数）
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = RuleRescanService().create_job(
+            rule_ids=serializer.validated_data.get('rule_ids'),
+            since=serializer.validated_data.get('since'),
+            chunk_size=serializer.validated_data.get('chunk_size'),
+            chunk_interval=serializer.validated_data.get('chunk_interval'),
+            created_by=request.user
+        )
+        return self._dispatch(job)
+
+    @action(detail=True, methods=['post'])
+    def pause(self, request, pk=None):
+        """暂停任务（当前批次完成后停止）"""
+        job = self.get_object()
+        if job.status not in ('pending', 'running'):
+            return Response({'error': '任务状态不允许暂停'}, status=status.HTTP_400_BAD_REQUEST)
+        job.status = 'paused'
+        job.save(update_fields=['status', 'updated_at'])
+        return Response(self.get_serializer(job).data)
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """从检查点恢复任务"""
+        job = self.get_object()
+        if job.status not in ('paused', 'failed'):
+            return Response({'error': '任务状态不允许恢复'}, status=status.HTTP_400_BAD_REQUEST)
+        job.status = 'running'
+        job.error_message = ''
+        job.completed_at = None
+        job.save(update_fields=['status', 'error_message', 'completed_at', 'updated_at'])
+        return self._dispatch(job)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """取消任务"""
+        job = self.get_object()
+        if job.status in ('completed', 'cancelled'):
+            return Response({'error': '任务已结束'}, status=status.HTTP_400_BAD_REQUEST)
+        job.status = 'cancelled'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'completed_at', 'updated_at'])
+        return Response(self.get_serializer(job).data)
+
+    def _dispatch(self, job):
+        """尝试异步执行，如果 Celery 不可用则同步执行"""
+        try:
+            celery_task = process_rule_rescan_job.delay(job.id)
+            job.celery_task_id = celery_task.id
+            job.save(update_fields=['celery_task_id', 'updated_at'])
+            return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+        except Exception:
+            RuleRescanService().run_job(job)
+            job.refresh_from_db()
+            return Response(self.get_serializer(job).data, status=status.HTTP_201_CREATED)
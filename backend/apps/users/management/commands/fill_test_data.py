@@ -10,6 +10,7 @@ from decimal import Decimal
 
 from apps.users.models import User, Department, Permission, Role, RolePermission, UserRole, AuditLog
 from apps.contracts.models import Contract, ContractVersion, Template, UserHabit
+from apps.contracts.services_version import ContractVersionService
 from apps.reviews.models import ReviewTask, ReviewResult, ReviewOpinion, ReviewCycle
 from apps.rules.models import ReviewRule, RuleMatch
 from apps.clauses.models import ContractClause
@@ -315,18 +316,20 @@ class Command(BaseCommand):
         """创建合同版本"""
         self.stdout.write('创建合同版本...')
         versions = []
+        version_service = ContractVersionService()
         
         for contract in contracts[:15]:  # 只为部分合同创建版本
             for version in range(1, contract.current_version + 1):
-                version_obj = ContractVersion.objects.create(
-                    contract=contract,
-                    version=version,
-                    content={
+                version_obj = version_service.create_version(
+                    contract,
+                    {
                         'html': f'<p>这是第{version}版合同内容</p>',
                         'text': f'这是第{version}版合同内容'
                     },
-                    change_summary=f'第{version}版变更说明' if version > 1 else '初始版本',
-                    changed_by=random.choice(users),
+                    '',
+                    f'第{version}版变更说明' if version > 1 else '初始版本',
+                    random.choice(users),
+                    version=version,
                 )
                 versions.append(version_obj)
         
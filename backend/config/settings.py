@@ -214,12 +214,70 @@ CACHE_TTL = {
     'dashboard_stats': 60,  # 1分钟
     'ai_config': 3600,  # 1小时
     'review_result': 1800,  # 30分钟
+    'rule_index': 3600,  # 1小时（规则变更时自动失效）
+    'rule_clause_hits': 86400 * 7,  # 7天（按条款内容哈希和规则集版本缓存）
+}
+
+# 规则引擎分片并行扫描配置（大合同、大规则集时启用进程池）
+RULE_ENGINE_PARALLEL = {
+    'ENABLED': os.getenv('RULE_ENGINE_PARALLEL_ENABLED', 'True').lower() == 'true',
+    'MAX_WORKERS': int(os.getenv('RULE_ENGINE_PARALLEL_WORKERS', '0')) or None,
+    'MIN_TEXT_LENGTH': 200000,
+    'MIN_RULE_COUNT': 500,
+    'START_METHOD': os.getenv('RULE_ENGINE_PARALLEL_START_METHOD', 'forkserver'),  # 不要使用fork
+}
+
+# 规则命中统计从进程内计数器刷新到数据库的间隔（秒）
+RULE_STATS_FLUSH_INTERVAL = int(os.getenv('RULE_STATS_FLUSH_INTERVAL', '60'))
+
+# 规则回测配置
+RULE_BACKTEST = {
+    'BATCH_SIZE': 50,
+    'SLOW_P99_MS': 20.0,  # 单份合同匹配耗时p99超过该值（毫秒）标记为慢规则
+    'BROAD_HIT_RATE': 0.5,  # 命中合同比例超过该值标记为过宽规则
+}
+
+# 规则开销预算：规则创建/修改时在固定样本合同上做基准测试
+RULE_AUTHORING_BUDGET = {
+    'SOFT_TIME_MS': float(os.getenv('RULE_BUDGET_SOFT_TIME_MS', '20')),  # 单份合同耗时超过该值标记规则
+    'HARD_TIME_MS': float(os.getenv('RULE_BUDGET_HARD_TIME_MS', '200')),  # 超过该值拒绝保存
+    'SOFT_MEMORY_KB': float(os.getenv('RULE_BUDGET_SOFT_MEMORY_KB', '2048')),
+    'HARD_MEMORY_KB': float(os.getenv('RULE_BUDGET_HARD_MEMORY_KB', '32768')),
+    'TIMEOUT_SECONDS': float(os.getenv('RULE_BUDGET_TIMEOUT_SECONDS', '5')),  # 基准测试超时视为超出硬限制
+}
+
+# 合同文件解析配置
+CONTRACT_PARSING = {
+    'MAX_WORKERS': int(os.getenv('CONTRACT_PARSING_WORKERS', '0')) or None,
+    'PDF_PARALLEL_MIN_PAGES': 100,  # PDF页数达到该值时按页码区间并行提取
+    'PDF_PAGES_PER_TASK': 25,
+}
+
+# 条款级审核（review_mode=clause_cache）：按条款缓存大模型审核结果
+REVIEW_CLAUSE_CACHE = {
+    'BATCH_CHARS': int(os.getenv('REVIEW_CLAUSE_BATCH_CHARS', '6000')),  # 每次调用大模型发送的条款文本总长度上限
+    'MAX_CLAUSE_CHARS': 3000,
+}
+
+# 合同版本存储：周期性快照加增量压缩保存
+CONTRACT_VERSION_STORAGE = {
+    'SNAPSHOT_INTERVAL': 10,
+    'SNAPSHOT_RATIO': 0.5,
+    'CACHE_SIZE': int(os.getenv('CONTRACT_VERSION_CACHE_SIZE', '64')),
 }
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# 文件上传：超过 DIRECT_UPLOAD_MAX_SIZE 的文件分片上传（分片直接写入磁盘，单个分片不超过 DATA_UPLOAD_MAX_MEMORY_SIZE）
+CONTRACT_UPLOAD = {
+    'MAX_FILE_SIZE': int(os.getenv('CONTRACT_UPLOAD_MAX_MB', '200')) * 1024 * 1024,
+    'DIRECT_UPLOAD_MAX_SIZE': int(os.getenv('CONTRACT_DIRECT_UPLOAD_MAX_MB', '10')) * 1024 * 1024,
+    'CHUNK_SIZE': 5 * 1024 * 1024,
+    'SESSION_EXPIRE_HOURS': 24,
+}
+
 # Logging
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
 os.makedirs(LOGS_DIR, exist_ok=True)